@@ -54,6 +54,9 @@ Attributes:
     local_home_dir - the local user's home directory on the client machine
 
     submissions_path - path to the submissions directory
+    templates_path - path to the directory of assignment templates
+    info_cache_path - path to the directory in which info fetched from the
+                      server is cached between runs
 
     server_host - hostname of the server
     server_username - the faculty member's username on the server
@@ -219,6 +222,7 @@ class ClientConfiguration:
         # Initialize all attributes related to the local client machine
         self.submissions_path = None
         self.templates_path = os.path.expanduser('~/.config/git-keeper/templates')
+        self.info_cache_path = os.path.expanduser('~/.cache/git-keeper')
 
         if 'local' not in self._parser.sections():
             return
@@ -242,7 +246,17 @@ class ClientConfiguration:
                 error = 'Templates path must be absolute: {}'.format(self.templates_path)
                 raise ClientConfigurationError(error)
 
-        allowed_options = ['submissions_path', 'templates_path']
+        if self._parser.has_option('local', 'info_cache_path'):
+            self.info_cache_path = self._parser.get('local', 'info_cache_path')
+
+            self.info_cache_path = os.path.expanduser(self.info_cache_path)
+
+            if not os.path.isabs(self.info_cache_path):
+                error = 'Info cache path must be absolute: {}'.format(self.info_cache_path)
+                raise ClientConfigurationError(error)
+
+        allowed_options = ['submissions_path', 'templates_path',
+                           'info_cache_path']
         self._ensure_options_are_valid('local', allowed_options)
 
     def _set_class_aliases(self):
@@ -101,7 +101,7 @@ def class_exists(func):
         :param kwargs: keyword arguments to pass on to the original function
         """
 
-        if class_name not in server_interface.get_info().class_list():
+        if class_name not in server_interface.get_class_list():
             raise GkeepException('Class {0} does not exist'.format(class_name))
 
         return func(class_name, *args, **kwargs)
@@ -160,7 +160,7 @@ def class_does_not_exist(func):
         :param args: positional arguments to pass on to the wrapped function
         :param kwargs: keyword arguments to pass on to the original function
         """
-        if class_name in server_interface.get_info().class_list():
+        if class_name in server_interface.get_class_list():
             raise GkeepException('Class {0} already exists'.format(class_name))
 
         return func(class_name, *args, **kwargs)
@@ -193,7 +193,8 @@ def assignment_exists(func):
         :param kwargs: keyword arguments to pass on to the original function
         """
 
-        assignments = server_interface.get_info().assignment_list(class_name)
+        info = server_interface.get_info(class_names=[class_name])
+        assignments = info.assignment_list(class_name)
 
         if assignment_name not in assignments:
             error = ('Assignment {0} does not exist in class {1}'
@@ -230,7 +231,8 @@ def assignment_does_not_exist(func):
         :param kwargs: keyword arguments to pass on to the original function
         """
 
-        assignments = server_interface.get_info().assignment_list(class_name)
+        info = server_interface.get_info(class_names=[class_name])
+        assignments = info.assignment_list(class_name)
 
         if assignment_name in assignments:
             error = ('Assignment {0} already exists in class {1}'
@@ -265,8 +267,8 @@ def assignment_published(func):
         :param kwargs: keyword arguments to pass on to the original function
         """
 
-        if not server_interface.get_info().is_published(class_name,
-                                                        assignment_name):
+        if not server_interface.assignment_published(class_name,
+                                                     assignment_name):
             error = ('Assignment {0} in class {1} is not published'
                      .format(assignment_name, class_name))
             raise GkeepException(error)
@@ -299,8 +301,8 @@ def assignment_not_published(func):
         :param kwargs: keyword arguments to pass on to the original function
         """
 
-        if server_interface.get_info().is_published(class_name,
-                                                    assignment_name):
+        if server_interface.assignment_published(class_name,
+                                                 assignment_name):
             error = ('Assignment {0} in class {1} is already published'
                      .format(assignment_name, class_name))
             raise GkeepException(error)
@@ -333,8 +335,8 @@ def assignment_not_disabled(func):
         :param kwargs: keyword arguments to pass on to the original function
         """
 
-        if server_interface.get_info().is_disabled(class_name,
-                                                   assignment_name):
+        if server_interface.assignment_disabled(class_name,
+                                                assignment_name):
             error = ('Assignment {0} in class {1} is disabled'
                      .format(assignment_name, class_name))
             raise GkeepException(error)
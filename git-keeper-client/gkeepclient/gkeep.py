@@ -278,6 +278,11 @@ def add_trigger_subparser(subparsers):
                            nargs='*',
                            help='optional, trigger tests for only these '
                                 'students')
+    subparser.add_argument('--digest', metavar='<seconds>', type=int,
+                           dest='digest_window',
+                           help='optional, combine the results emails each '
+                                'student receives within this many seconds '
+                                'into one email')
 
 
 def add_passwd_subparser(subparsers):
@@ -590,7 +595,8 @@ def take_action(parsed_args):
                   parsed_args.json)
     elif action_name == 'trigger':
         trigger_tests(class_name, assignment_name,
-                      parsed_args.student_usernames, parsed_args.yes)
+                      parsed_args.student_usernames, parsed_args.yes,
+                      digest_window=parsed_args.digest_window)
     elif action_name == 'passwd':
         reset_password(parsed_args.username)
     elif action_name == 'config':
@@ -0,0 +1,112 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a cache for storing info files fetched from the server on the local
+disk, so that they survive between runs of gkeep.
+
+Files are stored under their server-side filenames. Info filenames are
+timestamps and shard filenames contain a hash of their contents, so a cached
+file with the same name as the newest file on the server never needs to be
+downloaded again.
+
+The cache is strictly an optimization. Errors reading from or writing to the
+cache are ignored, and the caller falls back to fetching from the server.
+"""
+
+import os
+from tempfile import NamedTemporaryFile
+
+
+class InfoDiskCache:
+    """
+    Stores info files in a directory on the local machine. Files are grouped
+    into named categories, each of which is a subdirectory of the cache
+    directory.
+    """
+
+    def __init__(self, cache_path: str):
+        """
+        Create the object. The cache directory is created the first time
+        something is stored.
+
+        :param cache_path: path to the cache directory
+        """
+
+        self._cache_path = cache_path
+
+    def get(self, category: str, filename: str):
+        """
+        Get the contents of a cached file.
+
+        :param category: category of the file, such as 'info'
+        :param filename: server-side filename of the file
+        :return: contents of the file as bytes, or None if the file is not in
+         the cache
+        """
+
+        try:
+            with open(self._file_path(category, filename), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, category: str, filename: str, contents: bytes):
+        """
+        Store a file in the cache.
+
+        The file is written to a temporary file first and then renamed, so
+        that another gkeep process never reads a partially written file.
+
+        :param category: category of the file, such as 'info'
+        :param filename: server-side filename of the file
+        :param contents: contents of the file
+        """
+
+        category_path = os.path.join(self._cache_path, category)
+
+        try:
+            os.makedirs(category_path, mode=0o700, exist_ok=True)
+
+            with NamedTemporaryFile('wb', dir=category_path, prefix='.',
+                                    delete=False) as f:
+                f.write(contents)
+
+            os.replace(f.name, self._file_path(category, filename))
+        except OSError:
+            pass
+
+    def prune(self, category: str, keep_filenames):
+        """
+        Remove all of the files in a category except for the given files.
+
+        :param category: category of the files
+        :param keep_filenames: collection of filenames to keep
+        """
+
+        category_path = os.path.join(self._cache_path, category)
+
+        try:
+            for filename in os.listdir(category_path):
+                if filename not in keep_filenames:
+                    os.remove(os.path.join(category_path, filename))
+        except OSError:
+            pass
+
+    def _file_path(self, category, filename):
+        # Build the path to a file in the cache
+
+        return os.path.join(self._cache_path, category, filename)
@@ -20,11 +20,74 @@ query results.
 """
 
 import json
+import os
 from time import time, localtime, strftime
 
 from gkeepclient.client_function_decorators import config_parsed, \
     server_interface_connected
 from gkeepclient.server_interface import server_interface
+from gkeepclient.server_response_poller import ServerResponsePoller, \
+    ServerResponseType
+from gkeepcore.gkeep_exception import GkeepException
+
+
+def open_class_names() -> list:
+    """
+    Get the names of the faculty's open classes.
+
+    :return: list of open class names
+    """
+
+    return [class_name for class_name in server_interface.get_class_list()
+            if server_interface.is_open(class_name)]
+
+
+def query_server(query: str):
+    """
+    Ask gkeepd to compute the result of a query about the faculty's open
+    classes. See gkeepserver.event_handlers.query_handler for the supported
+    queries and the format of their results.
+
+    Returns None if the server does not answer queries, or if it fails to
+    answer this one within a few seconds, for instance because gkeepd is not
+    running or is busy. Callers should then compute the result from the info
+    file instead.
+
+    :param query: the query type, optionally followed by a space and an
+     argument
+    :return: the result of the query, or None
+    """
+
+    if not server_interface.supports_queries():
+        return None
+
+    event_type = 'QUERY'
+
+    # the info file gives the same answer, so do not wait long for gkeepd
+    response_timeout = 3
+
+    poller = ServerResponsePoller(event_type, response_timeout)
+
+    server_interface.log_event(event_type, query)
+
+    for response in poller.response_generator():
+        if response.response_type != ServerResponseType.SUCCESS:
+            continue
+
+        try:
+            response_data = json.loads(response.message)
+
+            if 'file' in response_data:
+                result_path = os.path.join(
+                    server_interface.query_results_path(),
+                    response_data['file'])
+                return json.loads(server_interface.read_file_text(result_path))
+
+            return response_data['result']
+        except (ValueError, KeyError, GkeepException):
+            return None
+
+    return None
 
 
 @config_parsed
@@ -32,7 +95,7 @@ from gkeepclient.server_interface import server_interface
 def list_classes(output_json: bool):
     """Print the names of all the classes owned by the faculty."""
 
-    class_list = sorted(server_interface.get_info().class_list())
+    class_list = sorted(server_interface.get_class_list())
 
     open_classes = []
     closed_classes = []
@@ -71,37 +134,31 @@ def list_assignments(output_json: bool):
     :param output_json: True if the output should be JSON, False otherwise
     """
 
-    info = server_interface.get_info()
+    assignments_by_class = query_server('assignments')
+
+    if assignments_by_class is None:
+        assignments_by_class = assignments_from_info()
 
     text_output = ''
     json_output = {}
 
-    for class_name in sorted(info.class_list()):
-        if not info.is_open(class_name):
-            continue
-
+    for class_name in sorted(assignments_by_class):
         text_output += '{}:\n'.format(class_name)
         json_output[class_name] = []
 
-        for assignment_name in sorted(info.assignment_list(class_name)):
-            published = info.is_published(class_name, assignment_name)
-            disabled = info.is_disabled(class_name, assignment_name)
-
-            json_assignment = {
-                'name': assignment_name,
-                'published': published,
-                'disabled': disabled,
-            }
+        assignments = sorted(assignments_by_class[class_name],
+                             key=lambda assignment: assignment['name'])
 
-            if disabled:
+        for assignment in assignments:
+            if assignment['disabled']:
                 prefix = 'D'
-            elif published:
+            elif assignment['published']:
                 prefix = 'P'
             else:
                 prefix = 'U'
 
-            text_output += '{} {}\n'.format(prefix, assignment_name)
-            json_output[class_name].append(json_assignment)
+            text_output += '{} {}\n'.format(prefix, assignment['name'])
+            json_output[class_name].append(assignment)
 
         text_output += '\n'
 
@@ -111,6 +168,28 @@ def list_assignments(output_json: bool):
         print(text_output, end='')
 
 
+def assignments_from_info() -> dict:
+    """
+    Build a dictionary which maps each open class to a list of assignment
+    dictionaries, using the info file.
+
+    :return: the same result as the server's assignments query
+    """
+
+    info = server_interface.get_info(class_names=open_class_names())
+
+    assignments_by_class = {}
+
+    for class_name in info.class_list():
+        assignments_by_class[class_name] = [{
+            'name': assignment_name,
+            'published': info.is_published(class_name, assignment_name),
+            'disabled': info.is_disabled(class_name, assignment_name),
+        } for assignment_name in info.assignment_list(class_name)]
+
+    return assignments_by_class
+
+
 @config_parsed
 @server_interface_connected
 def list_students(output_json: bool):
@@ -120,35 +199,25 @@ def list_students(output_json: bool):
     :param output_json: True if the output should be JSON, False otherwise
     """
 
-    text_output = ''
-    json_output = {}
+    students_by_class = query_server('students')
 
-    info = server_interface.get_info()
-    class_list = info.class_list()
+    if students_by_class is None:
+        students_by_class = students_from_info()
 
-    for class_name in sorted(class_list):
-        if not info.is_open(class_name):
-            continue
+    text_output = ''
+    json_output = {}
 
+    for class_name in sorted(students_by_class):
         text_output += '{}:\n'.format(class_name)
-        json_output[class_name] = []
 
-        student_list = info.student_list(class_name)
+        students = sorted(students_by_class[class_name],
+                          key=lambda student: student['username'])
+        json_output[class_name] = students
 
-        lines = []
-
-        for username in sorted(student_list):
-            first_name = info.student_first_name(class_name, username)
-            last_name = info.student_last_name(class_name, username)
-            email_address = info.student_email_address(class_name, username)
-
-            lines.append('{}, {} ({})'.format(last_name, first_name, username))
-            json_output[class_name].append({
-                'first_name': first_name,
-                'last_name': last_name,
-                'username': username,
-                'email_address': email_address,
-            })
+        lines = ['{}, {} ({})'.format(student['last_name'],
+                                      student['first_name'],
+                                      student['username'])
+                 for student in students]
 
         text_output += '\n'.join(sorted(lines))
         text_output += '\n\n'
@@ -159,6 +228,30 @@ def list_students(output_json: bool):
         print(text_output, end='')
 
 
+def students_from_info() -> dict:
+    """
+    Build a dictionary which maps each open class to a list of student
+    dictionaries, using the info file.
+
+    :return: the same result as the server's students query
+    """
+
+    info = server_interface.get_info(class_names=open_class_names())
+
+    students_by_class = {}
+
+    for class_name in info.class_list():
+        students_by_class[class_name] = [{
+            'first_name': info.student_first_name(class_name, username),
+            'last_name': info.student_last_name(class_name, username),
+            'username': username,
+            'email_address': info.student_email_address(class_name,
+                                                        username),
+        } for username in info.student_list(class_name)]
+
+    return students_by_class
+
+
 @config_parsed
 @server_interface_connected
 def list_recent(number_of_days, output_json: bool):
@@ -170,88 +263,88 @@ def list_recent(number_of_days, output_json: bool):
     :param output_json: True if the output should be JSON, False otherwise
     """
 
-    text_output = ''
-    json_output = {}
-
     if number_of_days is None:
         number_of_days = 1
 
-    text_output += 'Recent submissions:\n\n'
+    recent_by_class = query_server('recent {}'.format(number_of_days))
 
-    info = server_interface.get_info()
+    if recent_by_class is None:
+        recent_by_class = recent_from_info(number_of_days)
 
-    for class_name in sorted(info.class_list()):
-        if not server_interface.is_open(class_name):
-            continue
+    text_output = 'Recent submissions:\n\n'
+    json_output = {}
 
-        class_name_printed = False
+    for class_name in sorted(recent_by_class):
+        text_output += '{}:\n'.format(class_name)
+        json_output[class_name] = {}
+
+        for assignment_name in sorted(recent_by_class[class_name]):
+            text_output += '  {}:\n'.format(assignment_name)
+            json_output[class_name][assignment_name] = []
+
+            for submission in recent_by_class[class_name][assignment_name]:
+                human_timestamp = strftime('%Y-%m-%d %H:%M:%S',
+                                           localtime(submission['time']))
+                text_output += '   {} {} {} ({})\n'.format(
+                    human_timestamp, submission['first_name'],
+                    submission['last_name'], submission['email_address'])
+                json_entry = {
+                    'time': submission['time'],
+                    'human_time': human_timestamp,
+                    'first_name': submission['first_name'],
+                    'last_name': submission['last_name'],
+                    'username': submission['username'],
+                    'email_address': submission['email_address'],
+                }
+                json_output[class_name][assignment_name].append(json_entry)
+
+            text_output += '\n'
 
-        for assignment_name in sorted(info.assignment_list(class_name)):
-            published = info.is_published(class_name, assignment_name)
-            disabled = info.is_disabled(class_name, assignment_name)
+    if output_json:
+        print(json.dumps(json_output))
+    else:
+        print(text_output)
 
-            if not published or disabled:
-                continue
 
-            students_submitted = info.students_submitted_list(class_name,
-                                                              assignment_name)
+def recent_from_info(number_of_days) -> dict:
+    """
+    Build a dictionary which maps each open class to a dictionary mapping
+    assignment names to lists of recent submissions, using the info file.
+    Submissions are sorted by time, and classes and assignments without
+    recent submissions are left out.
 
-            if students_submitted is None:
-                continue
+    :param number_of_days: submissions past this number of days ago are not
+     recent
+    :return: the same result as the server's recent query
+    """
 
-            cutoff_time = time() - (60 * 60 * 24 * number_of_days)
+    info = server_interface.get_info(class_names=open_class_names())
 
-            recent = []
+    cutoff_time = time() - (60 * 60 * 24 * number_of_days)
 
-            for username in students_submitted:
-                if info.student_submission_count(
-                        class_name, assignment_name, username) == 0:
-                    continue
+    recent_by_class = {}
 
-                submission_time = \
-                    info.student_submission_time(class_name, assignment_name,
-                                                 username)
+    for class_name in info.class_list():
+        for assignment_name in info.assignment_list(class_name):
+            published = info.is_published(class_name, assignment_name)
+            disabled = info.is_disabled(class_name, assignment_name)
+
+            if not published or disabled:
+                continue
 
-                if submission_time >= cutoff_time:
-                    first_name = info.student_first_name(class_name, username)
-                    last_name = info.student_last_name(class_name, username)
-                    email_address = info.student_email_address(class_name,
-                                                               username)
-                    recent.append((submission_time, first_name, last_name,
-                                   username, email_address))
+            recent = [{
+                'time': submission_time,
+                'first_name': info.student_first_name(class_name, username),
+                'last_name': info.student_last_name(class_name, username),
+                'username': username,
+                'email_address': info.student_email_address(class_name,
+                                                            username),
+            } for submission_time, username
+                in info.recent_submissions(class_name, assignment_name,
+                                           cutoff_time)]
 
             if len(recent) > 0:
-                recent.sort()
-
-                if not class_name_printed:
-                    text_output += '{}:\n'.format(class_name)
-                    json_output[class_name] = {}
-                    class_name_printed = True
-
-                text_output += '  {}:\n'.format(assignment_name)
-                json_output[class_name][assignment_name] = []
-
-                for (timestamp, first_name, last_name, username,
-                     email_address) in recent:
-                    human_timestamp = strftime('%Y-%m-%d %H:%M:%S',
-                                               localtime(timestamp))
-                    text_output += '   {} {} {} ({})\n'.format(human_timestamp,
-                                                               first_name,
-                                                               last_name,
-                                                               email_address)
-                    json_entry = {
-                        'time': timestamp,
-                        'human_time': human_timestamp,
-                        'first_name': first_name,
-                        'last_name': last_name,
-                        'username': username,
-                        'email_address': email_address,
-                    }
-                    json_output[class_name][assignment_name].append(json_entry)
-
-                text_output += '\n'
+                recent_by_class.setdefault(class_name, {})[assignment_name] = \
+                    recent
 
-    if output_json:
-        print(json.dumps(json_output))
-    else:
-        print(text_output)
+    return recent_by_class
@@ -126,7 +126,8 @@ def class_modify(class_name: str, csv_file_path: str, yes: bool):
         raise GkeepException('{0} does not exist'.format(csv_file_path))
 
     students = students_from_csv(LocalCSVReader(csv_file_path))
-    existing_students = server_interface.get_info().class_students(class_name)
+    info = server_interface.get_info(class_names=[class_name])
+    existing_students = info.class_students(class_name)
 
     print('Modifying class {0}'.format(class_name))
 
@@ -376,7 +377,7 @@ def delete_assignment(class_name: str, assignment_name: str,
     :param yes: if True, will automatically answer yes to confirmation prompts
     """
 
-    if server_interface.get_info().is_published(class_name, assignment_name):
+    if server_interface.assignment_published(class_name, assignment_name):
         error = ('Assignment {} is published and cannot be deleted.\n'
                  'Use gkeep disable if you wish to disable this assignment.'
                  .format(assignment_name))
@@ -474,7 +475,8 @@ def publish_assignment(class_name: str, assignment_name: str):
 @assignment_exists
 @assignment_not_disabled
 def trigger_tests(class_name: str, assignment_name: str,
-                  student_usernames: list, yes: bool, response_timeout=20):
+                  student_usernames: list, yes: bool, response_timeout=20,
+                  digest_window=None):
     """
     Trigger tests to be run on the server.
 
@@ -487,8 +489,14 @@ def trigger_tests(class_name: str, assignment_name: str,
     be run, or an empty list for all students
     :param yes: if True, will automatically answer yes to confirmation prompts
     :param response_timeout: seconds to wait for server response
+    :param digest_window: if not None, the results emails that each student
+     receives within this many seconds are combined into one email
     """
 
+    if digest_window is not None and digest_window <= 0:
+        raise GkeepException('The digest window must be a positive number of '
+                             'seconds')
+
     published = server_interface.assignment_published(class_name,
                                                       assignment_name)
     faculty_only = (len(student_usernames) == 1 and
@@ -500,8 +508,8 @@ def trigger_tests(class_name: str, assignment_name: str,
                  'faculty account')
         raise GkeepException(error)
 
-    class_student_usernames = \
-        server_interface.get_info().student_list(class_name)
+    info = server_interface.get_info(class_names=[class_name])
+    class_student_usernames = info.student_list(class_name)
 
     if len(student_usernames) == 0:
         student_usernames = class_student_usernames
@@ -526,6 +534,9 @@ def trigger_tests(class_name: str, assignment_name: str,
     for username in student_usernames:
         payload += ' {0}'.format(username)
 
+    if digest_window is not None:
+        payload += ' --digest={0}'.format(digest_window)
+
     communicate_event('TRIGGER', payload, response_timeout=response_timeout,
                       success_message='Tests triggered successfully',
                       error_message='Error triggering tests: ',
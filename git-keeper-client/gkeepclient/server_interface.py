@@ -49,21 +49,25 @@ Example usage::
 import csv
 import json
 import os
+import stat
 from shlex import quote
 from time import time
 
 from paramiko import SSHClient, AutoAddPolicy, SSHException
 
 from gkeepclient.client_configuration import config
+from gkeepclient.info_disk_cache import InfoDiskCache
 from gkeepcore.gkeep_exception import GkeepException
 from gkeepcore.log_file import log_append_command
 from gkeepcore.path_utils import user_log_path, gkeepd_to_faculty_log_path, \
     faculty_upload_dir_path, faculty_assignment_dir_path, \
     faculty_class_dir_path, assignment_published_file_path, \
     faculty_classes_dir_path, class_student_csv_path, faculty_info_path, \
-    user_gitkeeper_path, user_gitkeeper_path_from_home_dir
+    user_gitkeeper_path, user_gitkeeper_path_from_home_dir, \
+    faculty_info_shards_path, faculty_info_manifest_path, \
+    faculty_query_results_path
 from gkeepcore.student import Student
-from gkeepcore.faculty_class_info import FacultyClassInfo
+from gkeepcore.faculty_class_info import FacultyClassInfo, decode_info
 
 
 class ServerInterfaceError(GkeepException):
@@ -95,6 +99,14 @@ class ServerInterface:
         self._info_cache = None
         self._info_cache_fetch_time = None
 
+        self._manifest_cache = None
+        self._manifest_cache_fetch_time = None
+
+        # maps class names to (shard hash, class info dictionary) tuples
+        self._shard_cache = {}
+
+        self._info_disk_cache = None
+
     def is_connected(self):
         """
         Determine if we're connected to the server.
@@ -139,6 +151,12 @@ class ServerInterface:
             self._gitkeeper_path = \
                 user_gitkeeper_path_from_home_dir(self._home_dir)
             self._event_log_path = self.me_to_gkeepd_log_path()
+
+            # keep separate caches for each server account
+            cache_name = '{0}@{1}'.format(config.server_username,
+                                          config.server_host)
+            self._info_disk_cache = \
+                InfoDiskCache(os.path.join(config.info_cache_path, cache_name))
         except Exception as e:
             error = ('Error connecting to {0}: {1}'.format(config.server_host,
                                                            e))
@@ -480,6 +498,34 @@ class ServerInterface:
 
         return log_path
 
+    def query_results_path(self) -> str:
+        """
+        Build the path to the directory in which gkeepd writes large query
+        results.
+
+        :return: query results directory path
+        """
+
+        return faculty_query_results_path(self._gitkeeper_path)
+
+    def supports_queries(self) -> bool:
+        """
+        Determine if gkeepd on the server answers QUERY events. Servers that
+        do create the query results directory.
+
+        :return: True if the server answers QUERY events, False otherwise
+        """
+
+        # stat over the existing SFTP session rather than running a command
+        try:
+            path_stat = self._sftp_client.stat(self.query_results_path())
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            raise ServerInterfaceError(e)
+
+        return stat.S_ISDIR(path_stat.st_mode)
+
     def upload_dir_path(self):
         """
         Build the path to the faculty's upload directory on the server.
@@ -521,7 +567,27 @@ class ServerInterface:
         :return: True if the class is open, False i fnot
         """
 
-        return self.get_info().is_open(class_name)
+        manifest = self.get_info_manifest()
+
+        if manifest is None:
+            return self.get_info().is_open(class_name)
+
+        return manifest[class_name]['open']
+
+    def get_class_list(self) -> list:
+        """
+        Get the names of all of the faculty member's classes from the info on
+        the server, including closed classes.
+
+        :return: list of class names
+        """
+
+        manifest = self.get_info_manifest()
+
+        if manifest is None:
+            return self.get_info().class_list()
+
+        return list(manifest)
 
     def assignment_exists(self, class_name: str, assignment_name: str) -> bool:
         """
@@ -546,7 +612,8 @@ class ServerInterface:
         :return: True if the assignment is published, False otherwise
         """
 
-        return self.get_info().is_published(class_name, assignment_name)
+        info = self.get_info(class_names=[class_name])
+        return info.is_published(class_name, assignment_name)
 
     def assignment_disabled(self, class_name: str,
                             assignment_name: str) -> bool:
@@ -558,7 +625,8 @@ class ServerInterface:
         :return: True if the assignment is disabled, False otherwise
         """
 
-        return self.get_info().is_disabled(class_name, assignment_name)
+        info = self.get_info(class_names=[class_name])
+        return info.is_disabled(class_name, assignment_name)
 
     def get_classes(self):
         """
@@ -618,9 +686,10 @@ class ServerInterface:
 
         assignments_info = []
 
-        for assignment_name in self.get_info().assignment_list(class_name):
-            published = self.get_info().is_published(class_name,
-                                                     assignment_name)
+        info = self.get_info(class_names=[class_name])
+
+        for assignment_name in info.assignment_list(class_name):
+            published = info.is_published(class_name, assignment_name)
             assignments_info.append((assignment_name, published))
 
         return assignments_info
@@ -647,45 +716,194 @@ class ServerInterface:
 
         return students
 
-    def get_info(self, freshness_threshold=5) -> FacultyClassInfo:
+    def get_info(self, freshness_threshold=5,
+                 class_names=None) -> FacultyClassInfo:
         """
         Fetch info from the server and return it as an FacultyClassInfo object.
 
+        If class_names is given, the returned object only contains
+        information about those classes. If the server also provides
+        per-class info shards, only the shards for those classes are fetched,
+        and only if they have changed since they were last fetched.
+
         :param freshness_threshold: If the number of seconds since the last
          fetch is smaller than freshness_threshold, the last cached fetch is
          returned. If freshness_threshold is None, the cached version will be
          used regardless of freshness.
+        :param class_names: optional list of the names of the classes that
+         the caller is interested in
         :return: FacultyClassInfo object
         """
 
+        if class_names is not None:
+            manifest = self.get_info_manifest(freshness_threshold)
+
+            if manifest is not None:
+                return self._get_sharded_info(class_names, manifest)
+
+            full_info = self.get_info(freshness_threshold).info_dict
+            return FacultyClassInfo({name: full_info[name]
+                                     for name in class_names
+                                     if name in full_info})
+
         # If the cache exists and is fresh enough, return the cached info
-        if self._info_cache_fetch_time is not None:
-            if freshness_threshold is None:
-                return self._info_cache
-            else:
-                freshness = time() - self._info_cache_fetch_time
-                if freshness < freshness_threshold:
-                    return self._info_cache
+        if self._cache_is_fresh(self._info_cache_fetch_time,
+                                freshness_threshold):
+            return self._info_cache
 
         info_path = faculty_info_path(self._gitkeeper_path)
 
-        # Get the contents of the last file in the directory, or an empty
-        # string if the directory is empty.
-        command = \
-            'echo | cat {0}/`ls {0} | tail -1`'.format(info_path).rstrip()
+        # info filenames are timestamps, so the last one is the newest
+        info_filenames = sorted(self.list_directory(info_path))
+
+        if len(info_filenames) == 0:
+            raise ServerInterfaceError('No info files found on the server')
 
+        newest_filename = info_filenames[-1]
+
+        # only download the newest info file if it is not already cached
+        # from a previous run
+        info_bytes = self._info_disk_cache.get('info', newest_filename)
+        downloaded = info_bytes is None
+
+        if downloaded:
+            info_bytes = self.read_file_bytes(os.path.join(info_path,
+                                                           newest_filename))
+
+        # the info may be plain or compressed JSON
         try:
-            info_json = self.run_command(command)
-            info = json.loads(info_json)
-        except Exception as e:
+            info_cache = FacultyClassInfo.from_bytes(info_bytes)
+        except ValueError as e:
             raise ServerInterfaceError('Error loading info from JSON: {0}'
                                        .format(e))
 
-        self._info_cache = FacultyClassInfo(info)
+        if downloaded:
+            self._info_disk_cache.put('info', newest_filename, info_bytes)
+            self._info_disk_cache.prune('info', {newest_filename})
+
+        self._info_cache = info_cache
         self._info_cache_fetch_time = time()
 
         return self._info_cache
 
+    def get_info_manifest(self, freshness_threshold=5):
+        """
+        Fetch the manifest of per-class info shards from the server.
+
+        The manifest maps each class name to a dictionary containing whether
+        or not the class is open, the hash of the class's info shard, and the
+        filename of the shard.
+
+        :param freshness_threshold: same as the parameter for get_info()
+        :return: the manifest as a dictionary, or None if the server has not
+         written a manifest
+        """
+
+        if self._cache_is_fresh(self._manifest_cache_fetch_time,
+                                freshness_threshold):
+            return self._manifest_cache
+
+        manifest_path = faculty_info_manifest_path(self._gitkeeper_path)
+
+        try:
+            self._sftp_client.stat(manifest_path)
+        except FileNotFoundError:
+            # servers older than the shard format only write full info files
+            return None
+        except Exception as e:
+            raise ServerInterfaceError(e)
+
+        try:
+            manifest = json.loads(self.read_file_text(manifest_path))
+        except ValueError as e:
+            raise ServerInterfaceError('Error loading info manifest from '
+                                       'JSON: {0}'.format(e))
+
+        self._manifest_cache = manifest
+        self._manifest_cache_fetch_time = time()
+
+        # shards that are no longer in the manifest will never be used again
+        self._info_disk_cache.prune('info_shards',
+                                    {entry['file'] for entry
+                                     in manifest.values()})
+
+        return self._manifest_cache
+
+    def _get_sharded_info(self, class_names, manifest) -> FacultyClassInfo:
+        # Build a FacultyClassInfo object from the shards of the given
+        # classes, downloading only the shards whose hashes have changed.
+        # Classes that are not in the manifest are left out.
+
+        info = {}
+
+        for class_name in class_names:
+            if class_name not in manifest:
+                continue
+
+            try:
+                class_info = self._get_class_shard(class_name,
+                                                   manifest[class_name])
+            except ServerInterfaceError:
+                # the shard may have been replaced since the manifest was
+                # fetched, so try again with a fresh manifest
+                manifest = self.get_info_manifest(freshness_threshold=0)
+
+                if manifest is None or class_name not in manifest:
+                    continue
+
+                class_info = self._get_class_shard(class_name,
+                                                   manifest[class_name])
+
+            info[class_name] = class_info
+
+        return FacultyClassInfo(info)
+
+    def _get_class_shard(self, class_name, manifest_entry) -> dict:
+        # Get the info dictionary for a single class from the in-memory shard
+        # cache or the disk cache, downloading the shard only if neither has
+        # the current version
+
+        cached = self._shard_cache.get(class_name)
+
+        if cached is not None and cached[0] == manifest_entry['hash']:
+            return cached[1]
+
+        shard_filename = manifest_entry['file']
+        shard_bytes = self._info_disk_cache.get('info_shards', shard_filename)
+        downloaded = shard_bytes is None
+
+        if downloaded:
+            shards_path = faculty_info_shards_path(self._gitkeeper_path)
+            shard_bytes = self.read_file_bytes(os.path.join(shards_path,
+                                                            shard_filename))
+
+        try:
+            shard = decode_info(shard_bytes)
+        except ValueError as e:
+            raise ServerInterfaceError('Error loading info shard from JSON: '
+                                       '{0}'.format(e))
+
+        if downloaded:
+            self._info_disk_cache.put('info_shards', shard_filename,
+                                      shard_bytes)
+
+        self._shard_cache[class_name] = (manifest_entry['hash'],
+                                         shard[class_name])
+
+        return shard[class_name]
+
+    def _cache_is_fresh(self, fetch_time, freshness_threshold) -> bool:
+        # Determine if something cached at fetch_time may be used given the
+        # freshness_threshold semantics described in get_info()
+
+        if fetch_time is None:
+            return False
+
+        if freshness_threshold is None:
+            return True
+
+        return time() - fetch_time < freshness_threshold
+
 
 # Module-level interface instance. Someone must call connect() on this before
 # it is used
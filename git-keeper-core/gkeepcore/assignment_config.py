@@ -115,6 +115,7 @@ class AssignmentConfig:
         self.use_html = None
         self.announcement_subject = '[{class_name}] New assignment: {assignment_name}'
         self.results_subject = '[{class_name}] {assignment_name} submission test results'
+        self.results_digest_window = None
 
     def _parse_config_file(self):
         # Use a ConfigParser object to parse the configuration file and store
@@ -232,6 +233,7 @@ class AssignmentConfig:
             'use_html',
             'announcement_subject',
             'results_subject',
+            'results_digest_window',
         ]
 
         for name in optional_options:
@@ -253,6 +255,10 @@ class AssignmentConfig:
                     error = '{} must be true or false'.format(attr)
                     raise GkeepException(error)
 
+        # results_digest_window must be a positive integer if not None
+        if self.results_digest_window is not None:
+            self._ensure_positive_integer('results_digest_window')
+
         self._ensure_options_are_valid('email', optional_options)
 
     def _ensure_options_are_valid(self, section, allowed_fields):
@@ -0,0 +1,101 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+
+"""
+Provides functions for delivering log events to a running gkeepd through its
+event socket, so that gkeepd does not have to wait to discover them by
+polling the log.
+
+The event socket is a Unix socket at EVENT_SOCKET_PATH which any user can
+connect to. Its directory is owned by the keeper user and only writable by
+it, so no other user can create the socket in gkeepd's place. gkeepd only
+accepts an event for the log of the user that is connected to the socket.
+The line must still be appended to the log first, which remains the record
+of the event and is how gkeepd finds events that could not be delivered.
+
+Example usage:
+
+    from gkeepcore.event_socket import deliver_event, EventSocketError
+    from gkeepcore.log_file import log_line, append_to_log
+
+    line = log_line('SUBMISSION', payload)
+    append_to_log(log_path, [line])
+
+    try:
+        deliver_event(log_path, line)
+    except EventSocketError:
+        # gkeepd will find the event when it polls the log
+        pass
+
+"""
+
+import json
+import socket
+
+from gkeepcore.gkeep_exception import GkeepException
+
+# path of the socket that gkeepd listens on for events. It is not
+# configurable because the git hooks that deliver events cannot read gkeepd's
+# configuration.
+EVENT_SOCKET_PATH = '/run/gkeepd/events.sock'
+
+
+class EventSocketError(GkeepException):
+    """Raised if an event cannot be delivered to gkeepd."""
+    pass
+
+
+def deliver_event(log_path: str, line: str, timeout=2,
+                  socket_path=EVENT_SOCKET_PATH):
+    """
+    Deliver an event that has been appended to a log to gkeepd, and wait for
+    gkeepd to acknowledge it.
+
+    Raises EventSocketError if gkeepd is not listening, does not respond in
+    time, or rejects the event.
+
+    :param log_path: path to the log that the line was appended to
+    :param line: the line that was appended, as built by log_line()
+    :param timeout: seconds to wait for gkeepd
+    :param socket_path: path of the event socket
+    """
+
+    request = {'log_path': log_path, 'line': line}
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+
+    try:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+        with connection.makefile('rb') as f:
+            response_line = f.readline()
+    except OSError as e:
+        raise EventSocketError('Error delivering event to gkeepd: {0}'
+                               .format(e))
+    finally:
+        connection.close()
+
+    try:
+        response = json.loads(response_line.decode('utf-8'))
+    except ValueError:
+        raise EventSocketError('Malformed response from gkeepd')
+
+    if not response['ok']:
+        raise EventSocketError(response['error'])
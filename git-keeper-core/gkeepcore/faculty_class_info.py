@@ -53,15 +53,74 @@ The structure of this dictionary is as follows:
   }
  }
 }
+
+Info files may be stored as plain JSON or as gzip-compressed JSON. Use
+encode_info() to produce either encoding and FacultyClassInfo.from_bytes() to
+load either one. Compressed data is recognized by the gzip magic number, so
+readers do not need to know which encoding was used.
 """
 
+import gzip
+import json
+from bisect import bisect_left
+from operator import itemgetter
 from time import localtime
 
 
+# first two bytes of any gzip stream
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def encode_info(info_dict: dict, compress=False) -> bytes:
+    """
+    Encode an info dictionary as JSON, optionally compressed with gzip.
+
+    :param info_dict: dictionary of information about a faculty's classes
+    :param compress: if True, the JSON is gzip-compressed
+    :return: the encoded info
+    """
+
+    info_bytes = json.dumps(info_dict, separators=(',', ':'),
+                            sort_keys=True).encode('utf-8')
+
+    if compress:
+        # mtime is fixed so that equal info always produces equal bytes.
+        # Level 6 is nearly as small as the default level of 9 and is
+        # several times faster, which matters because the server re-encodes
+        # info after every submission.
+        info_bytes = gzip.compress(info_bytes, compresslevel=6, mtime=0)
+
+    return info_bytes
+
+
+def decode_info(info_bytes: bytes) -> dict:
+    """
+    Decode info that was encoded by encode_info(), detecting whether or not
+    it is compressed.
+
+    Raises ValueError if the data cannot be decoded.
+
+    :param info_bytes: the encoded info
+    :return: the info dictionary
+    """
+
+    if info_bytes[:2] == GZIP_MAGIC:
+        try:
+            info_bytes = gzip.decompress(info_bytes)
+        except (OSError, EOFError) as e:
+            raise ValueError('Invalid compressed info: {0}'.format(e))
+
+    return json.loads(info_bytes.decode('utf-8'))
+
+
 class FacultyClassInfo:
     """
     Provides methods for extracting information from a faculty's info
     dictionary from the server.
+
+    Some queries are answered from indexes which are built from the info
+    dictionary the first time they are needed. The info dictionary must not
+    be modified after the object is created.
     """
 
     def __init__(self, info_dict: dict):
@@ -72,6 +131,30 @@ class FacultyClassInfo:
 
         self.info_dict = info_dict
 
+        # (class name, assignment name) -> list of (submission time, username)
+        # tuples for the students who submitted, sorted by time
+        self._submissions_by_time = {}
+
+        # class name -> dictionary mapping each student username to the list
+        # of assignments for which the student has a repository
+        self._assignments_by_student = {}
+
+        # class name -> dictionary mapping "last name, first name" to username
+        self._usernames_by_name = {}
+
+    @classmethod
+    def from_bytes(cls, info_bytes: bytes):
+        """
+        Create the object from info encoded as plain or compressed JSON.
+
+        Raises ValueError if the data cannot be decoded.
+
+        :param info_bytes: the encoded info
+        :return: FacultyClassInfo object
+        """
+
+        return cls(decode_info(info_bytes))
+
     def class_count(self) -> int:
         """
         Get the number of classes.
@@ -218,31 +301,39 @@ class FacultyClassInfo:
         :return: number of students who submitted the assignment
         """
 
-        students_submitted = 0
-        for student in self.student_list(class_name):
-            submission_count = \
-                self.student_submission_count(class_name, assignment, student)
-            if submission_count != 0:
-                students_submitted += 1
-        return students_submitted
+        return len(self._submissions(class_name, assignment))
 
     def students_submitted_list(self, class_name: str, assignment: str) \
             -> list:
         """
-        Get the list of students who submitted an assignment.
+        Get the list of students who submitted an assignment, ordered by the
+        time of their most recent submission.
 
         :param class_name: name of a class
         :param assignment: name of an assignment
         :return: list of students who submitted an assignment
         """
 
-        students_submitted = []
-        for student in self.student_list(class_name):
-            submission_count = \
-                self.student_submission_count(class_name, assignment, student)
-            if submission_count != 0:
-                students_submitted.append(student)
-        return students_submitted
+        return [username for submission_time, username
+                in self._submissions(class_name, assignment)]
+
+    def recent_submissions(self, class_name: str, assignment: str,
+                           cutoff_time) -> list:
+        """
+        Get the submissions to an assignment whose most recent submission
+        was made at or after a given time.
+
+        :param class_name: name of a class
+        :param assignment: name of an assignment
+        :param cutoff_time: Unix time of the oldest submission to include
+        :return: list of (submission time, username) tuples, sorted by time
+        """
+
+        submissions = self._submissions(class_name, assignment)
+
+        start = bisect_left(submissions, (cutoff_time,))
+
+        return submissions[start:]
 
     def student_email_address(self, class_name: str, username: str) -> str:
         """
@@ -299,13 +390,11 @@ class FacultyClassInfo:
         :return: an info dict of all the assignments for a student
         """
 
-        student_assignments = []
-        for an_assignment in self.assignment_list(class_name):
-            student_assignment = self.info_dict[class_name]['assignments'][
-                an_assignment]['students_repos'][username]
-            if student_assignment is not None:
-                student_assignments.append(an_assignment)
-        return student_assignments
+        if class_name not in self._assignments_by_student:
+            self._build_assignments_by_student(class_name)
+
+        return list(self._assignments_by_student[class_name].get(username,
+                                                                 []))
 
     def student_assignment_hash(self, class_name: str, assignment: str,
                                 username: str) -> str:
@@ -393,12 +482,10 @@ class FacultyClassInfo:
         :return: student's username
         """
 
-        for username in self.student_list(class_name):
-            name_form = '{0}, {1}'.format(
-                self.student_last_name(class_name, username),
-                self.student_first_name(class_name, username))
-            if name_form == name:
-                return username
+        if class_name not in self._usernames_by_name:
+            self._build_usernames_by_name(class_name)
+
+        return self._usernames_by_name[class_name].get(name)
 
     def student_last_first_username(self, class_name: str, username: str) \
             -> str:
@@ -413,3 +500,58 @@ class FacultyClassInfo:
 
         student_info = self.info_dict[class_name]['students'][username]
         return student_info['last_first_username']
+
+    def _submissions(self, class_name, assignment) -> list:
+        # Get the sorted list of (submission time, username) tuples for an
+        # assignment, building it if this is the first time it is needed
+
+        key = (class_name, assignment)
+
+        if key not in self._submissions_by_time:
+            assignment_info = \
+                self.info_dict[class_name]['assignments'][assignment]
+            # unpublished and disabled assignments have no students_repos
+            students_repos = assignment_info['students_repos'] or {}
+
+            submissions = []
+
+            for username in self.info_dict[class_name]['students']:
+                repo_info = students_repos.get(username)
+
+                if repo_info is not None and repo_info['submission_count'] != 0:
+                    submissions.append((repo_info['time'], username))
+
+            # sorting on the time alone avoids comparing usernames
+            submissions.sort(key=itemgetter(0))
+            self._submissions_by_time[key] = submissions
+
+        return self._submissions_by_time[key]
+
+    def _build_assignments_by_student(self, class_name):
+        # Build the index of each student's assignments in a class with a
+        # single pass over the class's assignments
+
+        assignments_by_student = {}
+
+        for assignment, assignment_info in \
+                self.info_dict[class_name]['assignments'].items():
+            for username in assignment_info['students_repos'] or {}:
+                assignments_by_student.setdefault(username, []) \
+                    .append(assignment)
+
+        self._assignments_by_student[class_name] = assignments_by_student
+
+    def _build_usernames_by_name(self, class_name):
+        # Build the index of usernames by "last name, first name". If two
+        # students share a name, the first one in the class wins, matching a
+        # linear search.
+
+        usernames_by_name = {}
+
+        for username, student_info in \
+                self.info_dict[class_name]['students'].items():
+            name_form = '{0}, {1}'.format(student_info['last'],
+                                          student_info['first'])
+            usernames_by_name.setdefault(name_form, username)
+
+        self._usernames_by_name[class_name] = usernames_by_name
@@ -23,17 +23,28 @@ or remote logs.
 
 log_append_command() builds a shell command for appending to a log.
 
+log_line() and append_to_log() do the same thing without running a command,
+for appending to logs on the local machine.
+
 """
 
 import abc
+import os
 import re
+from datetime import datetime, timezone
 from shlex import quote
+from time import time_ns
 
 from gkeepcore.gkeep_exception import GkeepException
 
 # keep the log line to 4KB or less to maintain write atomicity
 MAX_LOG_LINE_LENGTH = 4096
 
+# lengths of the timestamps at the beginning of log lines, which have 4
+# digits after the decimal point
+TIMESTAMP_LENGTH = 15
+HUMAN_READABLE_TIMESTAMP_LENGTH = 24
+
 
 class LogFileException(GkeepException):
     """
@@ -237,21 +248,12 @@ def log_append_command(file_path: str, item_type: str, text: str,
 
     if human_readable:
         timestamp_format = '%Y-%m-%d-%H:%M:%S.%N'
-        time_length = 24
+        time_length = HUMAN_READABLE_TIMESTAMP_LENGTH
     else:
         timestamp_format = '%s.%N'
-        time_length = 15
-
-    type_length = len(item_type.encode())
-    text_length = len(text.encode())
-    spacing_length = 2
-
-    total_length = time_length + type_length + text_length + spacing_length
+        time_length = TIMESTAMP_LENGTH
 
-    if total_length > MAX_LOG_LINE_LENGTH:
-        # truncate the text and append '...' to indicate that it was truncated
-        diff = total_length - MAX_LOG_LINE_LENGTH
-        text = text[:len(text) - diff - 3] + '...'
+    text = _truncate_text(item_type, text, time_length)
 
     quoted_path = quote(file_path)
 
@@ -262,3 +264,87 @@ def log_append_command(file_path: str, item_type: str, text: str,
                                                       time_length))
 
     return command
+
+
+def log_line(item_type: str, text: str, human_readable=False,
+             timestamp_ns=None) -> str:
+    """
+    Build a line to append to a log file. The line is the same as the line
+    that the command built by log_append_command() appends, including the
+    trailing newline, except that quotes and other characters that are
+    special to the shell are not altered.
+
+    :param item_type: a string describing the event type
+    :param text: the payload of the event
+    :param human_readable: If True, the timestamp will be a human-readable
+      timestamp, otherwise it will use epoch time
+    :param timestamp_ns: time of the event in nanoseconds since the epoch,
+     or None to use the current time
+    :return: the line
+    """
+
+    if timestamp_ns is None:
+        timestamp_ns = time_ns()
+
+    seconds, nanoseconds = divmod(timestamp_ns, 1000000000)
+
+    # like cutting off the 5 least significant digits of date's %N
+    fraction = '{:04d}'.format(nanoseconds // 100000)
+
+    if human_readable:
+        date = datetime.fromtimestamp(seconds, timezone.utc)
+        timestamp = '{}.{}'.format(date.strftime('%Y-%m-%d-%H:%M:%S'),
+                                   fraction)
+        time_length = HUMAN_READABLE_TIMESTAMP_LENGTH
+    else:
+        timestamp = '{}.{}'.format(seconds, fraction)
+        time_length = TIMESTAMP_LENGTH
+
+    text = text.replace('\n', '  ')
+    text = _truncate_text(item_type, text, time_length)
+
+    return '{} {} {}\n'.format(timestamp, item_type, text)
+
+
+def append_to_log(file_path: str, lines: list):
+    """
+    Append lines built by log_line() to a log file, creating the file if it
+    does not exist.
+
+    The lines are appended with a single write to the file opened with
+    O_APPEND, so they are never interleaved with lines appended by other
+    processes.
+
+    Raises OSError if the file cannot be written.
+
+    :param file_path: path to the log file
+    :param lines: list of lines to append
+    """
+
+    data = ''.join(lines).encode('utf-8')
+
+    fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+
+    try:
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
+    finally:
+        os.close(fd)
+
+
+def _truncate_text(item_type: str, text: str, time_length: int) -> str:
+    # Truncate the text of a log line if the line would be longer than
+    # MAX_LOG_LINE_LENGTH, and append '...' to indicate that it was truncated
+
+    type_length = len(item_type.encode())
+    text_length = len(text.encode())
+    spacing_length = 2
+
+    total_length = time_length + type_length + text_length + spacing_length
+
+    if total_length > MAX_LOG_LINE_LENGTH:
+        diff = total_length - MAX_LOG_LINE_LENGTH
+        text = text[:len(text) - diff - 3] + '...'
+
+    return text
@@ -0,0 +1,358 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides implementations of the filesystem operations in system_commands that
+use the os and shutil modules instead of running a command.
+
+Each function behaves like the command that the corresponding function in
+system_commands runs. If the operation fails, it raises a
+CommandExitCodeError with an exit code of 1, like the command would.
+
+Copies are made using copy-on-write clones on filesystems that support them,
+such as Btrfs and XFS, so copying test directories does not duplicate their
+contents on disk. Hard links are never used, because changing the ownership
+or permissions of a copy must not change the original.
+"""
+
+import errno
+import fcntl
+import os
+import re
+import shutil
+import stat
+from grp import getgrnam
+from pwd import getpwnam
+
+from gkeepcore.shell_command import CommandExitCodeError
+
+
+# ioctl request which makes a file a copy-on-write clone of another file, from
+# linux/fs.h
+FICLONE = 0x40049409
+
+# buffer size for copying files that cannot be cloned
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def parse_mode(permissions_mode) -> int:
+    """
+    Convert a chmod mode to an integer. Only numeric modes such as 750 or
+    '0640' are supported.
+
+    :param permissions_mode: mode as an int of octal digits or a string
+    :return: the mode as an integer, or None if it is not a numeric mode
+    """
+
+    permissions_mode = str(permissions_mode)
+
+    if re.fullmatch('[0-7]{3,4}', permissions_mode) is None:
+        return None
+
+    return int(permissions_mode, 8)
+
+
+def chmod(path, permissions_mode, recursive=False):
+    """
+    Change the permissions of a file or directory.
+
+    Like chmod -R, symbolic links found while recursing are not followed.
+
+    :param path: path to the file or directory
+    :param permissions_mode: numeric chmod mode
+    :param recursive: if True it will change files and directories recursively
+    """
+
+    mode = parse_mode(permissions_mode)
+
+    if mode is None:
+        raise _error('chmod: unsupported mode: {}'.format(permissions_mode))
+
+    try:
+        os.chmod(path, mode)
+
+        if recursive and os.path.isdir(path) and not os.path.islink(path):
+            for entry_path in _tree_entries(path):
+                if not os.path.islink(entry_path):
+                    os.chmod(entry_path, mode)
+    except OSError as e:
+        raise _error('chmod {}: {}'.format(path, e))
+
+
+def chown(path, user, group, recursive=False):
+    """
+    Change the ownership of a file or directory.
+
+    Like chown -R, symbolic links found while recursing are changed rather
+    than the files they point to.
+
+    :param path: path to the file or directory
+    :param user: new user owner
+    :param group: new group owner
+    :param recursive: if True will apply to all files and directories under
+     path
+    """
+
+    try:
+        uid = getpwnam(user).pw_uid
+        gid = getgrnam(group).gr_gid
+    except KeyError as e:
+        raise _error('chown {}: {}'.format(path, e))
+
+    try:
+        os.chown(path, uid, gid)
+
+        if recursive and os.path.isdir(path) and not os.path.islink(path):
+            for entry_path in _tree_entries(path):
+                os.lchown(entry_path, uid, gid)
+    except OSError as e:
+        raise _error('chown {}: {}'.format(path, e))
+
+
+def mkdir(path):
+    """
+    Create a directory, including all parent directories if they do not
+    exist. It is not an error if the directory already exists.
+
+    :param path: path to the new directory
+    """
+
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        raise _error('mkdir {}: {}'.format(path, e))
+
+
+def make_symbolic_link(source_path, link_path):
+    """
+    Create a symbolic link to a file or directory. If link_path is an existing
+    directory, the link is created inside it.
+
+    :param source_path: path to the actual file or directory
+    :param link_path: path to the symbolic link to be created
+    """
+
+    link_path = _path_in_directory(source_path, link_path)
+
+    try:
+        os.symlink(source_path, link_path)
+    except OSError as e:
+        raise _error('ln {}: {}'.format(link_path, e))
+
+
+def touch(path):
+    """
+    Update the access and modification times of a file or directory to the
+    current time, creating an empty file if it does not exist.
+
+    :param path: path to the file or directory
+    """
+
+    try:
+        if not os.path.exists(path):
+            open(path, 'a').close()
+
+        os.utime(path)
+    except OSError as e:
+        raise _error('touch {}: {}'.format(path, e))
+
+
+def mv(source_path, dest_path):
+    """
+    Move or rename a file or directory. If the destination is an existing
+    directory, the source is moved into it.
+
+    Like mv, moving to a different filesystem copies the source and then
+    removes it, keeping the ownership, permissions, and modification times of
+    everything that is copied.
+
+    :param source_path: the original path to the file or directory
+    :param dest_path: the new path or an existing directory to move the file
+     into
+    """
+
+    dest_path = _path_in_directory(source_path, dest_path)
+
+    try:
+        try:
+            os.rename(source_path, dest_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+            _move_across_filesystems(source_path, dest_path)
+    except (OSError, shutil.Error) as e:
+        raise _error('mv {}: {}'.format(source_path, e))
+
+
+def cp(source_path, dest_path, recursive=False):
+    """
+    Copy a file or directory. recursive must be True if copying a directory.
+    If the destination is an existing directory, the source is copied into
+    it.
+
+    :param source_path: path to the file or directory to be copied
+    :param dest_path: the new path or an existing directory to copy the file
+     into
+    :param recursive: if True, will copy directories
+    """
+
+    dest_path = _path_in_directory(source_path, dest_path)
+
+    if os.path.isdir(source_path):
+        if not recursive:
+            error = 'cp {}: -r not specified; omitting directory'
+            raise _error(error.format(source_path))
+
+        # like cp, refuse to copy a directory into itself
+        real_source_path = os.path.realpath(source_path)
+        real_dest_path = os.path.realpath(dest_path)
+        if os.path.commonpath([real_source_path, real_dest_path]) == \
+                real_source_path:
+            error = 'cp {}: cannot copy a directory into itself'
+            raise _error(error.format(source_path))
+
+    try:
+        if os.path.isdir(source_path):
+            _copy_tree(source_path, dest_path)
+        else:
+            _copy_file(source_path, dest_path)
+    except OSError as e:
+        raise _error('cp {}: {}'.format(source_path, e))
+
+
+def rm(path, recursive=False):
+    """
+    Remove a file or directory. recursive must be True if removing a
+    directory. Like rm -f, it is not an error if the path does not exist.
+
+    :param path: path to the file or directory to be removed
+    :param recursive: if True, will remove directories
+    """
+
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            if not recursive:
+                raise _error('rm {}: Is a directory'.format(path))
+
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        raise _error('rm {}: {}'.format(path, e))
+
+
+def _error(message):
+    # Build the exception raised when an operation fails
+
+    return CommandExitCodeError(message, 1)
+
+
+def _copy_file(source_path, dest_path):
+    # Copy a file like cp without -p. A new file gets the permissions of the
+    # source minus the umask, which os.open() applies, and an existing file
+    # keeps its permissions.
+
+    source_mode = stat.S_IMODE(os.stat(source_path).st_mode)
+
+    with open(source_path, 'rb') as source:
+        dest_fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                          source_mode)
+
+        with open(dest_fd, 'wb') as dest:
+            try:
+                fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+            except OSError:
+                shutil.copyfileobj(source, dest, COPY_BUFFER_SIZE)
+
+
+def _copy_tree(source_path, dest_path):
+    # Copy a directory like cp -r. Symbolic links are copied as links and new
+    # directories get the permissions of the source minus the umask.
+
+    if not os.path.isdir(dest_path):
+        source_mode = stat.S_IMODE(os.stat(source_path).st_mode)
+        os.mkdir(dest_path, source_mode)
+
+    with os.scandir(source_path) as entries:
+        for entry in entries:
+            entry_dest_path = os.path.join(dest_path, entry.name)
+
+            if entry.is_symlink():
+                if os.path.lexists(entry_dest_path):
+                    os.remove(entry_dest_path)
+                os.symlink(os.readlink(entry.path), entry_dest_path)
+            elif entry.is_dir():
+                _copy_tree(entry.path, entry_dest_path)
+            else:
+                _copy_file(entry.path, entry_dest_path)
+
+
+def _move_across_filesystems(source_path, dest_path):
+    # Copy a file or directory like cp -a and then remove the source, which is
+    # what mv does when it cannot rename across filesystems
+
+    if os.path.isdir(source_path) and not os.path.islink(source_path):
+        shutil.copytree(source_path, dest_path, symlinks=True)
+        _copy_ownership(source_path, dest_path)
+        for entry_path in _tree_entries(source_path):
+            _copy_ownership(entry_path,
+                            os.path.join(dest_path,
+                                         os.path.relpath(entry_path,
+                                                         source_path)))
+        shutil.rmtree(source_path)
+    else:
+        shutil.copy2(source_path, dest_path, follow_symlinks=False)
+        _copy_ownership(source_path, dest_path)
+        os.remove(source_path)
+
+
+def _copy_ownership(source_path, dest_path):
+    # Give a copy the owner and group of the original. Like mv, a user who is
+    # not allowed to give away files keeps ownership of the copy. Changing the
+    # owner clears the setuid and setgid bits, so the mode is set again.
+
+    source_stat = os.lstat(source_path)
+
+    try:
+        os.lchown(dest_path, source_stat.st_uid, source_stat.st_gid)
+    except PermissionError:
+        return
+
+    if not stat.S_ISLNK(source_stat.st_mode):
+        os.chmod(dest_path, stat.S_IMODE(source_stat.st_mode))
+
+
+def _tree_entries(path):
+    # Generate the paths of all the files and directories under a directory,
+    # without following symbolic links
+
+    for dir_path, dir_names, file_names in os.walk(path):
+        for name in dir_names + file_names:
+            yield os.path.join(dir_path, name)
+
+
+def _path_in_directory(source_path, dest_path):
+    # Commands like mv and cp put the source inside the destination if the
+    # destination is an existing directory
+
+    if os.path.isdir(dest_path):
+        return os.path.join(dest_path,
+                            os.path.basename(source_path.rstrip('/')))
+
+    return dest_path
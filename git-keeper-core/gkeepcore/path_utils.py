@@ -298,6 +298,72 @@ def faculty_info_path(gitkeeper_path: str):
     return os.path.join(gitkeeper_path, 'info')
 
 
+def faculty_info_shards_path(gitkeeper_path: str):
+    """
+    Build the path to a faculty member's directory of per-class info shards.
+
+    :param gitkeeper_path: .gitkeeper directory of the faculty member
+    :return: path to the info shards directory
+    """
+
+    return os.path.join(gitkeeper_path, 'info_shards')
+
+
+def faculty_info_manifest_path(gitkeeper_path: str):
+    """
+    Build the path to the manifest which describes a faculty member's info
+    shards.
+
+    :param gitkeeper_path: .gitkeeper directory of the faculty member
+    :return: path to the manifest file
+    """
+
+    return os.path.join(faculty_info_shards_path(gitkeeper_path),
+                        'manifest.json')
+
+
+def faculty_query_results_path(gitkeeper_path: str):
+    """
+    Build the path to the directory in which gkeepd writes the results of
+    queries that are too large to send through the gkeepd log.
+
+    :param gitkeeper_path: .gitkeeper directory of the faculty member
+    :return: path to the query results directory
+    """
+
+    return os.path.join(gitkeeper_path, 'query_results')
+
+
+def info_file_extension(compressed=False):
+    """
+    Get the filename extension used for info files and info shards.
+
+    :param compressed: True if the file is gzip-compressed
+    :return: the extension, without a leading dot
+    """
+
+    if compressed:
+        return 'json.gz'
+    else:
+        return 'json'
+
+
+def info_shard_filename(class_name: str, shard_hash: str, compressed=False):
+    """
+    Build the filename of a class's info shard. The hash of the shard's
+    contents is part of the name so that a shard file never changes once it
+    has been written.
+
+    :param class_name: name of the class
+    :param shard_hash: hash of the shard's contents
+    :param compressed: True if the shard is gzip-compressed
+    :return: the filename of the shard
+    """
+
+    return '{0}.{1}.{2}'.format(class_name, shard_hash,
+                                info_file_extension(compressed))
+
+
 def assignment_published_file_path(class_name: str, assignment_name: str,
                                    gitkeeper_path: str):
     """
@@ -15,11 +15,32 @@
 
 
 """
-Provides a run_command() function for running shell commands.
+Provides a run_command() function for running shell commands, and
+run_command_to_file() for running commands whose output may be too large to
+hold in memory.
+
+run_command() counts the processes it spawns. Once enable_command_stats() is
+called it also records the number of runs, the total seconds, the total
+output bytes, and the number of failures of each logical command, such as
+"git clone" or "chown", broken down by the module which called run_command()
+or one of the wrappers in system_commands and git_commands. The statistics
+are available from get_command_stats().
+
+Commands run inside a command_deadline() block must finish before the
+block's deadline. A command that is still running at the deadline is killed
+along with every process in its process group, and CommandTimeoutError is
+raised.
 """
 
 import os
-from subprocess import check_output, CalledProcessError, STDOUT
+import shlex
+import signal
+import sys
+from contextlib import contextmanager
+from select import select
+from subprocess import call, Popen, PIPE, STDOUT, DEVNULL, TimeoutExpired
+from threading import Lock, Timer, Event, local
+from time import perf_counter
 
 from gkeepcore.gkeep_exception import GkeepException
 
@@ -50,6 +71,164 @@ class CommandExitCodeError(CommandError):
         self.exit_code = exit_code
 
 
+class CommandTimeoutError(CommandError):
+    """
+    Raised if a command does not finish before the deadline set by
+    command_deadline().
+    """
+    pass
+
+
+# number of processes spawned by run_command()
+_spawn_count = 0
+_spawn_count_lock = Lock()
+
+# modules that only wrap run_command(), which are skipped when looking for
+# the subsystem that ran a command
+_WRAPPER_MODULES = {__name__, 'gkeepcore.system_commands',
+                    'gkeepcore.git_commands'}
+
+# number of bytes read from a command's output at a time when streaming it
+# to a file
+_OUTPUT_CHUNK_SIZE = 64 * 1024
+
+# (subsystem, command name) -> [runs, seconds, output bytes, failures], or
+# None if statistics are not being recorded
+_command_stats = None
+
+# each thread's command deadline, in perf_counter() time
+_deadline_state = local()
+
+# seconds to wait for a killed command's output to be closed
+_KILL_WAIT = 5
+
+
+def get_spawn_count() -> int:
+    """
+    Get the number of processes that run_command() has spawned.
+
+    :return: number of spawned processes
+    """
+
+    with _spawn_count_lock:
+        return _spawn_count
+
+
+def enable_command_stats():
+    """
+    Start recording statistics about each command that run_command() runs.
+    Statistics recorded before calling this again are discarded.
+    """
+
+    global _command_stats
+
+    with _spawn_count_lock:
+        _command_stats = {}
+
+
+def get_command_stats() -> list:
+    """
+    Get the statistics recorded since enable_command_stats() was called.
+
+    Each statistic is a dictionary with the keys subsystem (the name of the
+    module that ran the command), command (such as "git clone" or "chown"),
+    runs, seconds, output_bytes, and failures.
+
+    :return: list of dictionaries, or an empty list if statistics are not
+     being recorded
+    """
+
+    with _spawn_count_lock:
+        if _command_stats is None:
+            return []
+
+        items = sorted((key, list(values))
+                       for key, values in _command_stats.items())
+
+    return [
+        {'subsystem': subsystem, 'command': command, 'runs': runs,
+         'seconds': seconds, 'output_bytes': output_bytes,
+         'failures': failures}
+        for (subsystem, command), (runs, seconds, output_bytes, failures)
+        in items
+    ]
+
+
+def command_name(command) -> str:
+    """
+    Get a short name for a command which identifies what it does but not what
+    it is run on, for grouping statistics. sudo and its options are skipped,
+    and git is named along with its subcommand.
+
+    :param command: a shell command as a string or a list of strings
+    :return: the name, such as "git clone" or "chown"
+    """
+
+    if isinstance(command, str):
+        try:
+            words = shlex.split(command)
+        except ValueError:
+            words = command.split()
+    else:
+        words = list(command)
+
+    # skip sudo and its options, including the user given with -u
+    if words and os.path.basename(words[0]) == 'sudo':
+        words = words[1:]
+        while words and words[0].startswith('-'):
+            option = words.pop(0)
+            if option in ('-u', '--user') and words:
+                words.pop(0)
+
+    if not words:
+        return ''
+
+    program = os.path.basename(words[0])
+
+    if program != 'git':
+        return program
+
+    # skip git's global options, including the path given with -C
+    words = words[1:]
+    while words and words[0].startswith('-'):
+        option = words.pop(0)
+        if option in ('-C', '-c') and words:
+            words.pop(0)
+
+    if not words:
+        return program
+
+    return '{0} {1}'.format(program, words[0])
+
+
+@contextmanager
+def command_deadline(seconds):
+    """
+    Context manager which sets a deadline for all the commands that the
+    current thread runs with run_command() or run_command_to_file() in its
+    block, including those run by the wrappers in system_commands and
+    git_commands. A command which is still running at the deadline is killed
+    along with its process group, and CommandTimeoutError is raised. The
+    deadline replaces any deadline of an enclosing block until the block
+    exits.
+
+    :param seconds: seconds from now until the deadline, or None for no
+     deadline
+    """
+
+    previous_deadline = getattr(_deadline_state, 'deadline', None)
+
+    if seconds is None:
+        _deadline_state.deadline = None
+    else:
+        _deadline_state.deadline = perf_counter() + seconds
+
+    try:
+        yield
+    finally:
+        _deadline_state.deadline = previous_deadline
+
+
 def run_command(command, sudo=False, user=None, stderr=STDOUT) -> str:
     """
     Run a shell command and return the output.
@@ -67,6 +246,8 @@ def run_command(command, sudo=False, user=None, stderr=STDOUT) -> str:
 
     """
 
+    timeout = _time_until_deadline(command)
+
     # command must be a string or list
     if not isinstance(command, str) and not isinstance(command, list):
         raise InvalidCommandError('command must be a string or a list, not {0}'
@@ -85,26 +266,260 @@ def run_command(command, sudo=False, user=None, stderr=STDOUT) -> str:
             else:
                 command = ['sudo', '-n', '-u', user] + command
 
+    global _spawn_count
+
+    with _spawn_count_lock:
+        _spawn_count += 1
+
+    start_time = perf_counter()
+
     # run the command
     try:
-        if isinstance(command, str):
-            # shell must be True if we're using a string instead of a list
-            output = check_output(command, stderr=stderr, shell=True)
-        else:
-            output = check_output(command, stderr=stderr, shell=False)
-    except CalledProcessError as e:
-        # the CommandError exception will contain the output as a string
-        # and the exit code
-        raise CommandExitCodeError(e.output.decode('utf-8'), e.returncode)
+        process = _spawn(command, stderr, timeout)
     except FileNotFoundError:
+        _record_command(command, perf_counter() - start_time, 0,
+                        failed=True)
         error = 'Error running command, {} does not exist'.format(command[0])
         raise InvalidCommandError(error)
 
+    with process:
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except TimeoutExpired:
+            _kill_process_group(process)
+
+            try:
+                output, _ = process.communicate(timeout=_KILL_WAIT)
+            except TimeoutExpired:
+                output = b''
+
+            _record_command(command, perf_counter() - start_time,
+                            len(output or b''), failed=True)
+            raise CommandTimeoutError('{0} did not finish within {1:.0f} '
+                                      'seconds'.format(command_name(command),
+                                                       timeout))
+
+    if process.returncode != 0:
+        _record_command(command, perf_counter() - start_time,
+                        len(output or b''), failed=True)
+        # the CommandError exception will contain the output as a string
+        # and the exit code
+        raise CommandExitCodeError(output.decode('utf-8'), process.returncode)
+
+    _record_command(command, perf_counter() - start_time, len(output),
+                    failed=False)
+
     # convert the output from bytes to a string when returning, replacing any
     # byte sequences that are not valid utf-8 with the � character
     return output.decode('utf-8', 'replace')
 
 
+def run_command_to_file(command, file_path, max_bytes=0,
+                        stderr=STDOUT) -> bool:
+    """
+    Run a shell command and write its output to a file as it is produced,
+    rather than holding the output in memory.
+
+    By default the output is stdout and stderr combined. At most max_bytes
+    bytes are written to the file. Output beyond that is read and discarded
+    so that the command is never blocked writing its output.
+
+    Raises a CommandExitCodeError if the command has a non-zero exit code,
+    with the output that was written to the file as the message. Raises a
+    CommandTimeoutError if the command was killed at the deadline set by
+    command_deadline().
+
+    :param command: a shell command as a string or a list of strings
+     representing each argument
+    :param file_path: path of the file to write the output to, which is
+     replaced if it exists
+    :param max_bytes: maximum number of bytes to write to the file, or 0 for
+     no limit
+    :param stderr: where to send stderr
+    :return: True if the output was truncated, False otherwise
+    """
+
+    # command must be a string or list
+    if not isinstance(command, str) and not isinstance(command, list):
+        raise InvalidCommandError('command must be a string or a list, not {0}'
+                                  .format(type(command)))
+
+    timeout = _time_until_deadline(command)
+
+    global _spawn_count
+
+    with _spawn_count_lock:
+        _spawn_count += 1
+
+    start_time = perf_counter()
+
+    try:
+        process = _spawn(command, stderr, timeout)
+    except FileNotFoundError:
+        _record_command(command, perf_counter() - start_time, 0,
+                        failed=True)
+        error = 'Error running command, {} does not exist'.format(command[0])
+        raise InvalidCommandError(error)
+
+    output_bytes = 0
+    written_bytes = 0
+
+    # the output reaches its end once the process group is killed
+    killed = Event()
+
+    def kill():
+        killed.set()
+        _kill_process_group(process)
+
+    kill_timer = None
+
+    if timeout is not None:
+        kill_timer = Timer(timeout, kill)
+        kill_timer.daemon = True
+        kill_timer.start()
+
+    # a process that left the process group may keep the output open after
+    # the kill, so once the command is killed its output is only read for
+    # _KILL_WAIT more seconds
+    drain_deadline = None
+
+    try:
+        with process, open(file_path, 'wb') as f:
+            output_fd = process.stdout.fileno()
+
+            while True:
+                if killed.is_set():
+                    if drain_deadline is None:
+                        drain_deadline = perf_counter() + _KILL_WAIT
+
+                    wait = drain_deadline - perf_counter()
+
+                    if wait <= 0:
+                        break
+                elif timeout is not None:
+                    # check for the kill regularly
+                    wait = 0.1
+                else:
+                    wait = None
+
+                ready, _, _ = select([output_fd], [], [], wait)
+
+                if not ready:
+                    continue
+
+                chunk = os.read(output_fd, _OUTPUT_CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                output_bytes += len(chunk)
+
+                if max_bytes > 0:
+                    chunk = chunk[:max_bytes - written_bytes]
+
+                if chunk:
+                    f.write(chunk)
+                    written_bytes += len(chunk)
+
+            exit_code = process.wait()
+    finally:
+        if kill_timer is not None:
+            kill_timer.cancel()
+
+    _record_command(command, perf_counter() - start_time, output_bytes,
+                    failed=(exit_code != 0 or killed.is_set()))
+
+    if killed.is_set():
+        raise CommandTimeoutError('{0} did not finish within {1:.0f} seconds'
+                                  .format(command_name(command), timeout))
+
+    if exit_code != 0:
+        with open(file_path, 'rb') as f:
+            output = f.read().decode('utf-8', 'replace')
+        raise CommandExitCodeError(output, exit_code)
+
+    return output_bytes > written_bytes
+
+
+def _time_until_deadline(command):
+    # Seconds until the current thread's command deadline, or None if there
+    # is no deadline. Raises CommandTimeoutError if the deadline has passed.
+
+    deadline = getattr(_deadline_state, 'deadline', None)
+
+    if deadline is None:
+        return None
+
+    remaining = deadline - perf_counter()
+
+    if remaining <= 0:
+        raise CommandTimeoutError('Deadline passed before {0} could be run'
+                                  .format(command_name(command)))
+
+    return remaining
+
+
+def _spawn(command, stderr, timeout) -> Popen:
+    # Start a command with its output in a pipe. A command with a timeout
+    # gets its own process group so that it can be killed along with
+    # everything it starts.
+
+    # shell must be True if we're using a string instead of a list
+    return Popen(command, stdout=PIPE, stderr=stderr,
+                 shell=isinstance(command, str),
+                 start_new_session=(timeout is not None))
+
+
+def _kill_process_group(process: Popen):
+    # Kill every process in a command's process group. If the processes
+    # belong to another user, typically because the command was run with
+    # sudo, they are killed with sudo.
+
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    except PermissionError:
+        call(['sudo', '-n', 'kill', '-s', 'KILL', '--',
+              '-{}'.format(process.pid)], stdout=DEVNULL, stderr=DEVNULL)
+
+
+def _record_command(command, seconds, output_bytes, failed):
+    # Add a run of a command to the statistics, if they are being recorded
+
+    if _command_stats is None:
+        return
+
+    key = (_calling_subsystem(), command_name(command))
+
+    with _spawn_count_lock:
+        if _command_stats is None:
+            return
+
+        stats = _command_stats.setdefault(key, [0, 0.0, 0, 0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += output_bytes
+        stats[3] += int(failed)
+
+
+def _calling_subsystem() -> str:
+    # Name of the innermost module on the stack that is not a wrapper of
+    # run_command()
+
+    frame = sys._getframe(1)
+
+    while frame is not None:
+        module_name = frame.f_globals.get('__name__', '')
+
+        if module_name not in _WRAPPER_MODULES:
+            return module_name
+
+        frame = frame.f_back
+
+    return ''
+
+
 class ChangeDirectoryContext:
     """
     For use as a context manager to change into a directory and change out
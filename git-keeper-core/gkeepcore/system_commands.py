@@ -16,6 +16,12 @@
 
 """
 Provides functions for system calls and command line filesystem operations.
+
+The filesystem operations are performed in-process using the functions in
+gkeepcore.native_commands whenever this process has the privileges to do so,
+which is always the case when sudo is False, and is the case when sudo is True
+if this process is running as root. Otherwise the operation is sent to the
+privileged helper if one is set, or is run as a command using sudo.
 """
 
 import os
@@ -24,10 +30,69 @@ from grp import getgrgid, getgrnam
 from pwd import getpwuid, getpwnam, getpwall
 from shutil import which
 
+from gkeepcore import native_commands
+from gkeepcore.native_commands import parse_mode
 from gkeepcore.path_utils import user_home_dir
 from gkeepcore.shell_command import run_command, CommandError
 
 
+# Performs filesystem operations as root in place of sudo, if set. See
+# set_privileged_helper().
+_privileged_helper = None
+
+# If False, filesystem operations are always run as commands. See
+# use_native_commands().
+_native_commands_enabled = True
+
+
+def use_native_commands(enabled: bool):
+    """
+    Choose whether filesystem operations are performed in-process when this
+    process has the privileges to do so, or are always run as commands.
+    Operations are performed in-process by default.
+
+    :param enabled: True to perform operations in-process, False to run
+     commands
+    """
+
+    global _native_commands_enabled
+    _native_commands_enabled = enabled
+
+
+def set_privileged_helper(helper):
+    """
+    Perform the filesystem operations in this module that are run as root
+    using a privileged helper, rather than running each one with sudo.
+
+    The helper must have a method run(operation, arguments) which takes the
+    name of a function in gkeepcore.native_commands and a dictionary of its
+    keyword arguments. It must return True if the operation was performed,
+    raise a CommandExitCodeError if the operation failed, or return False if
+    the helper is unavailable, in which case the operation is run with sudo.
+
+    :param helper: the helper, or None to go back to using sudo
+    """
+
+    global _privileged_helper
+    _privileged_helper = helper
+
+
+def _perform(command, sudo, operation, **arguments):
+    # Perform a filesystem operation in-process using the function named
+    # operation in native_commands if we have the privileges to, and
+    # otherwise through the privileged helper or by running the command
+
+    if _native_commands_enabled and (not sudo or os.geteuid() == 0):
+        getattr(native_commands, operation)(**arguments)
+    elif not sudo:
+        run_command(command)
+    else:
+        helper = _privileged_helper
+
+        if helper is None or not helper.run(operation, arguments):
+            run_command(command, sudo=True)
+
+
 def this_user():
     """
     Get the username of the user that is running this process.
@@ -77,7 +142,12 @@ def chmod(path, permissions_mode, recursive=False, sudo=False):
     else:
         cmd = ['chmod', permissions_mode, path]
 
-    run_command(cmd, sudo=sudo)
+    # only numeric modes can be changed without running chmod
+    if parse_mode(permissions_mode) is not None:
+        _perform(cmd, sudo, 'chmod', path=path,
+                 permissions_mode=permissions_mode, recursive=recursive)
+    else:
+        run_command(cmd, sudo=sudo)
 
 
 def sudo_chown(path, user, group, recursive=False):
@@ -99,7 +169,8 @@ def sudo_chown(path, user, group, recursive=False):
     else:
         cmd = ['chown', '{0}:{1}'.format(user, group), path]
 
-    run_command(cmd, sudo=True)
+    _perform(cmd, True, 'chown', path=path, user=user, group=group,
+             recursive=recursive)
 
 
 def sudo_add_user_to_group(user, group):
@@ -298,7 +369,8 @@ def mkdir(path, sudo=False):
     """
 
     cmd = ['mkdir', '-p', path]
-    run_command(cmd, sudo=sudo)
+
+    _perform(cmd, sudo, 'mkdir', path=path)
 
 
 def make_symbolic_link(source_path: str, link_path: str, sudo=False):
@@ -311,7 +383,9 @@ def make_symbolic_link(source_path: str, link_path: str, sudo=False):
     """
 
     cmd = ['ln', '-s', source_path, link_path]
-    run_command(cmd, sudo=sudo)
+
+    _perform(cmd, sudo, 'make_symbolic_link', source_path=source_path,
+             link_path=link_path)
 
 
 def touch(path, sudo=False):
@@ -324,7 +398,8 @@ def touch(path, sudo=False):
     """
 
     cmd = ['touch', path]
-    run_command(cmd, sudo=sudo)
+
+    _perform(cmd, sudo, 'touch', path=path)
 
 
 def mv(source_path, dest_path, sudo=False):
@@ -341,7 +416,8 @@ def mv(source_path, dest_path, sudo=False):
     """
 
     cmd = ['mv', source_path, dest_path]
-    run_command(cmd, sudo=sudo)
+
+    _perform(cmd, sudo, 'mv', source_path=source_path, dest_path=dest_path)
 
 
 def cp(source_path, dest_path, recursive=False, sudo=False):
@@ -367,7 +443,8 @@ def cp(source_path, dest_path, recursive=False, sudo=False):
 
     cmd += [source_path, dest_path]
 
-    run_command(cmd, sudo=sudo)
+    _perform(cmd, sudo, 'cp', source_path=source_path, dest_path=dest_path,
+             recursive=recursive)
 
 
 def rm(path, recursive=False, sudo=False):
@@ -388,7 +465,7 @@ def rm(path, recursive=False, sudo=False):
 
     cmd.append(path)
 
-    run_command(cmd, sudo=sudo)
+    _perform(cmd, sudo, 'rm', path=path, recursive=recursive)
 
 
 def file_is_readable(path):
@@ -25,12 +25,14 @@ calling check_system()
 """
 import os
 
+from gkeepcore.event_socket import EVENT_SOCKET_PATH
 from gkeepcore.gkeep_exception import GkeepException
 from gkeepcore.path_utils import user_home_dir
 from gkeepcore.system_commands import (CommandError, user_exists, group_exists,
                                        sudo_add_group, mode, chmod,
                                        this_user, this_group, sudo_add_user,
-                                       group_owner, sudo_chown, sudo_add_user_to_group)
+                                       group_owner, sudo_chown, sudo_add_user_to_group,
+                                       user_owner, mkdir)
 from gkeepserver.user_setup import add_faculty
 from gkeepserver.database import db
 from gkeepserver.gkeepd_logger import gkeepd_logger as gkeepd_logger
@@ -76,11 +78,14 @@ def check_paths_and_permissions():
         * the faculty group does not exist
         * the faculty log directory does not exist
         * run_action.sh does not exist
+        * the event socket's directory does not exist or is not owned by
+          the keeper user
         * permissions are wrong on the following files/directories:
             * keeper user's home directory: 750
             * gkeepd.log: 600,
             * faculty.json: 600
             * gkeepd_db.sqlite: 600
+            * the event socket's directory: 755
 
     Raises a CheckSystemError exception on fatal errors.
 
@@ -146,6 +151,39 @@ def check_paths_and_permissions():
     if not os.path.isfile(config.gitconfig_file_path):
         write_gitconfig()
 
+    if config.use_event_socket:
+        check_event_socket_dir()
+
+
+def check_event_socket_dir():
+    """
+    Create the directory of the event socket if it does not exist, and make
+    sure that only the keeper user can create files in it so no other user
+    can listen on the socket in gkeepd's place. /run is typically emptied on
+    boot, so this may be needed every time gkeepd starts.
+
+    If the directory cannot be set up a warning is logged, and the event
+    socket server will fail to start so events are only found by polling.
+    """
+
+    socket_dir = os.path.dirname(EVENT_SOCKET_PATH)
+
+    try:
+        if not os.path.isdir(socket_dir):
+            gkeepd_logger.log_info('Creating {0} for the event socket'
+                                   .format(socket_dir))
+            mkdir(socket_dir, sudo=True)
+
+        if (user_owner(socket_dir) != config.keeper_user or
+                group_owner(socket_dir) != config.keeper_group):
+            sudo_chown(socket_dir, config.keeper_user, config.keeper_group)
+
+        if mode(socket_dir) != '755':
+            chmod(socket_dir, '755', sudo=True)
+    except (CommandError, OSError) as e:
+        gkeepd_logger.log_warning('Could not set up {0} for the event socket: '
+                                  '{1}'.format(socket_dir, e))
+
 
 def write_gitconfig():
     """
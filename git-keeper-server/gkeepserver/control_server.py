@@ -0,0 +1,239 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a global interface for controlling a running gkeepd through a Unix
+socket that only the keeper user can connect to.
+
+Each request is a line of JSON naming a command, and each response is a line
+of JSON:
+
+    {"command": "status"}
+    {"ok": true, "result": {...}}
+    {"ok": false, "error": "Unknown command: ..."}
+
+Commands are registered by gkeepd with register(). Use
+send_control_command() to send a command to a running gkeepd.
+
+This module stores a ControlServer instance in the module-level variable
+named control_server.
+
+Example usage:
+
+    from gkeepserver.control_server import (control_server,
+                                            send_control_command)
+
+    def main():
+        control_server.register('status', lambda: {'running': True})
+        control_server.start('/home/keeper/gkeepd_control.sock')
+
+        # commands are handled in background threads
+
+        control_server.shutdown()
+
+    # in another process
+    status = send_control_command('/home/keeper/gkeepd_control.sock',
+                                  'status')
+
+"""
+
+import json
+import os
+import socket
+import socketserver
+from threading import Thread
+
+from gkeepcore.gkeep_exception import GkeepException
+from gkeepserver.gkeepd_logger import gkeepd_logger as logger
+
+
+class ControlServerError(GkeepException):
+    """
+    Raised if the control server cannot be started, or if a command cannot be
+    sent or fails.
+    """
+    pass
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    # Handles all of the requests from a single connection
+
+    def handle(self):
+        for request_line in self.rfile:
+            response = self.server.perform(request_line)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class _ControlUnixServer(socketserver.ThreadingUnixStreamServer):
+    # Passes requests to the commands registered with the ControlServer
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, commands: dict):
+        self.commands = commands
+
+        super().__init__(socket_path, _ControlRequestHandler)
+
+    def perform(self, request_line: bytes) -> dict:
+        try:
+            request = json.loads(request_line.decode('utf-8'))
+            command = request['command']
+            arguments = request.get('arguments', {})
+
+            if not isinstance(arguments, dict):
+                raise ValueError
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return {'ok': False, 'error': 'Malformed request'}
+
+        if command not in self.commands:
+            return {'ok': False,
+                    'error': 'Unknown command: {}'.format(command)}
+
+        try:
+            result = self.commands[command](**arguments)
+        except Exception as e:
+            logger.log_warning('Control command {0} failed: {1}'
+                               .format(command, e))
+            return {'ok': False, 'error': str(e)}
+
+        return {'ok': True, 'result': result}
+
+
+class ControlServer:
+    """
+    Serves control commands in background threads.
+
+    Typically this will be accessed with the provided module-level global
+    instance rather than making an instance directly.
+    """
+
+    def __init__(self):
+        """
+        Construct the object. Call start() to start serving.
+        """
+
+        self._commands = {}
+        self._server = None
+        self._thread = None
+        self._socket_path = None
+
+    def register(self, command: str, function):
+        """
+        Register a function to call when a command is received, replacing
+        any function already registered for the command.
+
+        The function is called from a server thread with the request's
+        arguments as keyword arguments, so it must be thread-safe. Its
+        return value must be serializable as JSON.
+
+        :param command: name of the command
+        :param function: function to call
+        """
+
+        self._commands[command] = function
+
+    def start(self, socket_path: str):
+        """
+        Start serving commands on a Unix socket which only the user running
+        gkeepd can connect to.
+
+        Raises ControlServerError if the socket cannot be created.
+
+        :param socket_path: path of the Unix socket
+        """
+
+        try:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+            self._server = _ControlUnixServer(socket_path, self._commands)
+            os.chmod(socket_path, 0o600)
+        except OSError as e:
+            raise ControlServerError('Error starting the control server: {0}'
+                                     .format(e))
+
+        self._socket_path = socket_path
+
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """
+        Stop serving commands.
+
+        This method blocks until the serving thread has died.
+        """
+
+        if self._server is None:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+        self._server = None
+        self._thread = None
+        self._socket_path = None
+
+
+def send_control_command(socket_path: str, command: str, timeout=10,
+                         **arguments):
+    """
+    Send a command to a running gkeepd and return the result.
+
+    Raises ControlServerError if gkeepd cannot be reached or the command
+    fails.
+
+    :param socket_path: path of gkeepd's control socket
+    :param command: name of the command
+    :param timeout: seconds to wait for a response
+    :param arguments: arguments for the command
+    :return: the result of the command
+    """
+
+    request = {'command': command, 'arguments': arguments}
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+
+    try:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+        with connection.makefile('rb') as f:
+            response_line = f.readline()
+    except OSError as e:
+        raise ControlServerError('Error communicating with gkeepd through {0}:'
+                                 ' {1}'.format(socket_path, e))
+    finally:
+        connection.close()
+
+    try:
+        response = json.loads(response_line.decode('utf-8'))
+    except ValueError:
+        raise ControlServerError('Malformed response from gkeepd')
+
+    if not response['ok']:
+        raise ControlServerError(response['error'])
+
+    return response['result']
+
+
+# module-level instance for global access
+control_server = ControlServer()
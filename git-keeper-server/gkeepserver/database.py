@@ -14,6 +14,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from threading import Lock
+from time import monotonic
+
 import peewee as pw
 
 from gkeepcore.assignment import Assignment
@@ -21,6 +24,7 @@ from gkeepcore.valid_names import cleanup_string, validate_username
 from gkeepserver.faculty import Faculty
 from gkeepcore.gkeep_exception import GkeepException
 from gkeepcore.student import Student
+from gkeepserver.metrics import metrics
 
 
 class DatabaseException(GkeepException):
@@ -47,8 +51,37 @@ def username_from_email(email_address: str):
     return username
 
 
-# Used by the peewee Model classes
-database = pw.SqliteDatabase(None)
+# Maximum number of values to use in a single IN clause or multi-row insert,
+# to stay well below SQLite's limit on the number of query parameters
+BULK_CHUNK_SIZE = 200
+
+
+_query_seconds = metrics.histogram('gkeepd_db_query_seconds',
+                                   'Seconds taken to execute database '
+                                   'queries')
+
+
+class TimedSqliteDatabase(pw.SqliteDatabase):
+    """
+    A SqliteDatabase which records how long each query takes in the
+    gkeepd_db_query_seconds metric.
+    """
+
+    def execute_sql(self, sql, params=None):
+        # Rows of a SELECT are fetched after this returns, so only the time
+        # to execute the statement and produce the first row is recorded
+
+        start_time = monotonic()
+
+        try:
+            return super().execute_sql(sql, params)
+        finally:
+            _query_seconds.observe(monotonic() - start_time)
+
+
+# Used by the peewee Model classes. Connections are per-thread, so each
+# thread that uses the database has its own SQLite connection.
+database = TimedSqliteDatabase(None)
 
 
 class BaseModel(pw.Model):
@@ -65,6 +98,12 @@ class DBUser(BaseModel):
     username = pw.CharField(unique=True)
 
 
+# Email addresses are compared case-insensitively, so lookups by email address
+# use LOWER(email_address) and need an index on that expression
+DBUser.add_index(DBUser.index(pw.fn.LOWER(DBUser.email_address),
+                              name='dbuser_email_address_lower'))
+
+
 class DBFacultyUser(BaseModel):
     user_id = pw.ForeignKeyField(DBUser, unique=True)
     first_name = pw.CharField()
@@ -101,6 +140,9 @@ class DBClassStudent(BaseModel):
     class Meta:
         indexes = (
             (('class_id', 'user_id'), True),
+            # covers the queries for the active students in a class
+            (('class_id', 'active', 'user_id', 'first_name', 'last_name'),
+             False),
         )
 
 
@@ -121,25 +163,266 @@ class DBByteCount(BaseModel):
     byte_count = pw.IntegerField()
 
 
+class DBOutboxEmail(BaseModel):
+    to_address = pw.CharField()
+    subject = pw.TextField()
+    message = pw.TextField()
+    priority = pw.IntegerField()
+    enqueue_time = pw.FloatField()
+    send_attempts = pw.IntegerField()
+    next_attempt_time = pw.FloatField()
+    last_error = pw.TextField()
+    failed = pw.BooleanField()
+    digest_body = pw.TextField(null=True)
+    digest_html_pre_body = pw.BooleanField(null=True)
+
+    class Meta:
+        indexes = (
+            (('failed', 'next_attempt_time'), False),
+        )
+
+
+class DBTrace(BaseModel):
+    trace_id = pw.CharField(unique=True)
+    event_type = pw.CharField()
+    faculty_username = pw.CharField(null=True)
+    class_name = pw.CharField(null=True)
+    assignment_name = pw.CharField(null=True)
+    start_time = pw.FloatField(index=True)
+
+
+class DBTraceHop(BaseModel):
+    trace = pw.ForeignKeyField(DBTrace, on_delete='CASCADE')
+    name = pw.CharField()
+    time = pw.FloatField()
+
+
+class DBDeliveredEvent(BaseModel):
+    file_path = pw.CharField()
+    timestamp = pw.FloatField()
+    event_type = pw.CharField()
+    payload = pw.TextField()
+    delivery_time = pw.FloatField(index=True)
+
+    class Meta:
+        indexes = (
+            (('file_path', 'timestamp'), False),
+        )
+
+
+# Models in the order in which their tables must be created
+MODELS = [DBUser, DBFacultyUser, DBStudentUser, DBDummyUser, DBClass,
+          DBClassStudent, DBAssignment, DBByteCount, DBOutboxEmail, DBTrace,
+          DBTraceHop, DBDeliveredEvent]
+
+
+def _add_lookup_indexes():
+    # Version 1: index email address lookups and class rosters
+    database.execute_sql('CREATE INDEX IF NOT EXISTS '
+                         '"dbuser_email_address_lower" '
+                         'ON "dbuser" (LOWER("email_address"))')
+    database.execute_sql('CREATE INDEX IF NOT EXISTS '
+                         '"dbclassstudent_class_id_active_user_id_first_name_'
+                         'last_name" ON "dbclassstudent" ("class_id", '
+                         '"active", "user_id", "first_name", "last_name")')
+
+
+def _add_email_outbox():
+    # Version 2: store emails until they are sent
+    database.execute_sql('CREATE TABLE IF NOT EXISTS "dboutboxemail" ('
+                         '"id" INTEGER NOT NULL PRIMARY KEY, '
+                         '"to_address" VARCHAR(255) NOT NULL, '
+                         '"subject" TEXT NOT NULL, "message" TEXT NOT NULL, '
+                         '"priority" INTEGER NOT NULL, '
+                         '"enqueue_time" REAL NOT NULL, '
+                         '"send_attempts" INTEGER NOT NULL, '
+                         '"next_attempt_time" REAL NOT NULL, '
+                         '"last_error" TEXT NOT NULL, '
+                         '"failed" INTEGER NOT NULL)')
+    database.execute_sql('CREATE INDEX IF NOT EXISTS '
+                         '"dboutboxemail_failed_next_attempt_time" '
+                         'ON "dboutboxemail" ("failed", "next_attempt_time")')
+
+
+def _add_traces():
+    # Version 3: store the times at which events passed each stage
+    database.execute_sql('CREATE TABLE IF NOT EXISTS "dbtrace" ('
+                         '"id" INTEGER NOT NULL PRIMARY KEY, '
+                         '"trace_id" VARCHAR(255) NOT NULL, '
+                         '"event_type" VARCHAR(255) NOT NULL, '
+                         '"faculty_username" VARCHAR(255), '
+                         '"class_name" VARCHAR(255), '
+                         '"assignment_name" VARCHAR(255), '
+                         '"start_time" REAL NOT NULL)')
+    database.execute_sql('CREATE UNIQUE INDEX IF NOT EXISTS "dbtrace_trace_id" '
+                         'ON "dbtrace" ("trace_id")')
+    database.execute_sql('CREATE INDEX IF NOT EXISTS "dbtrace_start_time" '
+                         'ON "dbtrace" ("start_time")')
+    database.execute_sql('CREATE TABLE IF NOT EXISTS "dbtracehop" ('
+                         '"id" INTEGER NOT NULL PRIMARY KEY, '
+                         '"trace_id" INTEGER NOT NULL, '
+                         '"name" VARCHAR(255) NOT NULL, '
+                         '"time" REAL NOT NULL, '
+                         'FOREIGN KEY ("trace_id") REFERENCES "dbtrace" ("id") '
+                         'ON DELETE CASCADE)')
+    database.execute_sql('CREATE INDEX IF NOT EXISTS "dbtracehop_trace_id" '
+                         'ON "dbtracehop" ("trace_id")')
+
+
+def _add_outbox_digest_results():
+    # Version 4: store results that are waiting to be combined into a digest
+    database.execute_sql('ALTER TABLE "dboutboxemail" '
+                         'ADD COLUMN "digest_body" TEXT')
+    database.execute_sql('ALTER TABLE "dboutboxemail" '
+                         'ADD COLUMN "digest_html_pre_body" INTEGER')
+
+
+def _add_delivered_events():
+    # Version 5: remember events delivered through the event socket until
+    # they are read from their logs
+    database.execute_sql('CREATE TABLE IF NOT EXISTS "dbdeliveredevent" ('
+                         '"id" INTEGER NOT NULL PRIMARY KEY, '
+                         '"file_path" VARCHAR(255) NOT NULL, '
+                         '"timestamp" REAL NOT NULL, '
+                         '"event_type" VARCHAR(255) NOT NULL, '
+                         '"payload" TEXT NOT NULL, '
+                         '"delivery_time" REAL NOT NULL)')
+    database.execute_sql('CREATE INDEX IF NOT EXISTS '
+                         '"dbdeliveredevent_delivery_time" '
+                         'ON "dbdeliveredevent" ("delivery_time")')
+    database.execute_sql('CREATE INDEX IF NOT EXISTS '
+                         '"dbdeliveredevent_file_path_timestamp" '
+                         'ON "dbdeliveredevent" ("file_path", "timestamp")')
+
+
+# Schema migrations, in order. Applying MIGRATIONS[i] to a database with
+# schema version i brings it to version i + 1. The SQL in a migration must not
+# change once it is released, and any change to the models above must come
+# with a new migration that makes the same change to existing databases.
+MIGRATIONS = [
+    _add_lookup_indexes,
+    _add_email_outbox,
+    _add_traces,
+    _add_outbox_digest_results,
+    _add_delivered_events,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
 class Database:
     """
     Provides an interface for interacting with the database that stores
     information about users, classes, and assignments.
+
+    Whether a class is open and whether an assignment is published or
+    disabled are checked for every submission, so the results of
+    class_is_open(), is_published(), and is_disabled() are cached. The methods
+    that change these states invalidate the cached values, so the database
+    must not be modified except through this class while gkeepd is running.
     """
 
-    def connect(self, db_filename):
+    def __init__(self):
+        """
+        Initialize the caches. Call connect() before calling any other
+        methods.
+        """
+
+        self._cache_lock = Lock()
+
+        # (faculty username, class name) -> True if the class is open
+        self._class_open_cache = {}
+
+        # (faculty username, class name, assignment name) ->
+        # (published, disabled)
+        self._assignment_state_cache = {}
+
+        # incremented on every invalidation, so that a value read from the
+        # database before an invalidation is not cached after it
+        self._cache_generation = 0
+
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def connect(self, db_filename, pragmas=None):
         """
         Connects the database to a file, or creates an in-memory database if
         given the string ':memory:'. Database tables are created if they do
-        not already exist in the given file. This method must be called before
-        any other methods are called.
+        not already exist in the given file, and an existing database is
+        upgraded to the current schema version. This method must be called
+        before any other methods are called.
+
+        Each thread gets its own connection, which is opened the first time
+        the thread uses the database. The pragmas are applied to every
+        connection. Foreign key enforcement is always enabled.
+
+        Note that each connection to ':memory:' is a separate database, so an
+        in-memory database should only be used from a single thread.
 
         :param db_filename: name of the file to connect to
+        :param pragmas: optional dictionary of SQLite pragmas, such as
+         journal_mode and synchronous
+        """
+
+        all_pragmas = {}
+
+        if pragmas is not None:
+            all_pragmas.update(pragmas)
+
+        all_pragmas['foreign_keys'] = 1
+
+        self._clear_caches()
+
+        database.init(db_filename, pragmas=all_pragmas)
+        self._migrate()
+
+    def get_schema_version(self) -> int:
+        """
+        Get the schema version of the connected database.
+
+        :return: the schema version
+        """
+
+        return database.pragma('user_version')
+
+    def open_thread_connection(self):
+        """
+        Open the calling thread's connection to the database if it is not
+        already open.
+
+        Threads that use the database should call this when they start and
+        call close_thread_connection() before they exit.
+        """
+
+        database.connect(reuse_if_open=True)
+
+    def close_thread_connection(self):
+        """
+        Close the calling thread's connection to the database if it is open.
+        """
+
+        if not database.is_closed():
+            database.close()
+
+    def get_cache_stats(self) -> dict:
+        """
+        Get statistics about the cache used by class_is_open(),
+        is_published(), and is_disabled().
+
+        :return: dictionary with the number of cache hits and misses, the hit
+         rate, and the number of cached entries
         """
-        database.init(db_filename, pragmas={'foreign_keys': 1})
-        database.create_tables([DBUser, DBFacultyUser, DBStudentUser,
-                                DBDummyUser, DBClass, DBClassStudent,
-                                DBAssignment, DBByteCount])
+
+        with self._cache_lock:
+            lookups = self._cache_hits + self._cache_misses
+
+            return {
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'hit_rate': self._cache_hits / lookups if lookups else 0.0,
+                'entries': (len(self._class_open_cache) +
+                            len(self._assignment_state_cache)),
+            }
 
     def username_exists(self, username):
         """
@@ -181,6 +464,49 @@ class Database:
             error = 'No user with email address {}'.format(email_address)
             raise DatabaseException(error)
 
+    def get_users_by_email(self, email_addresses) -> dict:
+        """
+        Look up the users with any of the given email addresses, and which
+        roles they have. Matching is case-insensitive.
+
+        The returned dictionary maps lowercase email addresses to
+        dictionaries with these keys:
+
+            username - the user's username
+            is_faculty - True if the user is a faculty user
+            is_student - True if the user is a student user
+
+        Email addresses that do not belong to a user are left out.
+
+        :param email_addresses: collection of email addresses
+        :return: dictionary of users by lowercase email address
+        """
+
+        lower_emails = list({email.lower() for email in email_addresses})
+        lower_email = pw.fn.LOWER(DBUser.email_address)
+
+        users_by_email = {}
+
+        for chunk in pw.chunked(lower_emails, BULK_CHUNK_SIZE):
+            query = (DBUser
+                     .select(DBUser.email_address, DBUser.username,
+                             DBFacultyUser.id.alias('faculty_id'),
+                             DBStudentUser.id.alias('student_id'))
+                     .join(DBFacultyUser, pw.JOIN.LEFT_OUTER)
+                     .switch(DBUser)
+                     .join(DBStudentUser, pw.JOIN.LEFT_OUTER)
+                     .where(lower_email.in_(chunk))
+                     .dicts())
+
+            for row in query:
+                users_by_email[row['email_address'].lower()] = {
+                    'username': row['username'],
+                    'is_faculty': row['faculty_id'] is not None,
+                    'is_student': row['student_id'] is not None,
+                }
+
+        return users_by_email
+
     def get_email_from_username(self, username):
         """
         Get a user's email address from their username.
@@ -255,6 +581,83 @@ class Database:
         student.username = username
         return student
 
+    def insert_students(self, students: list, existing_users) -> list:
+        """
+        Inserts many students into the database in a single transaction. If
+        any student cannot be inserted, none of them are inserted and a
+        DatabaseException is raised.
+
+        A student whose email address already belongs to a user, such as a
+        faculty user, is given the student role with the existing username,
+        like insert_student() with user_exists=True. Other students get new
+        users with usernames assigned the same way as insert_student().
+
+        The username attributes of the Student objects are updated.
+
+        :param students: list of Student objects to insert
+        :param existing_users: collection of usernames that already exist on
+         the system, but are not necessarily in the db
+        :return: the list of Student objects
+        """
+
+        if len(students) == 0:
+            return students
+
+        users_by_email = self.get_users_by_email([student.email_address
+                                                  for student in students])
+
+        # every username that a new user must not be given
+        taken_usernames = set(existing_users)
+        taken_usernames.update(user.username for user
+                               in DBUser.select(DBUser.username))
+
+        new_user_rows = []
+
+        for student in students:
+            user = users_by_email.get(student.email_address.lower())
+
+            if user is not None:
+                student.username = user['username']
+                continue
+
+            original_username = username_from_email(student.email_address)
+            clean_username = cleanup_string(original_username,
+                                            is_username=True)
+
+            validate_username(clean_username)
+
+            username = clean_username
+
+            counter = 1
+            while username in taken_usernames:
+                username = clean_username + str(counter)
+                counter += 1
+
+            taken_usernames.add(username)
+            student.username = username
+
+            new_user_rows.append({'username': username,
+                                  'email_address': student.email_address})
+
+        try:
+            with database.atomic():
+                for rows in pw.chunked(new_user_rows, BULK_CHUNK_SIZE):
+                    DBUser.insert_many(rows).execute()
+
+                user_ids = self._user_ids_from_usernames(
+                    [student.username for student in students])
+
+                student_rows = [{'user_id': user_ids[student.username]}
+                                for student in students]
+
+                for rows in pw.chunked(student_rows, BULK_CHUNK_SIZE):
+                    DBStudentUser.insert_many(rows).execute()
+        except pw.IntegrityError as e:
+            error = 'Error inserting students: {}'.format(e)
+            raise DatabaseException(error)
+
+        return students
+
     def change_student_name(self, student: Student, class_name: str,
                             faculty_username: str):
         """
@@ -520,6 +923,9 @@ class Database:
             error = ('Faculty {} does not have a class named {}'
                      .format(faculty_username, class_name))
             raise DatabaseException(error)
+        finally:
+            self._invalidate(self._class_open_cache,
+                             (faculty_username, class_name))
 
     def open_class(self, class_name: str, faculty_username: str):
         """
@@ -541,6 +947,9 @@ class Database:
             error = ('Faculty {} does not have a class named {}'
                      .format(faculty_username, class_name))
             raise DatabaseException(error)
+        finally:
+            self._invalidate(self._class_open_cache,
+                             (faculty_username, class_name))
 
     def class_is_open(self, class_name: str, faculty_username: str) -> bool:
         """
@@ -553,16 +962,10 @@ class Database:
         :return: True if the class exists, False if it does not
         """
 
-        faculty_id = self._get_faculty_id(faculty_username)
-
-        try:
-            the_class = DBClass.get((DBClass.name == class_name) &
-                                    (DBClass.faculty_id == faculty_id))
-            return the_class.open
-        except DBClass.DoesNotExist:
-            error = ('Faculty {} does not have a class named {}'
-                     .format(faculty_username, class_name))
-            raise DatabaseException(error)
+        return self._cached(self._class_open_cache,
+                            (faculty_username, class_name),
+                            lambda: self._select_class_is_open(
+                                class_name, faculty_username))
 
     def insert_assignment(self, class_name: str, assignment_name: str,
                           faculty_username: str):
@@ -650,6 +1053,9 @@ class Database:
             error = ('No assignment named {} in class {}'
                      .format(assignment_name, class_name))
             raise DatabaseException(error)
+        finally:
+            self._invalidate(self._assignment_state_cache,
+                             (faculty_username, class_name, assignment_name))
 
     def disable_assignment(self, class_name: str, assignment_name: str,
                            faculty_username: str):
@@ -685,6 +1091,9 @@ class Database:
             error = ('No assignment named {} in class {}'
                      .format(assignment_name, class_name))
             raise DatabaseException(error)
+        finally:
+            self._invalidate(self._assignment_state_cache,
+                             (faculty_username, class_name, assignment_name))
 
     def is_disabled(self, class_name: str, assignment_name: str,
                     faculty_username: str):
@@ -698,19 +1107,11 @@ class Database:
          assignment
         :return: True if the assignment is disabled, False if not
         """
-        class_id = self._get_class_id(class_name, faculty_username)
 
-        try:
-            selected_assignment = DBAssignment.select().where(
-                (DBAssignment.name == assignment_name) &
-                (DBAssignment.class_id == class_id)
-            ).get()
-
-            return selected_assignment.disabled
-        except DBAssignment.DoesNotExist:
-            error = ('Class {} has no assignment {}'
-                     .format(class_name, assignment_name))
-            raise DatabaseException(error)
+        published, disabled = self._assignment_state(class_name,
+                                                     assignment_name,
+                                                     faculty_username)
+        return disabled
 
     def set_published(self, class_name: str, assignment_name: str,
                       faculty_username: str, published=True):
@@ -737,6 +1138,9 @@ class Database:
             error = ('No assignment named {} in class {}'
                      .format(assignment_name, class_name))
             raise DatabaseException(error)
+        finally:
+            self._invalidate(self._assignment_state_cache,
+                             (faculty_username, class_name, assignment_name))
 
     def is_published(self, class_name: str, assignment_name: str,
                      faculty_username: str):
@@ -750,19 +1154,21 @@ class Database:
          assignment
         :return: True if the assignment is published, False if not
         """
-        class_id = self._get_class_id(class_name, faculty_username)
 
-        try:
-            selected_assignment = DBAssignment.select().where(
-                (DBAssignment.name == assignment_name) &
-                (DBAssignment.class_id == class_id)
-            ).get()
+        published, disabled = self._assignment_state(class_name,
+                                                     assignment_name,
+                                                     faculty_username)
+        return published
 
-            return selected_assignment.published
-        except DBAssignment.DoesNotExist:
-            error = ('Class {} has no assignment {}'
-                     .format(class_name, assignment_name))
-            raise DatabaseException(error)
+    def _assignment_state(self, class_name, assignment_name,
+                          faculty_username) -> (bool, bool):
+        # Get whether an assignment is published and whether it is disabled,
+        # from the cache if possible
+
+        return self._cached(self._assignment_state_cache,
+                            (faculty_username, class_name, assignment_name),
+                            lambda: self._select_assignment_state(
+                                class_name, assignment_name, faculty_username))
 
     def add_student_to_class(self, class_name: str, student: Student,
                              faculty_username: str):
@@ -787,6 +1193,56 @@ class Database:
                                                        class_name)
             raise DatabaseException(error)
 
+    def add_students_to_class(self, class_name: str, students: list,
+                              faculty_username: str):
+        """
+        Add many students to a class in a single transaction. Raises a
+        DatabaseException if the class does not exist, if any of the students
+        do not exist, or if any of the students are already in the class. In
+        that case none of the students are added.
+
+        :param class_name: name of the class
+        :param students: list of Student objects representing the students
+        :param faculty_username: username of the faculty user that owns the
+         class
+        """
+
+        if len(students) == 0:
+            return
+
+        class_id = self._get_class_id(class_name, faculty_username)
+
+        users_by_email = self.get_users_by_email([student.email_address
+                                                  for student in students])
+
+        user_ids = self._user_ids_from_usernames(
+            [user['username'] for user in users_by_email.values()
+             if user['is_student']])
+
+        rows = []
+
+        for student in students:
+            user = users_by_email.get(student.email_address.lower())
+
+            if user is None or not user['is_student']:
+                error = ('No student with the email address {}'
+                         .format(student.email_address))
+                raise DatabaseException(error)
+
+            rows.append({'class_id': class_id,
+                         'user_id': user_ids[user['username']],
+                         'first_name': student.first_name,
+                         'last_name': student.last_name, 'active': True})
+
+        try:
+            with database.atomic():
+                for chunk in pw.chunked(rows, BULK_CHUNK_SIZE):
+                    DBClassStudent.insert_many(chunk).execute()
+        except pw.IntegrityError:
+            error = ('One or more of the students are already in class {}'
+                     .format(class_name))
+            raise DatabaseException(error)
+
     def deactivate_student_in_class(self, class_name: str, student_email: str,
                                     faculty_username: str):
         """
@@ -910,6 +1366,39 @@ class Database:
         except (DatabaseException, DBClassStudent.DoesNotExist):
             return False
 
+    def students_in_class(self, email_addresses, class_name,
+                          faculty_username) -> set:
+        """
+        Determine which of the given students are active students in a class.
+        Raises a DatabaseException if the class does not exist.
+
+        :param email_addresses: collection of student email addresses
+        :param class_name: name of the class
+        :param faculty_username: username of the faculty user that owns the
+         class
+        :return: set of the lowercase email addresses of the students who are
+         active in the class
+        """
+
+        class_id = self._get_class_id(class_name, faculty_username)
+
+        lower_emails = list({email.lower() for email in email_addresses})
+        lower_email = pw.fn.LOWER(DBUser.email_address)
+
+        in_class = set()
+
+        for chunk in pw.chunked(lower_emails, BULK_CHUNK_SIZE):
+            query = (DBUser
+                     .select(DBUser.email_address)
+                     .join(DBClassStudent)
+                     .where((DBClassStudent.class_id == class_id) &
+                            (DBClassStudent.active == True) &
+                            lower_email.in_(chunk)))
+
+            in_class.update(user.email_address.lower() for user in query)
+
+        return in_class
+
     def student_inactive_in_class(self, email_address, class_name,
                                   faculty_username):
         """
@@ -1035,6 +1524,306 @@ class Database:
             raise DatabaseException('No byte count found for {}'
                                     .format(file_path))
 
+    def insert_outbox_email(self, to_address: str, subject: str,
+                            message: str, priority: int,
+                            enqueue_time: float) -> int:
+        """
+        Store an email in the outbox until it is sent.
+
+        :param to_address: address the email is sent to
+        :param subject: subject of the email
+        :param message: the entire message, including headers
+        :param priority: priority of the email in the send queue
+        :param enqueue_time: time the email was enqueued
+        :return: the ID of the email in the outbox
+        """
+
+        outbox_email = DBOutboxEmail.create(to_address=to_address,
+                                            subject=subject, message=message,
+                                            priority=priority,
+                                            enqueue_time=enqueue_time,
+                                            send_attempts=0,
+                                            next_attempt_time=enqueue_time,
+                                            last_error='', failed=False)
+
+        return outbox_email.id
+
+    def insert_outbox_digest_result(self, to_address: str, subject: str,
+                                    message: str, priority: int,
+                                    result_time: float, send_time: float,
+                                    body: str, html_pre_body: bool) -> int:
+        """
+        Store a result that is waiting to be combined with others into a
+        results digest in the outbox, until the digest is sent.
+
+        :param to_address: address the email is sent to
+        :param subject: subject of the email
+        :param message: the entire message of an email containing only this
+         result, including headers
+        :param priority: priority of the email in the send queue
+        :param result_time: time the result was added to the digest
+        :param send_time: time at which the digest is sent
+        :param body: body of the result, to combine with the others
+        :param html_pre_body: whether the digest is also sent as HTML
+        :return: the ID of the result in the outbox
+        """
+
+        outbox_email = DBOutboxEmail.create(to_address=to_address,
+                                            subject=subject, message=message,
+                                            priority=priority,
+                                            enqueue_time=result_time,
+                                            send_attempts=0,
+                                            next_attempt_time=send_time,
+                                            last_error='', failed=False,
+                                            digest_body=body,
+                                            digest_html_pre_body=html_pre_body)
+
+        return outbox_email.id
+
+    def get_outbox_digest_results(self) -> list:
+        """
+        Get the results in the outbox that are waiting to be combined into
+        results digests, in the order in which they were added. Each result
+        is a dictionary with the same keys as the emails from
+        get_outbox_emails().
+
+        :return: list of dictionaries describing the results
+        """
+
+        query = (DBOutboxEmail.select()
+                 .where(DBOutboxEmail.digest_body.is_null(False))
+                 .order_by(DBOutboxEmail.enqueue_time, DBOutboxEmail.id))
+
+        return list(query.dicts())
+
+    def replace_outbox_digest_results(self, outbox_ids: list,
+                                      to_address: str, subject: str,
+                                      message: str, priority: int,
+                                      enqueue_time: float) -> int:
+        """
+        Replace results waiting in the outbox with the email that combines
+        them, in a single transaction so that the results are sent exactly
+        once even if gkeepd stops.
+
+        :param outbox_ids: IDs of the results in the outbox
+        :param to_address: address the email is sent to
+        :param subject: subject of the email
+        :param message: the entire message, including headers
+        :param priority: priority of the email in the send queue
+        :param enqueue_time: time the email was enqueued
+        :return: the ID of the email in the outbox
+        """
+
+        with database.atomic():
+            DBOutboxEmail.delete() \
+                .where(DBOutboxEmail.id.in_(outbox_ids)).execute()
+
+            return self.insert_outbox_email(to_address, subject, message,
+                                            priority, enqueue_time)
+
+    def get_outbox_emails(self, include_failed=True,
+                          include_digest_results=True) -> list:
+        """
+        Get the emails in the outbox, in the order in which they should next
+        be attempted. Each email is a dictionary with the keys id,
+        to_address, subject, message, priority, enqueue_time, send_attempts,
+        next_attempt_time, last_error, failed, digest_body, and
+        digest_html_pre_body. digest_body is None except for results that
+        are waiting to be combined into a results digest.
+
+        :param include_failed: if False, leave out emails that will not be
+         attempted again
+        :param include_digest_results: if False, leave out results that are
+         waiting to be combined into a results digest
+        :return: list of dictionaries describing the emails
+        """
+
+        query = DBOutboxEmail.select()
+
+        if not include_failed:
+            query = query.where(DBOutboxEmail.failed == False)
+
+        if not include_digest_results:
+            query = query.where(DBOutboxEmail.digest_body.is_null())
+
+        query = query.order_by(DBOutboxEmail.failed,
+                               DBOutboxEmail.next_attempt_time,
+                               DBOutboxEmail.id)
+
+        return list(query.dicts())
+
+    def record_outbox_send_failure(self, outbox_id: int, send_attempts: int,
+                                   next_attempt_time: float, error: str,
+                                   failed: bool):
+        """
+        Record a failed attempt to send an email in the outbox.
+
+        :param outbox_id: ID of the email in the outbox
+        :param send_attempts: number of attempts made so far
+        :param next_attempt_time: time of the next attempt
+        :param error: description of the error
+        :param failed: True if the email will not be attempted again
+        """
+
+        DBOutboxEmail.update(send_attempts=send_attempts,
+                             next_attempt_time=next_attempt_time,
+                             last_error=error, failed=failed) \
+            .where(DBOutboxEmail.id == outbox_id).execute()
+
+    def delete_outbox_email(self, outbox_id: int):
+        """
+        Remove an email from the outbox, typically because it was sent.
+
+        :param outbox_id: ID of the email in the outbox
+        """
+
+        DBOutboxEmail.delete().where(DBOutboxEmail.id == outbox_id).execute()
+
+    def insert_trace_hops(self, hops: list):
+        """
+        Store the times at which traced events passed stages in gkeepd.
+
+        Each hop is a 3-tuple of a dictionary describing the trace, the name
+        of the hop, and the time of the hop. The dictionary has the keys
+        trace_id, event_type, faculty_username, class_name, assignment_name,
+        and start_time. The trace is created the first time one of its hops
+        is stored, and its faculty username, class name, and assignment name
+        are filled in as they become known.
+
+        :param hops: list of (trace dictionary, name, time) tuples
+        """
+
+        # the latest description of each trace
+        trace_rows = {}
+
+        for trace_row, _, _ in hops:
+            trace_rows[trace_row['trace_id']] = trace_row
+
+        with database.atomic():
+            ids_by_trace_id = {
+                trace_id: self._upsert_trace(trace_row)
+                for trace_id, trace_row in trace_rows.items()
+            }
+
+            data = [
+                {'trace': ids_by_trace_id[trace_row['trace_id']],
+                 'name': name, 'time': timestamp}
+                for trace_row, name, timestamp in hops
+            ]
+
+            DBTraceHop.insert_many(data).execute()
+
+    def get_trace_hops(self, trace_id: str) -> list:
+        """
+        Get the hops of a trace in the order in which they happened.
+
+        :param trace_id: the trace's correlation id
+        :return: list of (name, time) tuples
+        """
+
+        query = (DBTraceHop.select(DBTraceHop.name, DBTraceHop.time)
+                 .join(DBTrace)
+                 .where(DBTrace.trace_id == trace_id)
+                 .order_by(DBTraceHop.time, DBTraceHop.id))
+
+        return [(hop.name, hop.time) for hop in query]
+
+    def get_trace_latencies(self, event_type: str, end_hop: str,
+                            since=0) -> list:
+        """
+        Get the time from the start of each trace of a type to the first
+        time it passed a hop. Traces which never passed the hop are left out.
+
+        Each latency is a dictionary with the keys faculty_username,
+        class_name, assignment_name, start_time, and latency.
+
+        :param event_type: type of the traced events
+        :param end_hop: name of the hop at which the latency ends
+        :param since: leave out traces which started before this time
+        :return: list of dictionaries, ordered by start time
+        """
+
+        end_time = pw.fn.MIN(DBTraceHop.time)
+
+        query = (DBTrace.select(DBTrace.faculty_username, DBTrace.class_name,
+                                DBTrace.assignment_name, DBTrace.start_time,
+                                (end_time - DBTrace.start_time)
+                                .alias('latency'))
+                 .join(DBTraceHop)
+                 .where((DBTrace.event_type == event_type) &
+                        (DBTrace.start_time >= since) &
+                        (DBTraceHop.name == end_hop))
+                 .group_by(DBTrace.id)
+                 .order_by(DBTrace.start_time))
+
+        return list(query.dicts())
+
+    def delete_traces_before(self, cutoff_time: float) -> int:
+        """
+        Remove the traces which started before a time, along with their
+        hops.
+
+        :param cutoff_time: traces which started before this time are removed
+        :return: the number of traces removed
+        """
+
+        return (DBTrace.delete().where(DBTrace.start_time < cutoff_time)
+                .execute())
+
+    def insert_delivered_event(self, file_path: str, timestamp: float,
+                               event_type: str, payload: str,
+                               delivery_time: float):
+        """
+        Remember an event that was delivered through the event socket, so
+        that it is not handled again when it is read from its log, even if
+        gkeepd restarts first.
+
+        :param file_path: path to the log that the event is from
+        :param timestamp: timestamp of the event
+        :param event_type: type of the event
+        :param payload: payload of the event
+        :param delivery_time: time the event was delivered
+        """
+
+        DBDeliveredEvent.create(file_path=file_path, timestamp=timestamp,
+                                event_type=event_type, payload=payload,
+                                delivery_time=delivery_time)
+
+    def delete_delivered_event(self, file_path: str, timestamp: float,
+                               event_type: str, payload: str) -> bool:
+        """
+        Forget an event that was delivered through the event socket,
+        typically because it has been read from its log.
+
+        :param file_path: path to the log that the event is from
+        :param timestamp: timestamp of the event
+        :param event_type: type of the event
+        :param payload: payload of the event
+        :return: True if the event had been delivered, False otherwise
+        """
+
+        deleted_count = (DBDeliveredEvent.delete()
+                         .where(DBDeliveredEvent.file_path == file_path,
+                                DBDeliveredEvent.timestamp == timestamp,
+                                DBDeliveredEvent.event_type == event_type,
+                                DBDeliveredEvent.payload == payload)
+                         .execute())
+
+        return deleted_count > 0
+
+    def delete_delivered_events_before(self, cutoff_time: float) -> int:
+        """
+        Forget the events that were delivered through the event socket
+        before a time.
+
+        :param cutoff_time: events delivered before this time are forgotten
+        :return: the number of events forgotten
+        """
+
+        return (DBDeliveredEvent.delete()
+                .where(DBDeliveredEvent.delivery_time < cutoff_time)
+                .execute())
+
     def _insert_user(self, email_address: str, existing_users):
         """
         Inserts a user into the database. The user's username will the username
@@ -1069,6 +1858,128 @@ class Database:
 
         return username
 
+    def _migrate(self):
+        # Create the tables of a new database, or bring an existing database
+        # up to the current schema version. The schema version is stored in
+        # SQLite's user_version, which is 0 for databases created before
+        # versioning was introduced. Each migration is applied in its own
+        # transaction along with its version bump, so an interrupted upgrade
+        # resumes from the last completed migration.
+
+        if not database.get_tables():
+            with database.atomic():
+                database.create_tables(MODELS)
+                database.pragma('user_version', SCHEMA_VERSION)
+            return
+
+        version = self.get_schema_version()
+
+        if version > SCHEMA_VERSION:
+            error = ('Database schema version {0} is newer than the latest '
+                     'version {1} known to this version of gkeepd'
+                     .format(version, SCHEMA_VERSION))
+            raise DatabaseException(error)
+
+        for version in range(version, SCHEMA_VERSION):
+            with database.atomic():
+                MIGRATIONS[version]()
+                database.pragma('user_version', version + 1)
+
+    def _upsert_trace(self, trace_row: dict) -> int:
+        # Create the trace if it does not exist, otherwise fill in the
+        # descriptive fields that have become known. Returns the row's id.
+
+        try:
+            trace = DBTrace.get(DBTrace.trace_id == trace_row['trace_id'])
+        except DBTrace.DoesNotExist:
+            return DBTrace.create(**trace_row).id
+
+        updates = {}
+
+        for field in ('faculty_username', 'class_name', 'assignment_name'):
+            if (trace_row[field] is not None and
+                    getattr(trace, field) != trace_row[field]):
+                updates[field] = trace_row[field]
+
+        if updates:
+            DBTrace.update(**updates).where(DBTrace.id == trace.id).execute()
+
+        return trace.id
+
+    def _select_class_is_open(self, class_name, faculty_username) -> bool:
+        # Query the database to determine if a class is open
+
+        faculty_id = self._get_faculty_id(faculty_username)
+
+        try:
+            the_class = DBClass.get((DBClass.name == class_name) &
+                                    (DBClass.faculty_id == faculty_id))
+            return the_class.open
+        except DBClass.DoesNotExist:
+            error = ('Faculty {} does not have a class named {}'
+                     .format(faculty_username, class_name))
+            raise DatabaseException(error)
+
+    def _select_assignment_state(self, class_name, assignment_name,
+                                 faculty_username) -> (bool, bool):
+        # Query the database for whether an assignment is published and
+        # whether it is disabled
+
+        class_id = self._get_class_id(class_name, faculty_username)
+
+        try:
+            selected_assignment = DBAssignment.select().where(
+                (DBAssignment.name == assignment_name) &
+                (DBAssignment.class_id == class_id)
+            ).get()
+
+            return selected_assignment.published, selected_assignment.disabled
+        except DBAssignment.DoesNotExist:
+            error = ('Class {} has no assignment {}'
+                     .format(class_name, assignment_name))
+            raise DatabaseException(error)
+
+    def _cached(self, cache: dict, key, lookup):
+        # Return the cached value for key, or call lookup() to get the value
+        # from the database and cache it. Exceptions raised by lookup() are
+        # not cached.
+
+        with self._cache_lock:
+            if key in cache:
+                self._cache_hits += 1
+                return cache[key]
+
+            self._cache_misses += 1
+            generation = self._cache_generation
+
+        value = lookup()
+
+        with self._cache_lock:
+            # if anything was invalidated during the lookup, the value may
+            # already be stale
+            if generation == self._cache_generation:
+                cache[key] = value
+
+        return value
+
+    def _invalidate(self, cache: dict, key):
+        # Remove a cached value after the database has been changed
+
+        with self._cache_lock:
+            cache.pop(key, None)
+            self._cache_generation += 1
+
+    def _clear_caches(self):
+        # Remove all cached values, such as when connecting to a different
+        # database
+
+        with self._cache_lock:
+            self._class_open_cache.clear()
+            self._assignment_state_cache.clear()
+            self._cache_generation += 1
+            self._cache_hits = 0
+            self._cache_misses = 0
+
     def _get_class_id(self, class_name, faculty_username):
         try:
             selected_class = DBClass.select().join(DBUser).where(
@@ -1087,6 +1998,20 @@ class Database:
             raise DatabaseException('No user with the username {}'
                                     .format(username))
 
+    def _user_ids_from_usernames(self, usernames) -> dict:
+        # Map each of the given usernames to its user ID
+
+        user_ids = {}
+
+        for chunk in pw.chunked(list(set(usernames)), BULK_CHUNK_SIZE):
+            query = (DBUser.select(DBUser.id, DBUser.username)
+                     .where(DBUser.username.in_(chunk)))
+
+            for user in query:
+                user_ids[user.username] = user.id
+
+        return user_ids
+
     def _get_faculty_id(self, faculty_username):
         try:
             faculty = DBUser.select().join(DBFacultyUser).where(
@@ -20,6 +20,23 @@ Provides a global interface for sending emails in a rate-limited fashion.
 The email sender runs in a separate thread so that other threads do not need
 to block when trying to send email due to rate limiting.
 
+Emails are rate-limited with a token bucket which allows config.email_burst
+emails to be sent at once, and one email every config.email_interval seconds
+after that. Emails to domains in config.email_domain_limits are also limited
+by a bucket for their domain. An email whose domain must wait does not hold
+up emails to other domains.
+
+The emails are sent by config.email_sender_count worker threads, each of
+which keeps its own connection to the SMTP server open while there are emails
+to send, and closes it after it has been idle for config.smtp_idle_timeout
+seconds.
+
+Once enable_outbox() is called, every email is stored in the database's
+outbox when it is enqueued and removed once it is sent, and emails left in
+the outbox by a previous run are sent again. An email that fails to send is
+retried after a delay which doubles with each attempt, starting at
+config.email_retry_delay seconds and capped at config.email_retry_max_delay.
+
 This module stores an EmailSenderThread instance in the module-level variable
 named email_sender. Call start() on this instance to start the thread.
 
@@ -41,19 +58,23 @@ Example usage:
 
 """
 
-from queue import PriorityQueue, Empty
-from threading import Thread
-from time import time, sleep
+import heapq
+from itertools import count
+from queue import PriorityQueue, Queue, Empty
+from threading import Thread, Lock, Semaphore
+from time import time
 
+from gkeepserver.database import db
 from gkeepserver.gkeepd_logger import gkeepd_logger as logger
 from gkeepserver.server_configuration import config
-from gkeepserver.server_email import Email
+from gkeepserver.server_email import Email, SMTPConnection
+from gkeepserver.token_bucket import TokenBucket
 
 
 class EmailSenderThread(Thread):
     """
-    Provides a Thread which blocks waiting for new emails and sends them in a
-    rate-limited fashion.
+    Provides a Thread which blocks waiting for new emails and hands them to
+    worker threads which send them, in a rate-limited fashion.
 
     Usage:
 
@@ -67,6 +88,12 @@ class EmailSenderThread(Thread):
     Add emails to the thread by calling enqueue(email). Emails must be
     gkeepserver.email.Email objects.
 
+    Call enable_outbox() before enqueueing emails to store them in the
+    database until they are sent.
+
+    Call get_metrics() for the length of the queue and how long emails waited
+    in it.
+
     """
     def __init__(self):
         """
@@ -80,88 +107,402 @@ class EmailSenderThread(Thread):
 
         self._email_queue = PriorityQueue()
 
-        self._last_send_time = 0
+        # emails waiting for a token for their domain, as a heap of
+        # (ready time, sequence number, email) tuples
+        self._deferred_emails = []
+        self._deferred_sequence = count()
+
+        # (ready time, email) tuples for emails to retry after a failure,
+        # which the run loop moves to the deferred emails
+        self._retry_queue = Queue()
+
+        self._use_outbox = False
+
+        # emails handed to the workers, and the number of idle workers
+        self._work_queue = Queue()
+        self._idle_workers = None
+        self._in_flight_count = 0
+        self._workers = []
+
+        self._bucket = None
+        self._domain_buckets = {}
+
+        self._metrics_lock = Lock()
+        self._sent_count = 0
+        self._failed_count = 0
+        self._last_age_at_send = 0
+        self._max_age_at_send = 0
+        self._total_age_at_send = 0
 
         self._shutdown_flag = False
 
+    def enable_outbox(self):
+        """
+        Store emails in the database's outbox until they are sent, and
+        enqueue the emails that a previous run left in the outbox. Results
+        waiting to be combined into a digest are left to the result digester.
+
+        The database must be connected first.
+
+        :return: the number of emails enqueued from the outbox
+        """
+
+        self._use_outbox = True
+
+        outbox_emails = db.get_outbox_emails(include_failed=False,
+                                             include_digest_results=False)
+
+        for outbox_email in outbox_emails:
+            email = Email.from_outbox(outbox_email)
+
+            if outbox_email['next_attempt_time'] > time():
+                self._retry_queue.put((outbox_email['next_attempt_time'],
+                                       email))
+            else:
+                self._email_queue.put(email)
+
+        return len(outbox_emails)
+
     def enqueue(self, email: Email):
         """
         Add a new email to the queue.
 
         Sending is rate-limited so the email will not be sent immediately.
 
+        If the outbox is enabled, the email is stored in it before this
+        method returns.
+
         :param email: the email to send
         """
 
+        if isinstance(email, Email):
+            if email.enqueue_time is None:
+                email.enqueue_time = time()
+
+            if self._use_outbox and email.outbox_id is None:
+                self._store_in_outbox(email)
+
         self._email_queue.put(email)
 
-    def shutdown(self):
+    def get_metrics(self) -> dict:
+        """
+        Get metrics describing the queue and the emails that have been sent.
+
+        The dictionary has these keys:
+
+            queue_length - number of emails waiting to be sent
+            sent - number of emails sent
+            failed - number of emails that could not be sent after several
+             attempts
+            last_age_at_send - seconds the last email sent waited since it was
+             enqueued
+            max_age_at_send - the longest any email sent has waited
+            total_age_at_send - sum of the seconds all emails sent waited
+
+        :return: dictionary of metrics
+        """
+
+        with self._metrics_lock:
+            return {
+                'queue_length': (self._email_queue.qsize() +
+                                 len(self._deferred_emails) +
+                                 self._retry_queue.qsize() +
+                                 self._work_queue.qsize()),
+                'sent': self._sent_count,
+                'failed': self._failed_count,
+                'last_age_at_send': self._last_age_at_send,
+                'max_age_at_send': self._max_age_at_send,
+                'total_age_at_send': self._total_age_at_send,
+            }
+
+    def shutdown(self, timeout=None):
         """
         Shutdown the thread.
 
         The run loop will not exit until all queued messages have been sent.
+        If the outbox is enabled, emails waiting to be retried are left in
+        the outbox for the next run rather than waited for.
 
-        This method blocks until the thread has died.
+        This method blocks until the thread has died, or until timeout
+        seconds have passed if timeout is not None.
+
+        :param timeout: maximum number of seconds to wait, or None to wait
+         until the thread dies
         """
 
         self._shutdown_flag = True
-        self.join()
+        self.join(timeout)
 
     def run(self):
         """
-        Send emails as they arrive in the queue.
+        Hand emails to the workers as they arrive in the queue.
 
         This method should not be called directly. Call the start() method
         instead.
 
-        Sends at most 1 email every _min_send_interval seconds.
-
         Loops until someone calls shutdown().
         """
 
-        while not self._shutdown_flag:
+        self._bucket = TokenBucket(config.email_interval, config.email_burst)
+
+        self._domain_buckets = {
+            domain: TokenBucket(interval, burst)
+            for domain, (interval, burst)
+            in config.email_domain_limits.items()
+        }
+
+        self._idle_workers = Semaphore(config.email_sender_count)
+
+        for worker_number in range(config.email_sender_count):
+            self._workers.append(self._start_worker())
+
+        while True:
+            self._replace_dead_workers()
+
+            # only take an email from the queue when a worker can send it,
+            # so that higher priority emails are not stuck behind others
+            if not self._idle_workers.acquire(timeout=0.1):
+                continue
+
             try:
-                while True:
-                    email = self._email_queue.get(block=True, timeout=0.1)
-
-                    if not isinstance(email, Email):
-                        warning = ('Item dequeued for emailing that is '
-                                   'not an email: {0}'.format(email))
-                        logger.log_warning(warning)
-                    else:
-                        self._send_email_with_rate_limiting(email)
+                email = self._next_email()
+
+                if email is None:
+                    self._idle_workers.release()
+
+                    # emails that fail are put back in the queue, so stop
+                    # only once nothing is being sent
+                    if self._shutdown_flag and self._is_drained():
+                        break
+                elif not isinstance(email, Email):
+                    warning = ('Item dequeued for emailing that is '
+                               'not an email: {0}'.format(email))
+                    logger.log_warning(warning)
+                    self._idle_workers.release()
+                else:
+                    self._dispatch(email)
+            except Exception as e:
+                logger.log_error('Error in email sender thread: {0}'
+                                 .format(e))
+                self._idle_workers.release()
+
+        for worker in self._workers:
+            self._work_queue.put(None)
+
+        for worker in self._workers:
+            worker.join()
+
+    def _next_email(self):
+        # Get the next email to send: a deferred email whose domain now has a
+        # token, or else an email from the queue. Returns None if there is
+        # no email to send yet.
+
+        timeout = 0.1
+
+        while True:
+            try:
+                ready_time, email = self._retry_queue.get(block=False)
             except Empty:
-                pass
+                break
+
+            heapq.heappush(self._deferred_emails,
+                           (ready_time, next(self._deferred_sequence), email))
+
+        if len(self._deferred_emails) > 0:
+            ready_time, _, email = self._deferred_emails[0]
+            wait_time = ready_time - time()
+
+            if wait_time <= 0:
+                heapq.heappop(self._deferred_emails)
+                return email
+
+            timeout = min(timeout, wait_time)
+
+        try:
+            return self._email_queue.get(block=True, timeout=timeout)
+        except Empty:
+            return None
+
+    def _dispatch(self, email: Email):
+        # Wait for tokens for the email and hand it to a worker. If its domain
+        # has no token the email is deferred, so it does not hold up emails
+        # to other domains.
+
+        domain_bucket = self._domain_buckets.get(_domain(email))
+
+        if domain_bucket is not None and not domain_bucket.try_acquire():
+            ready_time = time() + domain_bucket.wait_time()
+            heapq.heappush(self._deferred_emails,
+                           (ready_time, next(self._deferred_sequence), email))
+            self._idle_workers.release()
+            return
+
+        self._bucket.acquire()
+
+        with self._metrics_lock:
+            self._in_flight_count += 1
+
+        self._work_queue.put(email)
+
+    def _is_drained(self) -> bool:
+        # Determine whether there are no emails waiting or being sent. Emails
+        # waiting for a retry or for their domain's limit are still in the
+        # outbox if it is enabled, so they need not be waited for.
+
+        with self._metrics_lock:
+            deferred_count = (len(self._deferred_emails) +
+                              self._retry_queue.qsize())
+
+            return (self._email_queue.empty() and
+                    (self._use_outbox or deferred_count == 0) and
+                    self._in_flight_count == 0)
+
+    def _store_in_outbox(self, email: Email):
+        # Store a new email in the outbox. If that fails the email is still
+        # sent, it just would not survive a restart.
+
+        try:
+            email.outbox_id = db.insert_outbox_email(email.to_address,
+                                                     email.subject,
+                                                     email.message_string,
+                                                     int(email.priority),
+                                                     email.enqueue_time)
+        except Exception as e:
+            logger.log_warning('Could not store email ({0}) in the outbox: '
+                               '{1}'.format(email, e))
+
+    def _start_worker(self) -> Thread:
+        # Start a worker thread which sends emails from the work queue
+
+        worker = Thread(target=self._worker_loop, daemon=True)
+        worker.start()
+
+        return worker
+
+    def _replace_dead_workers(self):
+        # A worker only dies if something raises where exceptions are not
+        # caught, such as while logging. Without a replacement, emails handed
+        # to the workers would never be sent and shutdown would never finish.
+
+        for index, worker in enumerate(self._workers):
+            if not worker.is_alive():
+                self._workers[index] = self._start_worker()
+
+    def _worker_loop(self):
+        # Send emails handed over by the run loop until receiving None. Each
+        # worker keeps its own connection to the SMTP server.
+
+        connection = SMTPConnection()
+
+        if self._use_outbox:
+            db.open_thread_connection()
+
+        while True:
+            try:
+                email = self._work_queue.get(block=True, timeout=0.1)
+            except Empty:
+                connection.close_if_idle()
+                continue
+
+            if email is None:
+                break
+
+            try:
+                self._send_email(email, connection)
             except Exception as e:
                 logger.log_error('Error in email sender thread: {0}'
                                  .format(e))
+            finally:
+                with self._metrics_lock:
+                    self._in_flight_count -= 1
 
-    def _send_email_with_rate_limiting(self, email: Email):
-        # Send the email. Sleep first if need be.
-        #
-        # :param email: the email to send
+                self._idle_workers.release()
 
-        # if _min_send_interval seconds have not elapsed since the last email
-        # was sent, sleep until _min_send_interval seconds have elapsed
-        current_time = time()
-        if current_time - self._last_send_time < config.email_interval:
-            elapsed_time = current_time - self._last_send_time
-            sleep_time = config.email_interval - elapsed_time
-            sleep(sleep_time)
+        connection.close()
 
-        self._last_send_time = time()
+        if self._use_outbox:
+            db.close_thread_connection()
+
+    def _send_email(self, email: Email, connection: SMTPConnection):
+        # Send the email. If sending fails, the email is retried after a
+        # delay unless it has been attempted too many times.
+        #
+        # :param email: the email to send
+        # :param connection: the worker's connection to the SMTP server
 
         try:
-            email.send()
-            logger.log_info('Sent email: {0}'.format(email))
+            email.send(connection)
         except Exception as e:
-            if not email.max_send_attempts_reached():
-                logger.log_warning('Email sending failed, will retry')
-                self._email_queue.put(email)
-            else:
-                error = ('Failed to send email ({0}) after several '
-                         'attempts: {1}'.format(email, e))
-                logger.log_error(error)
+            email.last_send_error = str(e)
+            self._handle_send_failure(email)
+            return
+
+        if email.outbox_id is not None:
+            db.delete_outbox_email(email.outbox_id)
+
+        for trace in email.traces:
+            trace.hop('email_sent')
+
+        age = time() - email.enqueue_time
+
+        with self._metrics_lock:
+            self._sent_count += 1
+            self._last_age_at_send = age
+            self._max_age_at_send = max(self._max_age_at_send, age)
+            self._total_age_at_send += age
+
+        logger.log_info('Sent email: {0} (queued for {1:.1f}s)'
+                        .format(email, age))
+
+    def _handle_send_failure(self, email: Email):
+        # Schedule a retry of an email that could not be sent, or give up on
+        # it, and record the attempt in the outbox
+
+        failed = email.max_send_attempts_reached()
+
+        if failed:
+            next_attempt_time = time()
+        else:
+            next_attempt_time = time() + retry_delay(email.get_send_attempts())
+
+        if email.outbox_id is not None:
+            db.record_outbox_send_failure(email.outbox_id,
+                                          email.get_send_attempts(),
+                                          next_attempt_time,
+                                          email.last_send_error, failed)
+
+        if failed:
+            error = ('Failed to send email ({0}) after several '
+                     'attempts: {1}'.format(email, email.last_send_error))
+            logger.log_error(error)
+
+            with self._metrics_lock:
+                self._failed_count += 1
+        else:
+            logger.log_warning('Email sending failed, will retry in {0:.0f}s: '
+                               '{1}'.format(next_attempt_time - time(),
+                                            email.last_send_error))
+            self._retry_queue.put((next_attempt_time, email))
+
+
+def retry_delay(send_attempts: int) -> float:
+    """
+    Get the number of seconds to wait before attempting to send an email
+    again.
+
+    :param send_attempts: number of attempts made so far
+    :return: seconds to wait
+    """
+
+    delay = config.email_retry_delay * 2 ** (send_attempts - 1)
+
+    return min(delay, config.email_retry_max_delay)
+
+
+def _domain(email: Email) -> str:
+    # Get the lowercase domain of the email's recipient
+
+    return email.to_address.rsplit('@', 1)[-1].lower()
 
 
 # module-level instance for global email sending
@@ -23,6 +23,8 @@ from gkeepcore.gkeep_exception import GkeepException
 from gkeepcore.log_file import LogEvent
 from gkeepcore.path_utils import user_from_log_path
 from gkeepserver.handler_utils import log_gkeepd_to_faculty
+from gkeepserver.slow_log import StageTimer
+from gkeepserver.tracing import Trace
 
 
 class HandlerException(GkeepException):
@@ -58,12 +60,13 @@ class EventHandler(metaclass=abc.ABCMeta):
 
     """
 
-    def __init__(self, log_path: str, log_event: LogEvent):
+    def __init__(self, log_path: str, log_event: LogEvent, trace=None):
         """
         Store the information from the log and call _parse_payload()
 
         :param log_path: path to the log file that the information came from
         :param log_event: LogEvent object representing the event
+        :param trace: Trace following the event, or None to start a new one
         """
         self._log_path = log_path
         self._log_event = log_event
@@ -71,9 +74,20 @@ class EventHandler(metaclass=abc.ABCMeta):
         self._event_type = log_event.event_type
         self._payload = log_event.payload
 
+        # handlers may time their stages with this for the slow log
+        self.stage_timer = StageTimer()
+
+        if trace is None:
+            trace = Trace(self._event_type, self._timestamp)
+
+        self.trace = trace
+
         self._parse_log_path()
         self._parse_payload()
 
+        self.trace.describe(self._faculty_username)
+        self.trace.hop('assigned')
+
     @abc.abstractmethod
     def _parse_payload(self):
         """Parse the payload."""
@@ -82,6 +96,21 @@ class EventHandler(metaclass=abc.ABCMeta):
     def handle(self):
         """Handle the event in an appropriate way."""
 
+    def log_fields(self) -> dict:
+        """
+        Get fields that identify the event for the JSON-lines gkeepd log.
+
+        :return: dictionary of fields to pass to the gkeepd logger
+        """
+
+        return {
+            'event_id': '{0}:{1}'.format(self._faculty_username,
+                                         self._timestamp),
+            'event_type': self._event_type,
+            'faculty': self._faculty_username,
+            'trace_id': self.trace.trace_id,
+        }
+
     def _parse_log_path(self):
         """
         Extract the faculty username from the log file path.
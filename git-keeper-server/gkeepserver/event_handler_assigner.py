@@ -23,6 +23,7 @@ from gkeepcore.gkeep_exception import GkeepException
 from gkeepcore.log_file import LogEvent
 from gkeepserver.gkeepd_logger import gkeepd_logger
 from gkeepserver.event_handler import EventHandler
+from gkeepserver.tracing import Trace
 
 
 class EventHandlerAssignerError(GkeepException):
@@ -34,7 +35,8 @@ class EventHandlerAssignerThread(Thread):
     """
     Examines new log events and create handlers to handle them.
 
-    New log events arrive as (<log file path>, <log event>) tuples from a
+    New log events arrive as (<log file path>, <log event>, <trace>) tuples
+    from a
     queue which is passed to the constructor. The events are examined and
     the appropriate EventHandler object is created. The EventHandler object
     is then placed into another queue so that the main thread can actually
@@ -49,8 +51,8 @@ class EventHandlerAssignerThread(Thread):
         """
         Set up attributes.
 
-        :param new_log_event_queue: input queue. (<log file path>, <log event>)
-         tuples arrive in this queue
+        :param new_log_event_queue: input queue. (<log file path>, <log event>,
+         <trace>) tuples arrive in this queue
         :param event_handler_queue: output queue. EventHandler objects are
          placed in this queue after parsing
         :param event_handlers_by_type: dictionary mapping event type strings
@@ -103,10 +105,10 @@ class EventHandlerAssignerThread(Thread):
             try:
                 # block for a short time so we don't hog the CPU when the
                 # queue is empty
-                log_path, log_event = \
+                log_path, log_event, trace = \
                     self._new_log_event_queue.get(block=True, timeout=0.1)
 
-                self._examine_new_event(log_path, log_event)
+                self._examine_new_event(log_path, log_event, trace)
             except Empty:
                 # get() throws an Empty exception when the queue is empty
                 empty = True
@@ -114,26 +116,30 @@ class EventHandlerAssignerThread(Thread):
                 error = 'Unexpected error in log event assigner: {0}'.format(e)
                 gkeepd_logger.log_error(error)
 
-    def _examine_new_event(self, log_path: str, log_event: LogEvent):
+    def _examine_new_event(self, log_path: str, log_event: LogEvent,
+                           trace: Trace):
         # Examine a single log event.
         #
         # :param log_path: path to the log that the event came from
         # :param log_event: the LogEvent object
+        # :param trace: the Trace following the event
 
         try:
             # get a handler which wll handle the event
-            handler = self._get_handler(log_path, log_event)
+            handler = self._get_handler(log_path, log_event, trace)
             # pass the handler off via a queue
             self._event_handler_queue.put(handler)
         # log a warning if the event is not valid
         except GkeepException as e:
             self._logger.log_warning(str(e))
 
-    def _get_handler(self, log_path: str, log_event: LogEvent) -> EventHandler:
+    def _get_handler(self, log_path: str, log_event: LogEvent,
+                     trace: Trace) -> EventHandler:
         # Instantiate and return the appropriate handler for the event.
         #
         # :param log_path: the path to the log file
         # :param log_event: the LogEvent object
+        # :param trace: the Trace following the event
         # :return: an EventHandler object which will handle the event
 
         # raise exception on unknown event type
@@ -144,6 +150,6 @@ class EventHandlerAssignerThread(Thread):
         # get the handler class from the dictionary
         handler_class = self._event_handlers_by_type[log_event.event_type]
         # construct the handler from whatever class was selected
-        handler = handler_class(log_path, log_event)
+        handler = handler_class(log_path, log_event, trace)
 
         return handler
@@ -20,8 +20,12 @@ Provides a thread which runs event handlers.
 import traceback
 from queue import Queue, Empty
 from threading import Thread
+from time import time
 
 from gkeepcore.gkeep_exception import GkeepException
+from gkeepserver.database import db
+from gkeepserver.metrics import metrics
+from gkeepserver.slow_log import record_if_slow
 
 
 class EventHandlerThread(Thread):
@@ -46,6 +50,18 @@ class EventHandlerThread(Thread):
         self._logger = logger
         self._shutdown_flag = False
 
+        # (handler, start time) of the handler being run, or None
+        self._current_task = None
+
+    def current_task(self):
+        """
+        Get the event handler that is currently running, if any.
+
+        :return: tuple of the handler and the time it started, or None
+        """
+
+        return self._current_task
+
     def shutdown(self):
         """
         Shut down the thread.
@@ -65,8 +81,14 @@ class EventHandlerThread(Thread):
         This method should not be called directly. Call the start() method
         instead.
         """
-        while not self._shutdown_flag:
-            self._handle_all_new_events()
+
+        db.open_thread_connection()
+
+        try:
+            while not self._shutdown_flag:
+                self._handle_all_new_events()
+        finally:
+            db.close_thread_connection()
 
     def _handle_all_new_events(self):
         # Handles all events in the queue until the queue is empty
@@ -76,9 +98,33 @@ class EventHandlerThread(Thread):
                 handler = self._event_handler_queue.get(block=True,
                                                         timeout=0.1)
 
-                self._logger.log_debug('New task: ' + str(handler))
+                self._logger.log_debug('New task: ' + str(handler),
+                                       **handler.log_fields())
+
+                start_time = time()
+                self._current_task = (handler, start_time)
+                handler.trace.hop('handle_start', start_time)
+
+                try:
+                    handler.handle()
+                finally:
+                    self._current_task = None
+
+                end_time = time()
+                handler.trace.hop('handle_end', end_time)
+                duration = end_time - start_time
+
+                self._logger.log_debug('Handled task in {0:.3f} seconds'
+                                       .format(duration), duration=duration,
+                                       **handler.log_fields())
+
+                record_if_slow('handle', str(handler), duration,
+                               handler.stage_timer, **handler.log_fields())
 
-                handler.handle()
+                labels = {'event_type': handler.log_fields()['event_type']}
+                metrics.histogram('gkeepd_event_handle_seconds',
+                                  'Seconds taken to handle events',
+                                  labels=labels).observe(duration)
             except Empty:
                 empty = True
             except (GkeepException, Exception) as e:
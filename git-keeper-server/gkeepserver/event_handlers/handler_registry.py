@@ -31,6 +31,7 @@ from gkeepserver.event_handlers.delete_handler import DeleteHandler
 from gkeepserver.event_handlers.faculty_add_handler import FacultyAddHandler
 from gkeepserver.event_handlers.passwd_handler import PasswdHandler
 from gkeepserver.event_handlers.publish_handler import PublishHandler
+from gkeepserver.event_handlers.query_handler import QueryHandler
 from gkeepserver.event_handlers.students_modify_handler import \
     StudentsModifyHandler
 from gkeepserver.event_handlers.students_remove_handler import \
@@ -59,4 +60,5 @@ event_handlers_by_type = {
     'ADMIN_PROMOTE': AdminPromoteHandler,
     'ADMIN_DEMOTE': AdminDemoteHandler,
     'CHECK': CheckHandler,
+    'QUERY': QueryHandler,
 }
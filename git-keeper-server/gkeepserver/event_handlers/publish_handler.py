@@ -62,11 +62,17 @@ class PublishHandler(EventHandler):
 
             assignment_dir = AssignmentDirectory(assignment_path)
             self._ensure_not_published()
-            students = self._setup_students_assignment_repos(assignment_dir)
-            self._populate_reports_repo(assignment_dir, students)
 
-            db.set_published(self._class_name, self._assignment_name,
-                             self._faculty_username)
+            with self.stage_timer.stage('student_repos'):
+                students = \
+                    self._setup_students_assignment_repos(assignment_dir)
+
+            with self.stage_timer.stage('reports_repo'):
+                self._populate_reports_repo(assignment_dir, students)
+
+            with self.stage_timer.stage('database'):
+                db.set_published(self._class_name, self._assignment_name,
+                                 self._faculty_username)
 
             info_updater.enqueue_assignment_scan(self._faculty_username,
                                                  self._class_name,
@@ -0,0 +1,264 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides QueryHandler, the handler for answering queries about a faculty
+member's open classes on the server, so that the client does not need to
+download and walk the faculty's entire info file.
+
+The payload is the query type, optionally followed by a space and an
+argument. Supported queries:
+
+    recent <number of days> - recent submissions to published assignments
+    students - students in each class
+    assignments - assignments in each class
+
+The response payload is a JSON object. If the result is small it is sent
+directly in the response as {"result": <result>}. Otherwise the result is
+written to a file in the faculty's query results directory and the response
+is {"file": <filename>}.
+
+Event type: QUERY
+"""
+
+import json
+import os
+from time import time
+
+from gkeepcore.faculty_class_info import FacultyClassInfo
+from gkeepcore.path_utils import user_gitkeeper_path, faculty_info_path, \
+    faculty_query_results_path
+from gkeepcore.system_commands import rm
+from gkeepserver.database import db
+from gkeepserver.event_handler import EventHandler, HandlerException
+from gkeepserver.file_writing import write_and_install_file
+from gkeepserver.gkeepd_logger import gkeepd_logger
+from gkeepserver.server_configuration import config
+
+
+# results larger than this are written to a file rather than being sent
+# through the gkeepd log, which truncates long lines
+MAX_INLINE_RESULT_LENGTH = 3000
+
+# maximum number of result files to leave in the query results directory
+MAX_RESULT_FILES = 10
+
+
+class QueryHandler(EventHandler):
+    """Handles a query from the client about the faculty's open classes."""
+
+    def handle(self):
+        """
+        Compute the result of the query and send it to the client.
+        """
+
+        try:
+            if self._query_type == 'recent':
+                result = self._recent_submissions()
+            elif self._query_type == 'students':
+                result = self._students()
+            else:
+                result = self._assignments()
+
+            gkeepd_logger.log_debug('Answering query: {0}'.format(self))
+            self._send_result(result)
+        except Exception as e:
+            self._report_error(str(e))
+            warning = 'Query failed: {0}'.format(e)
+            gkeepd_logger.log_warning(warning)
+
+    def __repr__(self) -> str:
+        """
+        Build a string representation of the event.
+
+        :return: string representation of the event
+        """
+
+        return ('{0} query from {1}'
+                .format(self._payload, self._faculty_username))
+
+    def _parse_payload(self):
+        """
+        Extracts the query type and argument from the payload
+
+        Sets the following attributes:
+
+        _query_type - the type of the query
+        _days - number of days for recent queries
+        """
+
+        query_type, _, argument = self._payload.partition(' ')
+
+        if query_type not in ('recent', 'students', 'assignments'):
+            raise HandlerException('Invalid query type for QUERY: {0}'
+                                   .format(query_type))
+
+        self._query_type = query_type
+        self._days = None
+
+        if query_type == 'recent':
+            try:
+                self._days = float(argument)
+            except ValueError:
+                raise HandlerException('Invalid number of days for QUERY: {0}'
+                                       .format(argument))
+
+    def _open_class_names(self) -> list:
+        # Get the names of the faculty's open classes from the database
+
+        return [class_name for class_name
+                in db.get_faculty_class_names(self._faculty_username)
+                if db.class_is_open(class_name, self._faculty_username)]
+
+    def _assignments(self) -> dict:
+        # Map each open class to a list of its assignments
+
+        result = {}
+
+        for class_name in self._open_class_names():
+            assignments = db.get_class_assignments(class_name,
+                                                   self._faculty_username,
+                                                   include_disabled=True)
+            result[class_name] = [{
+                'name': assignment.name,
+                'published': assignment.published,
+                'disabled': assignment.disabled,
+            } for assignment in assignments]
+
+        return result
+
+    def _students(self) -> dict:
+        # Map each open class to a list of its active students
+
+        result = {}
+
+        for class_name in self._open_class_names():
+            students = db.get_class_students(class_name,
+                                             self._faculty_username)
+            result[class_name] = [{
+                'first_name': student.first_name,
+                'last_name': student.last_name,
+                'username': student.username,
+                'email_address': student.email_address,
+            } for student in students]
+
+        return result
+
+    def _recent_submissions(self) -> dict:
+        # Map each open class to a dictionary which maps each published
+        # assignment to a list of its recent submissions, sorted by time.
+        # Classes and assignments without recent submissions are left out.
+        #
+        # Submission times are only known to the info model, so they come
+        # from the faculty's newest info file.
+
+        info = self._load_info()
+        cutoff_time = time() - (60 * 60 * 24 * self._days)
+
+        result = {}
+
+        for class_name in self._open_class_names():
+            if class_name not in info.class_list():
+                continue
+
+            assignments = db.get_class_assignments(class_name,
+                                                   self._faculty_username)
+
+            for assignment in assignments:
+                if not assignment.published:
+                    continue
+
+                recent = self._recent_assignment_submissions(info, class_name,
+                                                             assignment.name,
+                                                             cutoff_time)
+
+                if len(recent) > 0:
+                    result.setdefault(class_name, {})[assignment.name] = recent
+
+        return result
+
+    def _recent_assignment_submissions(self, info: FacultyClassInfo,
+                                       class_name, assignment_name,
+                                       cutoff_time) -> list:
+        # Build a list of the submissions to an assignment that were made at
+        # or after cutoff_time, sorted by time
+
+        # the info file may not have caught up with the database yet, for
+        # instance just after the assignment was published
+        if assignment_name not in info.assignment_list(class_name):
+            return []
+
+        assignment_info = \
+            info.info_dict[class_name]['assignments'][assignment_name]
+
+        if (not info.is_published(class_name, assignment_name) or
+                assignment_info['students_repos'] is None):
+            return []
+
+        return [{
+            'time': submission_time,
+            'first_name': info.student_first_name(class_name, username),
+            'last_name': info.student_last_name(class_name, username),
+            'username': username,
+            'email_address': info.student_email_address(class_name, username),
+        } for submission_time, username
+            in info.recent_submissions(class_name, assignment_name,
+                                       cutoff_time)]
+
+    def _load_info(self) -> FacultyClassInfo:
+        # Load the faculty's newest info file
+
+        gitkeeper_path = user_gitkeeper_path(self._faculty_username)
+        info_path = faculty_info_path(gitkeeper_path)
+
+        try:
+            info_filenames = sorted(os.listdir(info_path))
+        except OSError:
+            info_filenames = []
+
+        if len(info_filenames) == 0:
+            raise HandlerException('No info available yet, try again later')
+
+        with open(os.path.join(info_path, info_filenames[-1]), 'rb') as f:
+            return FacultyClassInfo.from_bytes(f.read())
+
+    def _send_result(self, result):
+        # Send the result in the response if it is small enough, otherwise
+        # write it to a file and send the filename
+
+        result_json = json.dumps(result, separators=(',', ':'))
+
+        if len(result_json) <= MAX_INLINE_RESULT_LENGTH:
+            self._report_success('{{"result":{0}}}'.format(result_json))
+            return
+
+        gitkeeper_path = user_gitkeeper_path(self._faculty_username)
+        results_path = faculty_query_results_path(gitkeeper_path)
+
+        result_filename = '{0}.json'.format(str(time()))
+
+        write_and_install_file(result_json, result_filename,
+                               os.path.join(results_path, result_filename),
+                               self._faculty_username, config.keeper_group,
+                               '640')
+
+        self._report_success(json.dumps({'file': result_filename}))
+
+        # result filenames are timestamps, so the oldest come first
+        result_filenames = sorted(os.listdir(results_path))
+
+        while len(result_filenames) > MAX_RESULT_FILES:
+            rm(os.path.join(results_path, result_filenames.pop(0)), sudo=True)
@@ -54,13 +54,17 @@ class StudentsAddHandler(EventHandler):
             students = students_from_csv(reader)
             faculty = db.get_faculty_by_username(self._faculty_username)
 
+            in_class = db.students_in_class([student.email_address
+                                             for student in students],
+                                            self._class_name,
+                                            self._faculty_username)
+
             for student in students:
                 if student.email_address == faculty.email_address:
                     raise HandlerException('You cannot add yourself to your '
                                            'own class')
 
-                if db.student_in_class(student.email_address, self._class_name,
-                                       self._faculty_username):
+                if student.email_address.lower() in in_class:
                     error = ('Student {} is already in class {}'
                              .format(student.email_address, self._class_name))
                     raise HandlerException(error)
@@ -79,47 +83,55 @@ class StudentsAddHandler(EventHandler):
         # Add class directory in students' home directories. Add student
         # accounts if necessary.
 
-        # will be a list of (student, action) tuples, associating new student
-        # users with the appropriate action to take
-        student_actions = []
+        # students who need to be inserted into the database as students,
+        # and the subset of those who also need new system accounts
+        students_to_insert = []
+        new_user_students = []
+
+        # look up all the students' existing users at once
+        users_by_email = db.get_users_by_email([student.email_address
+                                                for student in students])
 
-        # associate each new student user with an action
         for student in students:
-            if db.email_exists(student.email_address):
+            user = users_by_email.get(student.email_address.lower())
+
+            if user is not None:
                 # email is in the database, but the username may not match
                 # the email username
-                student.username = \
-                    db.get_username_from_email(student.email_address)
-                if (db.faculty_username_exists(student.username) and
-                        not db.student_username_exists(student.username)):
+                student.username = user['username']
+                if user['is_faculty'] and not user['is_student']:
                     # email is associated with a faculty account, but not yet
-                    # a student account
-                    student_actions.append((student,
-                                            NewUserAction.NEW_DB_ROLE))
+                    # a student account (NewUserAction.NEW_DB_ROLE)
+                    students_to_insert.append(student)
             else:
-                student_actions.append((student,
-                                        NewUserAction.NEW_USER_NEW_DB))
+                students_to_insert.append(student)
+                new_user_students.append(student)
 
         existing_users = get_all_users()
 
-        # take actions as determined in the loop above
-        for student, action in student_actions:
-            if action == NewUserAction.NEW_DB_ROLE:
-                try:
-                    db.insert_student(student, existing_users,
-                                      user_exists=True)
-                except Exception as e:
-                    error = ('Error adding faculty user with email {} '
-                             'as a student: {}'.format(student.email_address, e))
-                    raise HandlerException(error)
-            else:
-                try:
-                    db.insert_student(student, existing_users)
-                    setup_student_user(student, action)
-                except Exception as e:
-                    error = ('Error adding student with email {0}: {1}'
-                             .format(student.email_address, e))
-                    raise HandlerException(error)
+        try:
+            db.insert_students(students_to_insert, existing_users)
+        except Exception as e:
+            error = 'Error adding students to the database: {0}'.format(e)
+            raise HandlerException(error)
+
+        # every student is already in the database, so set up as many of the
+        # accounts as possible before reporting any errors
+        setup_errors = []
+
+        for student in new_user_students:
+            try:
+                setup_student_user(student, NewUserAction.NEW_USER_NEW_DB)
+            except Exception as e:
+                setup_errors.append('Error adding student with email {0}: {1}'
+                                    .format(student.email_address, e))
+
+        if len(setup_errors) > 0:
+            raise HandlerException('; '.join(setup_errors))
+
+        # students who are new to the class, to be added to the class in the
+        # database all at once
+        new_class_students = []
 
         for student in students:
             home_dir = user_home_dir(student.username)
@@ -128,10 +140,13 @@ class StudentsAddHandler(EventHandler):
                                                     home_dir)
 
             if not os.path.isdir(class_dir_path):
-                self._add_new_student(student, class_dir_path)
+                self._create_student_class_dir(student, class_dir_path)
+                new_class_students.append(student)
             else:
                 self._activate_existing_student(student, class_dir_path)
 
+        self._add_students_to_class(new_class_students)
+
         published_assignment_dirs = []
 
         for assignment_dir in get_class_assignment_dirs(self._faculty_username,
@@ -158,7 +173,8 @@ class StudentsAddHandler(EventHandler):
                         self._log_warning_to_faculty(warning)
                         gkeepd_logger.log_warning(warning)
 
-    def _add_new_student(self, student: Student, class_dir_path: str):
+    def _create_student_class_dir(self, student: Student,
+                                  class_dir_path: str):
         try:
             mkdir(class_dir_path, sudo=True)
             sudo_chown(class_dir_path, student.username,
@@ -171,14 +187,27 @@ class StudentsAddHandler(EventHandler):
             self._log_warning_to_faculty(warning)
             gkeepd_logger.log_warning(warning)
 
+    def _add_students_to_class(self, students: list):
+        # Add the students to the class in a single transaction. If that
+        # fails, add them one at a time so that a problem with one student
+        # does not prevent the others from being added.
+
         try:
-            db.add_student_to_class(self._class_name, student,
-                                    self._faculty_username)
-        except DatabaseException as e:
-            warning = ('Error adding student {} in the database: {}'
-                       .format(student.email_address, e))
-            self._log_warning_to_faculty(warning)
-            gkeepd_logger.log_warning(warning)
+            db.add_students_to_class(self._class_name, students,
+                                     self._faculty_username)
+            return
+        except DatabaseException:
+            pass
+
+        for student in students:
+            try:
+                db.add_student_to_class(self._class_name, student,
+                                        self._faculty_username)
+            except DatabaseException as e:
+                warning = ('Error adding student {} in the database: {}'
+                           .format(student.email_address, e))
+                self._log_warning_to_faculty(warning)
+                gkeepd_logger.log_warning(warning)
 
     def _activate_existing_student(self, student: Student,
                                    class_dir_path: str):
@@ -65,8 +65,10 @@ class SubmissionHandler(EventHandler):
 
         submission = Submission(student, self._submission_repo_path,
                                 self._commit_hash, assignment_directory,
-                                self._faculty_username, faculty_email)
+                                self._faculty_username, faculty_email,
+                                trace=self.trace)
 
+        self.trace.hop('queued')
         new_submission_queue.put(submission)
 
     def __repr__(self) -> str:
@@ -144,3 +146,6 @@ class SubmissionHandler(EventHandler):
 
         self._faculty_username, self._class_name, self._assignment_name = \
             assignment_info
+
+        self.trace.describe(self._faculty_username, self._class_name,
+                            self._assignment_name)
@@ -115,7 +115,8 @@ class TriggerHandler(EventHandler):
 
             submission = Submission(student, submission_repo_path, commit_hash,
                                     assignment_dir, self._faculty_username,
-                                    faculty_email)
+                                    faculty_email,
+                                    digest_window=self._digest_window)
             new_submission_queue.put(submission)
 
     def __repr__(self):
@@ -141,14 +142,19 @@ class TriggerHandler(EventHandler):
 
     def _parse_payload(self):
         """
-        Extract the faculty username, class name, assignment name, and list of
-        student usernames from the log event.
+        Extract the faculty username, class name, assignment name, list of
+        student usernames, and digest window from the log event.
+
+        The payload may include --digest=<seconds> anywhere after the
+        assignment name. Usernames cannot begin with -, so it is never
+        mistaken for a username.
 
         Attributes available after parsing:
             _faculty_username
             _class_name
             _assignment_name
             _student_usernames
+            _digest_window
         """
 
         self._parse_log_path()
@@ -163,4 +169,18 @@ class TriggerHandler(EventHandler):
 
         self._class_name = payload_list[0]
         self._assignment_name = payload_list[1]
-        self._student_usernames = payload_list[2:]
+        self._student_usernames = []
+        self._digest_window = None
+
+        for item in payload_list[2:]:
+            if item.startswith('--digest='):
+                try:
+                    self._digest_window = int(item[len('--digest='):])
+                    if self._digest_window <= 0:
+                        raise ValueError
+                except ValueError:
+                    error = ('Invalid digest window for TRIGGER: {0}'
+                             .format(item))
+                    raise HandlerException(error)
+            else:
+                self._student_usernames.append(item)
@@ -67,24 +67,32 @@ class UploadHandler(EventHandler):
         assignment_dir = AssignmentDirectory(assignment_path, check=False)
 
         try:
-            # validate the fields in assignment.cfg file (including whether the
-            # required components that support the environment are in place)
-            assignment_config = \
-                AssignmentConfig(os.path.join(self._upload_path,
-                                              'assignment.cfg'),
-                                 default_env=config.default_test_env)
-            assignment_config.verify_env()
+            with self.stage_timer.stage('verify'):
+                # validate the fields in assignment.cfg file (including
+                # whether the required components that support the
+                # environment are in place)
+                assignment_config = \
+                    AssignmentConfig(os.path.join(self._upload_path,
+                                                  'assignment.cfg'),
+                                     default_env=config.default_test_env)
+                assignment_config.verify_env()
 
-            if not db.class_is_open(self._class_name, self._faculty_username):
-                raise HandlerException('{} is not open'
-                                       .format(self._class_name))
+                if not db.class_is_open(self._class_name,
+                                        self._faculty_username):
+                    raise HandlerException('{} is not open'
+                                           .format(self._class_name))
 
-            validate_assignment_name(assignment_dir.assignment_name)
-            self._setup_assignment_dir(assignment_dir)
-            self._setup_faculty_test_assignment(assignment_dir)
+                validate_assignment_name(assignment_dir.assignment_name)
 
-            db.insert_assignment(self._class_name, self._assignment_name,
-                                 self._faculty_username)
+            with self.stage_timer.stage('assignment_dir'):
+                self._setup_assignment_dir(assignment_dir)
+
+            with self.stage_timer.stage('faculty_test_assignment'):
+                self._setup_faculty_test_assignment(assignment_dir)
+
+            with self.stage_timer.stage('database'):
+                db.insert_assignment(self._class_name, self._assignment_name,
+                                     self._faculty_username)
 
             info_updater.enqueue_assignment_scan(self._faculty_username,
                                                  self._class_name,
@@ -110,10 +118,11 @@ class UploadHandler(EventHandler):
                 pass
 
         # delete the upload directory
-        try:
-            rm(self._upload_path, recursive=True, sudo=True)
-        except CommandError:
-            pass
+        with self.stage_timer.stage('cleanup'):
+            try:
+                rm(self._upload_path, recursive=True, sudo=True)
+            except CommandError:
+                pass
 
     def _setup_faculty_test_assignment(self,
                                        assignment_dir: AssignmentDirectory):
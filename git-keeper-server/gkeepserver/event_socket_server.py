@@ -0,0 +1,263 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+
+"""
+Provides a global interface for receiving log events through gkeepd's event
+socket, so that events are handled as soon as they are appended to a log
+instead of when the log is next polled.
+
+The socket is a Unix socket that any user can connect to, in a directory that
+only the keeper user can write to (see gkeepcore/event_socket.py). Each
+request is a line of JSON naming the log that a line was appended to, and each
+response is a line of JSON:
+
+    {"log_path": "/home/student/.gitkeeper/student.log", "line": "..."}
+    {"ok": true}
+    {"ok": false, "error": "..."}
+
+An event is only accepted for a log that the log poller is watching and that
+belongs to the connected user, which is determined from the socket's peer
+credentials. An accepted event is claimed through the log poller, which stores
+it in the database so that it is not passed on again when the poller reads the
+line from the log, even after a restart. It is then put in the new log event
+queue just as the poller would. The response is sent once the event is in the
+queue.
+
+This module stores an EventSocketServer instance in the module-level variable
+named event_server.
+
+Example usage:
+
+    from gkeepserver.event_socket_server import event_server
+    from gkeepserver.log_polling import log_poller
+
+    def main():
+        log_poller.initialize(new_log_event_queue, LocalLogFileReader,
+                              gkeepd_logger)
+        log_poller.start()
+
+        event_server.start(new_log_event_queue, log_poller)
+
+        # events are received in background threads
+
+        event_server.shutdown()
+        log_poller.shutdown()
+
+"""
+
+import json
+import os
+import pwd
+import socket
+import socketserver
+import stat
+import struct
+from queue import Queue
+from threading import Thread
+
+from gkeepcore.event_socket import EVENT_SOCKET_PATH
+from gkeepcore.gkeep_exception import GkeepException
+from gkeepcore.log_file import LogEvent, LogFileException
+from gkeepcore.path_utils import log_path_from_username
+from gkeepserver.database import db
+from gkeepserver.gkeepd_logger import gkeepd_logger as logger
+from gkeepserver.metrics import metrics
+from gkeepserver.tracing import Trace
+
+
+class EventSocketServerError(GkeepException):
+    """Raised if the event socket server cannot be started."""
+    pass
+
+
+class _EventRequestHandler(socketserver.StreamRequestHandler):
+    # Handles all of the requests from a single connection
+
+    def handle(self):
+        username = _peer_username(self.request)
+
+        db.open_thread_connection()
+
+        try:
+            for request_line in self.rfile:
+                response = self.server.receive(request_line, username)
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        finally:
+            db.close_thread_connection()
+
+
+class _EventUnixServer(socketserver.ThreadingUnixStreamServer):
+    # Passes events to the new log event queue
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, new_log_event_queue: Queue, poller):
+        self.new_log_event_queue = new_log_event_queue
+        self.poller = poller
+
+        super().__init__(socket_path, _EventRequestHandler)
+
+    def receive(self, request_line: bytes, username) -> dict:
+        try:
+            request = json.loads(request_line.decode('utf-8'))
+            log_path = request['log_path']
+            event = LogEvent(request['line'].rstrip('\n'))
+        except (ValueError, KeyError, TypeError, AttributeError,
+                LogFileException):
+            return _rejected('Malformed request')
+
+        if (username is None or
+                log_path != log_path_from_username(username)):
+            return _rejected('{0} is not your log'.format(log_path))
+
+        if not self.poller.is_watching(log_path):
+            return _rejected('{0} is not being watched'.format(log_path))
+
+        try:
+            claimed = self.poller.claim_event(log_path, event, delivered=True)
+        except Exception as e:
+            logger.log_warning('Event socket: could not claim event: {0}'
+                               .format(e))
+            return _rejected('Could not claim event')
+
+        if claimed:
+            trace = Trace(event.event_type, event.timestamp)
+            trace.hop('received')
+            self.new_log_event_queue.put((log_path, event, trace))
+            _count('accepted')
+        else:
+            _count('duplicate')
+
+        return {'ok': True}
+
+
+class EventSocketServer:
+    """
+    Receives events through the event socket in background threads.
+
+    Typically this will be accessed with the provided module-level global
+    instance rather than making an instance directly.
+    """
+
+    def __init__(self):
+        """
+        Construct the object. Call start() to start receiving events.
+        """
+
+        self._server = None
+        self._thread = None
+        self._socket_path = None
+
+    def start(self, new_log_event_queue: Queue, poller,
+              socket_path=EVENT_SOCKET_PATH):
+        """
+        Start receiving events on a Unix socket which any user can connect
+        to. The socket's directory must exist, and only the user running
+        gkeepd should be able to write to it.
+
+        Raises EventSocketServerError if the socket cannot be created, or if
+        another user could create a socket in its directory.
+
+        :param new_log_event_queue: (file_path, event, trace) tuples are put
+         into this queue, just as the log poller does
+        :param poller: the LogPollingThread which is watching the logs
+        :param socket_path: path of the Unix socket
+        """
+
+        try:
+            dir_stat = os.stat(os.path.dirname(socket_path))
+
+            if (dir_stat.st_uid != os.geteuid() or
+                    dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+                raise EventSocketServerError('Not starting the event socket '
+                                             'server, {0} must be owned by '
+                                             'and only writable by this user'
+                                             .format(os.path.dirname(
+                                                 socket_path)))
+
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+            self._server = _EventUnixServer(socket_path, new_log_event_queue,
+                                            poller)
+            os.chmod(socket_path, 0o666)
+        except OSError as e:
+            raise EventSocketServerError('Error starting the event socket '
+                                         'server: {0}'.format(e))
+
+        self._socket_path = socket_path
+
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """
+        Stop receiving events.
+
+        This method blocks until the serving thread has died.
+        """
+
+        if self._server is None:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+        self._server = None
+        self._thread = None
+        self._socket_path = None
+
+
+def _peer_username(connection: socket.socket):
+    # Username of the user connected to a Unix socket, or None if it cannot
+    # be determined. The credentials are a struct ucred of pid, uid, and gid.
+
+    try:
+        credentials = connection.getsockopt(socket.SOL_SOCKET,
+                                            socket.SO_PEERCRED,
+                                            struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', credentials)
+        return pwd.getpwuid(uid).pw_name
+    except (OSError, KeyError):
+        return None
+
+
+def _rejected(error: str) -> dict:
+    # Response for a rejected event, which is logged since the event will
+    # still be read from the log if it was appended
+
+    logger.log_warning('Event socket: {0}'.format(error))
+    _count('rejected')
+
+    return {'ok': False, 'error': error}
+
+
+def _count(result: str):
+    # Count a received event by its result
+
+    metrics.counter('gkeepd_socket_events_total',
+                    'Number of events received through the event socket',
+                    labels={'result': result}).inc()
+
+
+# module-level instance for global access
+event_server = EventSocketServer()
@@ -20,34 +20,67 @@ Spawns a number of threads:
 
 logger - GkeepdLoggerThread for logging runtime information
 email_sender - EmailSenderThread for sending rate-limited emails
+result_digester - ResultDigestThread for combining results emails
+log_appender - LogAppenderThread for writing responses to faculty logs
 log_poller - LogPollingThread for watching student and faculty logs for events
+event_server - EventSocketServer for receiving events from students' git
+               hooks as soon as they are appended to their logs
 handler_assigner - EventHandlerAssignerThread for creating event handlers from
                    log events
 submission_test_threads - list of SubmissionTestThread objects which run tests
+trace_recorder - TraceRecorderThread for storing when events passed each stage
+
+It also starts the privileged helper, a separate process which performs
+filesystem operations as root (see privileged_helper.py), and the metrics
+server which serves metrics about the threads (see metrics_server.py).
+
+Admins can see what the threads are doing and drain gkeepd before a restart
+through the control server (see control_server.py), using gkeepd status and
+gkeepd drain. The sampling profiler (see sampling_profiler.py) is toggled by
+gkeepd profile or by sending gkeepd the SIGUSR1 signal. gkeepd latency
+reports how long students wait for their results (see latency_report.py).
 
 """
 import argparse
-from time import sleep
+from time import sleep, time
 
 import fcntl
 import sys
 from queue import Queue
-from signal import signal, SIGINT, SIGTERM
+from signal import signal, SIGINT, SIGTERM, SIGUSR1
 
+from gkeepcore.shell_command import (get_spawn_count, enable_command_stats,
+                                     get_command_stats)
 from gkeepcore.version import __version__ as core_version
 from gkeepserver.check_config import check_config
 from gkeepserver.check_system import check_system
-from gkeepserver.database import db
+from gkeepserver.control_server import control_server, ControlServerError
+from gkeepserver.database import db, DatabaseException
 from gkeepserver.email_sender_thread import email_sender
 from gkeepserver.event_handler_assigner import EventHandlerAssignerThread
 from gkeepserver.event_handler_thread import EventHandlerThread
 from gkeepserver.event_handlers.handler_registry import event_handlers_by_type
+from gkeepserver.event_socket_server import (event_server,
+                                             EventSocketServerError)
 from gkeepserver.gkeepd_logger import gkeepd_logger as logger
 from gkeepserver.info_update_thread import info_updater
+from gkeepserver.latency_report import print_latency_report
+from gkeepserver.list_outbox import list_outbox
 from gkeepserver.local_log_file_reader import LocalLogFileReader
+from gkeepserver.log_appender_thread import log_appender
 from gkeepserver.log_polling import log_poller
+from gkeepserver.metrics import metrics
+from gkeepserver.metrics_server import metrics_server, MetricsServerError
+from gkeepserver.new_submission_queue import (new_submission_queue,
+                                              queued_submission_counts)
+from gkeepserver.privileged_helper import (privileged_helper,
+                                           PrivilegedHelperError)
+from gkeepserver.result_digest_thread import result_digester
+from gkeepserver.sampling_profiler import profiler
 from gkeepserver.server_configuration import config, ServerConfigurationError
+from gkeepserver.server_status import print_status, drain, toggle_profile
 from gkeepserver.submission_test_thread import SubmissionTestThread
+from gkeepserver.tracing import trace_recorder
 from gkeepserver.version import __version__ as server_version
 
 # switched to True by the signal handler on SIGINT or SIGTERM
@@ -69,6 +102,39 @@ def signal_handler(signum, frame):
     shutdown_flag = True
 
 
+def toggle_profiler() -> dict:
+    """
+    Start the sampling profiler if it is not running, otherwise stop it and
+    write the profile to config.profile_dir_path.
+
+    :return: the result of profiler.toggle()
+    """
+
+    result = profiler.toggle(config.profile_dir_path)
+
+    if result['running']:
+        logger.log_info('Profiler started')
+    else:
+        logger.log_info('Profiler stopped, wrote {0} samples to {1}'
+                        .format(result['samples'], result['path']))
+
+    return result
+
+
+def profiler_signal_handler(signum, frame):
+    """
+    Handle the SIGUSR1 signal by toggling the profiler.
+
+    :param signum: unused
+    :param frame: unused
+    """
+
+    try:
+        toggle_profiler()
+    except Exception as e:
+        logger.log_error('Error toggling the profiler: {0}'.format(e))
+
+
 def verify_core_version_match():
     """
     Exits with a non-zero exit code if the gkeepserver version does not match
@@ -82,12 +148,192 @@ def verify_core_version_match():
         sys.exit(error)
 
 
+def queue_length_functions(new_log_event_queue: Queue,
+                           event_handler_queue: Queue) -> dict:
+    """
+    Get functions which return the number of items waiting in each of
+    gkeepd's queues.
+
+    :param new_log_event_queue: queue of new log events
+    :param event_handler_queue: queue of event handlers
+    :return: dictionary mapping queue names to functions
+    """
+
+    return {
+        'new_log_event': new_log_event_queue.qsize,
+        'event_handler': event_handler_queue.qsize,
+        'new_submission': new_submission_queue.qsize,
+        'info_update': info_updater.queue_length,
+        'email': lambda: email_sender.get_metrics()['queue_length'],
+        'result_digest': result_digester.pending_count,
+        'log': logger.queue_length,
+        'trace': trace_recorder.queue_length,
+    }
+
+
+def register_metrics(new_log_event_queue: Queue, event_handler_queue: Queue):
+    """
+    Register the metrics whose values are tracked by other objects.
+
+    :param new_log_event_queue: queue of new log events
+    :param event_handler_queue: queue of event handlers
+    """
+
+    queues = queue_length_functions(new_log_event_queue, event_handler_queue)
+
+    for name, function in queues.items():
+        metrics.function('gkeepd_queue_length',
+                         'Number of items waiting in a queue', function,
+                         labels={'queue': name})
+
+    email_counters = {
+        'gkeepd_emails_sent_total': ('sent', 'Number of emails sent'),
+        'gkeepd_emails_failed_total': ('failed', 'Number of emails that '
+                                                 'could not be sent'),
+        'gkeepd_email_wait_seconds_total': ('total_age_at_send',
+                                            'Seconds that sent emails '
+                                            'waited to be sent'),
+    }
+
+    for name, (key, help_text) in email_counters.items():
+        metrics.function(name, help_text,
+                         lambda key=key: email_sender.get_metrics()[key],
+                         metric_type='counter')
+
+    metrics.function('gkeepd_email_max_wait_seconds',
+                     'Longest that a sent email waited to be sent',
+                     lambda: email_sender.get_metrics()['max_age_at_send'])
+
+    for key in ('hits', 'misses'):
+        metrics.function('gkeepd_db_cache_{}_total'.format(key),
+                         'Number of database cache {}'.format(key),
+                         lambda key=key: db.get_cache_stats()[key],
+                         metric_type='counter')
+
+    metrics.function('gkeepd_subprocess_spawns_total',
+                     'Number of processes spawned to run commands',
+                     get_spawn_count, metric_type='counter')
+
+    command_counters = {
+        'gkeepd_command_runs_total': ('runs', 'Number of times each command '
+                                              'was run'),
+        'gkeepd_command_seconds_total': ('seconds', 'Seconds spent running '
+                                                    'each command'),
+        'gkeepd_command_output_bytes_total': ('output_bytes',
+                                              'Bytes of output from each '
+                                              'command'),
+        'gkeepd_command_failures_total': ('failures',
+                                          'Number of times each command '
+                                          'failed'),
+    }
+
+    for name, (key, help_text) in command_counters.items():
+        metrics.function_family(name, help_text,
+                                lambda key=key: command_stat_samples(key),
+                                metric_type='counter')
+
+    metrics.function('gkeepd_log_messages_dropped_total',
+                     'Number of log messages dropped because the log queue '
+                     'was full', logger.get_dropped_count,
+                     metric_type='counter')
+
+    metrics.function('gkeepd_uptime_seconds', 'Seconds since gkeepd started',
+                     config.uptime)
+
+
+def command_stat_samples(key: str) -> list:
+    """
+    Get one of the statistics about the commands that gkeepd has run, labeled
+    by the subsystem that ran each command and the command.
+
+    :param key: the statistic, one of runs, seconds, output_bytes, or
+     failures
+    :return: list of (labels, value) tuples
+    """
+
+    return [({'subsystem': stats['subsystem'], 'command': stats['command']},
+             stats[key])
+            for stats in get_command_stats()]
+
+
+def register_control_commands(new_log_event_queue: Queue,
+                              event_handler_queue: Queue,
+                              event_handler_thread: EventHandlerThread,
+                              submission_test_threads: list):
+    """
+    Register the commands that the control server accepts:
+
+        status - describe what gkeepd is doing
+        drain - finish the work that is queued and shut down
+        profile - start or stop the sampling profiler
+
+    :param new_log_event_queue: queue of new log events
+    :param event_handler_queue: queue of event handlers
+    :param event_handler_thread: the thread which runs event handlers
+    :param submission_test_threads: the threads which run tests
+    """
+
+    queues = queue_length_functions(new_log_event_queue, event_handler_queue)
+
+    def status():
+        now = time()
+
+        handlers = []
+        current_task = event_handler_thread.current_task()
+        if current_task is not None:
+            handler, start_time = current_task
+            handlers.append({'handler': str(handler),
+                             'elapsed': now - start_time})
+
+        tests = []
+        for thread in submission_test_threads:
+            current_submission = thread.current_submission()
+            if current_submission is not None:
+                submission, start_time = current_submission
+                tests.append({'faculty': submission.faculty_username,
+                              'class_name': submission.class_name,
+                              'assignment': submission.assignment_name,
+                              'student': submission.student.username,
+                              'elapsed': now - start_time})
+
+        queued_submissions = [
+            {'faculty': faculty, 'class_name': class_name, 'count': count}
+            for (faculty, class_name), count
+            in sorted(queued_submission_counts().items())
+        ]
+
+        return {
+            'version': server_version,
+            'uptime': config.uptime(),
+            'draining': shutdown_flag,
+            'handlers': handlers,
+            'tests': tests,
+            'queued_submissions': queued_submissions,
+            'queues': {name: function() for name, function in queues.items()},
+            'log_file_lags': log_poller.get_log_file_lags(),
+            'email': email_sender.get_metrics(),
+        }
+
+    def drain():
+        global shutdown_flag
+        shutdown_flag = True
+        logger.log_info('Draining requested through the control socket')
+
+    control_server.register('status', status)
+    control_server.register('drain', drain)
+    control_server.register('profile', toggle_profiler)
+
+
 def main():
     """
     Entry point of the gkeepd process.
 
     If gkeepd is run with the --version or -v flags, it will print the current
     version and exit.
+
+    gkeepd status, gkeepd drain, and gkeepd profile communicate with a running
+    gkeepd through its control socket. gkeepd latency reads the traces in the
+    database.
     """
 
     verify_core_version_match()
@@ -99,6 +345,17 @@ def main():
                         help='Print gkeepd version')
     parser.add_argument('-c', '--check', action='store_true',
                         help='Validate config and send test email to admins')
+    parser.add_argument('-o', '--outbox', action='store_true',
+                        help='List emails that have not been sent')
+    parser.add_argument('command', nargs='?',
+                        choices=['status', 'drain', 'profile', 'latency'],
+                        help='status: show what a running gkeepd is doing, '
+                             'drain: finish queued work and shut down a '
+                             'running gkeepd, profile: start or stop '
+                             'profiling a running gkeepd, latency: report '
+                             'push-to-email latency percentiles')
+    parser.add_argument('--days', type=int, default=7,
+                        help='Number of days covered by gkeepd latency')
 
     args = parser.parse_args()
 
@@ -114,10 +371,34 @@ def main():
             print(e)
             sys.exit(1)
 
+    if args.outbox:
+        try:
+            list_outbox()
+            sys.exit(0)
+        except Exception as e:
+            print(e)
+            sys.exit(1)
+
+    if args.command is not None:
+        try:
+            if args.command == 'status':
+                print_status()
+            elif args.command == 'drain':
+                drain()
+            elif args.command == 'latency':
+                print_latency_report(args.days)
+            else:
+                toggle_profile()
+            sys.exit(0)
+        except Exception as e:
+            print(e)
+            sys.exit(1)
+
     # setup signal handling
     global shutdown_flag
     signal(SIGINT, signal_handler)
     signal(SIGTERM, signal_handler)
+    signal(SIGUSR1, profiler_signal_handler)
 
     # do not run if there are errors in the configuration file
     try:
@@ -136,12 +417,71 @@ def main():
         sys.exit(error_message)
 
     # initialize and start system logger
-    logger.initialize(config.log_file_path, log_level=config.log_level)
+    if config.log_json:
+        json_log_file_path = config.json_log_file_path
+    else:
+        json_log_file_path = None
+
+    logger.initialize(config.log_file_path, log_level=config.log_level,
+                      json_log_file_path=json_log_file_path,
+                      max_size=config.log_max_size * 1024 * 1024,
+                      rotate_interval=config.log_rotate_hours * 60 * 60,
+                      backup_count=config.log_backup_count,
+                      queue_size=config.log_queue_size)
     logger.start()
 
     logger.log_info('--- Starting gkeepd version {}---'.format(server_version))
 
-    db.connect(config.db_path)
+    # count the runs, time, and output of each kind of command for the
+    # metrics
+    if config.command_stats:
+        enable_command_stats()
+
+    # perform filesystem operations as root through the helper instead of
+    # running sudo for each one, falling back to sudo if it cannot start
+    if config.use_privileged_helper:
+        try:
+            privileged_helper.start(config.privileged_helper_socket_path,
+                                    config.privileged_helper_log_path)
+            logger.log_info('Privileged helper started')
+        except PrivilegedHelperError as e:
+            logger.log_warning('{}, using sudo instead'.format(e))
+
+    # connecting upgrades the database schema if needed
+    try:
+        db.connect(config.db_path, config.db_pragmas())
+    except DatabaseException as e:
+        logger.log_error(str(e))
+        logger.log_info('Shutting down')
+        logger.shutdown()
+        sys.exit(1)
+
+    # record when events pass each stage, forgetting traces that are older
+    # than the retention period
+    if config.trace_retention_days > 0:
+        cutoff_time = time() - config.trace_retention_days * 24 * 60 * 60
+        deleted_trace_count = db.delete_traces_before(cutoff_time)
+
+        if deleted_trace_count > 0:
+            logger.log_info('Removed {} old traces'
+                            .format(deleted_trace_count))
+
+        trace_recorder.start()
+
+    # store emails in the database until they are sent, and resend any that
+    # were not sent before gkeepd last stopped
+    resumed_email_count = email_sender.enable_outbox()
+
+    if resumed_email_count > 0:
+        logger.log_info('Resuming {} unsent emails from the outbox'
+                        .format(resumed_email_count))
+
+    # likewise for results waiting to be combined into digests
+    resumed_result_count = result_digester.enable_outbox()
+
+    if resumed_result_count > 0:
+        logger.log_info('Resuming {} results waiting for digests from the '
+                        'outbox'.format(resumed_result_count))
 
     # check for fatal errors in the system state, and correct correctable
     # issues including new faculty members
@@ -178,6 +518,8 @@ def main():
 
     # start the rest of the threads
     email_sender.start()
+    result_digester.start()
+    log_appender.start()
 
     submission_test_threads = []
     for count in range(config.test_thread_count):
@@ -188,6 +530,35 @@ def main():
     handler_assigner.start()
     log_poller.start()
 
+    # receive events from students' git hooks without waiting for the poller
+    if config.use_event_socket:
+        try:
+            event_server.start(new_log_event_queue, log_poller)
+        except EventSocketServerError as e:
+            logger.log_warning(str(e))
+
+    # serve metrics about the queues and threads
+    register_metrics(new_log_event_queue, event_handler_queue)
+
+    if config.use_metrics_socket:
+        metrics_socket_path = config.metrics_socket_path
+    else:
+        metrics_socket_path = None
+
+    try:
+        metrics_server.start(metrics_socket_path, config.metrics_port)
+    except MetricsServerError as e:
+        logger.log_warning(str(e))
+
+    # accept status and drain commands until gkeepd has shut down
+    register_control_commands(new_log_event_queue, event_handler_queue,
+                              event_handler_thread, submission_test_threads)
+
+    try:
+        control_server.start(config.control_socket_path)
+    except ControlServerError as e:
+        logger.log_warning(str(e))
+
     logger.log_info('Server is running')
 
     # spin until shutdown
@@ -201,6 +572,7 @@ def main():
     logger.log_info('Shutting down threads')
 
     # shut down the pipeline in this order so that no new log events are lost
+    event_server.shutdown()
     log_poller.shutdown()
     handler_assigner.shutdown()
     event_handler_thread.shutdown()
@@ -210,8 +582,21 @@ def main():
 
     info_updater.shutdown()
 
+    log_appender.shutdown()
+    result_digester.shutdown()
     email_sender.shutdown()
 
+    # after the email sender, which records the last hop of each trace
+    if trace_recorder.is_alive():
+        trace_recorder.shutdown()
+
+    privileged_helper.shutdown()
+
+    metrics_server.shutdown()
+    control_server.shutdown()
+
+    db.close_thread_connection()
+
     logger.log_info('Shutting down gkeepd')
 
     logger.shutdown()
@@ -43,14 +43,41 @@ There is a method for logging a message at each level:
     log_info()
     log_debug()
 
+Each method also accepts keyword arguments which are recorded as fields in
+the JSON-lines log, if it is enabled. The fields used by gkeepd are:
+    event_id - identifies the event being handled
+    event_type - type of the event being handled
+    faculty - username of the faculty member involved
+    class_name - name of the class involved
+    assignment - name of the assignment involved
+    duration - seconds that an operation took
+
+Messages are put in a bounded queue and never block the caller. If the queue
+is more than three quarters full, only a sample of debug messages are queued,
+and if it is full, messages are dropped. The number of dropped messages is
+logged as a warning once the logger catches up.
+
+The log files are rotated when they grow too large or too old, see
+rotating_log_file.py.
+
 """
-import os
+import json
 from enum import IntEnum
-from queue import Queue, Empty
-from threading import Thread
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+from time import time_ns
+
+from gkeepcore.log_file import log_line
+from gkeepserver.rotating_log_file import RotatingLogFile
+
+
+# when the queue is this full, only 1 of every DEBUG_SAMPLE_RATE debug
+# messages is queued
+SAMPLING_THRESHOLD = 0.75
+DEBUG_SAMPLE_RATE = 10
 
-from gkeepcore.log_file import log_append_command
-from gkeepcore.shell_command import run_command, CommandError
+# header of the plain text log file
+LOG_FILE_HEADER = '# THIS FILE WAS AUTO-GENERATED, DO NOT EDIT\n'
 
 
 class LogLevel(IntEnum):
@@ -69,7 +96,8 @@ class LogLevel(IntEnum):
 
 class GkeepdLoggerThread(Thread):
     """
-    Provides a Thread which logs gkeepd system messages to a log file.
+    Provides a Thread which logs gkeepd system messages to a log file, and
+    optionally to a JSON-lines log file.
 
     Typically this will be accessed with the provided module-level global
     instance rather than making an instance directly.
@@ -99,12 +127,21 @@ class GkeepdLoggerThread(Thread):
         # daemon=True means if the main thread dies this will die along with it
         Thread.__init__(self, daemon=True)
 
-        self._log_file_path = None
+        self._log_file = None
+        self._json_log_file = None
         self._log_level = None
         self._new_line_queue = None
         self._shutdown_flag = None
 
-    def initialize(self, log_file_path: str, log_level=LogLevel.DEBUG):
+        # counts of messages that were not queued
+        self._drop_lock = Lock()
+        self._debug_count = 0
+        self._unreported_drop_count = 0
+        self._dropped_count = 0
+
+    def initialize(self, log_file_path: str, log_level=LogLevel.DEBUG,
+                   json_log_file_path=None, max_size=0, rotate_interval=0,
+                   backup_count=5, queue_size=10000):
         """
         Initialize the attributes.
 
@@ -114,20 +151,51 @@ class GkeepdLoggerThread(Thread):
         Call start() after calling this method.
 
         :param log_file_path: path to the log file
-        :param log_level:
-        :return: the maximum log level to log
+        :param log_level: the maximum log level to log
+        :param json_log_file_path: path to the JSON-lines log file, or None
+         to only write the plain text log
+        :param max_size: size in bytes after which the log files are rotated,
+         or 0 to never rotate by size
+        :param rotate_interval: seconds after which the log files are
+         rotated, or 0 to never rotate by time
+        :param backup_count: number of rotated log files to keep
+        :param queue_size: maximum number of messages waiting to be logged
         """
 
-        self._log_file_path = log_file_path
         self._log_level = log_level
-        self._new_line_queue = Queue()
+        self._new_line_queue = Queue(maxsize=queue_size)
         self._shutdown_flag = False
 
-        # if the file does not exist, create it with an edit warning header
-        if not os.path.isfile(self._log_file_path):
-            with open(self._log_file_path, 'w') as f:
-                print('# THIS FILE WAS AUTO-GENERATED, DO NOT EDIT',
-                      file=f)
+        # if the file does not exist, it is created with an edit warning
+        # header
+        self._log_file = RotatingLogFile(log_file_path, max_size,
+                                         rotate_interval, backup_count,
+                                         header=LOG_FILE_HEADER)
+
+        if json_log_file_path is not None:
+            self._json_log_file = RotatingLogFile(json_log_file_path,
+                                                  max_size, rotate_interval,
+                                                  backup_count)
+
+    def queue_length(self) -> int:
+        """
+        Get the number of messages waiting to be logged.
+
+        :return: number of waiting messages
+        """
+
+        return self._new_line_queue.qsize()
+
+    def get_dropped_count(self) -> int:
+        """
+        Get the number of messages that were dropped because the queue was
+        full.
+
+        :return: number of dropped messages
+        """
+
+        with self._drop_lock:
+            return self._dropped_count
 
     def shutdown(self):
         """
@@ -147,76 +215,151 @@ class GkeepdLoggerThread(Thread):
         # This should not be called directly, the thread should be started by
         # calling start()
 
-        while not self._shutdown_flag:
+        while not self._shutdown_flag or not self._new_line_queue.empty():
             try:
-                while True:
-                    # We can't fully block because we need to check
-                    # _shutdown_flag regularly
-                    log_level, text = self._new_line_queue.get(block=True,
-                                                               timeout=0.1)
-                    self._cleanup_and_log(log_level, text)
-            # git() raises Empty after blocking for timeout seconds and the
+                # We can't fully block because we need to check
+                # _shutdown_flag regularly
+                entries = [self._new_line_queue.get(block=True, timeout=0.1)]
+            # get() raises Empty after blocking for timeout seconds and the
             # queue is still empty
+            except Empty:
+                continue
+
+            # write everything that is waiting at once
+            try:
+                while True:
+                    entries.append(self._new_line_queue.get(block=False))
             except Empty:
                 pass
 
-    def _cleanup_and_log(self, log_level, text: str):
-        # Replace newlines with spaces and log the message
+            self._log_entries(entries)
+            self._report_dropped()
 
-        # Only log if we're logging this log level
-        if self._log_level >= log_level:
-            # Replace newlines in text with spaces so the entire log text is on
-            # one line
+        self._log_file.close()
+
+        if self._json_log_file is not None:
+            self._json_log_file.close()
+
+    def _log_entries(self, entries: list):
+        # Write (log_level, text, fields, timestamp_ns) entries to the log
+        # files
+
+        lines = []
+        json_lines = []
+
+        for log_level, text, fields, timestamp_ns in entries:
+            # Only log if we're logging this log level
+            if self._log_level < log_level:
+                continue
+
+            # Replace newlines in text with spaces so the entire log text is
+            # on one line
             text = text.replace('\n', ' ')
             print('{}: {}'.format(log_level.name, text), flush=True)
-            command = log_append_command(self._log_file_path,
-                                         log_level.name, text,
-                                         human_readable=True)
-            try:
-                run_command(command)
-            except CommandError as e:
-                # bad news. raising an exception would only kill the thread
-                print('ERROR LOGGING: {0}'.format(e))
-                print('Command that raised error: {0}'.format(command))
-
-    def log_debug(self, text: str):
+            lines.append(log_line(log_level.name, text, human_readable=True,
+                                  timestamp_ns=timestamp_ns))
+
+            if self._json_log_file is not None:
+                record = {
+                    'time': timestamp_ns / 1e9,
+                    'level': log_level.name,
+                    'message': text,
+                }
+                record.update(fields)
+                json_lines.append(json.dumps(record, default=str) + '\n')
+
+        try:
+            if lines:
+                self._log_file.write(lines)
+            if json_lines:
+                self._json_log_file.write(json_lines)
+        except OSError as e:
+            # bad news. raising an exception would only kill the thread
+            print('ERROR LOGGING: {0}'.format(e))
+            print('Lines that raised error: {0}'.format(''.join(lines)))
+
+    def _report_dropped(self):
+        # Log a warning if messages were dropped since the last report
+
+        with self._drop_lock:
+            drop_count = self._unreported_drop_count
+            self._unreported_drop_count = 0
+
+        if drop_count > 0:
+            text = ('Dropped {0} log messages because the log queue was full'
+                    .format(drop_count))
+            self._log_entries([(LogLevel.WARNING, text, {}, time_ns())])
+
+    def _enqueue(self, log_level: LogLevel, text: str, fields: dict):
+        # Queue a message without blocking, sampling debug messages when the
+        # queue is nearly full and dropping messages when it is full
+
+        if self._log_level is not None and self._log_level < log_level:
+            return
+
+        queue = self._new_line_queue
+
+        if (log_level == LogLevel.DEBUG and queue.maxsize > 0 and
+                queue.qsize() >= queue.maxsize * SAMPLING_THRESHOLD):
+            with self._drop_lock:
+                self._debug_count += 1
+                sampled = (self._debug_count % DEBUG_SAMPLE_RATE == 0)
+
+            if not sampled:
+                self._count_dropped()
+                return
+
+        try:
+            queue.put((log_level, text, fields, time_ns()), block=False)
+        except Full:
+            self._count_dropped()
+
+    def _count_dropped(self):
+        # Count a message that was not queued
+
+        with self._drop_lock:
+            self._dropped_count += 1
+            self._unreported_drop_count += 1
+
+    def log_debug(self, text: str, **fields):
         """
         Log a debugging message.
 
         :param text: text to log
+        :param fields: fields for the JSON-lines log
         """
 
-        self._new_line_queue.put((LogLevel.DEBUG, text))
+        self._enqueue(LogLevel.DEBUG, text, fields)
 
-    def log_info(self, text: str):
+    def log_info(self, text: str, **fields):
         """
         Log an informative message.
 
         :param text: text to log
-        :return:
+        :param fields: fields for the JSON-lines log
         """
 
-        self._new_line_queue.put((LogLevel.INFO, text))
+        self._enqueue(LogLevel.INFO, text, fields)
 
-    def log_warning(self, text: str):
+    def log_warning(self, text: str, **fields):
         """
         Log a warning message.
 
         :param text: text to log
-        :return:
+        :param fields: fields for the JSON-lines log
         """
 
-        self._new_line_queue.put((LogLevel.WARNING, text))
+        self._enqueue(LogLevel.WARNING, text, fields)
 
-    def log_error(self, text: str):
+    def log_error(self, text: str, **fields):
         """
         Log an error message.
 
         :param text: text to log
-        :return:
+        :param fields: fields for the JSON-lines log
         """
 
-        self._new_line_queue.put((LogLevel.ERROR, text))
+        self._enqueue(LogLevel.ERROR, text, fields)
 
 
 # module-level instance for global access.
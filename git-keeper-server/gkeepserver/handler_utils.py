@@ -16,10 +16,9 @@
 
 """Provides utility functions used by EventHandler classes."""
 
-from gkeepcore.log_file import log_append_command
 from gkeepcore.path_utils import user_home_dir, gkeepd_to_faculty_log_path, \
     user_gitkeeper_path
-from gkeepcore.shell_command import run_command
+from gkeepserver.log_appender_thread import log_appender
 
 
 def log_gkeepd_to_faculty(faculty_username: str, event_type: str,
@@ -27,6 +26,9 @@ def log_gkeepd_to_faculty(faculty_username: str, event_type: str,
     """
     Append to the log that gkeepd uses to communicate with a faculty client.
 
+    The line is timestamped immediately and written by the log appender
+    thread.
+
     :param faculty_username: username of the faculty
     :param event_type: type of the event
     :param payload: event information
@@ -35,5 +37,4 @@ def log_gkeepd_to_faculty(faculty_username: str, event_type: str,
     gitkeeper_path = user_gitkeeper_path(faculty_username)
     log_path = gkeepd_to_faculty_log_path(gitkeeper_path)
 
-    command = log_append_command(log_path, event_type, payload)
-    run_command(command)
+    log_appender.append(log_path, event_type, payload)
@@ -20,27 +20,35 @@ an update by calling one of the various enqueue_*() functions of the global
 info_updater instance of the InfoUpdateThread class.
 """
 
-import json
 import os
 from collections import defaultdict
 from enum import Enum
+from hashlib import sha1
 from queue import Queue, Empty
 from tempfile import TemporaryDirectory
 from threading import Thread
 from time import time
 
 from gkeepserver.directory_locks import directory_locks
+from gkeepcore.faculty_class_info import encode_info
 from gkeepcore.git_commands import git_head_hash, git_hashes_and_times
 from gkeepcore.gkeep_exception import GkeepException
 from gkeepcore.path_utils import user_home_dir, student_assignment_repo_path, \
-    faculty_info_path, user_gitkeeper_path, faculty_assignment_dir_path
+    faculty_info_path, user_gitkeeper_path, faculty_assignment_dir_path, \
+    faculty_info_shards_path, faculty_info_manifest_path, \
+    info_shard_filename, info_file_extension, faculty_query_results_path
 from gkeepcore.system_commands import sudo_chown, chmod, mv, mkdir, rm
 from gkeepserver.assignments import AssignmentDirectory
 from gkeepserver.database import db
+from gkeepserver.metrics import metrics
 from gkeepserver.gkeepd_logger import gkeepd_logger as logger
 from gkeepserver.server_configuration import config
 
 
+_info_updates = metrics.counter('gkeepd_info_updates_total',
+                                'Number of completed info updates')
+
+
 def nested_defaultdict():
     """
     Constructs a recursively nested defaultdict that works for arbitrarily
@@ -217,6 +225,15 @@ class InfoUpdateThread(Thread):
                                     class_name, assignment_name)
         self._update_request_queue.put(payload)
 
+    def queue_length(self) -> int:
+        """
+        Get the number of info updates waiting to be carried out.
+
+        :return: number of waiting updates
+        """
+
+        return self._update_request_queue.qsize()
+
     def shutdown(self):
         """
         Shutdown the thread.
@@ -241,23 +258,29 @@ class InfoUpdateThread(Thread):
         Loops until someone calls shutdown().
         """
 
-        while not self._shutdown_flag:
-            try:
-                while True:
-                    payload = self._update_request_queue.get(block=True, timeout=0.1)
-
-                    if not isinstance(payload, InfoUpdatePayload):
-                        warning = ('Item was enqueued for info refresh that '
-                                   'is not an InfoRefreshPayload: {0}'
-                                   .format(payload))
-                        logger.log_warning(warning)
-                    else:
-                        self._update_info(payload)
-            except Empty:
-                pass
-            except Exception as e:
-                logger.log_error('Error in info refresh thread: {0}'
-                                 .format(e))
+        db.open_thread_connection()
+
+        try:
+            while not self._shutdown_flag:
+                try:
+                    while True:
+                        payload = self._update_request_queue.get(block=True,
+                                                                 timeout=0.1)
+
+                        if not isinstance(payload, InfoUpdatePayload):
+                            warning = ('Item was enqueued for info refresh '
+                                       'that is not an InfoRefreshPayload: {0}'
+                                       .format(payload))
+                            logger.log_warning(warning)
+                        else:
+                            self._update_info(payload)
+                except Empty:
+                    pass
+                except Exception as e:
+                    logger.log_error('Error in info refresh thread: {0}'
+                                     .format(e))
+        finally:
+            db.close_thread_connection()
 
     def _update_info(self, payload: InfoUpdatePayload):
         # Carries out the payload's instructions
@@ -302,12 +325,13 @@ class InfoUpdateThread(Thread):
             self._write_info(payload.faculty_username)
 
             logger.log_info('Completed info update: {}'.format(payload))
+            _info_updates.inc()
         except Exception as e:
             error = 'Info update failed: {0}'.format(e)
             logger.log_error(error)
 
     def _write_info(self, faculty_username):
-        # Write the info to the info file
+        # Write the info to the info file, and write the per-class shards
 
         gitkeeper_path = user_gitkeeper_path(faculty_username)
         info_path = faculty_info_path(gitkeeper_path)
@@ -317,22 +341,31 @@ class InfoUpdateThread(Thread):
             sudo_chown(info_path, faculty_username, config.keeper_group,
                        recursive=True)
 
-        json_filename = '{0}.json'.format(str(time()))
+        # The client looks for the query results directory to decide whether
+        # this server answers QUERY events. A full scan of every faculty runs
+        # at startup, so creating it here covers existing faculty as well as
+        # new ones.
+        query_results_path = faculty_query_results_path(gitkeeper_path)
 
-        info_json_path = os.path.join(info_path, json_filename)
+        if not os.path.isdir(query_results_path):
+            mkdir(query_results_path, sudo=True)
+            sudo_chown(query_results_path, faculty_username,
+                       config.keeper_group, recursive=True)
 
-        with TemporaryDirectory() as temp_dir_path:
-            temp_info_json_path = os.path.join(temp_dir_path, 'info.json')
+        info_filename = '{0}.{1}'.format(str(time()),
+                                         info_file_extension(
+                                             config.compress_info))
 
-            with open(temp_info_json_path, 'w') as f:
-                json.dump(self._info[faculty_username], f)
+        info_file_path = os.path.join(info_path, info_filename)
 
-            sudo_chown(temp_info_json_path, faculty_username,
-                       config.keeper_group)
-            chmod(temp_info_json_path, '640', sudo=True)
-            mv(temp_info_json_path, info_json_path, sudo=True)
+        self._install_info_file(encode_info(self._info[faculty_username],
+                                            config.compress_info),
+                                info_file_path, faculty_username)
 
-        info_files = [f for f in os.listdir(info_path) if f.endswith('.json')]
+        # include files of both encodings so that old files are cleaned up
+        # after compress_info is changed
+        info_files = [f for f in os.listdir(info_path)
+                      if f.endswith('.json') or f.endswith('.json.gz')]
         info_files.sort()
 
         # keep at most 10 info files on the server
@@ -341,6 +374,74 @@ class InfoUpdateThread(Thread):
             delete_path = os.path.join(info_path, delete_filename)
             rm(delete_path, sudo=True)
 
+        self._write_info_shards(faculty_username)
+
+    def _write_info_shards(self, faculty_username):
+        # Write a shard file for each class whose info has changed, and then
+        # write a manifest which maps each class name to its current shard.
+        #
+        # Shard filenames contain the hash of the shard's contents, so a shard
+        # that already exists on disk is identical to the one we would write
+        # and is left alone. Clients use the hashes in the manifest to avoid
+        # downloading shards they already have.
+
+        gitkeeper_path = user_gitkeeper_path(faculty_username)
+        shards_path = faculty_info_shards_path(gitkeeper_path)
+
+        if not os.path.isdir(shards_path):
+            mkdir(shards_path, sudo=True)
+            sudo_chown(shards_path, faculty_username, config.keeper_group,
+                       recursive=True)
+
+        manifest = {}
+
+        for class_name, class_info in self._info[faculty_username].items():
+            shard_bytes = encode_info({class_name: class_info},
+                                      config.compress_info)
+            shard_hash = sha1(shard_bytes).hexdigest()
+            shard_filename = info_shard_filename(class_name, shard_hash,
+                                                 config.compress_info)
+
+            manifest[class_name] = {
+                'open': class_info.get('open', False),
+                'hash': shard_hash,
+                'file': shard_filename,
+            }
+
+            shard_path = os.path.join(shards_path, shard_filename)
+
+            if not os.path.isfile(shard_path):
+                self._install_info_file(shard_bytes, shard_path,
+                                        faculty_username)
+
+        manifest_path = faculty_info_manifest_path(gitkeeper_path)
+        # the manifest is small and is always stored as plain JSON
+        self._install_info_file(encode_info(manifest), manifest_path,
+                                faculty_username)
+
+        # remove shards that are no longer referenced by the manifest
+        current_filenames = {entry['file'] for entry in manifest.values()}
+        current_filenames.add(os.path.basename(manifest_path))
+
+        for filename in os.listdir(shards_path):
+            if filename not in current_filenames:
+                rm(os.path.join(shards_path, filename), sudo=True)
+
+    def _install_info_file(self, contents: bytes, dest_path,
+                           faculty_username):
+        # Write contents to a temporary file and move it into place, so that
+        # clients never see a partially written file
+
+        with TemporaryDirectory() as temp_dir_path:
+            temp_info_path = os.path.join(temp_dir_path, 'info')
+
+            with open(temp_info_path, 'wb') as f:
+                f.write(contents)
+
+            sudo_chown(temp_info_path, faculty_username, config.keeper_group)
+            chmod(temp_info_path, '640', sudo=True)
+            mv(temp_info_path, dest_path, sudo=True)
+
     def _full_scan(self, faculty_username):
         class_names = db.get_faculty_class_names(faculty_username)
 
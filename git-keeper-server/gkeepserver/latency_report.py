@@ -0,0 +1,178 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides print_latency_report(), which prints percentiles of the time from a
+student's push to the email with the results being sent, per assignment and
+day. This is run by an admin with gkeepd latency, and may be run while gkeepd
+is running.
+
+The latencies come from the traces that gkeepd stores (see tracing.py).
+
+Example usage:
+
+    from gkeepserver.latency_report import print_latency_report
+
+    # the last week
+    print_latency_report(days=7)
+
+"""
+
+from collections import OrderedDict
+from math import ceil
+from time import localtime, strftime, time
+
+from gkeepcore.gkeep_exception import GkeepException
+from gkeepserver.database import db, DatabaseException
+from gkeepserver.server_configuration import config, ServerConfigurationError
+
+
+# the percentiles shown in the report
+PERCENTILES = (50, 95, 99)
+
+
+def print_latency_report(days=7):
+    """
+    Print the 50th, 95th, and 99th percentile push-to-email latencies of
+    submissions for each assignment and day.
+
+    If there are any errors, a GkeepException is raised.
+
+    :param days: number of days covered by the report, ending now
+    """
+
+    if days <= 0:
+        raise GkeepException('The number of days must be positive')
+
+    try:
+        config.parse()
+        db.connect(config.db_path, config.db_pragmas())
+    except (ServerConfigurationError, DatabaseException) as e:
+        raise GkeepException(e)
+
+    latencies = db.get_trace_latencies('SUBMISSION', 'email_sent',
+                                       since=time() - days * 24 * 60 * 60)
+
+    if len(latencies) == 0:
+        print('No submissions have been traced in the last {} days'
+              .format(days))
+        return
+
+    print(format_latency_report(summarize_latencies(latencies)))
+
+
+def summarize_latencies(latencies: list) -> OrderedDict:
+    """
+    Group latencies by assignment and local day, and compute their
+    percentiles.
+
+    :param latencies: list of dictionaries as returned by
+     Database.get_trace_latencies()
+    :return: OrderedDict mapping (faculty, class, assignment) tuples to
+     OrderedDicts mapping days (as YYYY-MM-DD strings) to (count,
+     percentiles) tuples, where percentiles maps each of PERCENTILES to a
+     latency in seconds
+    """
+
+    grouped = OrderedDict()
+
+    for latency in sorted(latencies,
+                          key=lambda l: (l['faculty_username'] or '',
+                                         l['class_name'] or '',
+                                         l['assignment_name'] or '',
+                                         l['start_time'])):
+        key = (latency['faculty_username'], latency['class_name'],
+               latency['assignment_name'])
+        day = strftime('%Y-%m-%d', localtime(latency['start_time']))
+
+        grouped.setdefault(key, OrderedDict()).setdefault(day, []) \
+            .append(latency['latency'])
+
+    summary = OrderedDict()
+
+    for key, values_by_day in grouped.items():
+        summary[key] = OrderedDict()
+
+        for day, values in values_by_day.items():
+            values.sort()
+            percentiles = {p: percentile(values, p) for p in PERCENTILES}
+            summary[key][day] = (len(values), percentiles)
+
+    return summary
+
+
+def format_latency_report(summary: OrderedDict) -> str:
+    """
+    Format a summary from summarize_latencies() as a table for each
+    assignment.
+
+    :param summary: the summary
+    :return: the report as a string
+    """
+
+    lines = []
+
+    for (faculty, class_name, assignment), days in summary.items():
+        if lines:
+            lines.append('')
+
+        lines.append('{0}/{1}/{2}'.format(faculty, class_name, assignment))
+        lines.append('    {0:<10} {1:>6} {2}'.format(
+            'day', 'count',
+            ' '.join('{0:>9}'.format('p{}'.format(p)) for p in PERCENTILES)))
+
+        for day, (count, percentiles) in days.items():
+            lines.append('    {0:<10} {1:>6} {2}'.format(
+                day, count,
+                ' '.join('{0:>9}'.format(_duration_string(percentiles[p]))
+                         for p in PERCENTILES)))
+
+    return '\n'.join(lines)
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """
+    Get a percentile of some values using the nearest-rank method, so the
+    result is always one of the values.
+
+    :param sorted_values: the values, sorted in ascending order
+    :param p: the percentile, between 0 and 100
+    :return: the smallest value which is greater than or equal to p percent
+     of the values
+    """
+
+    if len(sorted_values) == 0:
+        raise ValueError('No values')
+
+    rank = max(1, ceil(p / 100 * len(sorted_values)))
+
+    return sorted_values[rank - 1]
+
+
+def _duration_string(seconds: float) -> str:
+    # Format seconds as 12.3s, 4m05s, or 1h02m
+
+    if seconds < 60:
+        return '{0:.1f}s'.format(seconds)
+
+    minutes, seconds = divmod(int(seconds), 60)
+
+    if minutes < 60:
+        return '{0}m{1:02d}s'.format(minutes, seconds)
+
+    hours, minutes = divmod(minutes, 60)
+
+    return '{0}h{1:02d}m'.format(hours, minutes)
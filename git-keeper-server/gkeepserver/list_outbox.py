@@ -0,0 +1,72 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Provides list_outbox(), which prints the emails in gkeepd's outbox. This is
+run by an admin with gkeepd --outbox, and may be run while gkeepd is running.
+"""
+
+from time import localtime, strftime
+
+from gkeepcore.gkeep_exception import GkeepException
+from gkeepserver.database import db, DatabaseException
+from gkeepserver.server_configuration import config, ServerConfigurationError
+
+
+def list_outbox():
+    """
+    Print the emails that are waiting to be sent, followed by the emails that
+    gkeepd gave up on after too many failed attempts.
+
+    If there are any errors, a GkeepException is raised.
+    """
+
+    try:
+        config.parse()
+        db.connect(config.db_path, config.db_pragmas())
+    except (ServerConfigurationError, DatabaseException) as e:
+        raise GkeepException(e)
+
+    outbox_emails = db.get_outbox_emails()
+
+    if len(outbox_emails) == 0:
+        print('The outbox is empty')
+        return
+
+    for outbox_email in outbox_emails:
+        if outbox_email['failed']:
+            status = 'failed'
+        elif outbox_email['digest_body'] is not None:
+            status = 'waiting for results digest sent {}'.format(
+                _time_string(outbox_email['next_attempt_time']))
+        else:
+            status = 'next attempt {}'.format(
+                _time_string(outbox_email['next_attempt_time']))
+
+        print('{0}: {1} - {2}'.format(outbox_email['id'],
+                                      outbox_email['to_address'],
+                                      outbox_email['subject']))
+        print('    enqueued {0}, {1} attempts, {2}'
+              .format(_time_string(outbox_email['enqueue_time']),
+                      outbox_email['send_attempts'], status))
+
+        if outbox_email['last_error'] != '':
+            print('    last error: {0}'.format(outbox_email['last_error']))
+
+
+def _time_string(timestamp):
+    # Format a Unix time as a local time string
+
+    return strftime('%Y-%m-%d %H:%M:%S', localtime(timestamp))
@@ -0,0 +1,175 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a global interface for appending lines to the logs that gkeepd uses
+to respond to faculty clients.
+
+Lines are timestamped when they are appended, and are written by a separate
+thread. The thread writes all of the lines that are waiting to be written to
+the same log with a single write, so a handler that responds with several
+lines does not wait for each one to be written.
+
+This module stores a LogAppenderThread instance in the module-level variable
+named log_appender. Call start() on this instance to start the thread. Until
+the thread is started, and once it has written its last lines while shutting
+down, lines are written immediately by the thread that appends them.
+
+Example usage:
+
+    from gkeepserver.log_appender_thread import log_appender
+
+    def main():
+        log_appender.start()
+
+        log_appender.append('/home/faculty/.gitkeeper/gkeepd.log',
+                            'UPLOAD_SUCCESS', 'payload')
+
+        log_appender.shutdown()
+
+"""
+
+from queue import Queue, Empty
+from threading import Thread, Lock
+
+from gkeepcore.log_file import log_line, append_to_log
+from gkeepserver.gkeepd_logger import gkeepd_logger as logger
+
+
+class LogAppenderThread(Thread):
+    """
+    Provides a Thread which blocks waiting for new log lines and appends them
+    to their log files.
+
+    Usage:
+
+    Call the inherited start() method to start the thread.
+
+    Shutdown the thread by calling shutdown(). All lines that have been
+    appended are written before the thread exits.
+
+    Append lines by calling append(file_path, item_type, text).
+    """
+
+    def __init__(self):
+        """
+        Construct the object.
+
+        Constructing the object does not start the thread. Call start() to
+        actually start the thread.
+        """
+
+        Thread.__init__(self)
+
+        # queue of (file path, line) tuples
+        self._line_queue = Queue()
+
+        # True while the thread will write lines put in the queue. Lines are
+        # only put in the queue, and the thread only stops writing them, with
+        # the lock held, so no line is put in the queue after the last write.
+        self._accepting_lines = False
+        self._accepting_lock = Lock()
+
+        self._shutdown_flag = False
+
+    def append(self, file_path: str, item_type: str, text: str):
+        """
+        Append a line to a log file. The line is timestamped now, but is
+        written by the thread if it is running.
+
+        :param file_path: path to the log file
+        :param item_type: a string describing the event type
+        :param text: the payload of the event
+        """
+
+        line = log_line(item_type, text)
+
+        with self._accepting_lock:
+            if self._accepting_lines:
+                self._line_queue.put((file_path, line))
+                return
+
+        append_to_log(file_path, [line])
+
+    def shutdown(self):
+        """
+        Shutdown the thread.
+
+        This method blocks until all appended lines have been written and the
+        thread has died.
+        """
+
+        self._shutdown_flag = True
+        self.join()
+
+    def run(self):
+        """
+        Write lines as they arrive in the queue.
+
+        This method should not be called directly. Call the start() method
+        instead.
+
+        Loops until someone calls shutdown().
+        """
+
+        with self._accepting_lock:
+            self._accepting_lines = True
+
+        while not self._shutdown_flag:
+            try:
+                first_line = self._line_queue.get(block=True, timeout=0.1)
+                self._write_lines(first_line)
+            except Empty:
+                pass
+
+        # write anything that was appended while shutting down. Lines appended
+        # from now on are written by the threads that append them, after
+        # these so that each log stays in order.
+        with self._accepting_lock:
+            self._accepting_lines = False
+
+            try:
+                self._write_lines(self._line_queue.get(block=False))
+            except Empty:
+                pass
+
+    def _write_lines(self, first_line):
+        # Write the given line and all other lines waiting in the queue,
+        # grouped by file. Python dicts keep insertion order, so the lines
+        # for each file are written in the order they were appended.
+
+        lines_by_path = {}
+
+        file_path, line = first_line
+        lines_by_path[file_path] = [line]
+
+        while True:
+            try:
+                file_path, line = self._line_queue.get(block=False)
+            except Empty:
+                break
+
+            lines_by_path.setdefault(file_path, []).append(line)
+
+        for file_path, lines in lines_by_path.items():
+            try:
+                append_to_log(file_path, lines)
+            except OSError as e:
+                logger.log_error('Error writing to {}: {}'
+                                 .format(file_path, e))
+
+
+log_appender = LogAppenderThread()
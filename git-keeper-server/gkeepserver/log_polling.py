@@ -30,6 +30,12 @@ The sizes of the log files are stored in the database after every log
 modification. This allows the poller to start where it left off if the process
 is restarted.
 
+Events may also be delivered to gkeepd before the poller reads them from the
+log (see event_socket_server.py). Whichever of the two sees an event first
+claims it with claim_event(), and the other skips it. Delivered events are
+stored in the database until the poller reads them, so they are skipped even
+if gkeepd restarts before the poller gets to them.
+
 Example usage::
 
     from gkeepcore.log_polling import log_poller
@@ -46,7 +52,7 @@ Example usage::
         log_poller.watch_log_file('/path/to/log')
 
         while keep_going:
-            log_file_path, log_event = new_log_event_queue.get()
+            log_file_path, log_event, trace = new_log_event_queue.get()
             # do something with the event
 
         log_poller.shutdown()
@@ -54,15 +60,25 @@ Example usage::
 """
 
 import os
+from collections import OrderedDict
 from queue import Queue, Empty
-from threading import Thread
+from threading import Thread, Lock
 from time import time, sleep
 
 from gkeepcore.gkeep_exception import GkeepException
-from gkeepcore.log_file import LogFileReader, LogFileException
+from gkeepcore.log_file import LogFileReader, LogFileException, LogEvent
 from gkeepcore.system_commands import file_is_readable
 from gkeepserver.database import db
 from gkeepserver.gkeepd_logger import GkeepdLoggerThread
+from gkeepserver.tracing import Trace
+
+# seconds to remember that an event was claimed, which must be longer than
+# it takes the poller to read a line after it is appended
+CLAIM_EXPIRY = 600
+
+# seconds to keep delivered events in the database that have not been read
+# from their logs, such as events for logs that are no longer watched
+DELIVERED_EVENT_RETENTION = 7 * 24 * 60 * 60
 
 
 class LogPollingThreadError(GkeepException):
@@ -97,6 +113,11 @@ class LogPollingThread(Thread):
         # initialize this so we can add files to watch before the thread starts
         self._add_log_queue = Queue()
 
+        # maps (file path, timestamp, event type, payload) tuples of claimed
+        # events to the time they were claimed, oldest first
+        self._claimed_events = OrderedDict()
+        self._claim_lock = Lock()
+
         self._new_log_event_queue = None
         self._reader_class = None
         self._polling_interval = None
@@ -110,8 +131,9 @@ class LogPollingThread(Thread):
         """
         Initialize the attributes.
 
-        :param new_log_event_queue: the poller places (file_path, event) pairs
-         into this queue
+        :param new_log_event_queue: the poller places (file_path, event,
+         trace) tuples into this queue, the trace being a Trace which
+         follows the event through gkeepd
         :param reader_class: LogFileReader class to use for creating readers
         :param logger: the system logger, used to log runtime information
         :param polling_interval: number of seconds between polling files
@@ -132,6 +154,8 @@ class LogPollingThread(Thread):
 
         self._load_paths_from_db()
 
+        db.delete_delivered_events_before(time() - DELIVERED_EVENT_RETENTION)
+
         self._shutdown_flag = False
 
     def watch_log_file(self, file_path: str):
@@ -150,12 +174,100 @@ class LogPollingThread(Thread):
 
         self._add_log_queue.put(file_path)
 
+    def is_watching(self, file_path: str) -> bool:
+        """
+        Determine if a log file is being watched.
+
+        This method can be called from any other thread.
+
+        :param file_path: path to the log file
+        :return: True if the file is being watched, False otherwise
+        """
+
+        if self._log_file_readers is None:
+            return False
+
+        return file_path in self._log_file_readers
+
+    def claim_event(self, file_path: str, event: LogEvent,
+                    delivered=False) -> bool:
+        """
+        Claim an event so that it is only passed on once, whether it is read
+        from its log or delivered through the event socket.
+
+        A delivered event is stored in the database until it is read from
+        its log. The calling thread must have a database connection.
+
+        This method can be called from any other thread.
+
+        :param file_path: path to the log that the event is from
+        :param event: the event
+        :param delivered: True if the event was delivered through the event
+         socket, False if it was read from its log
+        :return: True if the event was claimed, False if it had already been
+         claimed
+        """
+
+        key = (file_path, event.timestamp, event.event_type, event.payload)
+        now = time()
+
+        with self._claim_lock:
+            # forget the claims that have expired
+            while self._claimed_events:
+                oldest_key, claim_time = next(iter(self._claimed_events
+                                                   .items()))
+                if now - claim_time < CLAIM_EXPIRY:
+                    break
+                del self._claimed_events[oldest_key]
+
+            claimed = key not in self._claimed_events
+
+            if delivered:
+                # stored before the claim so the event is still read from
+                # its log if this fails
+                if claimed:
+                    db.insert_delivered_event(*key, delivery_time=now)
+            else:
+                # the event may have been delivered before a restart, or
+                # before its claim expired
+                if db.delete_delivered_event(*key):
+                    claimed = False
+
+            if claimed:
+                self._claimed_events[key] = now
+
+        return claimed
+
+    def get_log_file_lags(self) -> dict:
+        """
+        Get the number of bytes in each watched log file that have not been
+        read yet.
+
+        :return: dictionary mapping log file paths to numbers of bytes
+        """
+
+        lags = {}
+
+        if self._log_file_readers is None:
+            return lags
+
+        for file_path, reader in list(self._log_file_readers.items()):
+            try:
+                lags[file_path] = (reader.get_byte_count() -
+                                   reader.get_seek_position())
+            except (GkeepException, OSError):
+                continue
+
+        return lags
+
     def shutdown(self):
         """
         Shut down the poller.
 
         The run loop will not shut down until the current polling cycle
-        is complete.
+        is complete. The logs are read once more before the thread dies so
+        that events which were delivered through the event socket are not
+        passed on again when gkeepd restarts.
 
         This method will block until the thread dies.
 
@@ -170,12 +282,22 @@ class LogPollingThread(Thread):
         # This should not be called directly, the thread should be started by
         # calling start()
 
-        while not self._shutdown_flag:
+        db.open_thread_connection()
+
+        try:
+            while not self._shutdown_flag:
+                try:
+                    self._poll()
+                except Exception as e:
+                    self._logger.log_error('Error polling logs: {0}'
+                                           .format(e))
+
             try:
-                self._poll()
+                self._read_new_events()
             except Exception as e:
-                self._logger.log_error('Error polling logs: {0}'
-                                       .format(e))
+                self._logger.log_error('Error polling logs: {0}'.format(e))
+        finally:
+            db.close_thread_connection()
 
     def _load_paths_from_db(self):
         for log_file_path, byte_count in db.get_byte_counts():
@@ -252,20 +374,7 @@ class LogPollingThread(Thread):
 
         self._last_poll_time = time()
 
-        readers = list(self._log_file_readers.values())
-
-        # for each file reader, add any new events to the queue
-        for reader in readers:
-            try:
-                for event in reader.get_new_events():
-                    file_path = reader.get_file_path()
-                    self._new_log_event_queue.put((file_path, event))
-                    self._write_byte_count_to_db(file_path)
-
-            except LogFileException as e:
-                self._logger.log_warning(str(e))
-                # if something goes wrong we should not keep watching this file
-                self._stop_watching_log_file(reader)
+        self._read_new_events()
 
         # consume all new log files until the queue is empty
         empty = False
@@ -287,6 +396,30 @@ class LogPollingThread(Thread):
         if sleep_time > 0 and not self._shutdown_flag:
             sleep(sleep_time)
 
+    def _read_new_events(self):
+        # For each file reader, add any new events to the queue, skipping
+        # events that were already delivered through the event socket
+
+        readers = list(self._log_file_readers.values())
+
+        for reader in readers:
+            try:
+                for event in reader.get_new_events():
+                    file_path = reader.get_file_path()
+
+                    if self.claim_event(file_path, event):
+                        trace = Trace(event.event_type, event.timestamp)
+                        trace.hop('polled')
+                        self._new_log_event_queue.put((file_path, event,
+                                                       trace))
+
+                    self._write_byte_count_to_db(file_path)
+
+            except LogFileException as e:
+                self._logger.log_warning(str(e))
+                # if something goes wrong we should not keep watching this file
+                self._stop_watching_log_file(reader)
+
 
 # module-level instance for global access
 log_poller = LogPollingThread()
@@ -0,0 +1,369 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a global registry of metrics about gkeepd, which are rendered in the
+Prometheus text format by the metrics server (see metrics_server.py).
+
+There are three kinds of metrics:
+
+    Counter - a count that only goes up, such as the number of tests run
+    Histogram - counts of observed values in buckets, along with their sum,
+        such as the number of seconds each test run took
+    functions - a function that is called when the metrics are rendered, for
+        values that are tracked elsewhere such as the length of a queue
+    function families - like functions, but the function returns values for
+        any number of label sets, for values whose labels are only known
+        when the metrics are rendered
+
+Metrics may have labels, and a metric name may be registered once for each
+set of label values.
+
+This module stores a MetricsRegistry instance in the module-level variable
+named metrics.
+
+Example usage:
+
+    from gkeepserver.metrics import metrics
+
+    tests_run = metrics.counter('gkeepd_tests_run_total',
+                                'Number of test runs')
+    test_seconds = metrics.histogram('gkeepd_test_run_seconds',
+                                     'Seconds each test run took')
+
+    metrics.function('gkeepd_queue_length', 'Number of items in a queue',
+                     some_queue.qsize, labels={'queue': 'some'})
+
+    tests_run.inc()
+    test_seconds.observe(2.5)
+
+    print(metrics.render())
+
+"""
+
+from bisect import bisect_left
+from threading import Lock
+
+
+# default histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60, 120, 300)
+
+
+class Counter:
+    """
+    A thread-safe count that only goes up.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        """
+        Increase the count.
+
+        :param amount: amount to increase the count by
+        """
+
+        with self._lock:
+            self._value += amount
+
+    def samples(self, name: str, labels: dict) -> list:
+        """
+        Get the samples to render for this counter.
+
+        :param name: name of the metric
+        :param labels: labels of the metric
+        :return: list of (name, labels, value) tuples
+        """
+
+        with self._lock:
+            return [(name, labels, self._value)]
+
+
+class Histogram:
+    """
+    A thread-safe histogram of observed values.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: sorted upper bounds of the buckets, not including
+         infinity
+        """
+
+        self._buckets = tuple(buckets)
+
+        # the last count is for values larger than every bucket
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        """
+        Record a value.
+
+        :param value: the value to record
+        """
+
+        index = bisect_left(self._buckets, value)
+
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def samples(self, name: str, labels: dict) -> list:
+        """
+        Get the samples to render for this histogram, with cumulative bucket
+        counts as Prometheus expects.
+
+        :param name: name of the metric
+        :param labels: labels of the metric
+        :return: list of (name, labels, value) tuples
+        """
+
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        samples = []
+        cumulative = 0
+
+        bounds = [_format_value(bound) for bound in self._buckets] + ['+Inf']
+
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            bucket_labels = dict(labels)
+            bucket_labels['le'] = bound
+            samples.append((name + '_bucket', bucket_labels, cumulative))
+
+        samples.append((name + '_sum', labels, total))
+        samples.append((name + '_count', labels, cumulative))
+
+        return samples
+
+
+class _FunctionMetric:
+    # A metric whose value comes from calling a function
+
+    def __init__(self, function):
+        self._function = function
+
+    def samples(self, name: str, labels: dict) -> list:
+        return [(name, labels, self._function())]
+
+
+class _FunctionFamilyMetric:
+    # A metric whose values and labels come from calling a function
+
+    def __init__(self, function):
+        self._function = function
+
+    def samples(self, name: str, labels: dict) -> list:
+        return [(name, sample_labels, value)
+                for sample_labels, value in self._function()]
+
+
+class MetricsRegistry:
+    """
+    Stores metrics by name and label values, and renders them in the
+    Prometheus text format.
+    """
+
+    def __init__(self):
+        # name -> (metric type, help text, {labels tuple: metric})
+        self._metrics = {}
+        self._lock = Lock()
+
+    def counter(self, name: str, help_text: str, labels=None) -> Counter:
+        """
+        Get the counter with the given name and labels, creating it if it
+        does not exist.
+
+        :param name: name of the metric
+        :param help_text: description of the metric
+        :param labels: optional dictionary of label names to values
+        :return: the counter
+        """
+
+        return self._get_or_add(name, 'counter', help_text, labels, Counter)
+
+    def histogram(self, name: str, help_text: str, labels=None,
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        """
+        Get the histogram with the given name and labels, creating it if it
+        does not exist.
+
+        :param name: name of the metric
+        :param help_text: description of the metric
+        :param labels: optional dictionary of label names to values
+        :param buckets: upper bounds of the buckets if the histogram is
+         created
+        :return: the histogram
+        """
+
+        return self._get_or_add(name, 'histogram', help_text, labels,
+                                lambda: Histogram(buckets))
+
+    def function(self, name: str, help_text: str, function, labels=None,
+                 metric_type='gauge'):
+        """
+        Register a function which is called to get the value of a metric
+        each time the metrics are rendered, replacing any function already
+        registered with the same name and labels.
+
+        The function must be thread-safe.
+
+        :param name: name of the metric
+        :param help_text: description of the metric
+        :param function: function which takes no arguments and returns a
+         number
+        :param labels: optional dictionary of label names to values
+        :param metric_type: 'gauge' for values that go up and down, or
+         'counter' for values that only go up
+        """
+
+        with self._lock:
+            metrics_by_labels = self._metrics_by_labels(name, metric_type,
+                                                        help_text)
+            metrics_by_labels[_labels_key(labels)] = _FunctionMetric(function)
+
+    def function_family(self, name: str, help_text: str, function,
+                        metric_type='gauge'):
+        """
+        Register a function which is called to get the values of a metric
+        and their labels each time the metrics are rendered, replacing any
+        function already registered with the same name.
+
+        The function must be thread-safe.
+
+        :param name: name of the metric
+        :param help_text: description of the metric
+        :param function: function which takes no arguments and returns a
+         list of (labels dictionary, number) tuples
+        :param metric_type: 'gauge' for values that go up and down, or
+         'counter' for values that only go up
+        """
+
+        with self._lock:
+            metrics_by_labels = self._metrics_by_labels(name, metric_type,
+                                                        help_text)
+            metrics_by_labels[()] = _FunctionFamilyMetric(function)
+
+    def render(self) -> str:
+        """
+        Render all the metrics in the Prometheus text format.
+
+        A function metric whose function raises an exception is left out.
+
+        :return: the metrics as text
+        """
+
+        with self._lock:
+            metrics = [(name, metric_type, help_text, dict(metrics_by_labels))
+                       for name, (metric_type, help_text, metrics_by_labels)
+                       in sorted(self._metrics.items())]
+
+        lines = []
+
+        for name, metric_type, help_text, metrics_by_labels in metrics:
+            lines.append('# HELP {0} {1}'.format(name, help_text))
+            lines.append('# TYPE {0} {1}'.format(name, metric_type))
+
+            for labels_key, metric in sorted(metrics_by_labels.items()):
+                try:
+                    samples = metric.samples(name, dict(labels_key))
+                except Exception:
+                    continue
+
+                for sample_name, labels, value in samples:
+                    lines.append('{0}{1} {2}'.format(sample_name,
+                                                     _format_labels(labels),
+                                                     _format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+    def _get_or_add(self, name, metric_type, help_text, labels, factory):
+        # Get the metric with the given name and labels, creating it with
+        # factory() if it does not exist
+
+        with self._lock:
+            metrics_by_labels = self._metrics_by_labels(name, metric_type,
+                                                        help_text)
+            key = _labels_key(labels)
+
+            if key not in metrics_by_labels:
+                metrics_by_labels[key] = factory()
+
+            return metrics_by_labels[key]
+
+    def _metrics_by_labels(self, name, metric_type, help_text):
+        # Get the dictionary of metrics with the given name, making sure the
+        # name is not already used for a different type of metric. Must be
+        # called with the lock held.
+
+        if name not in self._metrics:
+            self._metrics[name] = (metric_type, help_text, {})
+
+        existing_type, _, metrics_by_labels = self._metrics[name]
+
+        if existing_type != metric_type:
+            raise ValueError('{0} is already registered as a {1}'
+                             .format(name, existing_type))
+
+        return metrics_by_labels
+
+
+def _labels_key(labels) -> tuple:
+    # Sorted tuple of label items, so label dictionaries can be used as keys
+
+    if labels is None:
+        return ()
+
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: dict) -> str:
+    # Format labels as {name="value",...}, escaping the values
+
+    if not labels:
+        return ''
+
+    items = []
+
+    for label_name, value in labels.items():
+        value = (str(value).replace('\\', '\\\\').replace('"', '\\"')
+                 .replace('\n', '\\n'))
+        items.append('{0}="{1}"'.format(label_name, value))
+
+    return '{' + ','.join(items) + '}'
+
+
+def _format_value(value) -> str:
+    # Format a number, without a trailing .0 for whole numbers
+
+    if isinstance(value, bool):
+        value = int(value)
+
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    return str(value)
+
+
+# module-level instance for global access
+metrics = MetricsRegistry()
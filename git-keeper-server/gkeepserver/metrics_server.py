@@ -0,0 +1,179 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a global interface for serving gkeepd's metrics (see metrics.py) in
+the Prometheus text format.
+
+The metrics are served over HTTP at /metrics, on a Unix socket that only the
+keeper user can connect to and optionally on a TCP port that only accepts
+connections from localhost. For example:
+
+    curl --unix-socket ~keeper/gkeepd_metrics.sock http://localhost/metrics
+
+This module stores a MetricsServer instance in the module-level variable
+named metrics_server.
+
+Example usage:
+
+    from gkeepserver.metrics_server import metrics_server
+
+    def main():
+        metrics_server.start(socket_path='/home/keeper/gkeepd_metrics.sock',
+                             port=9100)
+
+        # metrics are served in background threads
+
+        metrics_server.shutdown()
+
+"""
+
+import os
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from gkeepcore.gkeep_exception import GkeepException
+from gkeepserver.metrics import metrics
+
+
+class MetricsServerError(GkeepException):
+    """Raised if the metrics server cannot be started."""
+    pass
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    # Serves the metrics at /metrics
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = metrics.render().encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # requests are not logged
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    # An HTTP server on a Unix socket
+
+    daemon_threads = True
+
+    def get_request(self):
+        # Unix socket clients have no address, but the request handler
+        # expects one
+        request, _ = super().get_request()
+        return request, ('localhost', 0)
+
+
+class _LocalhostHTTPServer(ThreadingHTTPServer):
+    # An HTTP server on a localhost TCP port
+
+    daemon_threads = True
+
+
+class MetricsServer:
+    """
+    Serves the metrics in background threads.
+
+    Typically this will be accessed with the provided module-level global
+    instance rather than making an instance directly.
+    """
+
+    def __init__(self):
+        """
+        Construct the object. Call start() to start serving.
+        """
+
+        self._servers = []
+        self._threads = []
+        self._socket_path = None
+
+    def start(self, socket_path=None, port=0):
+        """
+        Start serving the metrics.
+
+        Raises MetricsServerError if a socket cannot be created.
+
+        :param socket_path: path of the Unix socket to serve on, or None to
+         not serve on a Unix socket
+        :param port: localhost TCP port to serve on, or 0 to not serve on a
+         TCP port
+        """
+
+        try:
+            if socket_path is not None:
+                if os.path.exists(socket_path):
+                    os.remove(socket_path)
+
+                server = _UnixHTTPServer(socket_path, _MetricsRequestHandler)
+                os.chmod(socket_path, 0o600)
+
+                self._socket_path = socket_path
+                self._serve(server)
+
+            if port != 0:
+                server = _LocalhostHTTPServer(('127.0.0.1', port),
+                                              _MetricsRequestHandler)
+                self._serve(server)
+        except OSError as e:
+            self.shutdown()
+            raise MetricsServerError('Error starting the metrics server: {0}'
+                                     .format(e))
+
+    def shutdown(self):
+        """
+        Stop serving the metrics.
+
+        This method blocks until the serving threads have died.
+        """
+
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+        for thread in self._threads:
+            thread.join()
+
+        if self._socket_path is not None and os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+        self._servers = []
+        self._threads = []
+        self._socket_path = None
+
+    def _serve(self, server):
+        # Serve requests to a server in its own thread
+
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        self._servers.append(server)
+        self._threads.append(thread)
+
+
+# module-level instance for global access
+metrics_server = MetricsServer()
@@ -22,7 +22,23 @@ threads get them out.
 
 """
 
+from collections import Counter
 from queue import Queue
 
 
 new_submission_queue = Queue()
+
+
+def queued_submission_counts() -> Counter:
+    """
+    Count the submissions waiting in new_submission_queue for each class.
+
+    :return: Counter mapping (faculty username, class name) tuples to the
+     number of waiting submissions
+    """
+
+    with new_submission_queue.mutex:
+        submissions = list(new_submission_queue.queue)
+
+    return Counter((submission.faculty_username, submission.class_name)
+                   for submission in submissions)
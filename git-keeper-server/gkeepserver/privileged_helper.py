@@ -0,0 +1,422 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a long-running helper process which performs filesystem operations
+as root on behalf of gkeepd.
+
+Without the helper, every chmod, chown, mkdir, mv, cp, and rm that gkeepd
+runs as root is a separate sudo process. With the helper, gkeepd runs sudo
+once at startup to start the helper, and system_commands sends those
+operations to the helper over a Unix socket. The helper performs them using
+the functions in gkeepcore.native_commands, so no processes are spawned.
+
+The helper only accepts connections from processes running as the user that
+started it, which it checks using the peer credentials of the socket. It only
+performs the operations in OPERATIONS, only on absolute paths, and writes
+every operation to its audit log. It exits when gkeepd exits.
+
+Each request and response is a single line of JSON:
+
+    {"operation": "chmod", "arguments": {"path": "/a/path", ...}}
+    {"ok": true}
+    {"ok": false, "error": "chmod /a/path: ...", "exit_code": 1}
+
+A failed operation raises a CommandExitCodeError in gkeepd, just as it would
+if gkeepd had performed it itself or run the command.
+
+This module stores a PrivilegedHelper instance in the module-level variable
+named privileged_helper, which gkeepd uses to start the helper process.
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import sys
+from subprocess import Popen, PIPE, DEVNULL
+from threading import Thread, Lock, local
+from time import sleep, time
+
+from gkeepcore import native_commands
+from gkeepcore.gkeep_exception import GkeepException
+from gkeepcore.shell_command import CommandError, CommandExitCodeError
+from gkeepcore.system_commands import set_privileged_helper
+
+
+# Operations that the helper performs, which are functions in
+# gkeepcore.native_commands
+OPERATIONS = {
+    'chmod': native_commands.chmod,
+    'chown': native_commands.chown,
+    'mkdir': native_commands.mkdir,
+    'make_symbolic_link': native_commands.make_symbolic_link,
+    'touch': native_commands.touch,
+    'mv': native_commands.mv,
+    'cp': native_commands.cp,
+    'rm': native_commands.rm,
+}
+
+# Arguments of the operations which must be absolute paths
+PATH_ARGUMENTS = ('path', 'source_path', 'dest_path', 'link_path')
+
+# How often the helper checks whether gkeepd is still running, in seconds
+PARENT_CHECK_INTERVAL = 1
+
+# Format of struct ucred, returned by getsockopt() with SO_PEERCRED
+UCRED_FORMAT = '3i'
+
+
+class PrivilegedHelperError(GkeepException):
+    """Raised if the privileged helper process cannot be started."""
+    pass
+
+
+class PrivilegedHelperServer(socketserver.ThreadingUnixStreamServer):
+    """
+    The server that runs in the helper process. Each connection is handled
+    in its own thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, allowed_uid: int,
+                 audit_log: logging.Logger):
+        """
+        Create the socket and make it accessible only to the allowed user.
+
+        :param socket_path: path of the Unix socket to listen on
+        :param allowed_uid: UID of the user allowed to connect
+        :param audit_log: logger to write operations to
+        """
+
+        self.allowed_uid = allowed_uid
+        self.audit_log = audit_log
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        super().__init__(socket_path, _RequestHandler)
+
+        os.chown(socket_path, allowed_uid, -1)
+        os.chmod(socket_path, 0o600)
+
+    def perform(self, peer_pid: int, request_line: bytes) -> dict:
+        """
+        Perform the operation in a request.
+
+        :param peer_pid: PID of the process that sent the request
+        :param request_line: the request as a line of JSON
+        :return: the response
+        """
+
+        try:
+            request = json.loads(request_line.decode('utf-8'))
+            operation = request['operation']
+            arguments = request['arguments']
+
+            if operation not in OPERATIONS or not isinstance(arguments, dict):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            self.audit_log.warning('pid {}: malformed request: {!r}'
+                                   .format(peer_pid, request_line))
+            return {'ok': False, 'error': 'Malformed request'}
+
+        self.audit_log.info('pid {}: {} {}'.format(peer_pid, operation,
+                                                   json.dumps(arguments)))
+
+        try:
+            for name in PATH_ARGUMENTS:
+                if name in arguments and not os.path.isabs(arguments[name]):
+                    raise CommandError('{} is not an absolute path'
+                                       .format(arguments[name]))
+
+            OPERATIONS[operation](**arguments)
+        except (CommandError, TypeError) as e:
+            self.audit_log.warning('pid {}: {} failed: {}'
+                                   .format(peer_pid, operation, e))
+            return {'ok': False, 'error': str(e),
+                    'exit_code': getattr(e, 'exit_code', 1)}
+
+        return {'ok': True}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    # Handles all of the requests from a single connection
+
+    def handle(self):
+        credentials = self.request.getsockopt(socket.SOL_SOCKET,
+                                              socket.SO_PEERCRED,
+                                              struct.calcsize(UCRED_FORMAT))
+        pid, uid, gid = struct.unpack(UCRED_FORMAT, credentials)
+
+        if uid != self.server.allowed_uid:
+            self.server.audit_log.warning('Rejected connection from pid {} '
+                                          'with uid {}'.format(pid, uid))
+            return
+
+        for line in self.rfile:
+            response = self.server.perform(pid, line)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class PrivilegedHelper:
+    """
+    Starts the helper process and sends it requests from gkeepd.
+
+    Each thread gets its own connection to the helper, so requests from
+    different threads are performed concurrently.
+    """
+
+    def __init__(self):
+        """
+        Create the object. Call start() to start the helper process.
+        """
+
+        self._process = None
+        self._socket_path = None
+        self._local = local()
+
+        # connections from all threads, so they can be closed on shutdown
+        self._connections = []
+        self._connections_lock = Lock()
+
+    def start(self, socket_path: str, log_path: str, timeout=10):
+        """
+        Start the helper process, wait for it to listen on its socket, and
+        send the operations in system_commands that run as root to it.
+
+        The helper is started with sudo unless this process is running as
+        root. Raises PrivilegedHelperError if the helper does not start
+        within the timeout.
+
+        :param socket_path: path of the Unix socket for the helper to use
+        :param log_path: path of the helper's audit log
+        :param timeout: maximum number of seconds to wait for the helper
+        """
+
+        self._socket_path = socket_path
+
+        command = [sys.executable, '-m', 'gkeepserver.privileged_helper',
+                   '--socket', socket_path, '--uid', str(os.getuid()),
+                   '--parent-pid', str(os.getpid()), '--log', log_path]
+
+        if os.geteuid() != 0:
+            command = ['sudo', '-n'] + command
+
+        try:
+            self._process = Popen(command, stdin=PIPE, stdout=DEVNULL,
+                                  stderr=DEVNULL)
+        except OSError as e:
+            raise PrivilegedHelperError('Could not start the privileged '
+                                        'helper: {}'.format(e))
+
+        deadline = time() + timeout
+
+        while self._connection() is None:
+            if self._process.poll() is not None or time() > deadline:
+                self.shutdown()
+                error = ('The privileged helper did not start, see {}'
+                         .format(log_path))
+                raise PrivilegedHelperError(error)
+
+            sleep(0.05)
+
+        set_privileged_helper(self)
+
+    def run(self, operation: str, arguments: dict) -> bool:
+        """
+        Have the helper perform an operation.
+
+        Raises CommandExitCodeError if the operation fails, like the
+        command for the operation would.
+
+        :param operation: name of the operation
+        :param arguments: keyword arguments of the operation
+        :return: True if the operation was performed, False if the helper is
+         not available
+        """
+
+        connection = self._connection()
+
+        if connection is None:
+            return False
+
+        # the helper's working directory is not the same as ours
+        arguments = dict(arguments)
+        for name in PATH_ARGUMENTS:
+            if name in arguments:
+                arguments[name] = os.path.abspath(arguments[name])
+
+        request = {'operation': operation, 'arguments': arguments}
+
+        try:
+            connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            response_line = self._local.reader.readline()
+        except OSError:
+            response_line = b''
+
+        if not response_line:
+            self._close_connection()
+            return False
+
+        response = json.loads(response_line.decode('utf-8'))
+
+        if not response['ok']:
+            raise CommandExitCodeError(response['error'],
+                                       response.get('exit_code', 1))
+
+        return True
+
+    def shutdown(self):
+        """
+        Stop sending operations to the helper and stop the helper process.
+        """
+
+        set_privileged_helper(None)
+        self._socket_path = None
+
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+        if self._process is not None:
+            # the helper exits when its stdin is closed
+            self._process.stdin.close()
+
+            try:
+                self._process.wait(timeout=5)
+            except Exception:
+                pass
+
+            self._process = None
+
+    def _connection(self):
+        # Get this thread's connection to the helper, connecting if
+        # necessary. Returns None if the helper is not available.
+
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is not None:
+            return connection
+
+        if self._socket_path is None:
+            return None
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            connection.connect(self._socket_path)
+        except OSError:
+            connection.close()
+            return None
+
+        self._local.connection = connection
+        self._local.reader = connection.makefile('rb')
+
+        with self._connections_lock:
+            self._connections.append(connection)
+
+        return connection
+
+    def _close_connection(self):
+        # Close this thread's connection to the helper
+
+        connection = self._local.connection
+        self._local.connection = None
+
+        with self._connections_lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+
+        connection.close()
+
+
+def _exit_with_parent(server: PrivilegedHelperServer, parent_pid: int):
+    # Shut the server down when the parent process exits or closes our stdin.
+    # sudo does not always pass EOF on, so the parent is also checked for.
+
+    def watch_stdin():
+        sys.stdin.buffer.read()
+        server.shutdown()
+
+    Thread(target=watch_stdin, daemon=True).start()
+
+    def watch_parent():
+        while True:
+            sleep(PARENT_CHECK_INTERVAL)
+            try:
+                os.kill(parent_pid, 0)
+            except ProcessLookupError:
+                server.shutdown()
+                return
+
+    Thread(target=watch_parent, daemon=True).start()
+
+
+def main():
+    """
+    Entry point of the helper process.
+    """
+
+    parser = argparse.ArgumentParser(description='gkeepd privileged helper')
+    parser.add_argument('--socket', required=True,
+                        help='path of the Unix socket to listen on')
+    parser.add_argument('--uid', required=True, type=int,
+                        help='UID of the user allowed to connect')
+    parser.add_argument('--parent-pid', required=True, type=int,
+                        help='PID of gkeepd, the helper exits with it')
+    parser.add_argument('--log', required=True,
+                        help='path of the audit log')
+
+    args = parser.parse_args()
+
+    audit_log = logging.getLogger('gkeepd_helper')
+    audit_log.setLevel(logging.INFO)
+    audit_log.propagate = False
+    handler = logging.FileHandler(args.log)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s '
+                                           '%(message)s'))
+    audit_log.addHandler(handler)
+
+    try:
+        server = PrivilegedHelperServer(args.socket, args.uid, audit_log)
+    except OSError as e:
+        audit_log.error('Could not listen on {}: {}'.format(args.socket, e))
+        sys.exit(1)
+
+    audit_log.info('Listening on {} for uid {}'.format(args.socket, args.uid))
+
+    _exit_with_parent(server, args.parent_pid)
+
+    server.serve_forever()
+    server.server_close()
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    audit_log.info('Shut down')
+
+
+privileged_helper = PrivilegedHelper()
+
+
+if __name__ == '__main__':
+    main()
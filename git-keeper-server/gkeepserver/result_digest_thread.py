@@ -0,0 +1,340 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a global interface for combining submission results emails.
+
+If an assignment has a results digest window, results emails are not sent
+right away. The first result sent to a recipient for an assignment starts the
+window, and every result for the same recipient and assignment that arrives
+before the window ends is combined into a single email, with the most recent
+results first. This keeps bulk triggers and rapid resubmissions from flooding
+students and the email queue.
+
+Digests are combined in this thread and handed to the email sender when their
+window ends. Results that are pending when gkeepd shuts down are sent
+immediately.
+
+Once enable_outbox() is called, each result is also stored in the database's
+outbox until its digest is sent, with the time the digest is due as its next
+attempt time. The digest replaces its results in the outbox when it is handed
+to the email sender, so results that were pending when gkeepd crashed are
+combined and sent after it restarts.
+
+This module stores a ResultDigestThread instance in the module-level variable
+named result_digester. Call start() on this instance to start the thread.
+Until the thread is started, results are sent without waiting.
+
+Example usage:
+
+    from gkeepserver.result_digest_thread import result_digester
+
+    def main():
+        result_digester.start()
+
+        result_digester.add('student@example.edu', 'hw1 results', 'body',
+                            html_pre_body=False, window=300)
+
+        result_digester.shutdown()
+
+"""
+
+from threading import Thread, Lock
+from time import time, sleep, localtime, strftime
+
+from gkeepserver.database import db
+from gkeepserver.email_sender_thread import email_sender
+from gkeepserver.gkeepd_logger import gkeepd_logger as logger
+from gkeepserver.server_email import Email
+
+
+class ResultDigest:
+    """
+    Results waiting to be combined into a single email.
+    """
+
+    def __init__(self, to_address: str, subject: str, html_pre_body: bool,
+                 send_time: float):
+        """
+        :param to_address: address to send the email to
+        :param subject: subject of the email
+        :param html_pre_body: whether the email is also sent as HTML
+        :param send_time: time at which the digest is sent
+        """
+
+        self.to_address = to_address
+        self.subject = subject
+        self.html_pre_body = html_pre_body
+        self.send_time = send_time
+
+        # list of (time, body, trace) tuples in the order the results arrived
+        self.results = []
+
+        # IDs of the results in the outbox
+        self.outbox_ids = []
+
+    def build_email(self) -> Email:
+        """
+        Build the email containing all the results, most recent first.
+
+        :return: the email
+        """
+
+        traces = [trace for _, _, trace in self.results if trace is not None]
+
+        if len(self.results) == 1:
+            email = Email(self.to_address, self.subject, self.results[0][1],
+                          html_pre_body=self.html_pre_body)
+            email.traces = traces
+            return email
+
+        body = ['This email contains the results of {0} submissions. The '
+                'results of the most recent submission are first.'
+                .format(len(self.results))]
+
+        for result_time, result_body, _ in reversed(self.results):
+            time_string = strftime('%Y-%m-%d %H:%M:%S %Z',
+                                   localtime(result_time))
+            body.append('')
+            body.append('===== Results from {0} ====='.format(time_string))
+            body.append('')
+            body.append(result_body)
+
+        email = Email(self.to_address, self.subject, body,
+                      html_pre_body=self.html_pre_body)
+        email.traces = traces
+
+        return email
+
+
+class ResultDigestThread(Thread):
+    """
+    Provides a Thread which combines results emails and hands them to the
+    email sender when their digest window ends.
+
+    Usage:
+
+    Call the inherited start() method to start the thread.
+
+    Shutdown the thread by calling shutdown(). Pending digests are sent
+    before the thread exits. Shut this thread down before the email sender.
+
+    Add results by calling add().
+
+    Call enable_outbox() before adding results to store them in the database
+    until their digests are sent.
+    """
+
+    def __init__(self):
+        """
+        Construct the object.
+
+        Constructing the object does not start the thread. Call start() to
+        actually start the thread.
+        """
+
+        Thread.__init__(self)
+
+        # (to address, subject) -> ResultDigest
+        self._digests = {}
+        self._lock = Lock()
+
+        self._use_outbox = False
+
+        self._shutdown_flag = False
+
+    def enable_outbox(self) -> int:
+        """
+        Store results in the database's outbox until their digests are sent,
+        and resume the digests that a previous run left in the outbox. Their
+        windows end when they would have if gkeepd had not stopped.
+
+        The database must be connected first.
+
+        :return: the number of results resumed from the outbox
+        """
+
+        self._use_outbox = True
+
+        outbox_results = db.get_outbox_digest_results()
+
+        with self._lock:
+            for result in outbox_results:
+                digest = self._get_digest(result['to_address'],
+                                          result['subject'],
+                                          result['digest_html_pre_body'],
+                                          result['next_attempt_time'])
+                digest.results.append((result['enqueue_time'],
+                                       result['digest_body'], None))
+                digest.outbox_ids.append(result['id'])
+
+        return len(outbox_results)
+
+    def add(self, to_address: str, subject: str, body: str,
+            html_pre_body: bool, window: float, trace=None):
+        """
+        Add a result to the digest for its recipient and subject, starting a
+        new digest if there is none.
+
+        :param to_address: address to send the results to
+        :param subject: subject of the email, which identifies the assignment
+        :param body: the results
+        :param html_pre_body: whether the email is also sent as HTML
+        :param window: seconds to wait for more results before sending
+        :param trace: optional Trace of the submission that was tested
+        """
+
+        if not self.is_alive():
+            email = Email(to_address, subject, body,
+                          html_pre_body=html_pre_body)
+
+            if trace is not None:
+                email.traces = [trace]
+
+            email_sender.enqueue(email)
+            return
+
+        result_time = time()
+
+        with self._lock:
+            digest = self._get_digest(to_address, subject, html_pre_body,
+                                      result_time + window)
+            digest.results.append((result_time, body, trace))
+
+            # stored while holding the lock so the digest cannot be sent
+            # without it
+            if self._use_outbox:
+                self._store_in_outbox(digest, body, result_time)
+
+    def pending_count(self) -> int:
+        """
+        Get the number of results waiting to be sent.
+
+        :return: number of results in all pending digests
+        """
+
+        with self._lock:
+            return sum(len(digest.results)
+                       for digest in self._digests.values())
+
+    def shutdown(self):
+        """
+        Shutdown the thread.
+
+        This method blocks until all pending digests have been handed to the
+        email sender and the thread has died.
+        """
+
+        self._shutdown_flag = True
+        self.join()
+
+    def run(self):
+        """
+        Send digests when their windows end.
+
+        This method should not be called directly. Call the start() method
+        instead.
+
+        Loops until someone calls shutdown().
+        """
+
+        if self._use_outbox:
+            db.open_thread_connection()
+
+        try:
+            while not self._shutdown_flag:
+                self._send_digests(time())
+                sleep(0.1)
+
+            self._send_digests(None)
+        finally:
+            if self._use_outbox:
+                db.close_thread_connection()
+
+    def _get_digest(self, to_address, subject, html_pre_body, send_time):
+        # Get the digest for the recipient and subject, starting one which is
+        # sent at send_time if there is none. Must be called with the lock
+        # held.
+
+        key = (to_address, subject)
+
+        if key not in self._digests:
+            self._digests[key] = ResultDigest(to_address, subject,
+                                              html_pre_body, send_time)
+
+        return self._digests[key]
+
+    def _store_in_outbox(self, digest, body, result_time):
+        # Store a result in the outbox until its digest is sent. If that fails
+        # the result is still sent, it just would not survive a restart.
+
+        try:
+            email = Email(digest.to_address, digest.subject, body,
+                          html_pre_body=digest.html_pre_body)
+            outbox_id = db.insert_outbox_digest_result(
+                digest.to_address, digest.subject, email.message_string,
+                int(email.priority), result_time, digest.send_time, body,
+                digest.html_pre_body)
+            digest.outbox_ids.append(outbox_id)
+        except Exception as e:
+            logger.log_warning('Could not store result for {0} in the '
+                               'outbox: {1}'.format(digest.to_address, e))
+
+    def _send_digests(self, now):
+        # Send the digests whose window ended by now, or all of them if now
+        # is None
+
+        with self._lock:
+            due_keys = [key for key, digest in self._digests.items()
+                        if now is None or digest.send_time <= now]
+            due_digests = [self._digests.pop(key) for key in due_keys]
+
+        for digest in due_digests:
+            try:
+                email = digest.build_email()
+
+                if len(digest.outbox_ids) > 0:
+                    self._replace_in_outbox(digest, email)
+
+                email_sender.enqueue(email)
+            except Exception as e:
+                logger.log_error('Error sending results digest to {0}: {1}'
+                                 .format(digest.to_address, e))
+
+            if len(digest.results) > 1:
+                logger.log_info('Combined {0} results for {1} into one '
+                                'email'.format(len(digest.results),
+                                               digest.to_address))
+
+    def _replace_in_outbox(self, digest, email):
+        # Replace the digest's results in the outbox with the email combining
+        # them, so the email sender does not store it again. If that fails
+        # the email sender stores it, and the results are sent again after a
+        # restart.
+
+        email.enqueue_time = time()
+
+        try:
+            email.outbox_id = db.replace_outbox_digest_results(
+                digest.outbox_ids, email.to_address, email.subject,
+                email.message_string, int(email.priority), email.enqueue_time)
+        except Exception as e:
+            logger.log_warning('Could not replace results for {0} in the '
+                               'outbox: {1}'.format(digest.to_address, e))
+
+
+# module-level instance for global access
+result_digester = ResultDigestThread()
@@ -0,0 +1,169 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides RotatingLogFile, a log file which is rotated when it grows too large
+or too old.
+
+When the file is rotated it is compressed with gzip and renamed to
+<path>.1.gz. Older rotated files are renamed to <path>.2.gz, <path>.3.gz,
+and so on, and the oldest is removed once there are more than backup_count
+of them.
+
+RotatingLogFile is not thread-safe, it is meant to be written to by a single
+logging thread.
+
+Example usage:
+
+    from gkeepserver.rotating_log_file import RotatingLogFile
+
+    # rotate after 100 MB or one day, keeping 5 old files
+    log_file = RotatingLogFile('/home/keeper/gkeepd.log',
+                               max_size=100 * 1024 * 1024,
+                               rotate_interval=24 * 60 * 60,
+                               backup_count=5)
+
+    log_file.write(['first line\n', 'second line\n'])
+    log_file.close()
+
+"""
+
+import gzip
+import os
+import shutil
+from time import time
+
+
+class RotatingLogFile:
+    """
+    A log file which is compressed and replaced with a new file when it grows
+    larger than max_size bytes or older than rotate_interval seconds.
+    """
+
+    def __init__(self, path: str, max_size=0, rotate_interval=0,
+                 backup_count=5, header=None):
+        """
+        Open the file, creating it if it does not exist.
+
+        :param path: path to the log file
+        :param max_size: size in bytes after which the file is rotated, or 0
+         to never rotate by size
+        :param rotate_interval: seconds after which the file is rotated, or 0
+         to never rotate by time
+        :param backup_count: number of rotated files to keep
+        :param header: optional line to write at the top of each new file
+        """
+
+        self.path = path
+        self.max_size = max_size
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self._header = header
+
+        self._file = None
+        self._size = 0
+        self._open_time = 0
+
+        self._open()
+
+    def write(self, lines: list):
+        """
+        Append lines to the file, rotating it first if it is due.
+
+        Raises OSError if the file cannot be written.
+
+        :param lines: lines to write, each ending in a newline
+        """
+
+        if self._rotation_is_due():
+            self.rotate()
+
+        data = ''.join(lines)
+        self._file.write(data)
+        self._file.flush()
+
+        self._size += len(data.encode('utf-8'))
+
+    def rotate(self):
+        """
+        Compress the current file into <path>.1.gz and start a new one.
+
+        Raises OSError if the file cannot be rotated.
+        """
+
+        self._file.close()
+
+        oldest_path = self._backup_path(self.backup_count)
+        if os.path.isfile(oldest_path):
+            os.remove(oldest_path)
+
+        for number in range(self.backup_count - 1, 0, -1):
+            backup_path = self._backup_path(number)
+            if os.path.isfile(backup_path):
+                os.rename(backup_path, self._backup_path(number + 1))
+
+        if self.backup_count > 0:
+            with open(self.path, 'rb') as f_in:
+                with gzip.open(self._backup_path(1), 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+
+        os.remove(self.path)
+
+        self._open()
+
+    def close(self):
+        """
+        Close the file.
+        """
+
+        self._file.close()
+
+    def _open(self):
+        # Open the file for appending, writing the header if the file is new
+
+        is_new = not os.path.isfile(self.path)
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._open_time = time()
+
+        if is_new and self._header is not None:
+            self._file.write(self._header)
+            self._file.flush()
+
+        self._size = os.path.getsize(self.path)
+
+    def _rotation_is_due(self) -> bool:
+        # The file is rotated if it has reached max_size or has been open
+        # for rotate_interval seconds. An empty file is never rotated.
+
+        header_size = len(self._header) if self._header is not None else 0
+
+        if self._size <= header_size:
+            return False
+
+        if self.max_size > 0 and self._size >= self.max_size:
+            return True
+
+        if (self.rotate_interval > 0 and
+                time() - self._open_time >= self.rotate_interval):
+            return True
+
+        return False
+
+    def _backup_path(self, number: int) -> str:
+        # Path to a rotated file, 1 being the most recent
+
+        return '{0}.{1}.gz'.format(self.path, number)
@@ -0,0 +1,194 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a global sampling profiler for finding out where gkeepd's threads
+spend their time without restarting gkeepd.
+
+While the profiler is running, a thread samples the stack of every other
+thread at a fixed interval and counts how many times each stack was seen.
+Stopping the profiler writes the counts in the collapsed stack format used by
+flame graph tools, one stack per line with the frames separated by
+semicolons and followed by the count:
+
+    MainThread;gkeepd.py:main;gkeepd.py:<module> 12
+
+The profiler is toggled by sending gkeepd the SIGUSR1 signal or by running
+gkeepd profile. Profiles are written to the directory
+config.profile_dir_path.
+
+This module stores a SamplingProfiler instance in the module-level variable
+named profiler.
+
+Example usage:
+
+    from gkeepserver.sampling_profiler import profiler
+
+    profiler.start()
+
+    # do things
+
+    path = profiler.stop('/home/keeper/gkeepd_profiles')
+
+"""
+
+import os
+import sys
+from collections import Counter
+from threading import Thread, Lock, enumerate as enumerate_threads, get_ident
+from time import sleep, strftime
+
+from gkeepcore.gkeep_exception import GkeepException
+
+
+class SamplingProfilerError(GkeepException):
+    """Raised if the profiler is started or stopped at the wrong time."""
+    pass
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads in a background thread while running.
+
+    Typically this will be accessed with the provided module-level global
+    instance rather than making an instance directly.
+    """
+
+    def __init__(self):
+        """
+        Construct the object. Call start() to start sampling.
+        """
+
+        self._lock = Lock()
+        self._thread = None
+        self._stop_flag = False
+        self._stack_counts = Counter()
+        self._sample_count = 0
+
+    def is_running(self) -> bool:
+        """
+        Determine whether the profiler is sampling.
+
+        :return: True if sampling, False if not
+        """
+
+        return self._thread is not None
+
+    def start(self, interval=0.01):
+        """
+        Start sampling.
+
+        Raises SamplingProfilerError if the profiler is already running.
+
+        :param interval: seconds between samples
+        """
+
+        with self._lock:
+            if self._thread is not None:
+                raise SamplingProfilerError('The profiler is already running')
+
+            self._stop_flag = False
+            self._stack_counts = Counter()
+            self._sample_count = 0
+
+            self._thread = Thread(target=self._sample_loop, args=(interval,),
+                                  daemon=True)
+            self._thread.start()
+
+    def stop(self, output_dir_path: str) -> str:
+        """
+        Stop sampling and write the collapsed stacks to a new file in a
+        directory, creating the directory if it does not exist.
+
+        Raises SamplingProfilerError if the profiler is not running, and
+        OSError if the file cannot be written.
+
+        :param output_dir_path: directory to write the file to
+        :return: path to the file
+        """
+
+        with self._lock:
+            if self._thread is None:
+                raise SamplingProfilerError('The profiler is not running')
+
+            self._stop_flag = True
+            self._thread.join()
+            self._thread = None
+
+        os.makedirs(output_dir_path, exist_ok=True)
+
+        file_name = 'gkeepd-{}.folded'.format(strftime('%Y%m%d-%H%M%S'))
+        output_path = os.path.join(output_dir_path, file_name)
+
+        with open(output_path, 'w') as f:
+            for stack, count in sorted(self._stack_counts.items()):
+                f.write('{0} {1}\n'.format(stack, count))
+
+        return output_path
+
+    def toggle(self, output_dir_path: str) -> dict:
+        """
+        Start the profiler if it is not running, otherwise stop it.
+
+        :param output_dir_path: directory to write profiles to
+        :return: dictionary with the keys running, whether the profiler is
+         now running, path, the path to the profile that was written or None,
+         and samples, the number of samples in the profile
+        """
+
+        if self.is_running():
+            path = self.stop(output_dir_path)
+            return {'running': False, 'path': path,
+                    'samples': self._sample_count}
+        else:
+            self.start()
+            return {'running': True, 'path': None, 'samples': 0}
+
+    def _sample_loop(self, interval):
+        # Sample until stopped
+
+        while not self._stop_flag:
+            self._sample()
+            sleep(interval)
+
+    def _sample(self):
+        # Count the current stack of every thread but this one
+
+        names = {thread.ident: thread.name for thread in enumerate_threads()}
+        own_ident = get_ident()
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+
+            frames = []
+
+            while frame is not None:
+                code = frame.f_code
+                frames.append('{0}:{1}'.format(
+                    os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+
+            frames.append(names.get(ident, 'thread-{}'.format(ident)))
+            frames.reverse()
+
+            self._stack_counts[';'.join(frames)] += 1
+
+        self._sample_count += 1
+
+
+# module-level instance for global access
+profiler = SamplingProfiler()
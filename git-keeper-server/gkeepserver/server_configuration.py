@@ -58,8 +58,20 @@ Attributes:
     student_group - group that all student accounts belong to
 
     log_file_path - path to system log
+    json_log_file_path - path to the JSON-lines system log
+    privileged_helper_socket_path - path to the privileged helper's socket
+    privileged_helper_log_path - path to the privileged helper's audit log
     db_path - path to gkeepd's SQLite database file
+    metrics_socket_path - path to the metrics server's socket
+    control_socket_path - path to the control server's socket
+    slow_log_file_path - path to the log of slow handlers and test runs
+    profile_dir_path - path to the directory that profiles are written to
     log_level - how detailed the log messages should be
+    log_json - whether to also write the system log as JSON lines
+    log_max_size - size in MB after which the system log is rotated
+    log_rotate_hours - hours after which the system log is rotated
+    log_backup_count - number of rotated system logs to keep
+    log_queue_size - maximum number of messages waiting to be logged
 
     faculty_json_path - path to file containing faculty members
     faculty_log_dir_path - path to directory containing faculty event logs
@@ -67,7 +79,28 @@ Attributes:
     test_thread_count - maximum number of threads for testing student code
     tests_timeout - maximum number of seconds for tests to run
     tests_memory_limit - maximum amount of memory per test, in MB
+    tests_output_limit - maximum amount of test output kept, in KB
+    stage_timeout - seconds each stage of a test run other than the tests
+     themselves may take, and the extra seconds allowed for the tests stage
     default_test_env - default TestEnv for running tests
+    compress_info - whether faculty info files are gzip-compressed
+    use_privileged_helper - whether to perform filesystem operations as root
+     using the privileged helper process instead of sudo
+    use_metrics_socket - whether to serve metrics on a Unix socket
+    use_event_socket - whether to receive events from students' git hooks
+     through the event socket as well as by polling their logs
+    metrics_port - localhost TCP port to serve metrics on, 0 for none
+    slow_log_threshold - seconds after which event handlers and test runs
+     are recorded in the slow log, 0 to disable the slow log
+    trace_retention_days - days to keep the traces of events, 0 to not trace
+     events
+    command_stats - whether to record statistics about each kind of command
+     that is run, for the metrics
+
+    db_journal_mode - SQLite journal mode for the database
+    db_synchronous - SQLite synchronous setting for the database
+    db_cache_size - SQLite page cache size per connection, in KiB
+    db_mmap_size - maximum amount of the database to memory-map, in MiB
 
     from_name - the name that emails are from
     from_address - the address that emails are from
@@ -76,6 +109,16 @@ Attributes:
     email_username - username for the SMTP server
     email_password - password for the SMTP server
     email_interval - minimum amount of time to wait between sending emails
+    smtp_idle_timeout - seconds to keep an idle connection to the SMTP server
+     open
+    email_burst - number of emails that may be sent at once before
+     email_interval applies
+    email_sender_count - number of threads sending emails concurrently
+    email_domain_limits - dictionary mapping recipient domains to
+     (interval, burst) tuples which limit emails sent to those domains
+    email_retry_delay - seconds to wait before the first retry of an email
+     that failed to send
+    email_retry_max_delay - maximum seconds to wait between retries
 """
 
 import configparser
@@ -171,6 +214,22 @@ class ServerConfiguration:
 
         return time() - self._init_time
 
+    def db_pragmas(self) -> dict:
+        """
+        Build the SQLite pragmas to apply to each database connection from the
+        database tuning options.
+
+        :return: dictionary mapping pragma names to values
+        """
+
+        return {
+            'journal_mode': self.db_journal_mode,
+            'synchronous': self.db_synchronous,
+            # a negative cache_size is in KiB rather than pages
+            'cache_size': -self.db_cache_size,
+            'mmap_size': self.db_mmap_size * 1024 * 1024,
+        }
+
     @property
     def run_action_sh_file_path(self):
         """
@@ -193,8 +252,43 @@ class ServerConfiguration:
 
         # logging
         self.log_file_path = os.path.join(self.home_dir, 'gkeepd.log')
+        self.json_log_file_path = os.path.join(self.home_dir,
+                                               'gkeepd.log.jsonl')
 
         self.log_level = LogLevel.DEBUG
+        self.log_json = False
+        self.log_max_size = 100
+        self.log_rotate_hours = 0
+        self.log_backup_count = 5
+        self.log_queue_size = 10000
+
+        # privileged helper
+        self.use_privileged_helper = True
+        self.privileged_helper_socket_path = \
+            os.path.join(self.home_dir, 'gkeepd_helper.sock')
+        self.privileged_helper_log_path = \
+            os.path.join(self.home_dir, 'gkeepd_helper.log')
+
+        # metrics
+        self.use_metrics_socket = True
+        self.metrics_socket_path = os.path.join(self.home_dir,
+                                                'gkeepd_metrics.sock')
+        self.metrics_port = 0
+
+        # control server
+        self.control_socket_path = os.path.join(self.home_dir,
+                                                'gkeepd_control.sock')
+
+        # event socket server
+        self.use_event_socket = True
+
+        # performance analysis
+        self.slow_log_threshold = 0
+        self.slow_log_file_path = os.path.join(self.home_dir,
+                                               'gkeepd_slow.log')
+        self.profile_dir_path = os.path.join(self.home_dir, 'gkeepd_profiles')
+        self.trace_retention_days = 30
+        self.command_stats = True
 
         # database file location
         self.db_path = os.path.join(self.home_dir, 'gkeepd_db.sqlite')
@@ -206,8 +300,19 @@ class ServerConfiguration:
         self.test_thread_count = 1
         self.tests_timeout = 300
         self.tests_memory_limit = 1024
+        self.tests_output_limit = 1024
+        self.stage_timeout = 300
         self.default_test_env = TestEnv.FIREJAIL
 
+        # faculty info files
+        self.compress_info = False
+
+        # database tuning
+        self.db_journal_mode = 'wal'
+        self.db_synchronous = 'normal'
+        self.db_cache_size = 8192
+        self.db_mmap_size = 64
+
         # users and groups
         self.keeper_user = 'keeper'
         self.keeper_group = 'keeper'
@@ -223,6 +328,12 @@ class ServerConfiguration:
         self.email_username = None
         self.email_password = None
         self.email_interval = 2
+        self.smtp_idle_timeout = 30
+        self.email_burst = 1
+        self.email_sender_count = 1
+        self.email_domain_limits = {}
+        self.email_retry_delay = 30
+        self.email_retry_max_delay = 3600
         self.use_html = True
 
         # admin
@@ -275,6 +386,12 @@ class ServerConfiguration:
             'email_username',
             'email_password',
             'email_interval',
+            'smtp_idle_timeout',
+            'email_burst',
+            'email_sender_count',
+            'email_domain_limits',
+            'email_retry_delay',
+            'email_retry_max_delay',
             'use_html',
         ]
 
@@ -297,18 +414,61 @@ class ServerConfiguration:
                     error = '{} must be true or false'.format(attr)
                     raise ServerConfigurationError(error)
 
-        # email_interval must be a non-negative number
-        if isinstance(self.email_interval, str):
+        # these must be non-negative numbers
+        for attr in ('email_interval', 'smtp_idle_timeout',
+                     'email_retry_delay', 'email_retry_max_delay'):
+            if isinstance(getattr(self, attr), str):
+                try:
+                    setattr(self, attr, float(getattr(self, attr)))
+                    if getattr(self, attr) < 0:
+                        raise ValueError
+                except ValueError:
+                    error = '{} must be a non-negative number'.format(attr)
+                    raise ServerConfigurationError(error)
+
+        for name in ('email_burst', 'email_sender_count'):
+            self._ensure_positive_integer(name)
+
+        if isinstance(self.email_domain_limits, str):
+            self.email_domain_limits = \
+                self._parse_email_domain_limits(self.email_domain_limits)
+
+        self._ensure_options_are_valid('email',
+                                       required_options + optional_options)
+
+    def _parse_email_domain_limits(self, value):
+        # Parse a comma-separated list of domain:interval:burst limits. The
+        # burst may be omitted, in which case it is 1.
+
+        domain_limits = {}
+
+        for limit in value.split(','):
+            limit = limit.strip()
+
+            if limit == '':
+                continue
+
             try:
-                self.email_interval = float(self.email_interval)
-                if self.email_interval < 0:
+                fields = limit.split(':')
+
+                if len(fields) == 2:
+                    fields.append('1')
+
+                domain, interval, burst = fields
+                interval = float(interval)
+                burst = int(burst)
+
+                if domain == '' or interval < 0 or burst <= 0:
                     raise ValueError
             except ValueError:
-                error = 'email_interval must be a non-negative number'
+                error = ('{} is not a valid email domain limit, it must be '
+                         'domain:interval or domain:interval:burst'
+                         .format(limit))
                 raise ServerConfigurationError(error)
 
-        self._ensure_options_are_valid('email',
-                                       required_options + optional_options)
+            domain_limits[domain.lower()] = (interval, burst)
+
+        return domain_limits
 
     def _set_server_options(self):
         self._ensure_section_is_present('server')
@@ -374,7 +534,26 @@ class ServerConfiguration:
             'test_thread_count',
             'tests_timeout',
             'tests_memory_limit',
+            'tests_output_limit',
+            'stage_timeout',
             'default_test_env',
+            'compress_info',
+            'use_privileged_helper',
+            'db_journal_mode',
+            'db_synchronous',
+            'db_cache_size',
+            'db_mmap_size',
+            'log_json',
+            'log_max_size',
+            'log_rotate_hours',
+            'log_backup_count',
+            'log_queue_size',
+            'use_metrics_socket',
+            'metrics_port',
+            'use_event_socket',
+            'slow_log_threshold',
+            'trace_retention_days',
+            'command_stats',
         ]
 
         for name in optional_options:
@@ -385,12 +564,16 @@ class ServerConfiguration:
                 value = self._parser.get('gkeepd', name)
                 setattr(self, name, value)
 
-        # test_thread_count, tests_timeout, and tests_memory_limit must be
-        # positive integers
+        # test_thread_count, tests_timeout, tests_memory_limit,
+        # tests_output_limit, and stage_timeout must be positive integers
         positive_integer_options = [
             'test_thread_count',
             'tests_timeout',
-            'tests_memory_limit'
+            'tests_memory_limit',
+            'tests_output_limit',
+            'stage_timeout',
+            'db_cache_size',
+            'log_queue_size',
         ]
 
         for name in positive_integer_options:
@@ -398,8 +581,76 @@ class ServerConfiguration:
 
         self._validate_default_test_env()
 
+        # these must be non-negative integers, 0 disables the feature
+        for attr in ('log_max_size', 'log_rotate_hours', 'log_backup_count',
+                     'metrics_port', 'trace_retention_days'):
+            try:
+                setattr(self, attr, int(getattr(self, attr)))
+                if getattr(self, attr) < 0:
+                    raise ValueError
+            except ValueError:
+                error = '{} must be a non-negative integer'.format(attr)
+                raise ServerConfigurationError(error)
+
+        # slow_log_threshold must be a non-negative number
+        try:
+            self.slow_log_threshold = float(self.slow_log_threshold)
+            if self.slow_log_threshold < 0:
+                raise ValueError
+        except ValueError:
+            error = 'slow_log_threshold must be a non-negative number'
+            raise ServerConfigurationError(error)
+
+        # compress_info, use_privileged_helper, log_json, use_metrics_socket,
+        # use_event_socket, and command_stats must be true or false
+        for attr in ('compress_info', 'use_privileged_helper', 'log_json',
+                     'use_metrics_socket', 'use_event_socket',
+                     'command_stats'):
+            if isinstance(getattr(self, attr), str):
+                if getattr(self, attr).lower() == 'true':
+                    setattr(self, attr, True)
+                elif getattr(self, attr).lower() == 'false':
+                    setattr(self, attr, False)
+                else:
+                    error = '{} must be true or false'.format(attr)
+                    raise ServerConfigurationError(error)
+
+        self._validate_db_options()
+
         self._ensure_options_are_valid('gkeepd', optional_options)
 
+    def _validate_db_options(self):
+        # Ensure the database tuning options have valid values
+
+        valid_journal_modes = ('wal', 'delete', 'truncate', 'persist')
+
+        self.db_journal_mode = self.db_journal_mode.lower()
+
+        if self.db_journal_mode not in valid_journal_modes:
+            error = ('{} is not a valid db_journal_mode, it must be one of: '
+                     '{}'.format(self.db_journal_mode,
+                                 ','.join(valid_journal_modes)))
+            raise ServerConfigurationError(error)
+
+        valid_synchronous_values = ('off', 'normal', 'full', 'extra')
+
+        self.db_synchronous = self.db_synchronous.lower()
+
+        if self.db_synchronous not in valid_synchronous_values:
+            error = ('{} is not a valid db_synchronous, it must be one of: '
+                     '{}'.format(self.db_synchronous,
+                                 ','.join(valid_synchronous_values)))
+            raise ServerConfigurationError(error)
+
+        # db_mmap_size may be 0 to disable memory mapping
+        try:
+            self.db_mmap_size = int(self.db_mmap_size)
+            if self.db_mmap_size < 0:
+                raise ValueError
+        except ValueError:
+            error = 'db_mmap_size must be a non-negative integer'
+            raise ServerConfigurationError(error)
+
     def _validate_default_test_env(self):
 
         valid_default_envs = [
@@ -22,15 +22,20 @@ Supports file attachments and truncating long messages.
 Emails should not be sent directly, but rather enqueued in the global
 EmailSenderThread which provides rate limiting.
 
+SMTPConnection keeps an authenticated connection to the SMTP server open so
+that many emails can be sent without connecting and logging in for each one.
+
 """
 import html
 import os
+from time import time
 from email.header import Header
 from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from enum import IntEnum
-from smtplib import SMTP
+from smtplib import SMTP, SMTPException, SMTPResponseException, \
+    SMTPServerDisconnected
 
 from gkeepcore.gkeep_exception import GkeepException
 from gkeepserver.server_configuration import config
@@ -79,17 +84,10 @@ class Email:
          and wrapped in <pre></pre> tags
         """
 
-        self._send_attempts = 0
-        self._max_send_attempts = 10
-        self.last_send_error = ''
-
-        self.to_address = to_address
+        self._initialize_send_state(to_address, subject, priority)
 
-        self._subject = subject
         self._files_to_attach = files_to_attach
 
-        self.priority = priority
-
         # regardless of how the body is passed in, represent it by a list of
         # lines that have trailing whitespace removed
         if isinstance(body, list):
@@ -120,9 +118,57 @@ class Email:
 
         self._build_mime_message(files_to_attach, html_pre_body)
 
+    @classmethod
+    def from_outbox(cls, outbox_email: dict):
+        """
+        Rebuild an email that was stored in the outbox.
+
+        :param outbox_email: dictionary describing the email, as returned by
+         Database.get_outbox_emails()
+        :return: the email
+        """
+
+        email = cls.__new__(cls)
+
+        email._initialize_send_state(outbox_email['to_address'],
+                                     outbox_email['subject'],
+                                     EmailPriority(outbox_email['priority']))
+
+        email._files_to_attach = None
+        email.message_string = outbox_email['message']
+        email._send_attempts = outbox_email['send_attempts']
+        email.last_send_error = outbox_email['last_error']
+        email.enqueue_time = outbox_email['enqueue_time']
+        email.outbox_id = outbox_email['id']
+
+        return email
+
+    def _initialize_send_state(self, to_address, subject, priority):
+        # Set the attributes used when sending, which emails rebuilt from the
+        # outbox share with new emails
+
+        self._send_attempts = 0
+        self._max_send_attempts = 10
+        self.last_send_error = ''
+
+        # set by the EmailSenderThread when the email is first enqueued
+        self.enqueue_time = None
+
+        # ID of the email in the outbox, if it is stored there
+        self.outbox_id = None
+
+        # traces of the events whose results are in the email, which record
+        # a hop when the email is sent (see tracing.py)
+        self.traces = []
+
+        self.to_address = to_address
+        self.subject = subject
+
+        self.priority = priority
+
     def __repr__(self):
         repr_string = 'To: {0}, Subject: {1}'.format(self.to_address,
-                                                     self._subject)
+                                                     self.subject)
         return repr_string
 
     def __lt__(self, other):
@@ -136,7 +182,7 @@ class Email:
         # encode headers
         from_header = Header('{0}'.format(config.from_name), 'utf-8')
         to_header = Header('{0}'.format(self.to_address), 'utf-8')
-        subject_header = Header('{0}'.format(self._subject), 'utf-8')
+        subject_header = Header('{0}'.format(self.subject), 'utf-8')
         reply_to_header = Header('{0}'.format(config.from_address), 'utf-8')
 
         if html_pre_body:
@@ -191,7 +237,16 @@ class Email:
 
         return self._send_attempts >= self._max_send_attempts
 
-    def send(self):
+    def get_send_attempts(self) -> int:
+        """
+        Get the number of times sending this email has been attempted.
+
+        :return: number of send attempts
+        """
+
+        return self._send_attempts
+
+    def send(self, connection=None):
         """
         Send the email right now.
 
@@ -201,19 +256,164 @@ class Email:
         Uses the global ServerConfiguration object to obtain SMTP server
         information.
 
+        :param connection: SMTPConnection to send the email with, or None to
+         connect to the SMTP server just for this email
         """
 
         self._send_attempts += 1
 
+        if connection is not None:
+            connection.send(config.from_address, self.to_address,
+                            self.message_string)
+            return
+
+        connection = SMTPConnection()
+
+        try:
+            connection.send(config.from_address, self.to_address,
+                            self.message_string)
+        finally:
+            connection.close()
+
+
+class SMTPConnection:
+    """
+    Sends emails through a connection to the SMTP server which is kept open
+    between emails.
+
+    The connection is opened when the first email is sent. If the connection
+    has been idle for more than config.smtp_idle_timeout seconds it is closed
+    and a new one is opened, since servers drop idle connections. If sending
+    over an existing connection fails because the server closed it, the
+    email is sent again over a new connection.
+
+    Call close_if_idle() periodically so that idle connections are not left
+    open, and close() when done sending.
+
+    An SMTPConnection is not thread-safe.
+    """
+
+    def __init__(self):
+        """
+        Construct the object. No connection is made until the first email is
+        sent.
+        """
+
+        self._server = None
+        self._last_use_time = 0
+
+        # number of connections opened, for diagnostics
+        self.connection_count = 0
+
+    def is_open(self) -> bool:
+        """
+        Determine whether or not there is an open connection.
+
+        :return: True if a connection is open, False otherwise
+        """
+
+        return self._server is not None
+
+    def send(self, from_address: str, to_address: str, message_string: str):
+        """
+        Send an email, opening a connection first if necessary.
+
+        Raises an SMTPException or OSError if the email cannot be sent.
+
+        :param from_address: address the email is from
+        :param to_address: address to send the email to
+        :param message_string: the entire message, including headers
+        """
+
+        self.close_if_idle()
+
+        if self._server is not None:
+            try:
+                self._sendmail(from_address, to_address, message_string)
+                return
+            except (SMTPException, OSError) as e:
+                if not _is_connection_error(e):
+                    raise
+
+                # the server closed the connection, so try a new one
+                self.close()
+
+        self._connect()
+        self._sendmail(from_address, to_address, message_string)
+
+    def close_if_idle(self):
+        """
+        Close the connection if it has not been used for more than
+        config.smtp_idle_timeout seconds.
+        """
+
+        if (self._server is not None and
+                time() - self._last_use_time > config.smtp_idle_timeout):
+            self.close()
+
+    def close(self):
+        """
+        Close the connection, if one is open.
+        """
+
+        if self._server is None:
+            return
+
+        server = self._server
+        self._server = None
+
+        try:
+            server.quit()
+        except (SMTPException, OSError):
+            server.close()
+
+    def _connect(self):
+        # Open and authenticate a new connection. The connection is only
+        # stored if every step succeeds.
+
         server = SMTP(config.smtp_server, config.smtp_port)
-        server.ehlo()
 
-        if config.use_tls:
-            server.starttls()
+        try:
+            server.ehlo()
+
+            if config.use_tls:
+                server.starttls()
+
+            if config.email_username and config.email_password:
+                server.login(config.email_username, config.email_password)
+        except (SMTPException, OSError):
+            server.close()
+            raise
+
+        self._server = server
+        self._last_use_time = time()
+        self.connection_count += 1
+
+    def _sendmail(self, from_address, to_address, message_string):
+        # Send over the open connection, forgetting the connection if the
+        # server dropped it
+
+        try:
+            self._server.sendmail(from_address, to_address, message_string)
+        except (SMTPException, OSError) as e:
+            if _is_connection_error(e):
+                self._server.close()
+                self._server = None
+            raise
+        finally:
+            self._last_use_time = time()
+
+
+def _is_connection_error(e: Exception) -> bool:
+    # Determine whether an exception raised while sending means the
+    # connection is no longer usable. Errors such as a refused recipient
+    # leave the connection usable, since smtplib resets the session.
+
+    if isinstance(e, SMTPServerDisconnected):
+        return True
 
-        if config.email_username and config.email_password:
-            server.login(config.email_username, config.email_password)
+    # 421 means the server is closing the connection
+    if isinstance(e, SMTPResponseException):
+        return e.smtp_code == 421
 
-        server.sendmail(config.from_address, self.to_address,
-                        self.message_string)
-        server.quit()
+    return not isinstance(e, SMTPException)
@@ -0,0 +1,184 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides print_status(), drain(), and toggle_profile(), which communicate
+with a running gkeepd through its control socket. These are run by an admin
+with gkeepd status, gkeepd drain, and gkeepd profile.
+"""
+
+from time import sleep
+
+from gkeepcore.gkeep_exception import GkeepException
+from gkeepserver.control_server import send_control_command, ControlServerError
+from gkeepserver.server_configuration import config, ServerConfigurationError
+
+
+def print_status():
+    """
+    Print what a running gkeepd is doing.
+
+    If there are any errors, a GkeepException is raised.
+    """
+
+    _parse_config()
+
+    status = send_control_command(config.control_socket_path, 'status')
+
+    print(format_status(status))
+
+
+def drain(poll_interval=1):
+    """
+    Tell a running gkeepd to finish the work that is queued and shut down,
+    and print its progress until it has shut down.
+
+    If there are any errors, a GkeepException is raised.
+
+    :param poll_interval: seconds between progress updates
+    """
+
+    _parse_config()
+
+    send_control_command(config.control_socket_path, 'drain')
+
+    print('Draining gkeepd')
+
+    while True:
+        try:
+            status = send_control_command(config.control_socket_path,
+                                          'status')
+        except ControlServerError:
+            # the socket is removed once gkeepd has shut down
+            break
+
+        waiting_count = sum(status['queues'].values())
+        running_count = len(status['handlers']) + len(status['tests'])
+
+        print('{0} items queued, {1} running'.format(waiting_count,
+                                                     running_count))
+
+        sleep(poll_interval)
+
+    print('gkeepd has shut down')
+
+
+def toggle_profile():
+    """
+    Start the sampling profiler in a running gkeepd if it is not running,
+    otherwise stop it, and print the result.
+
+    If there are any errors, a GkeepException is raised.
+    """
+
+    _parse_config()
+
+    result = send_control_command(config.control_socket_path, 'profile')
+
+    if result['running']:
+        print('Profiler started. Run gkeepd profile again to stop it.')
+    else:
+        print('Profiler stopped, wrote {0} samples to {1}'
+              .format(result['samples'], result['path']))
+
+
+def format_status(status: dict) -> str:
+    """
+    Format the result of the status command for printing.
+
+    :param status: the status
+    :return: the status as text
+    """
+
+    lines = ['gkeepd version {0}, up {1}'
+             .format(status['version'], _duration_string(status['uptime']))]
+
+    if status['draining']:
+        lines.append('Draining, gkeepd will shut down when queued work is '
+                     'finished')
+
+    lines.append('')
+    lines.append('Running event handlers:')
+    for handler in status['handlers']:
+        lines.append('    {0} ({1})'.format(handler['handler'],
+                                            _duration_string(
+                                                handler['elapsed'])))
+    if not status['handlers']:
+        lines.append('    none')
+
+    lines.append('')
+    lines.append('Running tests:')
+    for test in status['tests']:
+        lines.append('    {0} {1} {2} for {3} ({4})'
+                     .format(test['faculty'], test['class_name'],
+                             test['assignment'], test['student'],
+                             _duration_string(test['elapsed'])))
+    if not status['tests']:
+        lines.append('    none')
+
+    lines.append('')
+    lines.append('Queued submissions:')
+    for queued in status['queued_submissions']:
+        lines.append('    {0} {1}: {2}'.format(queued['faculty'],
+                                               queued['class_name'],
+                                               queued['count']))
+    if not status['queued_submissions']:
+        lines.append('    none')
+
+    lines.append('')
+    lines.append('Queue lengths:')
+    for name, length in sorted(status['queues'].items()):
+        lines.append('    {0}: {1}'.format(name, length))
+
+    lags = status['log_file_lags']
+    behind = sorted(((lag, path) for path, lag in lags.items() if lag > 0),
+                    reverse=True)
+
+    lines.append('')
+    lines.append('Watching {0} log files, {1} with unread events:'
+                 .format(len(lags), len(behind)))
+    for lag, path in behind:
+        lines.append('    {0}: {1} bytes'.format(path, lag))
+
+    email = status['email']
+    lines.append('')
+    lines.append('Emails: {0} waiting, {1} sent, {2} failed'
+                 .format(email['queue_length'], email['sent'],
+                         email['failed']))
+
+    return '\n'.join(lines)
+
+
+def _parse_config():
+    # Parse the server configuration, raising a GkeepException on errors
+
+    try:
+        config.parse()
+    except ServerConfigurationError as e:
+        raise GkeepException(e)
+
+
+def _duration_string(seconds: float) -> str:
+    # Format a number of seconds as H:MM:SS, or as seconds if less than a
+    # minute
+
+    if seconds < 60:
+        return '{0:.1f} s'.format(seconds)
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return '{0}:{1:02}:{2:02}'.format(hours, minutes, seconds)
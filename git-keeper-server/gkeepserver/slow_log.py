@@ -0,0 +1,119 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides a slow log which records event handlers and test runs that take
+longer than the slow_log_threshold in the server configuration, along with
+how long each of their stages took.
+
+Each entry is a line of JSON in the file at config.slow_log_file_path, and a
+warning is also logged in the gkeepd log. Stages are timed with a
+StageTimer.
+
+Example usage:
+
+    from gkeepserver.slow_log import StageTimer, record_if_slow
+
+    timer = StageTimer()
+    start_time = time()
+
+    with timer.stage('clone'):
+        clone_the_repository()
+
+    with timer.stage('test'):
+        run_the_tests()
+
+    record_if_slow('run_tests', 'tests for hw1', time() - start_time,
+                   timer, faculty='prof')
+
+"""
+
+import json
+from contextlib import contextmanager
+from time import time
+
+from gkeepcore.log_file import append_to_log
+from gkeepserver.gkeepd_logger import gkeepd_logger as logger
+from gkeepserver.server_configuration import config
+
+
+class StageTimer:
+    """
+    Records how long each stage of an operation takes.
+    """
+
+    def __init__(self):
+        # list of (stage name, seconds) tuples in the order they ran
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager which times the code in its block as a stage.
+
+        :param name: name of the stage
+        """
+
+        start_time = time()
+
+        try:
+            yield
+        finally:
+            self.stages.append((name, time() - start_time))
+
+
+def record_if_slow(operation: str, description: str, duration: float,
+                   timer: StageTimer, **fields) -> bool:
+    """
+    Record an operation in the slow log if it took at least
+    slow_log_threshold seconds. Nothing is recorded if the threshold is 0.
+
+    :param operation: kind of operation, such as handle or run_tests
+    :param description: description of what was done
+    :param duration: seconds that the operation took
+    :param timer: the timer used to time the operation's stages
+    :param fields: additional fields to record, such as faculty
+    :return: True if the operation was recorded, False if not
+    """
+
+    threshold = config.slow_log_threshold
+
+    if threshold == 0 or duration < threshold:
+        return False
+
+    entry = {
+        'time': time(),
+        'operation': operation,
+        'description': description,
+        'duration': duration,
+        'stages': [[name, seconds] for name, seconds in timer.stages],
+    }
+    entry.update(fields)
+
+    stages = ', '.join('{0} {1:.3f}'.format(name, seconds)
+                       for name, seconds in timer.stages)
+
+    logger.log_warning('Slow {0}: {1} took {2:.3f} seconds ({3})'
+                       .format(operation, description, duration, stages),
+                       duration=duration, **fields)
+
+    try:
+        append_to_log(config.slow_log_file_path,
+                      [json.dumps(entry, default=str) + '\n'])
+    except OSError as e:
+        logger.log_error('Error writing to the slow log: {0}'.format(e))
+
+    return True
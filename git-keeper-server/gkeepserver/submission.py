@@ -20,8 +20,10 @@ on the submission.
 """
 
 import os
+import shutil
 from time import strftime, time
 from tempfile import TemporaryDirectory, mkdtemp
+from uuid import uuid4
 
 from gkeepcore.temp_paths import TempPaths
 from gkeepserver.directory_locks import directory_locks
@@ -35,15 +37,31 @@ from gkeepcore.git_commands import git_clone, git_add_all, git_commit, \
     git_checkout
 from gkeepcore.assignment_config import AssignmentConfig, TestEnv
 from gkeepcore.system_commands import cp, sudo_chown, rm, chmod, mv
-from gkeepcore.shell_command import run_command, CommandExitCodeError
+from gkeepcore.shell_command import (run_command, run_command_to_file,
+                                     command_deadline, CommandError,
+                                     CommandExitCodeError, CommandTimeoutError)
 from gkeepserver.email_sender_thread import email_sender
 from gkeepserver.info_update_thread import info_updater
+from gkeepserver.metrics import metrics
 from gkeepserver.reports import reports_clone
 from gkeepserver.server_configuration import config
+from gkeepserver.result_digest_thread import result_digester
 from gkeepserver.server_email import Email
+from gkeepserver.slow_log import StageTimer, record_if_slow
 from gkeepcore.path_utils import user_home_dir
 
 
+_test_run_seconds = metrics.histogram('gkeepd_test_run_seconds',
+                                      'Seconds taken to test submissions')
+
+_truncated_outputs = metrics.counter('gkeepd_test_outputs_truncated_total',
+                                     'Number of test runs whose output was '
+                                     'truncated')
+
+# seconds to wait for docker to kill a container that timed out
+DOCKER_KILL_TIMEOUT = 30
+
+
 class Submission:
     """
     Stores student submission information and allows test running.
@@ -51,7 +69,7 @@ class Submission:
 
     def __init__(self, student: Student, student_repo_path, commit_hash,
                  assignment_dir: AssignmentDirectory, faculty_username,
-                 faculty_email):
+                 faculty_email, digest_window=None, trace=None):
         """
         Simply assign the attributes.
 
@@ -60,6 +78,10 @@ class Submission:
         :param commit_hash: the hash of the commit of the submission
         :param faculty_email: email address of the faculty that owns the
          assignment
+        :param digest_window: seconds over which to combine results emails,
+         overriding the assignment's results_digest_window, or None
+        :param trace: Trace following the submission event, or None if the
+         submission is not traced
         """
 
         self.assignment_dir = assignment_dir
@@ -73,6 +95,11 @@ class Submission:
         self.class_name = assignment_dir.class_name
         self.assignment_name = assignment_dir.assignment_name
         self.config_path = assignment_dir.config_path
+        self.digest_window = digest_window
+        self.trace = trace
+
+        # name of the docker container the tests run in, if any
+        self._container_name = None
 
     def run_tests(self):
         """
@@ -87,6 +114,16 @@ class Submission:
 
         Creates a directory in the tester user's home directory in which to
         run the tests.
+
+        The output of the tests is written to a file in another temporary
+        directory as it is produced, and is truncated after
+        config.tests_output_limit KB. The email and the report are built from
+        this file.
+
+        Each stage has a deadline. Running the tests may take the tests
+        timeout plus config.stage_timeout seconds, and every other stage may
+        take config.stage_timeout seconds. The commands of a stage that
+        misses its deadline are killed, and the stage is logged.
         """
 
         if not db.class_is_open(self.class_name, self.faculty_username):
@@ -98,59 +135,108 @@ class Submission:
             self._send_disabled_email()
             return
 
-        logger.log_debug('Running tests on {0}'.format(self.student_repo_path))
+        log_fields = {
+            'faculty': self.faculty_username,
+            'class_name': self.class_name,
+            'assignment': self.assignment_name,
+        }
+
+        if self.trace is not None:
+            log_fields.update(self.trace.log_fields())
+
+        logger.log_debug('Running tests on {0}'.format(self.student_repo_path),
+                         **log_fields)
 
+        start_time = time()
+        timer = StageTimer()
         temp_path = ''
+        output_dir = TemporaryDirectory()
+        output_path = os.path.join(output_dir.name, 'output.txt')
+
+        self._trace_hop('test_start', start_time)
 
         try:
             # An exception raised in this block is considered a failure to
             # run the tests, and both the student and faculty user will be
             # notified
 
-            temp_path = mkdtemp(dir=user_home_dir(config.tester_user),
-                                prefix='{}_'.format(int(time())))
+            with timer.stage('setup'), command_deadline(config.stage_timeout):
+                temp_path = mkdtemp(dir=user_home_dir(config.tester_user),
+                                    prefix='{}_'.format(int(time())))
 
-            paths = TempPaths(temp_path, self.assignment_name)
+                paths = TempPaths(temp_path, self.assignment_name)
 
-            with directory_locks.get_lock(self.assignment_dir.path):
-                assignment_cfg_path = self.assignment_dir.config_path
-                assignment_cfg = AssignmentConfig(assignment_cfg_path,
-                                                  config.default_test_env)
+                with directory_locks.get_lock(self.assignment_dir.path):
+                    assignment_cfg_path = self.assignment_dir.config_path
+                    assignment_cfg = AssignmentConfig(assignment_cfg_path,
+                                                      config.default_test_env)
 
-            self._setup_temp_dir(paths, assignment_cfg)
+                self._setup_temp_dir(paths, assignment_cfg)
 
-            cmd = self._make_action_command(paths, assignment_cfg)
+                cmd = self._make_action_command(paths, assignment_cfg)
 
-            try:
-                body = run_command(cmd)
-            except CommandExitCodeError as e:
-                # Exit code 124 is raised on a timeout
-                if e.exit_code == 124:
-                    body = ('Tests timed out. Either the submitted code '
-                            'took too long to run or there is an issue '
-                            'with the tests themselves.')
-                else:
-                    raise e
+            if assignment_cfg.timeout is not None:
+                tests_timeout = assignment_cfg.timeout
+            else:
+                tests_timeout = config.tests_timeout
 
-            self._email_results(body, assignment_cfg)
+            tests_deadline = int(tests_timeout) + config.stage_timeout
 
-            if self.student.username != self.faculty_username:
-                with directory_locks.get_lock(self.assignment_dir.path):
-                    self._add_report(body)
-                info_updater.enqueue_submission_scan(self.faculty_username,
-                                                     self.class_name,
-                                                     self.assignment_name,
-                                                     self.student.username)
+            with timer.stage('tests'), command_deadline(tests_deadline):
+                self._run_action_command(cmd, output_path)
+
+            self._trace_hop('tests_done')
+
+            with timer.stage('email'):
+                with open(output_path, encoding='utf-8',
+                          errors='replace') as f:
+                    body = f.read()
+
+                self._email_results(body, assignment_cfg)
 
+            self._trace_hop('email_enqueued')
+
+            if self.student.username != self.faculty_username:
+                with timer.stage('report'), \
+                        command_deadline(config.stage_timeout):
+                    with directory_locks.get_lock(self.assignment_dir.path):
+                        self._add_report(output_path)
+                    self._trace_hop('report_committed')
+                    info_updater.enqueue_submission_scan(
+                        self.faculty_username, self.class_name,
+                        self.assignment_name, self.student.username)
+
+        except CommandTimeoutError as e:
+            # the stage that timed out is the last one timed
+            stage = timer.stages[-1][0]
+            self._log_stage_timeout(stage, e, log_fields)
+            report_failure(self.assignment_name, self.student,
+                           self.faculty_email,
+                           'Timed out in the {0} stage: {1}'.format(stage, e))
         except Exception as e:
             report_failure(self.assignment_name, self.student,
                            self.faculty_email, str(e))
         finally:
-            if os.path.isdir(temp_path):
-                rm(temp_path, recursive=True, sudo=True)
+            with timer.stage('cleanup'):
+                try:
+                    if os.path.isdir(temp_path):
+                        with command_deadline(config.stage_timeout):
+                            rm(temp_path, recursive=True, sudo=True)
+                except CommandTimeoutError as e:
+                    self._log_stage_timeout('cleanup', e, log_fields)
+
+                output_dir.cleanup()
+
+        duration = time() - start_time
+        _test_run_seconds.observe(duration)
+
+        record_if_slow('run_tests', 'tests on {0}'
+                       .format(self.student_repo_path), duration, timer,
+                       **log_fields)
 
-        logger.log_debug('Done running tests on {0}'
-                         .format(self.student_repo_path))
+        logger.log_debug('Done running tests on {0} in {1:.3f} seconds'
+                         .format(self.student_repo_path, duration),
+                         duration=duration, **log_fields)
 
     def _setup_temp_dir(self, paths: TempPaths,
                         assignment_cfg: AssignmentConfig):
@@ -183,7 +269,62 @@ class Submission:
         sudo_chown(paths.temp_path, config.tester_user, config.keeper_group,
                    recursive=True)
 
-    def _add_report(self, body):
+    def _run_action_command(self, cmd, output_path):
+        # Run the tests, writing the output to output_path with a notice
+        # added if it was truncated
+
+        max_bytes = config.tests_output_limit * 1024
+
+        try:
+            truncated = run_command_to_file(cmd, output_path, max_bytes)
+        except CommandTimeoutError:
+            # killing the docker CLI does not stop the container
+            if self._container_name is not None:
+                self._kill_container()
+            raise
+        except CommandExitCodeError as e:
+            # Exit code 124 is raised on a timeout
+            if e.exit_code == 124:
+                with open(output_path, 'w') as f:
+                    f.write('Tests timed out. Either the submitted code '
+                            'took too long to run or there is an issue '
+                            'with the tests themselves.')
+                return
+            else:
+                raise e
+
+        if truncated:
+            _truncated_outputs.inc()
+
+            with open(output_path, 'a') as f:
+                f.write('\n\nATTENTION: The output of the tests was truncated '
+                        'after {0} KB. If important information seems '
+                        'missing, contact your instructor.\n'
+                        .format(config.tests_output_limit))
+
+    def _kill_container(self):
+        # Kill the container the tests are running in. Failing to kill it is
+        # not an error, since it may have stopped on its own.
+
+        try:
+            with command_deadline(DOCKER_KILL_TIMEOUT):
+                run_command(['docker', 'kill', self._container_name])
+        except CommandError as e:
+            logger.log_warning('Could not kill container {0}: {1}'
+                               .format(self._container_name, e))
+
+    def _log_stage_timeout(self, stage, error, log_fields):
+        # Record that a stage of the test run did not finish in time
+
+        metrics.counter('gkeepd_test_stage_timeouts_total',
+                        'Number of test runs stopped because a stage did '
+                        'not finish in time', labels={'stage': stage}).inc()
+
+        logger.log_warning('Tests on {0} timed out in the {1} stage: {2}'
+                           .format(self.student_repo_path, stage, error),
+                           stage=stage, **log_fields)
+
+    def _add_report(self, output_path):
         # Add the results of running tests to the reports repository
         with reports_clone(self.assignment_dir) as temp_reports_repo_path:
             last_first_username = self.student.get_last_first_username()
@@ -205,8 +346,7 @@ class Submission:
                                                 report_filename)
                 counter += 1
 
-            with open(report_file_path, 'w') as f:
-                f.write(body)
+            shutil.copyfile(output_path, report_file_path)
 
             for placeholder_filename in ('.placeholder', 'no_submission'):
                 placeholder_path = os.path.join(student_report_dir_path,
@@ -231,8 +371,29 @@ class Submission:
         subject = (assignment_cfg.results_subject
                    .format(class_name=self.class_name,
                            assignment_name=self.assignment_name))
-        email_sender.enqueue(Email(self.student.email_address, subject,
-                                   body, html_pre_body=html_pre_body))
+
+        if self.digest_window is not None:
+            digest_window = self.digest_window
+        else:
+            digest_window = assignment_cfg.results_digest_window
+
+        if digest_window is not None:
+            result_digester.add(self.student.email_address, subject, body,
+                                html_pre_body, digest_window,
+                                trace=self.trace)
+        else:
+            email = Email(self.student.email_address, subject, body,
+                          html_pre_body=html_pre_body)
+
+            if self.trace is not None:
+                email.traces = [self.trace]
+
+            email_sender.enqueue(email)
+
+    def _trace_hop(self, name, timestamp=None):
+        # Record a hop in the submission's trace, if it has one
+        if self.trace is not None:
+            self.trace.hop(name, timestamp)
 
     def _make_action_command(self, paths: TempPaths,
                              assignment_cfg: AssignmentConfig):
@@ -258,7 +419,10 @@ class Submission:
 
     def _make_docker_command(self, paths: TempPaths,
                              assignment_cfg: AssignmentConfig):
-        return ['docker', 'run', '--pull', 'never', '-v',
+        self._container_name = 'gkeepd-{}'.format(uuid4().hex)
+
+        return ['docker', 'run', '--pull', 'never',
+                '--name', self._container_name, '-v',
                 '{}:/git-keeper-tester'.format(paths.temp_path),
                 assignment_cfg.image, 'bash',
                 '/git-keeper-tester/run_action.sh',
@@ -23,6 +23,9 @@ New submissions are pulled from the global new_submission_queue.
 
 from queue import Empty
 from threading import Thread
+from time import time
+
+from gkeepserver.database import db
 from gkeepserver.gkeepd_logger import gkeepd_logger as logger
 from gkeepserver.new_submission_queue import new_submission_queue
 
@@ -41,8 +44,21 @@ class SubmissionTestThread(Thread):
         # set to True when shutdown() is called
         self._shutdown_flag = False
 
+        # (submission, start time) of the submission being tested, or None
+        self._current_submission = None
+
         self.start()
 
+    def current_submission(self):
+        """
+        Get the submission that is currently being tested, if any.
+
+        :return: tuple of the submission and the time testing started, or
+         None
+        """
+
+        return self._current_submission
+
     def shutdown(self):
         """
         Shut down the thread.
@@ -62,17 +78,28 @@ class SubmissionTestThread(Thread):
         #
         # Do not call this method directly.
 
-        while not self._shutdown_flag:
-            try:
-                # consume all submissions in the queue before shutdown
-                while True:
-                    submission = new_submission_queue.get(block=True,
-                                                          timeout=0.1)
-                    submission.run_tests()
-
-            # get() raises Empty when there is nothing in the queue after
-            # timeout seconds
-            except Empty:
-                pass
-            except Exception as e:
-                logger.log_error('Error while running tests: {0}'.format(e))
+        db.open_thread_connection()
+
+        try:
+            while not self._shutdown_flag:
+                try:
+                    # consume all submissions in the queue before shutdown
+                    while True:
+                        submission = new_submission_queue.get(block=True,
+                                                              timeout=0.1)
+                        self._current_submission = (submission, time())
+
+                        try:
+                            submission.run_tests()
+                        finally:
+                            self._current_submission = None
+
+                # get() raises Empty when there is nothing in the queue after
+                # timeout seconds
+                except Empty:
+                    pass
+                except Exception as e:
+                    logger.log_error('Error while running tests: {0}'
+                                     .format(e))
+        finally:
+            db.close_thread_connection()
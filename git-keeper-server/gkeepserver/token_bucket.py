@@ -0,0 +1,118 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides TokenBucket, a thread-safe rate limiter which allows bursts.
+
+A bucket holds at most burst tokens and gains a token every interval seconds.
+Each action takes a token, so up to burst actions can happen at once, after
+which actions happen at most once every interval seconds on average.
+
+Example usage:
+
+    from gkeepserver.token_bucket import TokenBucket
+
+    # 10 emails at once, then one every 2 seconds
+    bucket = TokenBucket(interval=2, burst=10)
+
+    for email in emails:
+        bucket.acquire()
+        email.send()
+
+"""
+
+from threading import Lock
+from time import monotonic, sleep
+
+
+class TokenBucket:
+    """
+    Rate limiter which allows an action at most every interval seconds on
+    average, with bursts of up to burst actions.
+
+    The bucket starts full.
+    """
+
+    def __init__(self, interval: float, burst=1):
+        """
+        Construct the bucket.
+
+        :param interval: seconds it takes to gain a token. If 0, actions are
+         not limited.
+        :param burst: maximum number of tokens in the bucket
+        """
+
+        self.interval = interval
+        self.burst = burst
+
+        self._tokens = burst
+        self._last_refill_time = monotonic()
+
+        self._lock = Lock()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a token if one is available, without waiting.
+
+        :return: True if a token was taken, False otherwise
+        """
+
+        with self._lock:
+            self._refill()
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+
+            return False
+
+    def acquire(self):
+        """
+        Take a token, waiting until one is available.
+        """
+
+        while not self.try_acquire():
+            sleep(self.wait_time())
+
+    def wait_time(self) -> float:
+        """
+        Get the number of seconds until a token will be available.
+
+        :return: seconds until a token is available, 0 if one is available
+         now
+        """
+
+        with self._lock:
+            self._refill()
+
+            if self._tokens >= 1:
+                return 0
+
+            return (1 - self._tokens) * self.interval
+
+    def _refill(self):
+        # Add the tokens gained since the last refill. Must be called with
+        # the lock held.
+
+        now = monotonic()
+
+        if self.interval == 0:
+            self._tokens = self.burst
+        else:
+            gained = (now - self._last_refill_time) / self.interval
+            self._tokens = min(self.burst, self._tokens + gained)
+
+        self._last_refill_time = now
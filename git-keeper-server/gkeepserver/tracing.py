@@ -0,0 +1,249 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Provides Trace, which ties together the stages that an event passes through
+in gkeepd with a correlation id, and a global thread which stores the time at
+which each trace passed each stage in the database.
+
+A trace is created when the log poller reads an event. The trace follows the
+event to its handler, and for a submission, to the test thread and to the
+emails with the results. At each stage ("hop") the time is recorded:
+
+    logged - the event was written to the log (the event's timestamp)
+    polled - the log poller read the event
+    assigned - a handler was created for the event
+    handle_start, handle_end - the handler ran
+    queued - a submission was put in the new submission queue
+    test_start, tests_done - the tests were run
+    email_enqueued - the results email was handed to the email sender
+    report_committed - the results were committed to the reports repository
+    email_sent - the results email was sent
+
+Traces of submissions that were triggered by faculty or resumed from the
+outbox after a restart are not followed to the end.
+
+This module stores a TraceRecorderThread instance in the module-level
+variable named trace_recorder. Call start() on this instance to start the
+thread. Until the thread is started, hops are only kept in memory.
+
+Example usage:
+
+    from gkeepserver.tracing import Trace, trace_recorder
+
+    trace_recorder.start()
+
+    trace = Trace('SUBMISSION', origin_time=log_event.timestamp)
+    trace.hop('polled')
+
+    trace_recorder.shutdown()
+
+"""
+
+from queue import Queue, Empty
+from threading import Thread, Lock
+from time import time
+from uuid import uuid4
+
+from gkeepserver.database import db
+from gkeepserver.gkeepd_logger import gkeepd_logger as logger
+
+
+class Trace:
+    """
+    A correlation id for an event and the times at which it passed each
+    stage in gkeepd.
+    """
+
+    def __init__(self, event_type: str, origin_time=None):
+        """
+        Create a trace with a new id. The first hop, logged, is at
+        origin_time.
+
+        :param event_type: type of the event being traced
+        :param origin_time: time the event was logged, or None for now
+        """
+
+        self.trace_id = uuid4().hex
+        self.event_type = event_type
+
+        # set as they become known
+        self.faculty_username = None
+        self.class_name = None
+        self.assignment_name = None
+
+        if origin_time is None:
+            origin_time = time()
+
+        self.start_time = origin_time
+
+        # list of (hop name, time) tuples
+        self.hops = []
+        self._lock = Lock()
+
+        self.hop('logged', origin_time)
+
+    def describe(self, faculty_username: str, class_name=None,
+                 assignment_name=None):
+        """
+        Record who and what the traced event is for.
+
+        :param faculty_username: faculty member the event is for
+        :param class_name: class the event is for, if any
+        :param assignment_name: assignment the event is for, if any
+        """
+
+        self.faculty_username = faculty_username
+
+        if class_name is not None:
+            self.class_name = class_name
+
+        if assignment_name is not None:
+            self.assignment_name = assignment_name
+
+    def hop(self, name: str, timestamp=None):
+        """
+        Record that the event passed a stage.
+
+        :param name: name of the stage
+        :param timestamp: time the stage was passed, or None for now
+        """
+
+        if timestamp is None:
+            timestamp = time()
+
+        with self._lock:
+            self.hops.append((name, timestamp))
+
+        trace_recorder.record(self, name, timestamp)
+
+    def log_fields(self) -> dict:
+        """
+        Get fields that identify the trace for the JSON-lines gkeepd log.
+
+        :return: dictionary of fields to pass to the gkeepd logger
+        """
+
+        return {'trace_id': self.trace_id}
+
+
+class TraceRecorderThread(Thread):
+    """
+    Provides a Thread which stores trace hops in the database in batches.
+
+    Usage:
+
+    Call the inherited start() method to start the thread.
+
+    Shutdown the thread by calling shutdown(). Hops that are waiting are
+    stored before the thread exits.
+
+    Hops are recorded by Trace.hop().
+    """
+
+    def __init__(self):
+        """
+        Construct the object.
+
+        Constructing the object does not start the thread. Call start() to
+        actually start the thread.
+        """
+
+        Thread.__init__(self)
+
+        self._hop_queue = Queue()
+        self._shutdown_flag = False
+
+    def record(self, trace: Trace, name: str, timestamp: float):
+        """
+        Queue a hop to be stored. Nothing is stored if the thread has not
+        been started.
+
+        :param trace: the trace
+        :param name: name of the hop
+        :param timestamp: time of the hop
+        """
+
+        if not self.is_alive():
+            return
+
+        trace_row = {
+            'trace_id': trace.trace_id,
+            'event_type': trace.event_type,
+            'faculty_username': trace.faculty_username,
+            'class_name': trace.class_name,
+            'assignment_name': trace.assignment_name,
+            'start_time': trace.start_time,
+        }
+
+        self._hop_queue.put((trace_row, name, timestamp))
+
+    def queue_length(self) -> int:
+        """
+        Get the number of hops waiting to be stored.
+
+        :return: number of waiting hops
+        """
+
+        return self._hop_queue.qsize()
+
+    def shutdown(self):
+        """
+        Shutdown the thread.
+
+        This method blocks until the waiting hops have been stored and the
+        thread has died.
+        """
+
+        self._shutdown_flag = True
+        self.join()
+
+    def run(self):
+        """
+        Store hops in batches.
+
+        This method should not be called directly. Call the start() method
+        instead.
+
+        Loops until someone calls shutdown().
+        """
+
+        db.open_thread_connection()
+
+        try:
+            while not self._shutdown_flag or not self._hop_queue.empty():
+                try:
+                    hops = [self._hop_queue.get(block=True, timeout=0.1)]
+                except Empty:
+                    continue
+
+                try:
+                    while True:
+                        hops.append(self._hop_queue.get(block=False))
+                except Empty:
+                    pass
+
+                try:
+                    db.insert_trace_hops(hops)
+                except Exception as e:
+                    logger.log_error('Error storing trace hops: {0}'
+                                     .format(e))
+        finally:
+            db.close_thread_connection()
+
+
+# module-level instance for global access
+trace_recorder = TraceRecorderThread()
@@ -0,0 +1,214 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures gkeepd database latency under a mixed load of concurrent readers and
+writers, comparing the rollback journal with write-ahead logging.
+
+Reader threads do the lookups that test threads and the info updater do for
+every submission. Writer threads do the writes that the log poller and the
+event handler thread do. Time spent waiting for locks shows up as latency.
+
+Usage:
+
+    python bench_database_concurrency.py [seconds] [reader_count]
+
+The defaults are 5 seconds per configuration and 4 readers.
+"""
+
+import os
+import sys
+from tempfile import TemporaryDirectory
+from threading import Thread, Event
+from time import perf_counter
+
+from gkeepcore.student import Student
+from gkeepserver.database import Database
+from gkeepserver.faculty import Faculty
+
+
+CONFIGURATIONS = (
+    ('delete/full', {'journal_mode': 'delete', 'synchronous': 'full'}),
+    ('wal/normal', {'journal_mode': 'wal', 'synchronous': 'normal',
+                    'cache_size': -8192, 'mmap_size': 64 * 1024 * 1024}),
+)
+
+CLASS_COUNT = 5
+STUDENTS_PER_CLASS = 100
+ASSIGNMENT_COUNT = 10
+
+
+def populate(db: Database):
+    """
+    Add a faculty member with classes, students, and assignments.
+
+    :param db: connected Database
+    """
+
+    db.insert_faculty(Faculty('last', 'first', 'prof', 'prof@school.edu',
+                              False), set())
+
+    for class_index in range(CLASS_COUNT):
+        class_name = 'class{}'.format(class_index)
+        db.insert_class(class_name, 'prof')
+
+        for assignment_index in range(ASSIGNMENT_COUNT):
+            db.insert_assignment(class_name,
+                                 'hw{}'.format(assignment_index), 'prof')
+
+        for student_index in range(STUDENTS_PER_CLASS):
+            email = 's{}_{}@school.edu'.format(class_index, student_index)
+            student = Student('last', 'first', None, email)
+            student = db.insert_student(student, set())
+            db.add_student_to_class(class_name, student, 'prof')
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Get a percentile from a sorted list.
+
+    :param sorted_values: sorted list of values
+    :param fraction: percentile as a fraction, such as 0.99
+    :return: the value at the percentile
+    """
+
+    if len(sorted_values) == 0:
+        return 0.0
+
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+
+    return sorted_values[index]
+
+
+def reader(db: Database, stop: Event, latencies: list, errors: list):
+    """
+    Repeatedly perform the lookups done while handling a submission.
+    """
+
+    db.open_thread_connection()
+
+    try:
+        i = 0
+        while not stop.is_set():
+            class_name = 'class{}'.format(i % CLASS_COUNT)
+            assignment_name = 'hw{}'.format(i % ASSIGNMENT_COUNT)
+
+            start = perf_counter()
+            try:
+                db.class_is_open(class_name, 'prof')
+                db.is_published(class_name, assignment_name, 'prof')
+                db.is_disabled(class_name, assignment_name, 'prof')
+                db.get_class_students(class_name, 'prof')
+            except Exception as e:
+                errors.append(e)
+            latencies.append(perf_counter() - start)
+
+            i += 1
+    finally:
+        db.close_thread_connection()
+
+
+def writer(db: Database, stop: Event, latencies: list, errors: list):
+    """
+    Repeatedly perform small writes like those done by the log poller and
+    the event handlers.
+    """
+
+    db.open_thread_connection()
+
+    try:
+        i = 0
+        while not stop.is_set():
+            class_name = 'class{}'.format(i % CLASS_COUNT)
+            assignment_name = 'hw{}'.format(i % ASSIGNMENT_COUNT)
+
+            start = perf_counter()
+            try:
+                db.update_byte_counts({'/home/s/s.log': i})
+                db.set_published(class_name, assignment_name, 'prof')
+            except Exception as e:
+                errors.append(e)
+            latencies.append(perf_counter() - start)
+
+            i += 1
+    finally:
+        db.close_thread_connection()
+
+
+def run_configuration(pragmas: dict, seconds: float, reader_count: int):
+    """
+    Run the mixed load against a new database file.
+
+    :param pragmas: pragmas to pass to Database.connect()
+    :param seconds: how long to run the load
+    :param reader_count: number of reader threads
+    :return: tuple of (reader latencies, writer latencies, error count)
+    """
+
+    with TemporaryDirectory() as temp_dir_path:
+        db = Database()
+        db.connect(os.path.join(temp_dir_path, 'gkeepd_db.sqlite'), pragmas)
+        populate(db)
+        db.close_thread_connection()
+
+        stop = Event()
+        reader_latencies = []
+        writer_latencies = []
+        errors = []
+
+        threads = [Thread(target=reader,
+                          args=(db, stop, reader_latencies, errors))
+                   for _ in range(reader_count)]
+        threads.append(Thread(target=writer,
+                              args=(db, stop, writer_latencies, errors)))
+
+        for thread in threads:
+            thread.start()
+
+        stop.wait(seconds)
+        stop.set()
+
+        for thread in threads:
+            thread.join()
+
+    return sorted(reader_latencies), sorted(writer_latencies), len(errors)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    reader_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print('{0} readers, 1 writer, {1} seconds per configuration'
+          .format(reader_count, seconds))
+    print('{0:<14}{1:>8}{2:>10}{3:>10}{4:>10}{5:>8}{6:>10}{7:>10}{8:>8}'
+          .format('config', 'reads', 'r p50 ms', 'r p99 ms', 'r max ms',
+                  'writes', 'w p50 ms', 'w p99 ms', 'errors'))
+
+    for name, pragmas in CONFIGURATIONS:
+        reads, writes, error_count = run_configuration(pragmas, seconds,
+                                                       reader_count)
+
+        print('{0:<14}{1:>8}{2:>10.2f}{3:>10.2f}{4:>10.2f}{5:>8}{6:>10.2f}'
+              '{7:>10.2f}{8:>8}'
+              .format(name, len(reads), percentile(reads, 0.5) * 1000,
+                      percentile(reads, 0.99) * 1000,
+                      percentile(reads, 1.0) * 1000, len(writes),
+                      percentile(writes, 0.5) * 1000,
+                      percentile(writes, 0.99) * 1000, error_count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures FacultyClassInfo queries over a large info dictionary, comparing
+them with equivalent queries that walk the nested info dictionaries.
+
+Usage:
+
+    python bench_faculty_class_info.py [class_count] [student_count]
+
+The defaults are 10 classes and 3000 students.
+"""
+
+import sys
+
+from gkeepcore.faculty_class_info import FacultyClassInfo
+
+from bench_info_encoding import time_call
+from synthetic_info import build_info
+
+
+def walk_recent(info_dict: dict, cutoff_time) -> int:
+    """
+    Find recent submissions the way gkeep list recent did before
+    FacultyClassInfo had indexes: build the list of students who submitted,
+    then look up each student's submission count, time, and name, with each
+    lookup starting from the top of the info dictionary.
+
+    :param info_dict: the info dictionary
+    :param cutoff_time: Unix time of the oldest submission to include
+    :return: number of recent submissions
+    """
+
+    count = 0
+
+    for class_name in info_dict:
+        for assignment in info_dict[class_name]['assignments']:
+            submitted = []
+
+            for username in info_dict[class_name]['students']:
+                repos = (info_dict[class_name]['assignments'][assignment]
+                         ['students_repos'])
+                if repos[username]['submission_count'] != 0:
+                    submitted.append(username)
+
+            recent = []
+
+            for username in submitted:
+                repos = (info_dict[class_name]['assignments'][assignment]
+                         ['students_repos'])
+
+                if repos[username]['submission_count'] == 0:
+                    continue
+
+                submission_time = repos[username]['time']
+
+                if submission_time >= cutoff_time:
+                    students = info_dict[class_name]['students']
+                    recent.append((submission_time,
+                                   students[username]['first'],
+                                   students[username]['last'], username))
+
+            recent.sort()
+            count += len(recent)
+
+    return count
+
+
+def indexed_recent(info: FacultyClassInfo, cutoff_time) -> int:
+    """
+    Find recent submissions using FacultyClassInfo.recent_submissions().
+
+    :param info: the FacultyClassInfo object
+    :param cutoff_time: Unix time of the oldest submission to include
+    :return: number of recent submissions
+    """
+
+    count = 0
+
+    for class_name in info.class_list():
+        for assignment in info.assignment_list(class_name):
+            for submission_time, username in \
+                    info.recent_submissions(class_name, assignment,
+                                            cutoff_time):
+                info.student_first_name(class_name, username)
+                info.student_last_name(class_name, username)
+                count += 1
+
+    return count
+
+
+def walk_usernames_from_names(info_dict: dict) -> int:
+    """
+    Look up every student's username from their name with a linear search
+    per lookup.
+
+    :param info_dict: the info dictionary
+    :return: number of names found
+    """
+
+    found = 0
+
+    for class_info in info_dict.values():
+        students = class_info['students']
+
+        for student in students.values():
+            name = '{0}, {1}'.format(student['last'], student['first'])
+
+            for username, other in students.items():
+                if '{0}, {1}'.format(other['last'], other['first']) == name:
+                    found += 1
+                    break
+
+    return found
+
+
+def indexed_usernames_from_names(info: FacultyClassInfo) -> int:
+    """
+    Look up every student's username from their name using
+    FacultyClassInfo.get_username_from_name().
+
+    :param info: the FacultyClassInfo object
+    :return: number of names found
+    """
+
+    found = 0
+
+    for class_name in info.class_list():
+        for student in info.class_students(class_name).values():
+            name = '{0}, {1}'.format(student['last'], student['first'])
+
+            if info.get_username_from_name(class_name, name) is not None:
+                found += 1
+
+    return found
+
+
+def main():
+    class_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    student_count = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+
+    info_dict = build_info(class_count, student_count)
+
+    # the synthetic submission times span 10000000 seconds, so this cutoff
+    # includes about one day's worth of submissions
+    cutoff_time = 1700000000 + 10000000 - 24 * 60 * 60
+
+    print('{0} classes, {1} students'.format(class_count, student_count))
+    print('{0:<24}{1:>12}{2:>12}{3:>12}'.format('query', 'walk ms',
+                                                'cold ms', 'warm ms'))
+
+    # "cold" includes building the indexes on a new object, "warm" reuses
+    # an object whose indexes have already been built
+    for name, walk, indexed in (
+            ('recent submissions',
+             lambda: walk_recent(info_dict, cutoff_time),
+             lambda info: indexed_recent(info, cutoff_time)),
+            ('username from name',
+             lambda: walk_usernames_from_names(info_dict),
+             indexed_usernames_from_names)):
+
+        assert walk() == indexed(FacultyClassInfo(info_dict))
+
+        walk_ms = time_call(walk, repeat=3)
+        cold_ms = time_call(lambda: indexed(FacultyClassInfo(info_dict)))
+
+        warm_info = FacultyClassInfo(info_dict)
+        indexed(warm_info)
+        warm_ms = time_call(lambda: indexed(warm_info))
+
+        print('{0:<24}{1:>12.1f}{2:>12.1f}{3:>12.1f}'.format(name, walk_ms,
+                                                            cold_ms, warm_ms))
+
+
+if __name__ == '__main__':
+    main()
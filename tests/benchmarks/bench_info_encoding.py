@@ -0,0 +1,79 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Compares the size and decoding time of plain and compressed info files.
+
+Usage:
+
+    python bench_info_encoding.py [class_count] [student_count]
+
+The defaults are 10 classes and 3000 students.
+"""
+
+import sys
+from time import perf_counter
+
+from gkeepcore.faculty_class_info import encode_info, FacultyClassInfo
+
+from synthetic_info import build_info
+
+
+def time_call(function, repeat=5) -> float:
+    """
+    Call a function several times and return the fastest time.
+
+    :param function: function that takes no arguments
+    :param repeat: number of times to call the function
+    :return: fastest time in milliseconds
+    """
+
+    best = None
+
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        elapsed = perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best * 1000
+
+
+def main():
+    class_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    student_count = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+
+    info = build_info(class_count, student_count)
+
+    print('{0} classes, {1} students'.format(class_count, student_count))
+    print('{0:<12}{1:>14}{2:>14}{3:>14}'.format('encoding', 'bytes',
+                                                'encode ms', 'decode ms'))
+
+    for name, compress in (('json', False), ('json.gz', True)):
+        encoded = encode_info(info, compress)
+
+        encode_ms = time_call(lambda: encode_info(info, compress))
+        decode_ms = time_call(lambda: FacultyClassInfo.from_bytes(encoded))
+
+        print('{0:<12}{1:>14,}{2:>14.1f}{3:>14.1f}'.format(name, len(encoded),
+                                                          encode_ms,
+                                                          decode_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Counts the processes spawned and the time taken by the filesystem operations
+that gkeepd performs as root for each submission when running commands, when
+using the privileged helper, and when performing them in-process as gkeepd
+does when it runs as root.
+
+For each submission gkeepd moves run_action.sh into place, gives the tester
+ownership of the temporary directory, removes it afterwards, and installs a
+new info file, class shard, and manifest, each of which is a chown, chmod,
+and mv, and removes the oldest info file and the old shard.
+
+Must be run as root, or as a user that can run sudo without a password.
+If sudo is not installed and this is run as root, the operations are run
+without sudo, so each one spawns a single process instead of two.
+
+Usage:
+
+    python bench_privileged_helper.py [submission_count]
+
+The default is 50 submissions.
+"""
+
+import os
+import subprocess
+import sys
+from shutil import which
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from gkeepcore.shell_command import run_command
+from gkeepcore.system_commands import (chmod, mkdir, mv, rm, sudo_chown,
+                                       this_group, this_user,
+                                       use_native_commands)
+from gkeepserver.privileged_helper import PrivilegedHelper
+
+
+spawn_count = 0
+
+
+def count_spawns():
+    """
+    Count every child process started with the subprocess module.
+    """
+
+    execute_child = subprocess.Popen._execute_child
+
+    def counting_execute_child(*args, **kwargs):
+        global spawn_count
+        spawn_count += 1
+        return execute_child(*args, **kwargs)
+
+    subprocess.Popen._execute_child = counting_execute_child
+
+
+def chown(path, sudo, recursive=False):
+    """
+    Change a path's ownership as root, without sudo if sudo is False.
+    """
+
+    if not sudo:
+        command = ['chown', '{}:{}'.format(this_user(), this_group()), path]
+        if recursive:
+            command.insert(1, '-R')
+        run_command(command)
+    else:
+        sudo_chown(path, this_user(), this_group(), recursive=recursive)
+
+
+def install_file(temp_dir_path, dest_path, sudo):
+    """
+    Install a file the way the info updater does.
+    """
+
+    temp_path = os.path.join(temp_dir_path, 'temp_info')
+
+    with open(temp_path, 'w') as f:
+        f.write('{}')
+
+    chown(temp_path, sudo)
+    chmod(temp_path, '640', sudo=sudo)
+    mv(temp_path, dest_path, sudo=sudo)
+
+
+def submission(base_path, index, sudo):
+    """
+    Perform the operations done as root for one submission.
+    """
+
+    test_path = os.path.join(base_path, 'tester', 'test{}'.format(index))
+    info_path = os.path.join(base_path, 'info')
+    shards_path = os.path.join(base_path, 'info_shards')
+
+    os.makedirs(os.path.join(test_path, 'tests'))
+    with open(os.path.join(base_path, 'run_action.sh'), 'w') as f:
+        f.write('#!/bin/sh\n')
+
+    mv(os.path.join(base_path, 'run_action.sh'), test_path, sudo=sudo)
+    chown(test_path, sudo, recursive=True)
+    rm(test_path, recursive=True, sudo=sudo)
+
+    install_file(base_path, os.path.join(info_path, '{}.json'.format(index)),
+                 sudo)
+    rm(os.path.join(info_path, '{}.json'.format(index - 1)), sudo=sudo)
+
+    install_file(base_path, os.path.join(shards_path,
+                                         'class.{}.json'.format(index)), sudo)
+    install_file(base_path, os.path.join(shards_path, 'manifest.json'), sudo)
+    rm(os.path.join(shards_path, 'class.{}.json'.format(index - 1)),
+       sudo=sudo)
+
+
+def run(submission_count, helper: PrivilegedHelper, native: bool):
+    """
+    Perform the operations for a number of submissions.
+
+    :return: tuple of (spawns, seconds)
+    """
+
+    use_native_commands(native)
+
+    sudo = native or helper is not None or which('sudo') is not None
+
+    with TemporaryDirectory() as base_path:
+        for name in ('tester', 'info', 'info_shards'):
+            mkdir(os.path.join(base_path, name))
+
+        if helper is not None:
+            helper.start(os.path.join(base_path, 'helper.sock'),
+                         os.path.join(base_path, 'helper.log'))
+
+        try:
+            spawns_before = spawn_count
+            start = perf_counter()
+
+            for index in range(submission_count):
+                submission(base_path, index, sudo)
+
+            return spawn_count - spawns_before, perf_counter() - start
+        finally:
+            if helper is not None:
+                helper.shutdown()
+
+
+def main():
+    submission_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    count_spawns()
+
+    if which('sudo') is None:
+        print('sudo is not installed, running commands directly')
+
+    print('{0} submissions'.format(submission_count))
+    print('{0:<10}{1:>10}{2:>16}{3:>16}'.format('mode', 'spawns',
+                                                'spawns/subm', 'ms/subm'))
+
+    modes = (
+        ('commands', None, False),
+        ('helper', PrivilegedHelper(), False),
+    )
+
+    # sudo=True operations are only performed in-process as root
+    if os.geteuid() == 0:
+        modes += (('native', None, True),)
+
+    for name, helper, native in modes:
+        spawns, seconds = run(submission_count, helper, native)
+
+        print('{0:<10}{1:>10}{2:>16.1f}{3:>16.2f}'
+              .format(name, spawns, spawns / submission_count,
+                      seconds * 1000 / submission_count))
+
+    print('the helper itself is started with a single spawn')
+
+
+if __name__ == '__main__':
+    main()
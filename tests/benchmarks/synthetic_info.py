@@ -0,0 +1,122 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Builds synthetic faculty info dictionaries for benchmarks.
+
+The dictionaries have the same structure as the ones written by gkeepd's info
+update thread. See gkeepcore.faculty_class_info for a description of the
+structure.
+"""
+
+import random
+from hashlib import sha1
+
+
+def _fake_hash(*parts) -> str:
+    # Build a deterministic 40 character hex string, like a git commit hash
+
+    return sha1('/'.join(str(part) for part in parts)
+                .encode('utf-8')).hexdigest()
+
+
+def build_info(class_count=10, student_count=3000, assignment_count=10,
+               faculty_username='faculty', seed=0) -> dict:
+    """
+    Build a synthetic info dictionary.
+
+    Students are divided evenly among the classes and every student has a
+    repository for every assignment in their class.
+
+    :param class_count: number of classes
+    :param student_count: total number of students across all classes
+    :param assignment_count: number of assignments per class
+    :param faculty_username: username of the faculty who owns the classes
+    :param seed: seed for the random number generator
+    :return: the info dictionary
+    """
+
+    rng = random.Random(seed)
+    students_per_class = student_count // class_count
+    base_time = 1700000000
+
+    info = {}
+
+    for class_index in range(class_count):
+        class_name = 'cs{0}'.format(100 + class_index)
+
+        students = {}
+
+        for student_index in range(students_per_class):
+            username = 's{0}_{1}'.format(class_index, student_index)
+            first = 'First{0}'.format(student_index)
+            last = 'Last{0}'.format(student_index)
+
+            students[username] = {
+                'email_address': '{0}@example.edu'.format(username),
+                'first': first,
+                'home_dir': '/home/{0}'.format(username),
+                'last': last,
+                'last_first_username': '{0}_{1}_{2}'.format(last.lower(),
+                                                            first.lower(),
+                                                            username),
+                'username': username,
+            }
+
+        assignments = {}
+
+        for assignment_index in range(assignment_count):
+            assignment_name = 'hw{0:02d}'.format(assignment_index)
+
+            students_repos = {}
+
+            for username, student in students.items():
+                submission_count = rng.randint(0, 5)
+                students_repos[username] = {
+                    'first': student['first'],
+                    'hash': _fake_hash(class_name, assignment_name, username,
+                                       submission_count),
+                    'last': student['last'],
+                    'path': '{0}/{1}/{2}/{3}.git'.format(student['home_dir'],
+                                                         faculty_username,
+                                                         class_name,
+                                                         assignment_name),
+                    'submission_count': submission_count,
+                    'time': base_time + rng.randint(0, 10000000),
+                }
+
+            reports_path = ('/home/{0}/.gitkeeper/classes/{1}/{2}/reports.git'
+                            .format(faculty_username, class_name,
+                                    assignment_name))
+
+            assignments[assignment_name] = {
+                'name': assignment_name,
+                'published': True,
+                'disabled': False,
+                'reports_repo': {
+                    'hash': _fake_hash(reports_path),
+                    'path': reports_path,
+                },
+                'students_repos': students_repos,
+            }
+
+        info[class_name] = {
+            'open': True,
+            'assignments': assignments,
+            'students': students,
+        }
+
+    return info
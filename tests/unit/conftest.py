@@ -0,0 +1,147 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Fixtures shared by the unit tests.
+
+smtp_server provides a minimal SMTP server running in a thread, and points
+the email settings in the server configuration at it.
+
+gkeepd_log collects the messages logged with the gkeepd logger without
+starting it.
+"""
+
+
+import socketserver
+from queue import Queue
+from threading import Thread
+
+import pytest
+
+from gkeepserver.gkeepd_logger import gkeepd_logger
+from gkeepserver.server_configuration import config
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP to accept messages from smtplib.
+    """
+
+    def reply(self, line):
+        self.wfile.write('{}\r\n'.format(line).encode())
+
+    def handle(self):
+        server = self.server
+        server.connection_count += 1
+
+        self.reply('220 stand-in ready')
+
+        recipients = []
+
+        for line in self.rfile:
+            command = line.decode().rstrip('\r\n')
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.reply('250-stand-in')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'AUTH':
+                server.login_count += 1
+                self.reply('235 authenticated')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 ok')
+            elif verb == 'RCPT':
+                if 'refused' in command:
+                    self.reply('550 no such user')
+                else:
+                    recipients.append(command)
+                    self.reply('250 ok')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                for data_line in self.rfile:
+                    if data_line == b'.\r\n':
+                        break
+                server.messages.append(recipients)
+                self.reply('250 queued')
+
+                if server.drop_after_message:
+                    return
+            elif verb == 'RSET':
+                self.reply('250 ok')
+            elif verb == 'QUIT':
+                server.quit_count += 1
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+
+        self.connection_count = 0
+        self.login_count = 0
+        self.quit_count = 0
+        self.messages = []
+
+        # close the connection after each message, like a server that drops
+        # idle connections
+        self.drop_after_message = False
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = SMTPStandIn()
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    settings = {
+        'smtp_server': '127.0.0.1',
+        'smtp_port': server.server_address[1],
+        'use_tls': False,
+        'email_username': 'keeper',
+        'email_password': 'password',
+        'smtp_idle_timeout': 30,
+        'email_interval': 0,
+        'email_burst': 1,
+        'email_sender_count': 1,
+        'email_domain_limits': {},
+        'email_retry_delay': 0,
+        'email_retry_max_delay': 0,
+        'from_name': 'git-keeper',
+        'from_address': 'keeper@example.com',
+    }
+
+    for name, value in settings.items():
+        monkeypatch.setattr(config, name, value, raising=False)
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gkeepd_log(monkeypatch):
+    # the logger queues messages for its thread, which is never started
+    log_queue = Queue()
+    monkeypatch.setattr(gkeepd_logger, '_new_line_queue', log_queue)
+
+    yield log_queue
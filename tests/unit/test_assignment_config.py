@@ -18,6 +18,7 @@ def test_non_existent_file():
     assert config.use_html is None
     assert config.announcement_subject == '[{class_name}] New assignment: {assignment_name}'
     assert config.results_subject == '[{class_name}] {assignment_name} submission test results'
+    assert config.results_digest_window is None
 
 
 def test_good_firejail_no_args():
@@ -69,6 +70,7 @@ def test_good_default_firejail_all_other_options():
     assert config.use_html is False
     assert config.announcement_subject == 'New: {class_name} {assignment_name}'
     assert config.results_subject == 'Results: {class_name} {assignment_name}'
+    assert config.results_digest_window == 300
 
 
 def test_good_docker():
@@ -142,3 +144,11 @@ def test_good_option_bad_section():
 
     with pytest.raises(GkeepException):
         AssignmentConfig(path)
+
+
+def test_bad_email_digest_window():
+    path = 'assignment_configs/bad_email_digest_window.cfg'
+    assert os.path.isfile(path)
+
+    with pytest.raises(GkeepException):
+        AssignmentConfig(path)
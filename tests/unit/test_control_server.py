@@ -0,0 +1,107 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.control_server and gkeepserver.server_status
+"""
+
+
+import os
+import socket
+
+import pytest
+
+from gkeepserver.control_server import (ControlServer, ControlServerError,
+                                        send_control_command)
+from gkeepserver.server_status import format_status
+
+
+@pytest.fixture
+def control_socket_path(tmp_path, gkeepd_log):
+    socket_path = os.path.join(str(tmp_path), 'control.sock')
+
+    def fail():
+        raise ValueError('failed')
+
+    server = ControlServer()
+    server.register('echo', lambda text='': {'echo': text})
+    server.register('fail', fail)
+    server.start(socket_path)
+
+    yield socket_path
+
+    server.shutdown()
+
+    assert not os.path.exists(socket_path)
+
+
+def test_commands(control_socket_path):
+    assert os.stat(control_socket_path).st_mode & 0o777 == 0o600
+
+    result = send_control_command(control_socket_path, 'echo', text='hi')
+    assert result == {'echo': 'hi'}
+
+    with pytest.raises(ControlServerError, match='Unknown command'):
+        send_control_command(control_socket_path, 'other')
+
+    with pytest.raises(ControlServerError, match='failed'):
+        send_control_command(control_socket_path, 'fail')
+
+
+def test_malformed_request(control_socket_path):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(control_socket_path)
+    connection.sendall(b'not json\n{"command": "echo"}\n')
+
+    with connection.makefile('rb') as f:
+        assert f.readline() == b'{"ok": false, "error": "Malformed request"}\n'
+        assert f.readline() == b'{"ok": true, "result": {"echo": ""}}\n'
+
+    connection.close()
+
+
+def test_no_server(tmp_path):
+    socket_path = os.path.join(str(tmp_path), 'control.sock')
+
+    with pytest.raises(ControlServerError):
+        send_control_command(socket_path, 'status')
+
+
+def test_format_status():
+    status = {
+        'version': '1.0.0',
+        'uptime': 3725,
+        'draining': True,
+        'handlers': [{'handler': 'Submission handler', 'elapsed': 1.25}],
+        'tests': [{'faculty': 'prof', 'class_name': 'cs1',
+                   'assignment': 'hw1', 'student': 'stu', 'elapsed': 61}],
+        'queued_submissions': [{'faculty': 'prof', 'class_name': 'cs1',
+                                'count': 3}],
+        'queues': {'new_submission': 3, 'email': 0},
+        'log_file_lags': {'/a.log': 0, '/b.log': 20},
+        'email': {'queue_length': 0, 'sent': 5, 'failed': 1},
+    }
+
+    text = format_status(status)
+
+    assert 'gkeepd version 1.0.0, up 1:02:05' in text
+    assert 'Draining' in text
+    assert '    Submission handler (1.2 s)' in text
+    assert '    prof cs1 hw1 for stu (0:01:01)' in text
+    assert '    prof cs1: 3' in text
+    assert 'Watching 2 log files, 1 with unread events:' in text
+    assert '    /b.log: 20 bytes' in text
+    assert 'Emails: 0 waiting, 5 sent, 1 failed' in text
@@ -1,8 +1,13 @@
+import os
+import sqlite3
+from threading import Thread
+
 import pytest
 
 from gkeepcore.assignment import Assignment
 from gkeepcore.student import Student
-from gkeepserver.database import Database, DatabaseException
+from gkeepserver.database import (Database, DatabaseException, database,
+                                  SCHEMA_VERSION)
 from gkeepserver.faculty import Faculty
 
 
@@ -535,3 +540,328 @@ def test_insert_users_with_existing_users(db):
                                         user_exists=True)
 
     assert faculty_student.username == 'user1'
+
+
+def test_insert_students(db):
+    faculty = Faculty('last', 'first', 'faculty', 'faculty@school.edu',
+                      False)
+    db.insert_faculty(faculty, [])
+
+    students = [
+        Student('last', 'first', None, 'user@school.edu'),
+        Student('last', 'first', None, 'user@other.edu'),
+        Student('last', 'first', None, 'Faculty@school.edu'),
+    ]
+
+    db.insert_students(students, ['user'])
+
+    assert [student.username for student in students] == \
+        ['user1', 'user2', 'faculty']
+
+    users = db.get_users_by_email(['USER@school.edu', 'faculty@school.edu',
+                                   'nobody@school.edu'])
+
+    assert users == {
+        'user@school.edu': {'username': 'user1', 'is_faculty': False,
+                            'is_student': True},
+        'faculty@school.edu': {'username': 'faculty', 'is_faculty': True,
+                               'is_student': True},
+    }
+
+    # inserting a student twice inserts nothing
+    with pytest.raises(DatabaseException):
+        db.insert_students([Student('last', 'first', None, 'new@school.edu'),
+                            Student('last', 'first', None,
+                                    'user@school.edu')], [])
+
+    assert not db.email_exists('new@school.edu')
+
+
+def test_add_students_to_class(db):
+    faculty = Faculty('last', 'first', 'faculty', 'faculty@school.edu',
+                      False)
+    db.insert_faculty(faculty, [])
+    db.insert_class('class', 'faculty')
+
+    students = [Student('last', 'first', None, 'student{}@school.edu'
+                        .format(i)) for i in range(450)]
+    db.insert_students(students, [])
+
+    db.add_students_to_class('class', students[:300], 'faculty')
+
+    assert len(db.get_class_students('class', 'faculty')) == 300
+    assert db.students_in_class(['STUDENT0@school.edu', 'student299@school.edu',
+                                 'student300@school.edu'], 'class',
+                                'faculty') == \
+        {'student0@school.edu', 'student299@school.edu'}
+
+    # one student already in the class means none are added
+    with pytest.raises(DatabaseException):
+        db.add_students_to_class('class', students[299:], 'faculty')
+
+    assert len(db.get_class_students('class', 'faculty')) == 300
+
+    with pytest.raises(DatabaseException):
+        db.add_students_to_class('class',
+                                 [Student('last', 'first', None,
+                                          'nobody@school.edu')],
+                                 'faculty')
+
+
+def test_state_cache_invalidation(db):
+    faculty = Faculty('last', 'first', 'faculty', 'faculty@school.edu',
+                      False)
+    db.insert_faculty(faculty, [])
+    db.insert_class('class', 'faculty')
+    db.insert_assignment('class', 'assgn', 'faculty')
+
+    assert db.class_is_open('class', 'faculty')
+    assert db.class_is_open('class', 'faculty')
+    db.close_class('class', 'faculty')
+    assert not db.class_is_open('class', 'faculty')
+    db.open_class('class', 'faculty')
+    assert db.class_is_open('class', 'faculty')
+
+    assert not db.is_published('class', 'assgn', 'faculty')
+    assert not db.is_disabled('class', 'assgn', 'faculty')
+    db.set_published('class', 'assgn', 'faculty')
+    assert db.is_published('class', 'assgn', 'faculty')
+    db.disable_assignment('class', 'assgn', 'faculty')
+    assert db.is_disabled('class', 'assgn', 'faculty')
+
+    db.remove_assignment('class', 'assgn', 'faculty')
+
+    with pytest.raises(DatabaseException):
+        db.is_published('class', 'assgn', 'faculty')
+
+    stats = db.get_cache_stats()
+
+    # the second class_is_open() call and the is_disabled() call that
+    # follows is_published() are the only hits
+    assert stats['hits'] == 2
+    assert stats['misses'] == 7
+    assert stats['hit_rate'] == 2 / 9
+
+
+def test_file_database_pragmas_and_thread_connections(tmp_path):
+    db = Database()
+    db.connect(os.path.join(str(tmp_path), 'gkeepd_db.sqlite'),
+               {'journal_mode': 'wal', 'synchronous': 'normal'})
+
+    try:
+        assert database.execute_sql('PRAGMA journal_mode').fetchone()[0] == \
+            'wal'
+        assert database.execute_sql('PRAGMA foreign_keys').fetchone()[0] == 1
+
+        faculty = Faculty('last', 'first', 'faculty', 'faculty@school.edu',
+                          False)
+        db.insert_faculty(faculty, set())
+
+        results = []
+
+        def read_in_thread():
+            db.open_thread_connection()
+            try:
+                results.append(db.faculty_username_exists('faculty'))
+                results.append(database.execute_sql('PRAGMA synchronous')
+                               .fetchone()[0])
+            finally:
+                db.close_thread_connection()
+
+        thread = Thread(target=read_in_thread)
+        thread.start()
+        thread.join()
+
+        # synchronous is reported as a number, and normal is 1
+        assert results == [True, 1]
+    finally:
+        db.close_thread_connection()
+
+
+# The schema created by gkeepd before schema versions were introduced
+VERSION_0_SCHEMA = """
+CREATE TABLE "dbuser" ("id" INTEGER NOT NULL PRIMARY KEY, "email_address" VARCHAR(255) NOT NULL, "username" VARCHAR(255) NOT NULL);
+CREATE UNIQUE INDEX "dbuser_email_address" ON "dbuser" ("email_address");
+CREATE UNIQUE INDEX "dbuser_username" ON "dbuser" ("username");
+CREATE TABLE "dbfacultyuser" ("id" INTEGER NOT NULL PRIMARY KEY, "user_id" INTEGER NOT NULL, "first_name" VARCHAR(255) NOT NULL, "last_name" VARCHAR(255) NOT NULL, "admin" INTEGER NOT NULL, FOREIGN KEY ("user_id") REFERENCES "dbuser" ("id"));
+CREATE UNIQUE INDEX "dbfacultyuser_user_id" ON "dbfacultyuser" ("user_id");
+CREATE TABLE "dbstudentuser" ("id" INTEGER NOT NULL PRIMARY KEY, "user_id" INTEGER NOT NULL, FOREIGN KEY ("user_id") REFERENCES "dbuser" ("id"));
+CREATE UNIQUE INDEX "dbstudentuser_user_id" ON "dbstudentuser" ("user_id");
+CREATE TABLE "dbdummyuser" ("id" INTEGER NOT NULL PRIMARY KEY, "user_id" INTEGER NOT NULL, FOREIGN KEY ("user_id") REFERENCES "dbuser" ("id"));
+CREATE UNIQUE INDEX "dbdummyuser_user_id" ON "dbdummyuser" ("user_id");
+CREATE TABLE "dbclass" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(255) NOT NULL, "faculty_id" INTEGER NOT NULL, "open" INTEGER NOT NULL, FOREIGN KEY ("faculty_id") REFERENCES "dbuser" ("id"));
+CREATE INDEX "dbclass_faculty_id" ON "dbclass" ("faculty_id");
+CREATE UNIQUE INDEX "dbclass_name_faculty_id" ON "dbclass" ("name", "faculty_id");
+CREATE TABLE "dbclassstudent" ("id" INTEGER NOT NULL PRIMARY KEY, "class_id" INTEGER NOT NULL, "user_id" INTEGER NOT NULL, "first_name" VARCHAR(255) NOT NULL, "last_name" VARCHAR(255) NOT NULL, "active" INTEGER NOT NULL, FOREIGN KEY ("class_id") REFERENCES "dbclass" ("id"), FOREIGN KEY ("user_id") REFERENCES "dbuser" ("id"));
+CREATE INDEX "dbclassstudent_class_id" ON "dbclassstudent" ("class_id");
+CREATE INDEX "dbclassstudent_user_id" ON "dbclassstudent" ("user_id");
+CREATE UNIQUE INDEX "dbclassstudent_class_id_user_id" ON "dbclassstudent" ("class_id", "user_id");
+CREATE TABLE "dbassignment" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(255) NOT NULL, "class_id" INTEGER NOT NULL, "published" INTEGER NOT NULL, "disabled" INTEGER NOT NULL, FOREIGN KEY ("class_id") REFERENCES "dbclass" ("id"));
+CREATE INDEX "dbassignment_class_id" ON "dbassignment" ("class_id");
+CREATE UNIQUE INDEX "dbassignment_name_class_id" ON "dbassignment" ("name", "class_id");
+CREATE TABLE "dbbytecount" ("id" INTEGER NOT NULL PRIMARY KEY, "file_path" VARCHAR(255) NOT NULL, "byte_count" INTEGER NOT NULL);
+CREATE UNIQUE INDEX "dbbytecount_file_path" ON "dbbytecount" ("file_path");
+
+INSERT INTO "dbuser" VALUES (1, 'Faculty@school.edu', 'faculty');
+INSERT INTO "dbuser" VALUES (2, 'student1@school.edu', 'student1');
+INSERT INTO "dbfacultyuser" VALUES (1, 1, 'first', 'last', 1);
+INSERT INTO "dbstudentuser" VALUES (1, 2);
+INSERT INTO "dbclass" VALUES (1, 'class', 1, 1);
+INSERT INTO "dbclassstudent" VALUES (1, 1, 2, 'one', 'student', 1);
+"""
+
+
+def _schema(db_path):
+    # Get the SQL of every table and index in a database file
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = connection.execute('SELECT name, sql FROM sqlite_master '
+                                  'WHERE sql IS NOT NULL')
+        return dict(rows.fetchall())
+    finally:
+        connection.close()
+
+
+def test_upgrade_version_0_database(tmp_path):
+    old_db_path = os.path.join(str(tmp_path), 'old.sqlite')
+    new_db_path = os.path.join(str(tmp_path), 'new.sqlite')
+
+    connection = sqlite3.connect(old_db_path)
+    connection.executescript(VERSION_0_SCHEMA)
+    connection.close()
+
+    db = Database()
+
+    try:
+        db.connect(old_db_path)
+
+        assert db.get_schema_version() == SCHEMA_VERSION
+
+        # existing data survives the upgrade
+        assert db.get_faculty_by_email('faculty@school.edu').username == \
+            'faculty'
+        assert db.student_in_class('Student1@school.edu', 'class', 'faculty')
+        assert [s.username for s in db.get_class_students('class',
+                                                          'faculty')] == \
+            ['student1']
+    finally:
+        db.close_thread_connection()
+
+    # connecting again is a no-op
+    db.connect(old_db_path)
+    assert db.get_schema_version() == SCHEMA_VERSION
+    db.close_thread_connection()
+
+    db.connect(new_db_path)
+    assert db.get_schema_version() == SCHEMA_VERSION
+    db.close_thread_connection()
+
+    # an upgraded database has the same schema as a new database
+    assert _schema(old_db_path) == _schema(new_db_path)
+
+
+def test_database_newer_than_gkeepd(tmp_path):
+    db_path = os.path.join(str(tmp_path), 'gkeepd_db.sqlite')
+
+    db = Database()
+    db.connect(db_path)
+    database.pragma('user_version', SCHEMA_VERSION + 1)
+    db.close_thread_connection()
+
+    try:
+        with pytest.raises(DatabaseException):
+            db.connect(db_path)
+    finally:
+        db.close_thread_connection()
+
+
+def test_outbox_digest_results(db):
+    email_id = db.insert_outbox_email('a@example.com', 'hw1', 'message', 1,
+                                      10)
+    first_id = db.insert_outbox_digest_result('b@example.com', 'hw1', 'one',
+                                              1, 20, 320, 'body one', True)
+    second_id = db.insert_outbox_digest_result('b@example.com', 'hw1', 'two',
+                                               1, 30, 320, 'body two', True)
+
+    results = db.get_outbox_digest_results()
+    assert [(result['id'], result['digest_body'],
+             result['digest_html_pre_body'], result['next_attempt_time'])
+            for result in results] == [(first_id, 'body one', True, 320),
+                                       (second_id, 'body two', True, 320)]
+
+    assert [email['id'] for email in
+            db.get_outbox_emails(include_digest_results=False)] == [email_id]
+
+    digest_id = db.replace_outbox_digest_results([first_id, second_id],
+                                                 'b@example.com', 'hw1',
+                                                 'combined', 1, 40)
+
+    assert db.get_outbox_digest_results() == []
+    assert [(email['id'], email['message'])
+            for email in db.get_outbox_emails()] == [(email_id, 'message'),
+                                                     (digest_id, 'combined')]
+
+
+def test_delivered_events(db):
+    db.insert_delivered_event('/a.log', 1.5, 'SUBMISSION', 'payload', 100)
+    db.insert_delivered_event('/b.log', 1.5, 'SUBMISSION', 'payload', 200)
+
+    assert not db.delete_delivered_event('/a.log', 1.5, 'SUBMISSION',
+                                         'other')
+    assert db.delete_delivered_event('/a.log', 1.5, 'SUBMISSION', 'payload')
+    assert not db.delete_delivered_event('/a.log', 1.5, 'SUBMISSION',
+                                         'payload')
+
+    db.insert_delivered_event('/c.log', 2.5, 'SUBMISSION', 'payload', 300)
+
+    assert db.delete_delivered_events_before(250) == 1
+    assert not db.delete_delivered_event('/b.log', 1.5, 'SUBMISSION',
+                                         'payload')
+    assert db.delete_delivered_event('/c.log', 2.5, 'SUBMISSION', 'payload')
+
+
+def test_traces(db):
+    trace_row = {
+        'trace_id': 'abc',
+        'event_type': 'SUBMISSION',
+        'faculty_username': None,
+        'class_name': None,
+        'assignment_name': None,
+        'start_time': 100.0,
+    }
+
+    db.insert_trace_hops([(trace_row, 'logged', 100.0),
+                          (trace_row, 'polled', 101.0)])
+
+    described_row = dict(trace_row, faculty_username='faculty',
+                         class_name='class', assignment_name='hw1')
+
+    db.insert_trace_hops([(described_row, 'email_sent', 130.0),
+                          (described_row, 'email_sent', 150.0)])
+
+    assert db.get_trace_hops('abc') == [('logged', 100.0),
+                                        ('polled', 101.0),
+                                        ('email_sent', 130.0),
+                                        ('email_sent', 150.0)]
+
+    other_row = dict(trace_row, trace_id='def', start_time=200.0)
+    db.insert_trace_hops([(other_row, 'logged', 200.0)])
+
+    # the latency ends at the first email, and traces which never reached
+    # the end hop are left out
+    assert db.get_trace_latencies('SUBMISSION', 'email_sent') == [{
+        'faculty_username': 'faculty',
+        'class_name': 'class',
+        'assignment_name': 'hw1',
+        'start_time': 100.0,
+        'latency': 30.0,
+    }]
+
+    assert db.get_trace_latencies('SUBMISSION', 'email_sent',
+                                  since=150) == []
+    assert db.get_trace_latencies('UPLOAD', 'email_sent') == []
+
+    assert db.delete_traces_before(150) == 1
+
+    assert db.get_trace_hops('abc') == []
+    assert db.get_trace_hops('def') == [('logged', 200.0)]
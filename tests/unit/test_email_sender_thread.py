@@ -0,0 +1,201 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.email_sender_thread, using the SMTP server from the
+smtp_server fixture.
+"""
+
+
+import os
+from time import time
+
+from gkeepserver.database import db
+from gkeepserver.email_sender_thread import EmailSenderThread, retry_delay
+from gkeepserver.gkeepd_logger import gkeepd_logger
+from gkeepserver.server_configuration import config
+from gkeepserver.server_email import Email
+
+
+def _send_all(to_addresses):
+    # Send emails with a new sender thread and return the seconds it took
+
+    sender = EmailSenderThread()
+    sender.start()
+
+    start = time()
+
+    for to_address in to_addresses:
+        sender.enqueue(Email(to_address, 'subject', 'body'))
+
+    # fail rather than hang if the sender never finishes
+    sender.shutdown(timeout=10)
+    assert not sender.is_alive()
+
+    return sender, time() - start
+
+
+def _recipients(smtp_server):
+    return [recipients[0].split('<')[1].rstrip('>')
+            for recipients in smtp_server.messages]
+
+
+def test_burst_and_workers(smtp_server, gkeepd_log):
+    config.email_interval = 0.05
+    config.email_burst = 5
+    config.email_sender_count = 3
+
+    addresses = ['student{}@example.com'.format(i) for i in range(10)]
+
+    sender, seconds = _send_all(addresses)
+
+    assert sorted(_recipients(smtp_server)) == sorted(addresses)
+
+    # 5 emails at once, then 5 more 0.05 seconds apart
+    assert seconds >= 0.2
+
+    # each worker connects at most once
+    assert smtp_server.connection_count <= 3
+
+    metrics = sender.get_metrics()
+    assert metrics['queue_length'] == 0
+    assert metrics['sent'] == 10
+    assert metrics['failed'] == 0
+    assert 0 < metrics['max_age_at_send'] <= seconds
+    assert metrics['max_age_at_send'] <= metrics['total_age_at_send']
+
+
+def test_domain_limits(smtp_server, gkeepd_log):
+    config.email_domain_limits = {'slow.edu': (0.3, 1)}
+
+    addresses = ['a@slow.edu', 'b@SLOW.edu', 'c@fast.edu', 'd@fast.edu',
+                 'e@fast.edu']
+
+    sender, seconds = _send_all(addresses)
+
+    # the second email to slow.edu waits without holding up the others
+    recipients = _recipients(smtp_server)
+    assert sorted(recipients) == sorted(addresses)
+    assert recipients[-1].lower().endswith('@slow.edu')
+    assert seconds >= 0.25
+
+
+def test_retry_after_failure(smtp_server, gkeepd_log):
+    smtp_server.drop_after_message = True
+
+    sender, seconds = _send_all(['refused@example.com', 'a@example.com'])
+
+    assert _recipients(smtp_server) == ['a@example.com']
+
+    metrics = sender.get_metrics()
+    assert metrics['sent'] == 1
+    assert metrics['failed'] == 1
+
+    log_levels = [entry[0].name for entry in list(gkeepd_log.queue)]
+    assert log_levels.count('WARNING') == 9
+    assert log_levels.count('ERROR') == 1
+
+
+def test_dead_worker_is_replaced(smtp_server, gkeepd_log, monkeypatch):
+    send_email = EmailSenderThread._send_email
+    calls = []
+
+    def failing_send_email(self, email, connection):
+        calls.append(email)
+        if len(calls) == 1:
+            raise RuntimeError('send failed')
+        send_email(self, email, connection)
+
+    def failing_log_error(text):
+        raise RuntimeError('log failed')
+
+    # the worker dies when logging the first error
+    monkeypatch.setattr(EmailSenderThread, '_send_email', failing_send_email)
+    monkeypatch.setattr(gkeepd_logger, 'log_error', failing_log_error)
+
+    _send_all(['a@example.com', 'b@example.com', 'c@example.com'])
+
+    assert len(smtp_server.messages) == 2
+
+
+def test_retry_delay(monkeypatch):
+    monkeypatch.setattr(config, 'email_retry_delay', 30, raising=False)
+    monkeypatch.setattr(config, 'email_retry_max_delay', 3600, raising=False)
+
+    assert [retry_delay(attempts) for attempts in range(1, 10)] == \
+        [30, 60, 120, 240, 480, 960, 1920, 3600, 3600]
+
+
+def test_outbox(smtp_server, gkeepd_log, tmp_path):
+    db.connect(os.path.join(str(tmp_path), 'gkeepd.db'))
+
+    # an email left over from a previous run, and one that was given up on
+    sender = EmailSenderThread()
+    sender.enable_outbox()
+    sender.enqueue(Email('old@example.com', 'old', 'body'))
+
+    db.record_outbox_send_failure(
+        db.insert_outbox_email('failed@example.com', 'failed', 'message',
+                               1, time()),
+        10, time(), 'error', True)
+
+    sender = EmailSenderThread()
+    assert sender.enable_outbox() == 1
+
+    sender.start()
+    sender.enqueue(Email('refused@example.com', 'refused', 'body'))
+    sender.enqueue(Email('new@example.com', 'new', 'body'))
+    sender.shutdown(timeout=10)
+    assert not sender.is_alive()
+
+    assert sorted(_recipients(smtp_server)) == ['new@example.com',
+                                                'old@example.com']
+
+    outbox_emails = db.get_outbox_emails()
+    assert [(email['to_address'], email['send_attempts'], email['failed'])
+            for email in outbox_emails] == [('failed@example.com', 10, True),
+                                            ('refused@example.com', 10, True)]
+    assert '550' in outbox_emails[1]['last_error']
+
+    assert db.get_outbox_emails(include_failed=False) == []
+
+
+def test_outbox_keeps_emails_waiting_for_retry(smtp_server, gkeepd_log,
+                                               tmp_path):
+    config.email_retry_delay = 60
+    config.email_retry_max_delay = 60
+
+    db.connect(os.path.join(str(tmp_path), 'gkeepd.db'))
+
+    sender = EmailSenderThread()
+    sender.enable_outbox()
+    sender.start()
+    sender.enqueue(Email('refused@example.com', 'refused', 'body'))
+    sender.enqueue(Email('new@example.com', 'new', 'body'))
+
+    # shutting down does not wait for the retry
+    sender.shutdown(timeout=10)
+    assert not sender.is_alive()
+
+    outbox_emails = db.get_outbox_emails()
+    assert len(outbox_emails) == 1
+    assert outbox_emails[0]['send_attempts'] == 1
+    assert outbox_emails[0]['next_attempt_time'] > time() + 50
+
+    # the next run waits for the retry time
+    sender = EmailSenderThread()
+    sender.enable_outbox()
+    assert sender.get_metrics()['queue_length'] == 1
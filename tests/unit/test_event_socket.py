@@ -0,0 +1,194 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepcore.event_socket and gkeepserver.event_socket_server
+"""
+
+
+import getpass
+import json
+import os
+import socket
+from queue import Queue
+
+import pytest
+
+from gkeepcore.event_socket import deliver_event, EventSocketError
+from gkeepcore.log_file import log_line, LogEvent
+from gkeepserver import event_socket_server
+from gkeepserver.database import db
+from gkeepserver.event_socket_server import (EventSocketServer,
+                                             EventSocketServerError)
+from gkeepserver.log_polling import LogPollingThread
+
+
+class PollerStandIn(LogPollingThread):
+    """
+    A log poller that watches a single log without reading it.
+    """
+
+    def __init__(self, log_path):
+        super().__init__()
+        self.log_path = log_path
+
+    def is_watching(self, file_path):
+        return file_path == self.log_path
+
+
+@pytest.fixture
+def event_socket(tmp_path, gkeepd_log, monkeypatch):
+    db.connect(os.path.join(str(tmp_path), 'gkeepd.db'))
+
+    # the user running the tests owns the log
+    log_path = os.path.join(str(tmp_path), 'student.log')
+    user_log_paths = {getpass.getuser(): log_path}
+    monkeypatch.setattr(event_socket_server, 'log_path_from_username',
+                        lambda username: user_log_paths.get(username))
+
+    socket_path = os.path.join(str(tmp_path), 'events.sock')
+    queue = Queue()
+    poller = PollerStandIn(log_path)
+
+    server = EventSocketServer()
+    server.start(queue, poller, socket_path)
+
+    yield socket_path, log_path, queue, poller
+
+    server.shutdown()
+
+    assert not os.path.exists(socket_path)
+
+
+def test_deliver_event(event_socket):
+    socket_path, log_path, queue, poller = event_socket
+
+    line = log_line('SUBMISSION', '/path/to/repo.git abc123')
+    deliver_event(log_path, line, socket_path=socket_path)
+
+    file_path, event, trace = queue.get(block=False)
+    assert file_path == log_path
+    assert event.event_type == 'SUBMISSION'
+    assert event.payload == '/path/to/repo.git abc123'
+    assert [hop[0] for hop in trace.hops] == ['logged', 'received']
+
+    # the poller skips the event when it reads it from the log
+    assert not poller.claim_event(log_path, LogEvent(line.rstrip('\n')))
+
+    # delivering the event again is acknowledged but it is not queued again
+    deliver_event(log_path, line, socket_path=socket_path)
+    assert queue.empty()
+
+
+def test_delivered_event_after_restart(event_socket):
+    socket_path, log_path, queue, poller = event_socket
+
+    line = log_line('SUBMISSION', '/path/to/repo.git abc123')
+    deliver_event(log_path, line, socket_path=socket_path)
+    assert not queue.empty()
+
+    # a new poller after a restart still skips the delivered event, and
+    # then forgets it
+    event = LogEvent(line.rstrip('\n'))
+    restarted_poller = PollerStandIn(log_path)
+    assert not restarted_poller.claim_event(log_path, event)
+    assert not db.delete_delivered_event(log_path, event.timestamp,
+                                         event.event_type, event.payload)
+
+
+def test_polled_event_not_queued(event_socket):
+    socket_path, log_path, queue, poller = event_socket
+
+    line = log_line('SUBMISSION', '/path/to/repo.git abc123')
+    assert poller.claim_event(log_path, LogEvent(line.rstrip('\n')))
+
+    deliver_event(log_path, line, socket_path=socket_path)
+    assert queue.empty()
+
+
+def test_rejected_events(event_socket, gkeepd_log):
+    socket_path, log_path, queue, poller = event_socket
+
+    line = log_line('SUBMISSION', '/path/to/repo.git abc123')
+
+    with pytest.raises(EventSocketError, match='is not your log'):
+        deliver_event('/home/other/.gitkeeper/other.log', line,
+                      socket_path=socket_path)
+
+    with pytest.raises(EventSocketError, match='Malformed request'):
+        deliver_event(log_path, 'not an event', socket_path=socket_path)
+
+    assert queue.empty()
+
+
+def test_malformed_request(event_socket):
+    socket_path, log_path, queue, poller = event_socket
+
+    request = {'log_path': log_path,
+               'line': log_line('SUBMISSION', '/path/to/repo.git abc123')}
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(socket_path)
+    connection.sendall(b'not json\n' + json.dumps(request).encode() + b'\n')
+
+    with connection.makefile('rb') as f:
+        assert f.readline() == b'{"ok": false, "error": "Malformed request"}\n'
+        assert f.readline() == b'{"ok": true}\n'
+
+    connection.close()
+
+    assert not queue.empty()
+
+
+def test_no_server(tmp_path):
+    socket_path = os.path.join(str(tmp_path), 'events.sock')
+
+    with pytest.raises(EventSocketError):
+        deliver_event('/a.log', log_line('SUBMISSION', 'payload'),
+                      socket_path=socket_path)
+
+
+def test_socket_permissions(event_socket):
+    socket_path, log_path, queue, poller = event_socket
+
+    # any user may connect, but only gkeepd may create the socket
+    assert os.stat(socket_path).st_mode & 0o777 == 0o666
+
+
+def test_writable_directory(tmp_path, gkeepd_log):
+    # another user could replace the socket in a directory they can write to
+    os.chmod(str(tmp_path), 0o777)
+
+    server = EventSocketServer()
+
+    with pytest.raises(EventSocketServerError, match='only writable'):
+        server.start(Queue(), PollerStandIn('/a.log'),
+                     os.path.join(str(tmp_path), 'events.sock'))
+
+
+def test_claims_expire(tmp_path, monkeypatch):
+    db.connect(os.path.join(str(tmp_path), 'gkeepd.db'))
+
+    poller = LogPollingThread()
+    event = LogEvent(log_line('SUBMISSION', 'payload').rstrip('\n'))
+
+    assert poller.claim_event('/a.log', event)
+    assert not poller.claim_event('/a.log', event)
+    assert poller.claim_event('/b.log', event)
+
+    monkeypatch.setattr('gkeepserver.log_polling.CLAIM_EXPIRY', 0)
+
+    assert poller.claim_event('/a.log', event)
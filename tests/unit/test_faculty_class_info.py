@@ -0,0 +1,122 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for encoding and decoding faculty info"""
+
+
+import gzip
+
+import pytest
+
+from gkeepcore.faculty_class_info import FacultyClassInfo, encode_info, \
+    decode_info
+
+
+INFO = {
+    'cs100': {
+        'open': True,
+        'assignments': {},
+        'students': {},
+    }
+}
+
+
+def test_plain_round_trip():
+    info_bytes = encode_info(INFO)
+
+    assert info_bytes.startswith(b'{')
+    assert FacultyClassInfo.from_bytes(info_bytes).info_dict == INFO
+
+
+def test_compressed_round_trip():
+    info_bytes = encode_info(INFO, compress=True)
+
+    assert gzip.decompress(info_bytes) == encode_info(INFO)
+    assert FacultyClassInfo.from_bytes(info_bytes).info_dict == INFO
+
+
+def test_compressed_encoding_is_deterministic():
+    assert encode_info(INFO, compress=True) == encode_info(INFO, compress=True)
+
+
+def test_decode_invalid():
+    with pytest.raises(ValueError):
+        decode_info(b'not json')
+
+    with pytest.raises(ValueError):
+        decode_info(b'\x1f\x8b truncated')
+
+
+def build_class_info():
+    students = {}
+    students_repos = {}
+
+    for username, first, last, count, time in (('a', 'Ann', 'Ash', 1, 30),
+                                               ('b', 'Bob', 'Birch', 0, 10),
+                                               ('c', 'Cat', 'Cedar', 2, 20)):
+        students[username] = {'first': first, 'last': last}
+        students_repos[username] = {'submission_count': count, 'time': time}
+
+    return FacultyClassInfo({
+        'cs100': {
+            'open': True,
+            'students': students,
+            'assignments': {
+                'hw1': {'students_repos': students_repos},
+                'hw2': {'students_repos': {'a': students_repos['a']}},
+                # the info updater stores None for unpublished assignments
+                'hw3': {'published': False, 'students_repos': None},
+            },
+        }
+    })
+
+
+def test_students_submitted():
+    info = build_class_info()
+
+    assert info.students_submitted_list('cs100', 'hw1') == ['c', 'a']
+    assert info.student_submitted_count('cs100', 'hw1') == 2
+
+
+def test_recent_submissions():
+    info = build_class_info()
+
+    assert info.recent_submissions('cs100', 'hw1', 0) == [(20, 'c'),
+                                                          (30, 'a')]
+    assert info.recent_submissions('cs100', 'hw1', 25) == [(30, 'a')]
+    assert info.recent_submissions('cs100', 'hw1', 31) == []
+
+
+def test_student_assignments():
+    info = build_class_info()
+
+    assert sorted(info.student_assignments('cs100', 'a')) == ['hw1', 'hw2']
+    assert info.student_assignments('cs100', 'b') == ['hw1']
+
+
+def test_unpublished_assignment():
+    info = build_class_info()
+
+    assert info.students_submitted_list('cs100', 'hw3') == []
+    assert info.recent_submissions('cs100', 'hw3', 0) == []
+    assert info.student_assignments('cs100', 'c') == ['hw1']
+
+
+def test_get_username_from_name():
+    info = build_class_info()
+
+    assert info.get_username_from_name('cs100', 'Cedar, Cat') == 'c'
+    assert info.get_username_from_name('cs100', 'Nobody, No') is None
@@ -0,0 +1,140 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.gkeepd_logger and gkeepserver.rotating_log_file
+"""
+
+
+import gzip
+import json
+import os
+
+from gkeepserver.gkeepd_logger import (GkeepdLoggerThread, LogLevel,
+                                       LOG_FILE_HEADER)
+from gkeepserver.rotating_log_file import RotatingLogFile
+
+
+def test_rotate_by_size(tmp_path):
+    log_path = os.path.join(str(tmp_path), 'test.log')
+
+    log_file = RotatingLogFile(log_path, max_size=100, backup_count=2,
+                               header='# header\n')
+
+    for count in range(5):
+        log_file.write(['{0} {1}\n'.format(count, 'x' * 100)])
+
+    log_file.close()
+
+    with open(log_path) as f:
+        assert f.read() == '# header\n4 {0}\n'.format('x' * 100)
+
+    with gzip.open(log_path + '.1.gz', 'rt') as f:
+        assert f.read() == '# header\n3 {0}\n'.format('x' * 100)
+
+    with gzip.open(log_path + '.2.gz', 'rt') as f:
+        assert f.read() == '# header\n2 {0}\n'.format('x' * 100)
+
+    assert not os.path.exists(log_path + '.3.gz')
+
+
+def test_rotate_by_time(tmp_path):
+    log_path = os.path.join(str(tmp_path), 'test.log')
+
+    log_file = RotatingLogFile(log_path, rotate_interval=3600)
+    log_file.write(['first\n'])
+    log_file.write(['second\n'])
+
+    assert not os.path.exists(log_path + '.1.gz')
+
+    log_file._open_time -= 3600
+    log_file.write(['third\n'])
+    log_file.close()
+
+    with open(log_path) as f:
+        assert f.read() == 'third\n'
+
+    with gzip.open(log_path + '.1.gz', 'rt') as f:
+        assert f.read() == 'first\nsecond\n'
+
+
+def test_json_log(tmp_path):
+    log_path = os.path.join(str(tmp_path), 'gkeepd.log')
+    json_log_path = os.path.join(str(tmp_path), 'gkeepd.log.jsonl')
+
+    logger = GkeepdLoggerThread()
+    logger.initialize(log_path, log_level=LogLevel.INFO,
+                      json_log_file_path=json_log_path)
+    logger.start()
+
+    logger.log_info('first\nmessage', faculty='prof', duration=1.5)
+    logger.log_debug('not logged')
+    logger.log_error('second message')
+
+    logger.shutdown()
+
+    with open(log_path) as f:
+        lines = f.read().splitlines()
+
+    assert lines[0] == LOG_FILE_HEADER.rstrip()
+    assert lines[1].endswith(' INFO first message')
+    assert lines[2].endswith(' ERROR second message')
+    assert len(lines) == 3
+
+    with open(json_log_path) as f:
+        records = [json.loads(line) for line in f]
+
+    assert len(records) == 2
+    assert records[0]['level'] == 'INFO'
+    assert records[0]['message'] == 'first message'
+    assert records[0]['faculty'] == 'prof'
+    assert records[0]['duration'] == 1.5
+    assert records[1]['level'] == 'ERROR'
+    assert 'faculty' not in records[1]
+    assert records[0]['time'] <= records[1]['time']
+
+
+def test_full_queue_drops_messages(tmp_path):
+    log_path = os.path.join(str(tmp_path), 'gkeepd.log')
+
+    logger = GkeepdLoggerThread()
+    logger.initialize(log_path, queue_size=20)
+
+    # debug messages are sampled once the queue is three quarters full
+    for count in range(15):
+        logger.log_info('info {}'.format(count))
+
+    for count in range(20):
+        logger.log_debug('debug {}'.format(count))
+
+    assert logger.get_dropped_count() == 18
+
+    # messages are dropped once the queue is full
+    for count in range(5):
+        logger.log_error('error {}'.format(count))
+
+    assert logger.get_dropped_count() == 20
+
+    logger.start()
+    logger.shutdown()
+
+    with open(log_path) as f:
+        text = f.read()
+
+    assert text.count(' INFO ') == 15
+    assert text.count(' DEBUG ') == 2
+    assert text.count(' ERROR ') == 3
+    assert 'Dropped 20 log messages' in text
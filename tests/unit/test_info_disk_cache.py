@@ -0,0 +1,56 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for class InfoDiskCache from gkeepclient.info_disk_cache"""
+
+
+import os
+
+from gkeepclient.info_disk_cache import InfoDiskCache
+
+
+def test_get_missing(tmp_path):
+    cache = InfoDiskCache(str(tmp_path))
+
+    assert cache.get('info', '1.0.json') is None
+
+
+def test_put_and_get(tmp_path):
+    cache = InfoDiskCache(str(tmp_path / 'cache'))
+
+    cache.put('info', '1.0.json', b'{"class": {}}')
+
+    assert cache.get('info', '1.0.json') == b'{"class": {}}'
+    assert cache.get('info_shards', '1.0.json') is None
+
+
+def test_prune(tmp_path):
+    cache = InfoDiskCache(str(tmp_path))
+
+    cache.put('info', '1.0.json', b'old')
+    cache.put('info', '2.0.json', b'new')
+    cache.prune('info', {'2.0.json'})
+
+    assert cache.get('info', '1.0.json') is None
+    assert cache.get('info', '2.0.json') == b'new'
+    assert os.listdir(os.path.join(str(tmp_path), 'info')) == ['2.0.json']
+
+
+def test_prune_missing_category(tmp_path):
+    cache = InfoDiskCache(str(tmp_path))
+
+    # must not raise
+    cache.prune('info_shards', set())
@@ -0,0 +1,78 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.latency_report
+"""
+
+
+from time import mktime
+
+import pytest
+
+from gkeepserver.latency_report import (percentile, summarize_latencies,
+                                        format_latency_report)
+
+
+def _latency(assignment_name, day, latency):
+    # a latency of a trace that started at noon local time on the given day
+    year, month, day_of_month = day
+    start_time = mktime((year, month, day_of_month, 12, 0, 0, 0, 0, -1))
+
+    return {'faculty_username': 'faculty', 'class_name': 'class',
+            'assignment_name': assignment_name, 'start_time': start_time,
+            'latency': latency}
+
+
+def test_percentile():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile(values, 0) == 1
+    assert percentile([7], 99) == 7
+    assert percentile([1, 2, 3], 50) == 2
+
+    with pytest.raises(ValueError):
+        percentile([], 50)
+
+
+def test_summarize_and_format():
+    latencies = [_latency('hw2', (2026, 3, 1), 5)]
+
+    for latency in range(1, 21):
+        latencies.append(_latency('hw1', (2026, 3, 2), latency))
+
+    latencies.append(_latency('hw1', (2026, 3, 1), 90))
+
+    summary = summarize_latencies(latencies)
+
+    assert list(summary.keys()) == [('faculty', 'class', 'hw1'),
+                                     ('faculty', 'class', 'hw2')]
+
+    hw1 = summary[('faculty', 'class', 'hw1')]
+
+    assert list(hw1.keys()) == ['2026-03-01', '2026-03-02']
+    assert hw1['2026-03-01'] == (1, {50: 90, 95: 90, 99: 90})
+    assert hw1['2026-03-02'] == (20, {50: 10, 95: 19, 99: 20})
+
+    report = format_latency_report(summary)
+
+    assert report.splitlines()[0] == 'faculty/class/hw1'
+    assert '1m30s' in report
+    assert 'faculty/class/hw2' in report
@@ -0,0 +1,131 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for appending to logs with gkeepcore.log_file and
+gkeepserver.log_appender_thread
+"""
+
+
+import os
+from threading import Thread
+
+from gkeepcore.log_file import (log_line, append_to_log, log_append_command,
+                                LogEvent, MAX_LOG_LINE_LENGTH)
+from gkeepcore.shell_command import run_command
+from gkeepserver.log_appender_thread import LogAppenderThread
+
+
+# 2026-01-02 03:04:05.123456789 UTC
+TIMESTAMP_NS = 1767323045123456789
+
+
+def test_log_line():
+    line = log_line('TYPE', 'some\ntext', timestamp_ns=TIMESTAMP_NS)
+    assert line == '1767323045.1234 TYPE some  text\n'
+
+    event = LogEvent(line.rstrip('\n'))
+    assert event.timestamp == 1767323045.1234
+    assert event.payload == 'some  text'
+
+    line = log_line('TYPE', 'text', human_readable=True,
+                    timestamp_ns=TIMESTAMP_NS)
+    assert line == '2026-01-02-03:04:05.1234 TYPE text\n'
+
+
+def test_log_line_matches_command(tmp_path):
+    log_path = os.path.join(str(tmp_path), 'test.log')
+
+    for text in ('short text', 'x' * MAX_LOG_LINE_LENGTH, 'é' * 3000):
+        for human_readable in (False, True):
+            if os.path.exists(log_path):
+                os.remove(log_path)
+
+            run_command(log_append_command(log_path, 'TYPE', text,
+                                           human_readable))
+
+            with open(log_path, encoding='utf-8') as f:
+                command_line = f.read()
+
+            line = log_line('TYPE', text, human_readable)
+
+            assert len(line.encode()) <= MAX_LOG_LINE_LENGTH + 1
+
+            # everything but the timestamp must match
+            assert line.split(' ', 1)[1] == command_line.split(' ', 1)[1]
+
+
+def test_append_to_log(tmp_path):
+    log_path = os.path.join(str(tmp_path), 'test.log')
+
+    append_to_log(log_path, ['1.0 A a\n'])
+    append_to_log(log_path, ['2.0 B b\n', '3.0 C c\n'])
+
+    with open(log_path) as f:
+        assert f.read() == '1.0 A a\n2.0 B b\n3.0 C c\n'
+
+
+def test_log_appender_thread(tmp_path):
+    log_paths = [os.path.join(str(tmp_path), '{}.log'.format(i))
+                 for i in range(2)]
+
+    appender = LogAppenderThread()
+
+    # before the thread starts, lines are written immediately
+    appender.append(log_paths[0], 'BEFORE', 'start')
+    assert os.path.isfile(log_paths[0])
+
+    appender.start()
+
+    for i in range(100):
+        appender.append(log_paths[i % 2], 'EVENT', str(i))
+
+    appender.shutdown()
+
+    for i, log_path in enumerate(log_paths):
+        with open(log_path) as f:
+            events = [LogEvent(line) for line in f.read().splitlines()]
+
+        payloads = [event.payload for event in events
+                    if event.event_type == 'EVENT']
+        assert payloads == [str(n) for n in range(i, 100, 2)]
+
+        timestamps = [event.timestamp for event in events]
+        assert timestamps == sorted(timestamps)
+
+
+def test_log_appender_thread_shutdown(tmp_path):
+    log_path = os.path.join(str(tmp_path), 'test.log')
+
+    appender = LogAppenderThread()
+    appender.start()
+
+    def append_lines():
+        for i in range(1000):
+            appender.append(log_path, 'EVENT', str(i))
+
+    # lines appended while the thread shuts down are not lost
+    append_thread = Thread(target=append_lines)
+    append_thread.start()
+    appender.shutdown()
+    append_thread.join()
+
+    appender.append(log_path, 'EVENT', 'after')
+
+    with open(log_path) as f:
+        payloads = [LogEvent(line).payload for line in f.read().splitlines()]
+
+    assert payloads == [str(i) for i in range(1000)] + ['after']
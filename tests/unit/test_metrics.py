@@ -0,0 +1,145 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.metrics and gkeepserver.metrics_server
+"""
+
+
+import os
+import socket
+from http.client import HTTPConnection
+
+import pytest
+
+from gkeepserver.database import db
+from gkeepserver.metrics import MetricsRegistry, metrics
+from gkeepserver.metrics_server import MetricsServer
+
+
+def test_render():
+    registry = MetricsRegistry()
+
+    counter = registry.counter('test_total', 'A counter')
+    counter.inc()
+    counter.inc(2)
+
+    assert registry.counter('test_total', 'A counter') is counter
+
+    registry.counter('test_total', 'A counter',
+                     labels={'name': 'quote"d'}).inc()
+
+    histogram = registry.histogram('test_seconds', 'A histogram',
+                                   buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value)
+
+    registry.function('test_length', 'A gauge', lambda: 7,
+                      labels={'queue': 'a'})
+    registry.function('test_length', 'A gauge', lambda: 1 / 0,
+                      labels={'queue': 'b'})
+
+    assert registry.render().splitlines() == [
+        '# HELP test_length A gauge',
+        '# TYPE test_length gauge',
+        'test_length{queue="a"} 7',
+        '# HELP test_seconds A histogram',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{le="0.1"} 1',
+        'test_seconds_bucket{le="1"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        'test_seconds_sum 6.05',
+        'test_seconds_count 4',
+        '# HELP test_total A counter',
+        '# TYPE test_total counter',
+        'test_total 3',
+        'test_total{name="quote\\"d"} 1',
+    ]
+
+    with pytest.raises(ValueError):
+        registry.histogram('test_total', 'Not a counter')
+
+
+def test_function_family():
+    registry = MetricsRegistry()
+
+    values = []
+    registry.function_family('test_runs_total', 'A family', lambda: values,
+                             metric_type='counter')
+
+    assert registry.render().splitlines() == [
+        '# HELP test_runs_total A family',
+        '# TYPE test_runs_total counter',
+    ]
+
+    values.append(({'command': 'git clone'}, 2))
+    values.append(({'command': 'rm'}, 1.5))
+
+    assert registry.render().splitlines()[2:] == [
+        'test_runs_total{command="git clone"} 2',
+        'test_runs_total{command="rm"} 1.5',
+    ]
+
+
+def test_db_query_seconds():
+    def query_count():
+        for line in metrics.render().splitlines():
+            if line.startswith('gkeepd_db_query_seconds_count'):
+                return int(line.split()[1])
+
+    db.connect(':memory:')
+    count = query_count()
+
+    db.username_exists('someone')
+    assert query_count() == count + 1
+
+
+def _get(socket_path, path):
+    # make an HTTP request over the Unix socket
+    connection = HTTPConnection('localhost')
+    connection.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.sock.connect(socket_path)
+
+    connection.request('GET', path)
+    response = connection.getresponse()
+    body = response.read().decode()
+
+    connection.close()
+
+    return response.status, body
+
+
+def test_metrics_server(tmp_path):
+    socket_path = os.path.join(str(tmp_path), 'metrics.sock')
+
+    metrics.counter('gkeepd_test_server_total', 'A counter').inc()
+
+    server = MetricsServer()
+    server.start(socket_path=socket_path)
+
+    try:
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+
+        status, body = _get(socket_path, '/metrics')
+        assert status == 200
+        assert 'gkeepd_test_server_total 1\n' in body
+
+        status, body = _get(socket_path, '/other')
+        assert status == 404
+    finally:
+        server.shutdown()
+
+    assert not os.path.exists(socket_path)
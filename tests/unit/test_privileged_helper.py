@@ -0,0 +1,116 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for the privileged helper in gkeepserver.privileged_helper"""
+
+
+import json
+import logging
+import os
+
+import pytest
+
+from gkeepcore.shell_command import CommandExitCodeError
+from gkeepcore.system_commands import (chmod, cp, mkdir, mode, mv, rm,
+                                       sudo_chown, this_group, this_user,
+                                       use_native_commands)
+from gkeepserver.privileged_helper import (PrivilegedHelper,
+                                           PrivilegedHelperServer)
+
+
+@pytest.fixture
+def server(tmp_path):
+    socket_path = os.path.join(str(tmp_path), 'helper.sock')
+    server = PrivilegedHelperServer(socket_path, os.getuid(),
+                                    logging.getLogger('test_helper'))
+    yield server
+    server.server_close()
+
+
+def _request(operation, **arguments):
+    request = {'operation': operation, 'arguments': arguments}
+    return json.dumps(request).encode('utf-8')
+
+
+def test_perform(server, tmp_path):
+    dir_path = os.path.join(str(tmp_path), 'a', 'b')
+
+    assert server.perform(1, _request('mkdir', path=dir_path)) == {'ok': True}
+    assert os.path.isdir(dir_path)
+
+    response = server.perform(1, _request('chmod', path=dir_path,
+                                          permissions_mode='750'))
+    assert response == {'ok': True}
+    assert mode(dir_path) == '750'
+
+
+def test_perform_rejects_bad_requests(server, tmp_path):
+    malformed = {'ok': False, 'error': 'Malformed request'}
+
+    assert server.perform(1, b'not json') == malformed
+    assert server.perform(1, _request('chsh', path='/bin/sh')) == malformed
+
+    response = server.perform(1, _request('mkdir', path='relative/path'))
+    assert not response['ok']
+    assert response['exit_code'] == 1
+    assert not os.path.exists('relative')
+
+    response = server.perform(1, _request('rm', path=str(tmp_path),
+                                          force=True))
+    assert not response['ok']
+    assert os.path.isdir(str(tmp_path))
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason='helper must be started as '
+                                             'root without sudo')
+def test_system_commands_use_helper(tmp_path):
+    # as root, operations are performed in-process unless this is disabled
+    use_native_commands(False)
+
+    helper = PrivilegedHelper()
+    helper.start(os.path.join(str(tmp_path), 'helper.sock'),
+                 os.path.join(str(tmp_path), 'helper.log'))
+
+    try:
+        source_path = os.path.join(str(tmp_path), 'source')
+        dest_path = os.path.join(str(tmp_path), 'dest')
+
+        mkdir(os.path.join(source_path, 'sub'), sudo=True)
+        cp(source_path, dest_path, recursive=True, sudo=True)
+        chmod(dest_path, 700, recursive=True, sudo=True)
+        sudo_chown(dest_path, this_user(), this_group(), recursive=True)
+        mv(dest_path, source_path, sudo=True)
+
+        assert mode(os.path.join(source_path, 'dest', 'sub')) == '700'
+
+        # failures raise the same exception as the command would
+        with pytest.raises(CommandExitCodeError):
+            rm(source_path, sudo=True)
+
+        rm(source_path, recursive=True, sudo=True)
+        assert not os.path.exists(source_path)
+    finally:
+        helper.shutdown()
+        use_native_commands(True)
+
+    with open(os.path.join(str(tmp_path), 'helper.log')) as f:
+        audit_log = f.read()
+
+    # every operation is logged, along with the failure of the first rm
+    assert audit_log.count('INFO pid {}:'.format(os.getpid())) == 7
+    assert audit_log.count('WARNING pid {}: rm failed'
+                           .format(os.getpid())) == 1
+    assert 'Shut down' in audit_log
@@ -0,0 +1,157 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for combining results emails with gkeepserver.result_digest_thread
+"""
+
+
+import os
+from email import message_from_string
+from time import sleep
+
+import pytest
+
+from gkeepserver import result_digest_thread
+from gkeepserver.database import db
+from gkeepserver.result_digest_thread import ResultDigestThread
+from gkeepserver.tracing import Trace
+
+
+@pytest.fixture
+def sent_emails(monkeypatch, smtp_server, gkeepd_log):
+    # collect the emails handed to the email sender instead of sending them
+    emails = []
+    monkeypatch.setattr(result_digest_thread.email_sender, 'enqueue',
+                        emails.append)
+
+    yield emails
+
+
+@pytest.fixture
+def digester(sent_emails):
+    digester = ResultDigestThread()
+    digester.start()
+
+    yield digester
+
+    if digester.is_alive():
+        digester.shutdown()
+
+
+def _body(email):
+    message = message_from_string(email.message_string)
+
+    for part in message.walk():
+        if part.get_content_type() == 'text/plain':
+            return part.get_payload(decode=True).decode()
+
+
+def test_send_immediately_when_not_started(sent_emails):
+    digester = ResultDigestThread()
+
+    digester.add('a@example.com', 'hw1', 'result', False, window=300)
+
+    assert len(sent_emails) == 1
+    assert _body(sent_emails[0]) == 'result'
+    assert digester.pending_count() == 0
+
+
+def test_combine_results(digester, sent_emails):
+    for count in range(3):
+        digester.add('a@example.com', 'hw1', 'result {}'.format(count),
+                     False, window=0.3)
+
+    digester.add('a@example.com', 'hw2', 'other', False, window=0.3)
+    digester.add('b@example.com', 'hw1', 'another', False, window=0.3)
+
+    assert digester.pending_count() == 5
+    assert sent_emails == []
+
+    sleep(1)
+
+    assert digester.pending_count() == 0
+    assert len(sent_emails) == 3
+
+    combined = [email for email in sent_emails
+                if email.to_address == 'a@example.com' and
+                email.subject == 'hw1'][0]
+    body = _body(combined)
+
+    assert 'results of 3 submissions' in body
+    assert (body.index('result 2') < body.index('result 1') <
+            body.index('result 0'))
+
+
+def test_flush_on_shutdown(digester, sent_emails):
+    digester.add('a@example.com', 'hw1', 'first', False, window=300)
+    digester.add('a@example.com', 'hw1', 'second', False, window=300)
+
+    digester.shutdown()
+
+    assert len(sent_emails) == 1
+    assert 'second' in _body(sent_emails[0])
+    assert not digester.is_alive()
+
+
+def test_combined_email_carries_traces(digester, sent_emails):
+    first_trace = Trace('SUBMISSION')
+    second_trace = Trace('SUBMISSION')
+
+    digester.add('a@example.com', 'hw1', 'first', False, window=300,
+                 trace=first_trace)
+    digester.add('a@example.com', 'hw1', 'second', False, window=300,
+                 trace=second_trace)
+    digester.add('a@example.com', 'hw1', 'untraced', False, window=300)
+
+    digester.shutdown()
+
+    assert sent_emails[0].traces == [first_trace, second_trace]
+
+
+def test_resume_from_outbox(sent_emails, tmp_path, monkeypatch):
+    db.connect(os.path.join(str(tmp_path), 'gkeepd.db'))
+
+    # gkeepd stops without sending the digest
+    crashed = ResultDigestThread()
+    crashed.enable_outbox()
+    monkeypatch.setattr(crashed, '_send_digests', lambda now: None)
+    crashed.start()
+    crashed.add('a@example.com', 'hw1', 'result one', True, window=300)
+    crashed.add('a@example.com', 'hw1', 'result two', True, window=300)
+    crashed.shutdown()
+
+    assert sent_emails == []
+
+    # the email sender leaves the results to the digester
+    assert db.get_outbox_emails(include_digest_results=False) == []
+
+    digester = ResultDigestThread()
+    assert digester.enable_outbox() == 2
+    assert digester.pending_count() == 2
+
+    digester.start()
+    digester.shutdown()
+
+    assert len(sent_emails) == 1
+    body = _body(sent_emails[0])
+    assert body.index('result two') < body.index('result one')
+
+    # the combined email has replaced the results in the outbox
+    outbox_emails = db.get_outbox_emails()
+    assert [email['id'] for email in outbox_emails] == \
+        [sent_emails[0].outbox_id]
+    assert outbox_emails[0]['digest_body'] is None
@@ -0,0 +1,77 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.sampling_profiler
+"""
+
+
+import os
+from threading import Thread, Event
+from time import sleep
+
+import pytest
+
+from gkeepserver.sampling_profiler import (SamplingProfiler,
+                                           SamplingProfilerError)
+
+
+def busy_function(stop_event):
+    while not stop_event.is_set():
+        sum(range(1000))
+
+
+def test_profile(tmp_path):
+    stop_event = Event()
+    thread = Thread(target=busy_function, args=(stop_event,),
+                    name='busy-thread')
+    thread.start()
+
+    profiler = SamplingProfiler()
+
+    with pytest.raises(SamplingProfilerError):
+        profiler.stop(str(tmp_path))
+
+    result = profiler.toggle(str(tmp_path))
+    assert result['running']
+    assert profiler.is_running()
+
+    with pytest.raises(SamplingProfilerError):
+        profiler.start()
+
+    while profiler._sample_count < 5:
+        sleep(0.01)
+
+    result = profiler.toggle(str(tmp_path))
+
+    stop_event.set()
+    thread.join()
+
+    assert not result['running']
+    assert not profiler.is_running()
+    assert result['samples'] >= 5
+    assert os.path.dirname(result['path']) == str(tmp_path)
+
+    with open(result['path']) as f:
+        lines = f.read().splitlines()
+
+    busy_lines = [line for line in lines if line.startswith('busy-thread;')]
+    assert len(busy_lines) > 0
+
+    for line in busy_lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+        assert 'test_sampling_profiler.py:busy_function' in stack.split(';')
@@ -0,0 +1,113 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for sending emails with gkeepserver.server_email, using the SMTP server
+from the smtp_server fixture.
+"""
+
+
+from smtplib import SMTPRecipientsRefused
+from time import sleep
+
+import pytest
+
+from gkeepserver.server_configuration import config
+from gkeepserver.server_email import Email, SMTPConnection
+
+
+def _email(to_address='student@example.com'):
+    return Email(to_address, 'subject', 'body')
+
+
+def test_connection_reuse(smtp_server):
+    connection = SMTPConnection()
+
+    for count in range(5):
+        _email().send(connection)
+
+    connection.close()
+
+    assert len(smtp_server.messages) == 5
+    assert smtp_server.connection_count == 1
+    assert smtp_server.login_count == 1
+    assert connection.connection_count == 1
+    assert not connection.is_open()
+
+
+def test_reconnect_after_server_closes(smtp_server):
+    smtp_server.drop_after_message = True
+
+    connection = SMTPConnection()
+
+    for count in range(3):
+        _email().send(connection)
+
+    connection.close()
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.connection_count == 3
+    assert smtp_server.login_count == 3
+
+
+def test_idle_timeout(smtp_server):
+    connection = SMTPConnection()
+
+    _email().send(connection)
+
+    connection.close_if_idle()
+    assert connection.is_open()
+
+    config.smtp_idle_timeout = 0.01
+    sleep(0.05)
+
+    connection.close_if_idle()
+    assert not connection.is_open()
+
+    # an idle connection is also replaced when sending
+    _email().send(connection)
+    sleep(0.05)
+    _email().send(connection)
+
+    connection.close()
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.connection_count == 3
+    assert smtp_server.quit_count == 3
+
+
+def test_refused_recipient_keeps_connection(smtp_server):
+    connection = SMTPConnection()
+
+    with pytest.raises(SMTPRecipientsRefused):
+        _email('refused@example.com').send(connection)
+
+    assert connection.is_open()
+
+    _email().send(connection)
+    connection.close()
+
+    assert len(smtp_server.messages) == 1
+    assert smtp_server.connection_count == 1
+
+
+def test_send_without_connection(smtp_server):
+    _email().send()
+    _email().send()
+
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.connection_count == 2
+    assert smtp_server.quit_count == 2
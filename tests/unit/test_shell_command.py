@@ -0,0 +1,182 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for the command statistics, streaming output, and deadlines in
+gkeepcore.shell_command
+"""
+
+
+import os
+import shutil
+from time import time
+
+import pytest
+
+from gkeepcore import shell_command
+from gkeepcore.shell_command import (command_name, command_deadline,
+                                     enable_command_stats, get_command_stats,
+                                     run_command, run_command_to_file,
+                                     CommandExitCodeError, CommandTimeoutError,
+                                     InvalidCommandError)
+from gkeepcore.system_commands import mkdir, use_native_commands
+
+
+@pytest.fixture
+def command_stats(monkeypatch):
+    # record statistics only for the duration of a test
+    monkeypatch.setattr(shell_command, '_command_stats', None)
+    use_native_commands(False)
+    enable_command_stats()
+
+    yield
+
+    use_native_commands(True)
+
+
+def test_command_name():
+    assert command_name(['git', 'clone', 'a', 'b']) == 'git clone'
+    assert command_name(['git', '-C', '/repo', 'commit', '-m', 'x']) == \
+        'git commit'
+    assert command_name('git -c user.name=x push origin') == 'git push'
+    assert command_name(['sudo', '-n', '-u', 'tester', 'chown', 'a']) == \
+        'chown'
+    assert command_name('sudo -n rm -rf /tmp/x') == 'rm'
+    assert command_name(['/usr/bin/firejail', '--quiet']) == 'firejail'
+    assert command_name(['git']) == 'git'
+    assert command_name('') == ''
+
+
+def test_no_stats_unless_enabled(monkeypatch):
+    monkeypatch.setattr(shell_command, '_command_stats', None)
+
+    run_command(['true'])
+
+    assert get_command_stats() == []
+
+
+def test_command_stats(command_stats, tmp_path):
+    run_command(['echo', 'hello'])
+    run_command('echo hello')
+
+    with pytest.raises(CommandExitCodeError):
+        run_command(['false'])
+
+    # the subsystem is the caller of the wrapper, not the wrapper
+    mkdir(os.path.join(str(tmp_path), 'new'))
+
+    stats = {(s['subsystem'], s['command']): s for s in get_command_stats()}
+
+    echo = stats[(__name__, 'echo')]
+    assert echo['runs'] == 2
+    assert echo['output_bytes'] == 12
+    assert echo['failures'] == 0
+    assert echo['seconds'] > 0
+
+    assert stats[(__name__, 'false')]['failures'] == 1
+    assert stats[(__name__, 'mkdir')]['runs'] == 1
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_run_command_to_file(tmp_path):
+    output_path = os.path.join(str(tmp_path), 'output.txt')
+
+    assert not run_command_to_file(['echo', 'hello'], output_path)
+    assert _read_bytes(output_path) == b'hello\n'
+
+    # stderr is included, and the file is replaced
+    assert not run_command_to_file('echo out; echo err 1>&2', output_path,
+                                   max_bytes=100)
+    assert _read_bytes(output_path) == b'out\nerr\n'
+
+
+def test_run_command_to_file_truncates(tmp_path):
+    output_path = os.path.join(str(tmp_path), 'output.txt')
+
+    # far more output than fits in a pipe, so the command would block if the
+    # output past the limit were not read
+    command = ['python3', '-c', 'print("x" * 1000000)']
+
+    assert run_command_to_file(command, output_path, max_bytes=1000)
+    assert _read_bytes(output_path) == b'x' * 1000
+
+
+def test_run_command_to_file_errors(tmp_path):
+    output_path = os.path.join(str(tmp_path), 'output.txt')
+
+    with pytest.raises(CommandExitCodeError) as exc_info:
+        run_command_to_file('echo failing; exit 3', output_path,
+                            max_bytes=4)
+
+    assert exc_info.value.exit_code == 3
+    assert str(exc_info.value) == 'fail'
+
+    with pytest.raises(InvalidCommandError):
+        run_command_to_file(['no_such_program_gkeep'], output_path)
+
+
+def test_command_deadline(tmp_path):
+    output_path = os.path.join(str(tmp_path), 'output.txt')
+
+    with command_deadline(5):
+        assert run_command(['echo', 'on time']) == 'on time\n'
+
+        # a deadline without a limit replaces the enclosing deadline
+        with command_deadline(None):
+            assert run_command(['echo', 'no deadline']) == 'no deadline\n'
+
+    # the sleep in the background keeps the output open, so it must be
+    # killed along with the shell for the command to finish
+    for run in (lambda: run_command('sleep 30 & sleep 30'),
+                lambda: run_command_to_file('sleep 30 & sleep 30',
+                                            output_path)):
+        start_time = time()
+
+        with pytest.raises(CommandTimeoutError):
+            with command_deadline(0.5):
+                run()
+
+        assert time() - start_time < 10
+
+
+@pytest.mark.skipif(shutil.which('setsid') is None,
+                    reason='setsid is not installed')
+def test_deadline_with_escaped_process(tmp_path, monkeypatch):
+    output_path = os.path.join(str(tmp_path), 'output.txt')
+    monkeypatch.setattr(shell_command, '_KILL_WAIT', 0.5)
+
+    # the setsid sleep leaves the process group so it is not killed, and it
+    # keeps the output open
+    for run in (lambda: run_command('setsid sleep 20 & sleep 100'),
+                lambda: run_command_to_file('setsid sleep 20 & sleep 100',
+                                            output_path)):
+        start_time = time()
+
+        with pytest.raises(CommandTimeoutError):
+            with command_deadline(0.5):
+                run()
+
+        assert time() - start_time < 5
+
+
+def test_passed_deadline():
+    with command_deadline(0):
+        with pytest.raises(CommandTimeoutError):
+            run_command(['echo', 'too late'])
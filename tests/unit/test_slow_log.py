@@ -0,0 +1,85 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.slow_log
+"""
+
+
+import json
+import os
+
+import pytest
+
+from gkeepserver.server_configuration import config
+from gkeepserver.slow_log import StageTimer, record_if_slow
+
+
+@pytest.fixture
+def slow_log_path(tmp_path, monkeypatch, gkeepd_log):
+    slow_log_path = os.path.join(str(tmp_path), 'slow.log')
+
+    monkeypatch.setattr(config, 'slow_log_threshold', 1, raising=False)
+    monkeypatch.setattr(config, 'slow_log_file_path', slow_log_path,
+                        raising=False)
+
+    yield slow_log_path
+
+
+def test_stage_timer():
+    timer = StageTimer()
+
+    with timer.stage('first'):
+        pass
+
+    with pytest.raises(ValueError):
+        with timer.stage('second'):
+            raise ValueError
+
+    assert [name for name, seconds in timer.stages] == ['first', 'second']
+    assert all(seconds >= 0 for name, seconds in timer.stages)
+
+
+def test_record_if_slow(slow_log_path, gkeepd_log):
+    timer = StageTimer()
+    timer.stages = [('setup', 0.5), ('tests', 2.0)]
+
+    assert not record_if_slow('run_tests', 'fast', 0.5, timer)
+    assert not os.path.exists(slow_log_path)
+
+    assert record_if_slow('run_tests', 'slow', 2.5, timer, faculty='prof')
+
+    with open(slow_log_path) as f:
+        entries = [json.loads(line) for line in f]
+
+    assert len(entries) == 1
+    assert entries[0]['operation'] == 'run_tests'
+    assert entries[0]['description'] == 'slow'
+    assert entries[0]['duration'] == 2.5
+    assert entries[0]['stages'] == [['setup', 0.5], ['tests', 2.0]]
+    assert entries[0]['faculty'] == 'prof'
+
+    level, text, fields, timestamp = gkeepd_log.get()
+    assert level.name == 'WARNING'
+    assert 'setup 0.500, tests 2.000' in text
+    assert fields == {'duration': 2.5, 'faculty': 'prof'}
+
+
+def test_disabled(slow_log_path):
+    config.slow_log_threshold = 0
+
+    assert not record_if_slow('handle', 'slow', 100, StageTimer())
+    assert not os.path.exists(slow_log_path)
@@ -0,0 +1,274 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for the filesystem operations in gkeepcore.system_commands. Every test
+runs once running commands and once performing the operations in-process.
+"""
+
+
+import os
+import stat
+import tempfile
+
+import pytest
+
+from gkeepcore.shell_command import CommandExitCodeError
+from gkeepcore.system_commands import (chmod, cp, make_symbolic_link, mkdir,
+                                       mode, mv, rm, touch,
+                                       use_native_commands)
+
+
+@pytest.fixture(params=['commands', 'native'])
+def backend(request):
+    # the expected permissions of new files depend on the umask
+    old_umask = os.umask(0o022)
+    use_native_commands(request.param == 'native')
+
+    yield request.param
+
+    use_native_commands(True)
+    os.umask(old_umask)
+
+
+def _write(path, contents='contents', permissions=0o644):
+    with open(path, 'w') as f:
+        f.write(contents)
+    os.chmod(path, permissions)
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _snapshot(root_path):
+    # Describe every file, directory, and link under a directory
+
+    snapshot = {}
+
+    for dir_path, dir_names, file_names in os.walk(root_path):
+        for name in dir_names + file_names:
+            path = os.path.join(dir_path, name)
+            relative_path = os.path.relpath(path, root_path)
+            path_stat = os.lstat(path)
+
+            if stat.S_ISLNK(path_stat.st_mode):
+                snapshot[relative_path] = ('link', os.readlink(path))
+            elif stat.S_ISDIR(path_stat.st_mode):
+                snapshot[relative_path] = ('dir',
+                                           stat.S_IMODE(path_stat.st_mode))
+            else:
+                snapshot[relative_path] = ('file',
+                                           stat.S_IMODE(path_stat.st_mode),
+                                           _read(path))
+
+    return snapshot
+
+
+def test_mkdir(backend, tmp_path):
+    path = os.path.join(str(tmp_path), 'a', 'b', 'c')
+
+    mkdir(path)
+    assert os.path.isdir(path)
+
+    # an existing directory is not an error
+    mkdir(path)
+
+    file_path = os.path.join(str(tmp_path), 'file')
+    _write(file_path)
+
+    with pytest.raises(CommandExitCodeError) as exception_info:
+        mkdir(file_path)
+
+    assert exception_info.value.exit_code == 1
+
+
+def test_cp_file(backend, tmp_path):
+    source_path = os.path.join(str(tmp_path), 'source')
+    dest_dir_path = os.path.join(str(tmp_path), 'dest')
+    _write(source_path, 'new', 0o755)
+    os.mkdir(dest_dir_path)
+
+    # copy to a new path and into an existing directory
+    cp(source_path, os.path.join(str(tmp_path), 'copy'))
+    cp(source_path, dest_dir_path)
+
+    # overwriting an existing file keeps its permissions
+    existing_path = os.path.join(str(tmp_path), 'existing')
+    _write(existing_path, 'old', 0o600)
+    cp(source_path, existing_path)
+
+    assert _snapshot(str(tmp_path)) == {
+        'source': ('file', 0o755, 'new'),
+        'copy': ('file', 0o755, 'new'),
+        'dest': ('dir', 0o755),
+        'dest/source': ('file', 0o755, 'new'),
+        'existing': ('file', 0o600, 'new'),
+    }
+
+
+def test_cp_directory(backend, tmp_path):
+    source_path = os.path.join(str(tmp_path), 'source')
+    os.makedirs(os.path.join(source_path, 'sub'))
+    os.chmod(os.path.join(source_path, 'sub'), 0o750)
+    _write(os.path.join(source_path, 'sub', 'file'), 'contents', 0o640)
+    os.symlink('sub/file', os.path.join(source_path, 'link'))
+
+    with pytest.raises(CommandExitCodeError):
+        cp(source_path, os.path.join(str(tmp_path), 'copy'))
+
+    with pytest.raises(CommandExitCodeError):
+        cp(source_path, os.path.join(source_path, 'sub'), recursive=True)
+
+    cp(source_path, os.path.join(str(tmp_path), 'copy'), recursive=True)
+
+    # copying to an existing directory copies into it
+    cp(source_path, os.path.join(str(tmp_path), 'copy'), recursive=True)
+
+    source_snapshot = _snapshot(source_path)
+    copy_snapshot = _snapshot(os.path.join(str(tmp_path), 'copy'))
+
+    assert copy_snapshot.pop('source') == ('dir', 0o755)
+    assert copy_snapshot == {
+        **source_snapshot,
+        **{os.path.join('source', path): description
+           for path, description in source_snapshot.items()}
+    }
+    assert source_snapshot['link'] == ('link', 'sub/file')
+
+
+def test_mv(backend, tmp_path):
+    source_path = os.path.join(str(tmp_path), 'source')
+    dir_path = os.path.join(str(tmp_path), 'dir')
+    _write(source_path, 'new')
+    os.mkdir(dir_path)
+    _write(os.path.join(dir_path, 'existing'), 'old')
+
+    mv(source_path, os.path.join(dir_path, 'existing'))
+    mv(dir_path, os.path.join(str(tmp_path), 'renamed'))
+
+    os.mkdir(os.path.join(str(tmp_path), 'parent'))
+    mv(os.path.join(str(tmp_path), 'renamed'),
+       os.path.join(str(tmp_path), 'parent'))
+
+    assert _snapshot(str(tmp_path)) == {
+        'parent': ('dir', 0o755),
+        'parent/renamed': ('dir', 0o755),
+        'parent/renamed/existing': ('file', 0o644, 'new'),
+    }
+
+    with pytest.raises(CommandExitCodeError):
+        mv(source_path, dir_path)
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason='must run as root to chown')
+def test_mv_across_filesystems(backend, tmp_path):
+    # /dev/shm is usually a tmpfs, like /tmp on many systems
+    if (not os.path.isdir('/dev/shm') or
+            os.stat('/dev/shm').st_dev == os.stat(str(tmp_path)).st_dev):
+        pytest.skip('no second filesystem to move between')
+
+    with tempfile.TemporaryDirectory(dir='/dev/shm') as other_path:
+        file_path = os.path.join(other_path, 'file')
+        dir_path = os.path.join(other_path, 'dir')
+        _write(file_path, 'file', 0o640)
+        os.mkdir(dir_path, 0o750)
+        _write(os.path.join(dir_path, 'inner'), 'inner', 0o600)
+        os.symlink('inner', os.path.join(dir_path, 'link'))
+
+        for path in (file_path, dir_path, os.path.join(dir_path, 'inner'),
+                     os.path.join(dir_path, 'link')):
+            os.lchown(path, 65534, 65534)
+
+        mv(file_path, str(tmp_path))
+        mv(dir_path, str(tmp_path))
+
+        assert os.listdir(other_path) == []
+
+    assert _snapshot(str(tmp_path)) == {
+        'file': ('file', 0o640, 'file'),
+        'dir': ('dir', 0o750),
+        'dir/inner': ('file', 0o600, 'inner'),
+        'dir/link': ('link', 'inner'),
+    }
+
+    for relative_path in ('file', 'dir', 'dir/inner', 'dir/link'):
+        path_stat = os.lstat(os.path.join(str(tmp_path), relative_path))
+        assert (path_stat.st_uid, path_stat.st_gid) == (65534, 65534)
+
+
+def test_rm(backend, tmp_path):
+    dir_path = os.path.join(str(tmp_path), 'dir')
+    os.makedirs(os.path.join(dir_path, 'sub'))
+    _write(os.path.join(dir_path, 'sub', 'file'), permissions=0o400)
+    os.symlink(dir_path, os.path.join(str(tmp_path), 'link'))
+
+    # a missing path is not an error
+    rm(os.path.join(str(tmp_path), 'missing'))
+
+    with pytest.raises(CommandExitCodeError):
+        rm(dir_path)
+
+    # removing a link to a directory does not remove the directory
+    rm(os.path.join(str(tmp_path), 'link'), recursive=True)
+    assert os.path.isdir(dir_path)
+
+    rm(os.path.join(dir_path, 'sub', 'file'))
+    rm(dir_path, recursive=True)
+
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_chmod(backend, tmp_path):
+    dir_path = os.path.join(str(tmp_path), 'dir')
+    os.makedirs(os.path.join(dir_path, 'sub'))
+    _write(os.path.join(dir_path, 'sub', 'file'))
+
+    chmod(dir_path, 750)
+    assert mode(dir_path) == '750'
+    assert mode(os.path.join(dir_path, 'sub')) == '755'
+
+    chmod(dir_path, '770', recursive=True)
+    assert mode(os.path.join(dir_path, 'sub')) == '770'
+    assert mode(os.path.join(dir_path, 'sub', 'file')) == '770'
+
+    # symbolic modes are always run as a command
+    chmod(dir_path, 'o+r')
+    assert mode(dir_path) == '774'
+
+    with pytest.raises(CommandExitCodeError):
+        chmod(os.path.join(str(tmp_path), 'missing'), '700')
+
+
+def test_touch_and_link(backend, tmp_path):
+    file_path = os.path.join(str(tmp_path), 'file')
+    dir_path = os.path.join(str(tmp_path), 'dir')
+    os.mkdir(dir_path)
+
+    touch(file_path)
+    os.utime(file_path, (0, 0))
+    touch(file_path)
+    assert os.stat(file_path).st_mtime > 0
+
+    make_symbolic_link(file_path, os.path.join(str(tmp_path), 'link'))
+    make_symbolic_link(file_path, dir_path)
+
+    assert os.readlink(os.path.join(str(tmp_path), 'link')) == file_path
+    assert os.readlink(os.path.join(dir_path, 'file')) == file_path
+
+    with pytest.raises(CommandExitCodeError):
+        make_symbolic_link(file_path, os.path.join(str(tmp_path), 'link'))
@@ -0,0 +1,61 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepserver.token_bucket"""
+
+
+from time import monotonic, sleep
+
+from gkeepserver.token_bucket import TokenBucket
+
+
+def test_burst_then_rate():
+    bucket = TokenBucket(interval=0.05, burst=3)
+
+    for count in range(3):
+        assert bucket.try_acquire()
+
+    assert not bucket.try_acquire()
+    assert 0 < bucket.wait_time() <= 0.05
+
+    sleep(0.06)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    # the bucket never holds more than burst tokens
+    sleep(0.3)
+    assert [bucket.try_acquire() for count in range(4)] == \
+        [True, True, True, False]
+
+
+def test_acquire_waits():
+    bucket = TokenBucket(interval=0.05)
+
+    start = monotonic()
+
+    for count in range(4):
+        bucket.acquire()
+
+    assert monotonic() - start >= 0.14
+
+
+def test_unlimited():
+    bucket = TokenBucket(interval=0)
+
+    for count in range(100):
+        assert bucket.try_acquire()
+
+    assert bucket.wait_time() == 0
@@ -0,0 +1,83 @@
+# Copyright 2026 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests for gkeepserver.tracing
+"""
+
+
+import os
+
+import pytest
+
+from gkeepserver import tracing
+from gkeepserver.database import db
+from gkeepserver.tracing import Trace, TraceRecorderThread
+
+
+@pytest.fixture
+def recorder(monkeypatch, gkeepd_log, tmp_path):
+    db.connect(os.path.join(str(tmp_path), 'gkeepd.db'))
+
+    recorder = TraceRecorderThread()
+    monkeypatch.setattr(tracing, 'trace_recorder', recorder)
+    recorder.start()
+
+    yield recorder
+
+    if recorder.is_alive():
+        recorder.shutdown()
+
+    db.close_thread_connection()
+
+
+def test_hops_in_memory_when_not_started():
+    trace = Trace('SUBMISSION', 100.0)
+    trace.hop('polled', 101.0)
+
+    assert trace.hops == [('logged', 100.0), ('polled', 101.0)]
+    assert trace.start_time == 100.0
+    assert len(trace.trace_id) == 32
+    assert Trace('SUBMISSION').trace_id != trace.trace_id
+
+
+def test_describe():
+    trace = Trace('SUBMISSION')
+
+    trace.describe('faculty', 'class', 'hw1')
+    trace.describe('faculty')
+
+    assert (trace.faculty_username, trace.class_name,
+            trace.assignment_name) == ('faculty', 'class', 'hw1')
+
+
+def test_recorder_stores_hops(recorder):
+    trace = Trace('SUBMISSION', 100.0)
+    trace.hop('polled', 101.0)
+    trace.describe('faculty', 'class', 'hw1')
+    trace.hop('email_sent', 160.0)
+
+    recorder.shutdown()
+
+    assert db.get_trace_hops(trace.trace_id) == [('logged', 100.0),
+                                                 ('polled', 101.0),
+                                                 ('email_sent', 160.0)]
+
+    latencies = db.get_trace_latencies('SUBMISSION', 'email_sent')
+
+    assert len(latencies) == 1
+    assert latencies[0]['assignment_name'] == 'hw1'
+    assert latencies[0]['latency'] == 60.0